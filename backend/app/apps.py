@@ -5,4 +5,6 @@ class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
 
-
+    def ready(self):
+        # Connects the cache invalidation and event publishing receivers
+        from . import signals  # noqa: F401
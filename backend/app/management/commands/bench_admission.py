@@ -0,0 +1,139 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import RequestFactory, override_settings
+
+from app.middleware import AdmissionControl
+from app.services.rate_limit import Admission, SharedTokenBuckets
+
+
+class Command(BaseCommand):
+    help = 'Measure goodput under increasing overload with admission control off and on, and rate-limit check cost'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/stress-index', help='Endpoint to load')
+        parser.add_argument('--threads', type=int, default=64, help='Request threads of the simulated server')
+        parser.add_argument('--seconds', type=float, default=10.0, help='Seconds of traffic per load level')
+        parser.add_argument('--load', type=float, action='append',
+                            help='Offered load as a multiple of capacity (repeatable; default 0.5, 1, 2 and 4)')
+        parser.add_argument('--deadline', type=float, default=1.0,
+                            help='Seconds a client waits; later responses do not count as goodput')
+        parser.add_argument('--mode', choices=('off', 'on'), action='append',
+                            help='Admission control off or on (repeatable; default both)')
+        parser.add_argument('--max-concurrent', type=int, help='Override ADMISSION_MAX_CONCURRENT')
+        parser.add_argument('--queue-size', type=int, help='Override ADMISSION_QUEUE_SIZE')
+        parser.add_argument('--queue-timeout', type=float, help='Override ADMISSION_QUEUE_TIMEOUT')
+
+    def handle(self, *args, **options):
+        # Every shed request would otherwise log a 503
+        logging.getLogger('django.request').disabled = True
+        with override_settings(ALLOWED_HOSTS=['*']):
+            capacity = self._capacity(options)
+        self.stdout.write(f'{options["path"]}: capacity {capacity:,.0f} req/s, {options["threads"]} server threads, '
+                          f'{options["deadline"]:g}s client deadline')
+        admission = {key: getattr(settings, f'ADMISSION_{key.upper()}') if options[key] is None else options[key]
+                     for key in ('max_concurrent', 'queue_size', 'queue_timeout')}
+        self.stdout.write(', '.join(f'{key}={value}' for key, value in admission.items()))
+        self.stdout.write(f'{"admission":>9} {"load":>5} {"offered/s":>10} {"goodput/s":>10} {"late":>6} '
+                          f'{"shed":>6} {"p50 ms":>8} {"p99 ms":>8}')
+        for mode in options['mode'] or ('off', 'on'):
+            for load in options['load'] or (0.5, 1, 2, 4):
+                with override_settings(ALLOWED_HOSTS=['*']):
+                    self._overload(Admission(**admission) if mode == 'on' else None, load, capacity, options)
+        self._bucket_cost()
+
+    @staticmethod
+    def _server(options, admission=None):
+        """A thread pool in front of Django's WSGI handler, as a threaded server has"""
+        handler = WSGIHandler()
+        if admission is not None:
+            handler = AdmissionControl(handler, admission)
+        environ = RequestFactory().get(options['path']).environ
+
+        def request():
+            statuses = []
+            response = handler(dict(environ), lambda status, headers: statuses.append(int(status[:3])))
+            try:
+                b''.join(response)
+            finally:
+                if hasattr(response, 'close'):
+                    response.close()
+            return statuses[0]
+
+        return ThreadPoolExecutor(options['threads']), request
+
+    def _capacity(self, options):
+        """Requests per second with a few clients back to back, after a warm-up"""
+        server, request = self._server(options)
+        done = []
+        stop = time.perf_counter() + 3.0
+
+        def client():
+            while time.perf_counter() < stop:
+                request()
+                done.append(time.perf_counter())
+
+        with server:
+            for future in [server.submit(client) for _ in range(4)]:
+                future.result()
+        started = done[0] + 0.5
+        return sum(1 for when in done if when >= started) / (done[-1] - started)
+
+    def _overload(self, admission, load, capacity, options):
+        """Open-loop Poisson arrivals at `load` times capacity; latency counts from when each request was due"""
+        rng = np.random.default_rng(3)
+        rate = load * capacity
+        arrivals = np.cumsum(rng.exponential(1 / rate, size=int(rate * options['seconds'] * 1.2)))
+        arrivals = arrivals[arrivals < options['seconds']]
+        results = []
+        server, request = self._server(options, admission)
+
+        def call(due):
+            status = request()
+            results.append((status, time.perf_counter() - due))
+
+        started = time.perf_counter()
+        for offset in arrivals:
+            due = started + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            server.submit(call, due)
+        # Requests still queued once their client has given up are never worth answering
+        time.sleep(options['deadline'])
+        server.shutdown(wait=True, cancel_futures=True)
+
+        statuses = np.array([status for status, _ in results])
+        latencies = np.array([latency for _, latency in results])
+        ok = latencies[statuses == 200]
+        good = (ok <= options['deadline']).sum()
+        late = len(arrivals) - good - (statuses == 503).sum()
+        self.stdout.write(
+            f'{"on" if admission else "off":>9} {load:>4g}x {len(arrivals) / options["seconds"]:>10,.0f} '
+            f'{good / options["seconds"]:>10,.0f} {late / len(arrivals):>6.1%} '
+            f'{(statuses == 503).sum() / len(arrivals):>6.1%} '
+            f'{np.percentile(ok, 50) * 1000 if len(ok) else 0:>8,.1f} '
+            f'{np.percentile(ok, 99) * 1000 if len(ok) else 0:>8,.1f}'
+        )
+
+    def _bucket_cost(self):
+        """Time per rate-limit check against the shared table, for many clients and for one"""
+        buckets = SharedTokenBuckets(settings.RATE_LIMIT_FILE + '.bench', 131072)
+        try:
+            for label, clients in (('10,000 clients', 10000), ('1 client', 1)):
+                keys = [f'/api/ 10.0.{index // 256}.{index % 256}' for index in range(clients)]
+                checks = 200000
+                started = time.perf_counter()
+                for index in range(checks):
+                    buckets.take(keys[index % clients], 1000.0, 100)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'rate-limit check, {label}: {elapsed * 1e6 / checks:.1f} µs')
+        finally:
+            buckets.close()
+            os.unlink(buckets.path)
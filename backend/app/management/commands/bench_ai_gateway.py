@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from app.services.ai_gateway import AIGateway, CircuitBreaker
+from app.services.ai_stub import StubModel
+from app.services.gemini_service import GeminiService
+
+from .bench_prompt import synthetic_payload
+
+
+class Command(BaseCommand):
+    help = 'Drive AI analysis through healthy, failing and recovering phases of a fault-injecting stub model'
+
+    # (name, error rate, slow rate)
+    PHASES = (('healthy', 0.0, 0.0), ('outage', 1.0, 0.5), ('recovered', 0.0, 0.0))
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rps', type=float, default=15.0, help='Requests arriving per second')
+        parser.add_argument('--phase-seconds', type=float, default=4.0)
+        parser.add_argument('--latency', type=float, default=0.2, help='Stub latency per healthy call, seconds')
+        parser.add_argument('--slow-latency', type=float, default=5.0, help='Extra seconds for a slow call')
+        parser.add_argument('--rate', type=float, default=20.0, help='Gateway requests per second')
+        parser.add_argument('--max-concurrent', type=int, default=4)
+        parser.add_argument('--queue-size', type=int, default=8)
+        parser.add_argument('--timeout', type=float, default=1.0, help='Gateway model call timeout, seconds')
+        parser.add_argument('--mode', choices=('direct', 'gateway'), action='append',
+                            help='Mode to run (repeatable; default both)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"mode":>8} {"phase":>10} {"requests":>9} {"model":>6} {"fallback":>9} '
+                          f'{"errors":>7} {"p50 s":>6} {"p99 s":>6} {"max s":>6} {"peak busy":>9}  fallback reasons')
+        for mode in options['mode'] or ('direct', 'gateway'):
+            self._run(mode, options)
+
+    def _run(self, mode, options):
+        service = GeminiService()
+        model = service.model = StubModel(options['latency'], 0.0, slow_latency=options['slow_latency'], seed=0)
+        gateway = AIGateway(
+            service,
+            rate=options['rate'],
+            burst=options['max_concurrent'],
+            max_concurrent=options['max_concurrent'],
+            queue_size=options['queue_size'],
+            queue_timeout=0.5,
+            timeout=options['timeout'],
+            breaker=CircuitBreaker(failure_threshold=3, slow_seconds=options['timeout'] * 0.8, reset_seconds=1.0),
+        )
+        payload = synthetic_payload(200)
+        results = []
+        lock = threading.Lock()
+        busy = [0]
+        peak = Counter()
+
+        # Open loop: requests arrive at a fixed rate whether or not earlier ones
+        # have finished, each on its own thread, like request workers
+        def request(name):
+            with lock:
+                busy[0] += 1
+                peak[name] = max(peak[name], busy[0])
+            started = time.perf_counter()
+            if mode == 'gateway':
+                result = gateway.analyze('sensor', payload)
+            else:
+                result = asyncio.run(service.analyze_data('sensor', payload))
+            with lock:
+                busy[0] -= 1
+                results.append((name, time.perf_counter() - started, result))
+
+        threads = []
+        interval = 1.0 / options['rps']
+        next_arrival = time.perf_counter()
+        for name, error_rate, slow_rate in self.PHASES:
+            model.error_rate, model.slow_rate = error_rate, slow_rate
+            phase_end = time.perf_counter() + options['phase_seconds']
+            while next_arrival < phase_end:
+                time.sleep(max(0.0, next_arrival - time.perf_counter()))
+                thread = threading.Thread(target=request, args=(name,), daemon=True)
+                thread.start()
+                threads.append(thread)
+                next_arrival += interval
+        for thread in threads:
+            thread.join()
+        gateway.shutdown()
+
+        for name, _, _ in self.PHASES:
+            rows = [(elapsed, result) for phase_name, elapsed, result in results if phase_name == name]
+            latencies = np.array([elapsed for elapsed, _ in rows]) if rows else np.zeros(1)
+            fallbacks = Counter(result['reason'] for _, result in rows if result.get('fallback'))
+            errors = sum(1 for _, result in rows if not result.get('success'))
+            model_answers = len(rows) - sum(fallbacks.values()) - errors
+            self.stdout.write(
+                f'{mode:>8} {name:>10} {len(rows):>9} {model_answers:>6} {sum(fallbacks.values()):>9} {errors:>7} '
+                f'{np.percentile(latencies, 50):>6.2f} {np.percentile(latencies, 99):>6.2f} {latencies.max():>6.2f} '
+                f'{peak[name]:>9}  '
+                + ', '.join(f'{reason}={count}' for reason, count in fallbacks.most_common())
+            )
+        if mode == 'gateway':
+            self.stdout.write(f'{"":>8} circuit opened {gateway.breaker.opened} time(s); stats {gateway.status()}')
@@ -0,0 +1,87 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from app.models import AnalysisJob
+from app.services import ai_jobs
+from app.services.ai_stub import StubModel
+from app.services.gemini_service import GeminiService
+
+from .bench_prompt import synthetic_payload
+
+
+class Command(BaseCommand):
+    help = 'Measure interactive AI job latency with and without a batch backlog, against a stub model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--interactive-slots', type=int, default=1)
+        parser.add_argument('--rate', type=float, default=10.0, help='Model requests per second (the quota)')
+        parser.add_argument('--latency', type=float, default=0.3, help='Stub latency per call, seconds')
+        parser.add_argument('--interactive-rps', type=float, default=1.5, help='Interactive jobs per second')
+        parser.add_argument('--seconds', type=float, default=10.0, help='Seconds of interactive load per phase')
+        parser.add_argument('--backlog', type=int, default=1000, help='Batch jobs queued for the second phase')
+        parser.add_argument('--fifo', action='store_true',
+                            help='Queue batch jobs in the interactive lane, with no reserved threads or quota')
+
+    def handle(self, *args, **options):
+        latency = options['latency']
+
+        def service_factory():
+            service = GeminiService()
+            service.model = StubModel(latency, 0.0)
+            return service
+
+        payload = synthetic_payload(200)
+        created = []
+        pool = ai_jobs.AnalysisWorkerPool(
+            service_factory,
+            processes=options['processes'],
+            threads=options['threads'],
+            rate=options['rate'],
+            interactive_slots=0 if options['fifo'] else options['interactive_slots'],
+            batch_reserve=0 if options['fifo'] else None,
+        )
+        pool.start()
+        try:
+            self.stdout.write(f'{"phase":>9} {"jobs":>5} {"p50 s":>6} {"p99 s":>6} {"max s":>6} {"batch done":>10}')
+            for phase in ('idle', 'backlog'):
+                batch = []
+                if phase == 'backlog':
+                    lane = 'interactive' if options['fifo'] else 'batch'
+                    batch = [ai_jobs.enqueue('sensor', payload, lane).id for _ in range(options['backlog'])]
+                    created += batch
+                interactive = self._drive(payload, options)
+                created += interactive
+                self._report(phase, interactive, batch)
+        finally:
+            pool.stop()
+            AnalysisJob.objects.filter(id__in=created).delete()
+
+    def _drive(self, payload, options):
+        """Queue interactive jobs at a steady rate, then wait for them all to finish"""
+        ids = []
+        interval = 1.0 / options['interactive_rps']
+        next_arrival = time.perf_counter()
+        end = next_arrival + options['seconds']
+        while next_arrival < end:
+            time.sleep(max(0.0, next_arrival - time.perf_counter()))
+            ids.append(ai_jobs.enqueue('sensor', payload).id)
+            next_arrival += interval
+        deadline = time.monotonic() + 300
+        while AnalysisJob.objects.filter(id__in=ids, status__in=('queued', 'running')).exists():
+            if time.monotonic() > deadline:
+                break
+            time.sleep(0.1)
+        return ids
+
+    def _report(self, phase, interactive, batch):
+        rows = AnalysisJob.objects.filter(id__in=interactive, finished_at__isnull=False).values_list(
+            'created_at', 'finished_at'
+        )
+        latencies = np.array([(finished - created).total_seconds() for created, finished in rows] or [0.0])
+        batch_done = AnalysisJob.objects.filter(id__in=batch, status='done').count()
+        self.stdout.write(f'{phase:>9} {len(rows):>5} {np.percentile(latencies, 50):>6.2f} '
+                          f'{np.percentile(latencies, 99):>6.2f} {latencies.max():>6.2f} {batch_done:>10}')
@@ -0,0 +1,63 @@
+import multiprocessing
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.services.audio import AudioFeatureExtractor
+
+
+def synthetic_audio(seconds: float, sample_rate: int, seed: int = 0) -> np.ndarray:
+    """Ambient noise and a hum, with a loud burst every few seconds, as 16-bit PCM"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    signal = 0.02 * rng.standard_normal(len(t)) + 0.01 * np.sin(2 * np.pi * 120 * t)
+    burst = int(0.2 * sample_rate)
+    for start in range(sample_rate, len(t) - burst, 4 * sample_rate):
+        signal[start:start + burst] += 0.5 * rng.standard_normal(burst) * np.hanning(burst)
+    return (np.clip(signal, -1, 1) * 32767).astype('<i2')
+
+
+def _process(pcm: bytes, chunk_bytes: int, results) -> None:
+    extractor = AudioFeatureExtractor()
+    started = time.process_time()
+    summaries = []
+    for offset in range(0, len(pcm), chunk_bytes):
+        summaries.extend(extractor.feed(pcm[offset:offset + chunk_bytes]))
+    results.put((time.process_time() - started, sum(summary['spikes'] for summary in summaries)))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the audio feature pipeline: realtime factor per core and concurrent streams'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=600.0, help='Seconds of audio per stream')
+        parser.add_argument('--chunk-ms', type=float, default=100.0, help='Size of each PCM chunk fed in')
+        parser.add_argument('--processes', type=int, action='append',
+                            help='Parallel streams to try, one process each (repeatable; default 1..cores)')
+
+    def handle(self, *args, **options):
+        sample_rate = settings.AUDIO_SAMPLE_RATE
+        pcm = synthetic_audio(options['seconds'], sample_rate).tobytes()
+        chunk_bytes = int(sample_rate * options['chunk_ms'] / 1000) * 2
+        self.stdout.write(f'{options["seconds"]:.0f}s of {sample_rate} Hz audio per stream, '
+                          f'{options["chunk_ms"]:.0f} ms chunks, {settings.AUDIO_WINDOW}-sample windows')
+        self.stdout.write(f'{"streams":>8} {"wall s":>8} {"cpu s/stream":>13} {"realtime x/core":>16} {"spikes":>7}')
+
+        context = multiprocessing.get_context('fork')
+        for processes in options['processes'] or range(1, (os.cpu_count() or 1) + 1):
+            results = context.Queue()
+            workers = [context.Process(target=_process, args=(pcm, chunk_bytes, results))
+                       for _ in range(processes)]
+            started = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            outcomes = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+            wall = time.perf_counter() - started
+            cpu = sum(seconds for seconds, _ in outcomes) / processes
+            self.stdout.write(f'{processes:>8} {wall:>8.2f} {cpu:>13.2f} {options["seconds"] / cpu:>16,.0f} '
+                              f'{outcomes[0][1]:>7}')
@@ -0,0 +1,67 @@
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from app.services.retention import CompactionJob
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the compaction job against a synthetic dataset in a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000_000, help='Number of synthetic readings')
+        parser.add_argument('--sensors', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=120, help='Time span covered by the readings')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--export', action='store_true', help='Also export expired partitions to Parquet')
+        parser.add_argument('--db-file', default=os.path.join(tempfile.gettempdir(), 'bench_compaction.sqlite3'))
+
+    def handle(self, *args, **options):
+        # Run against a separate test database so the real one is never touched
+        connection.settings_dict['TEST']['NAME'] = options['db_file']
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            now = timezone.now()
+            self._generate(options['rows'], options['sensors'], options['days'], now)
+            job = CompactionJob(batch_size=options['batch_size'], export=options['export'])
+            if options['export']:
+                job.archive.export_dir = job.archive.export_dir / 'bench'
+            stats = job.run(now=now)
+            rows_per_second = options['rows'] / stats['elapsedSeconds'] if stats['elapsedSeconds'] else 0
+            for key, value in stats.items():
+                self.stdout.write(f'{key:>20}: {value}')
+            self.stdout.write(self.style.SUCCESS(f'{"rowsPerSecond":>20}: {rows_per_second:,.0f}'))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def _generate(self, rows, sensors, days, now):
+        """Bulk insert readings spread uniformly over the time span"""
+        started = time.perf_counter()
+        types = ('video', 'audio', 'iot')
+        span = days * 86400
+        chunk = 200_000
+        with connection.cursor() as cursor:
+            for offset in range(0, rows, chunk):
+                batch = []
+                for _ in range(min(chunk, rows - offset)):
+                    sensor = random.randrange(sensors)
+                    batch.append((
+                        f'SEN-{sensor:05d}',
+                        types[sensor % 3],
+                        random.random(),
+                        connection.ops.adapt_datetimefield_value(now - timedelta(seconds=random.random() * span)),
+                    ))
+                with transaction.atomic():
+                    cursor.executemany(
+                        'INSERT INTO app_sensorreading (sensor_id, sensor_type, value, recorded_at) '
+                        'VALUES (%s, %s, %s, %s)',
+                        batch,
+                    )
+                self.stdout.write(f'\rgenerated {offset + len(batch):,} rows', ending='')
+        self.stdout.write(f'\ngenerated {rows:,} rows in {time.perf_counter() - started:.1f}s')
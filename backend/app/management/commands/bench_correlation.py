@@ -0,0 +1,89 @@
+import time
+import tracemalloc
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from app.services.correlation import SOURCES, Correlator, Evidence
+
+
+def _stream(rng, zones, seconds, rate, incidents, jitter):
+    """
+    Unrelated single-sensor events at `rate` per second spread over `zones`, plus
+    `incidents` planted incidents: one event from each kind of source in one zone
+    within a minute. Arrival order is time order disturbed by up to `jitter` seconds.
+    """
+    count = int(seconds * rate)
+    times = rng.uniform(0, seconds, size=count)
+    scopes = rng.integers(zones, size=count)
+    sources = rng.integers(len(SOURCES), size=count)
+    planted = np.full(count, -1)
+
+    starts = rng.uniform(0, seconds - 60, size=incidents)
+    planted_times = (starts[:, None] + rng.uniform(0, 60, size=(incidents, len(SOURCES)))).ravel()
+    planted_scopes = np.repeat(rng.integers(zones, size=incidents), len(SOURCES))
+    planted_sources = np.tile(np.arange(len(SOURCES)), incidents)
+
+    times = np.concatenate([times, planted_times])
+    scopes = np.concatenate([scopes, planted_scopes])
+    sources = np.concatenate([sources, planted_sources])
+    planted = np.concatenate([planted, np.repeat(np.arange(incidents), len(SOURCES))])
+    order = np.argsort(times + rng.uniform(0, jitter, size=len(times)))
+    return times[order].tolist(), scopes[order].tolist(), sources[order].tolist(), planted[order].tolist()
+
+
+def _found(cluster):
+    """Planted incidents whose events all ended up in this cluster"""
+    ids = [item.alert_id for item in cluster.evidence if item.alert_id >= 0]
+    return {planted for planted in set(ids) if ids.count(planted) == len(SOURCES)}
+
+
+class Command(BaseCommand):
+    help = 'Measure cross-sensor correlation throughput, memory and how many planted incidents it fuses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--zones', type=int, default=500)
+        parser.add_argument('--rate', type=float, default=5.0, help='Unrelated events per second')
+        parser.add_argument('--hours', type=float, action='append',
+                            help='Stream lengths to try (repeatable; default 1, 4 and 16)')
+        parser.add_argument('--incidents-per-hour', type=int, default=200)
+        parser.add_argument('--window', type=float, default=120.0)
+        parser.add_argument('--jitter', type=float, default=10.0, help='Seconds events may arrive out of order')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{options["zones"]} zones, {options["rate"]:g} unrelated events/s, '
+                          f'{options["window"]:g}s window')
+        self.stdout.write(f'{"hours":>6} {"events":>11} {"events/s":>10} {"peak open":>10} {"peak MiB":>9} '
+                          f'{"found":>7} {"fused":>7} {"late":>5}')
+        for hours in options['hours'] or (1, 4, 16):
+            rng = np.random.default_rng(11)
+            incidents = int(hours * options['incidents_per_hour'])
+            stream = _stream(rng, options['zones'], hours * 3600, options['rate'], incidents, options['jitter'])
+            # Timed first, then run again under tracemalloc for the memory the correlator holds
+            elapsed, correlator, found, peak_open = self._run(stream, options)
+            tracemalloc.start()
+            self._run(stream, options)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            events = correlator.stats["events"]
+            self.stdout.write(f'{hours:>6g} {events:>11,} {events / elapsed:>10,.0f} {peak_open:>10,} '
+                              f'{peak / 2 ** 20:>9.1f} {len(found) / max(incidents, 1):>7.1%} '
+                              f'{correlator.stats["fused"]:>7,} {correlator.stats["late"]:>5}')
+
+    @staticmethod
+    def _run(stream, options):
+        correlator = Correlator(window=options['window'], lateness=options['jitter'] * 2, min_sources=2)
+        found = set()
+        peak_open = 0
+        started = time.perf_counter()
+        for when, scope, source, planted in zip(*stream):
+            evidence = Evidence(when, f'/{scope}/', SOURCES[source], '', planted, 'Medium', '', '', None)
+            for action, cluster in correlator.add(evidence):
+                # A planted incident counts as found when all its events ended up fused together
+                if action == 'closed' and len(cluster.sources) == len(SOURCES):
+                    found |= _found(cluster)
+            peak_open = max(peak_open, len(correlator))
+        for action, cluster in correlator.close_all():
+            found |= _found(cluster)
+        return time.perf_counter() - started, correlator, found, peak_open
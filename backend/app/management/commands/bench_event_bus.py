@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.services.events import SENSOR_UPDATED, EventBroker, LocalEventBus, RemoteEventBus
+
+
+def _worker(address, events, batch_size, disconnect_every, barrier, results):
+    """One API worker stand-in: publish `events` events and count every event received"""
+    bus = RemoteEventBus(address, batch_size=batch_size, publish_timeout=30)
+    seen = {}
+    duplicates = 0
+    done = threading.Event()
+    expected = events * barrier.parties
+
+    def handler(event):
+        nonlocal duplicates
+        key = (event.origin, event.seq)
+        if key in seen:
+            duplicates += 1
+        seen[key] = True
+        if len(seen) == expected:
+            done.set()
+
+    bus.subscribe(handler)
+    bus.connected.wait(10)
+    barrier.wait()
+
+    stop = threading.Event()
+
+    def drop_connection():
+        # Simulates network failures: the bus must resend and replay across them
+        while not stop.wait(disconnect_every):
+            sock = bus._socket
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+    if disconnect_every:
+        threading.Thread(target=drop_connection, daemon=True).start()
+    started = time.perf_counter()
+    for index in range(events):
+        bus.publish(SENSOR_UPDATED, {"sensor": os.getpid(), "value": index})
+    published = time.perf_counter() - started
+    done.wait(60)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    bus.stop()
+    results.put({"received": len(seen), "duplicates": duplicates, "expected": expected,
+                 "published_s": published, "elapsed_s": elapsed, "timed_out": bus.stats["timed_out"],
+                 "reconnects": bus.stats["reconnects"], "resent": bus.stats["resent"]})
+
+
+class Command(BaseCommand):
+    help = 'Measure event bus throughput across worker processes and check no event is lost or duplicated'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', choices=('local', 'unix', 'tcp'), action='append',
+                            help='Backend to measure (repeatable; default all)')
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--events', type=int, default=20000, help='Events published per process')
+        parser.add_argument('--batch-size', type=int, default=256)
+        parser.add_argument('--disconnect-every', type=float, default=0.0,
+                            help='Drop each worker\'s broker connection every N seconds')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"backend":>8} {"events":>8} {"publish/s":>10} {"deliver/s":>10} '
+                          f'{"lost":>6} {"dups":>5} {"reconnects":>10}')
+        for backend in options['backend'] or ('local', 'unix', 'tcp'):
+            if backend == 'local':
+                self._local(options)
+            else:
+                self._remote(backend, options)
+
+    def _local(self, options):
+        bus = LocalEventBus(batch_size=options['batch_size'], publish_timeout=30)
+        total = options['events'] * options['processes']
+        received = []
+        done = threading.Event()
+
+        def handler(event):
+            received.append(event.seq)
+            if len(received) == total:
+                done.set()
+
+        bus.subscribe(handler)
+        started = time.perf_counter()
+        for index in range(total):
+            bus.publish(SENSOR_UPDATED, {"sensor": 1, "value": index})
+        published = time.perf_counter() - started
+        done.wait(60)
+        elapsed = time.perf_counter() - started
+        bus.stop()
+        lost = total - len(set(received))
+        self.stdout.write(f'{"local":>8} {total:>8,} {total / published:>10,.0f} {total / elapsed:>10,.0f} '
+                          f'{lost:>6} {len(received) - len(set(received)):>5} {0:>10}')
+
+    def _remote(self, backend, options):
+        with tempfile.TemporaryDirectory() as directory:
+            if backend == 'unix':
+                broker = EventBroker(unix_path=os.path.join(directory, 'events.sock'))
+                address = f'unix:{broker.unix_path}'
+            else:
+                with socket.socket() as probe:
+                    probe.bind(('127.0.0.1', 0))
+                    port = probe.getsockname()[1]
+                broker = EventBroker(tcp_address=f'127.0.0.1:{port}')
+                address = f'tcp://127.0.0.1:{port}'
+            broker.start()
+
+            context = multiprocessing.get_context('fork')
+            barrier = context.Barrier(options['processes'])
+            results = context.Queue()
+            processes = [
+                context.Process(target=_worker, args=(address, options['events'], options['batch_size'],
+                                                      options['disconnect_every'], barrier, results))
+                for _ in range(options['processes'])
+            ]
+            for process in processes:
+                process.start()
+            reports = [results.get() for _ in processes]
+            for process in processes:
+                process.join()
+            broker.stop()
+
+        total = options['events'] * options['processes']
+        published = max(report['published_s'] for report in reports)
+        elapsed = max(report['elapsed_s'] for report in reports)
+        lost = sum(report['expected'] - report['received'] for report in reports)
+        duplicates = sum(report['duplicates'] for report in reports)
+        reconnects = sum(report['reconnects'] for report in reports)
+        style = self.style.SUCCESS if not lost and not duplicates else self.style.ERROR
+        self.stdout.write(style(f'{backend:>8} {total:>8,} {total / published:>10,.0f} '
+                                f'{total * len(reports) / elapsed:>10,.0f} {lost:>6} {duplicates:>5} '
+                                f'{reconnects:>10}'))
@@ -0,0 +1,123 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.services.evidence import BlobStore
+
+
+class Command(BaseCommand):
+    help = 'Compare the evidence blob store with a file per blob and a SQLite BLOB table for many small blobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--blobs', type=int, default=1000000, help='Blobs written to the blob store')
+        parser.add_argument('--baseline-blobs', type=int, default=100000,
+                            help='Blobs written to the file-per-blob and SQLite baselines')
+        parser.add_argument('--size', type=int, default=4096, help='Mean blob size in bytes (sizes vary by half)')
+        parser.add_argument('--lookups', type=int, default=20000, help='Random reads timed per store')
+        parser.add_argument('--segment-bytes', type=int, help='Override EVIDENCE_SEGMENT_BYTES')
+        parser.add_argument('--dir', help='Where to write (default: a temporary directory next to EVIDENCE_DIR)')
+
+    def handle(self, *args, **options):
+        parent = options['dir'] or str(settings.EVIDENCE_DIR.parent)
+        root = tempfile.mkdtemp(prefix='bench-evidence-', dir=parent)
+        rng = np.random.default_rng(5)
+        sizes = rng.integers(options['size'] // 2, options['size'] * 3 // 2, size=256)
+        # Random bytes, as compressed JPEG data is
+        self.payloads = [os.urandom(int(size)) for size in sizes]
+        self.stdout.write(f'mean blob {options["size"]:,} bytes, {options["lookups"]:,} random reads per store')
+        self.stdout.write(f'{"store":>10} {"blobs":>10} {"writes/s":>10} {"files":>9} {"disk MiB":>9} '
+                          f'{"disk/blob":>10} {"read p50 µs":>12} {"read p99 µs":>12}')
+        try:
+            store = self._blob_store(os.path.join(root, 'blobs'), options['blobs'], rng, options)
+            self._files(os.path.join(root, 'files'), options['baseline_blobs'], rng, options)
+            self._sqlite(os.path.join(root, 'sqlite'), options['baseline_blobs'], rng, options)
+            self._evict(store, options['blobs'])
+        finally:
+            shutil.rmtree(root)
+
+    def _payload(self, key):
+        return self.payloads[key % len(self.payloads)]
+
+    def _report(self, name, blobs, write_seconds, directory, read, rng, options):
+        keys = rng.integers(0, blobs, size=options['lookups'])
+        latencies = np.empty(len(keys))
+        for index, key in enumerate(keys):
+            started = time.perf_counter()
+            data = read(int(key))
+            latencies[index] = time.perf_counter() - started
+            if data != self._payload(int(key)):
+                raise RuntimeError(f'{name} returned the wrong blob for {key}')
+        files, disk = 0, 0
+        for path, _, names in os.walk(directory):
+            for file_name in names:
+                files += 1
+                disk += os.stat(os.path.join(path, file_name)).st_blocks * 512
+        self.stdout.write(f'{name:>10} {blobs:>10,} {blobs / write_seconds:>10,.0f} {files:>9,} '
+                          f'{disk / 2 ** 20:>9,.0f} {disk / blobs:>10,.0f} '
+                          f'{np.percentile(latencies, 50) * 1e6:>12,.1f} {np.percentile(latencies, 99) * 1e6:>12,.1f}')
+
+    def _blob_store(self, directory, blobs, rng, options):
+        store = BlobStore(directory, options['segment_bytes'])
+        # Spread over a day, so eviction has something to choose by
+        base = time.time() - 86400
+        started = time.perf_counter()
+        for key in range(blobs):
+            store.append(key, self._payload(key), base + key * 86400 / blobs)
+        elapsed = time.perf_counter() - started
+        self._report('blob store', blobs, elapsed, directory, lambda key: store.get(key).data, rng, options)
+        return store
+
+    def _files(self, directory, blobs, rng, options):
+        def path(key):
+            return os.path.join(directory, f'{key % 256:02x}', f'{key}.jpg')
+
+        for fanout in range(256):
+            os.makedirs(os.path.join(directory, f'{fanout:02x}'))
+        started = time.perf_counter()
+        for key in range(blobs):
+            with open(path(key), 'wb') as file:
+                file.write(self._payload(key))
+        elapsed = time.perf_counter() - started
+
+        def read(key):
+            with open(path(key), 'rb') as file:
+                return file.read()
+
+        self._report('files', blobs, elapsed, directory, read, rng, options)
+
+    def _sqlite(self, directory, blobs, rng, options):
+        os.makedirs(directory)
+        database = sqlite3.connect(os.path.join(directory, 'evidence.sqlite3'))
+        database.execute('PRAGMA journal_mode=WAL')
+        database.execute('CREATE TABLE evidence (key INTEGER PRIMARY KEY, data BLOB NOT NULL)')
+        started = time.perf_counter()
+        for first in range(0, blobs, 1000):
+            with database:
+                database.executemany('INSERT INTO evidence VALUES (?, ?)',
+                                     ((key, self._payload(key)) for key in range(first, min(first + 1000, blobs))))
+        elapsed = time.perf_counter() - started
+
+        def read(key):
+            return database.execute('SELECT data FROM evidence WHERE key = ?', (key,)).fetchone()[0]
+
+        try:
+            self._report('sqlite', blobs, elapsed, directory, read, rng, options)
+        finally:
+            database.close()
+
+    def _evict(self, store, blobs):
+        """Time dropping the older half of the blob store"""
+        before = store.usage()
+        started = time.perf_counter()
+        evicted = store.evict(time.time() - 86400 / 2)
+        elapsed = time.perf_counter() - started
+        store.close()
+        self.stdout.write(f'evicting {evicted["blobs"]:,} of {blobs:,} blobs ({evicted["segments"]} of '
+                          f'{before["segments"]} segments, {evicted["bytes"] / 2 ** 20:,.0f} MiB): '
+                          f'{elapsed * 1000:,.0f} ms')
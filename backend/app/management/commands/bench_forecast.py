@@ -0,0 +1,91 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from app.services.forecast import PERIOD, HoltWinters
+
+
+def _series(rng, zones, hours):
+    """Daily-cycle stress per zone with its own amplitude, slow drift, noise and gaps"""
+    phase = rng.uniform(0, 2 * np.pi, size=(zones, 1))
+    base = rng.uniform(0.2, 0.5, size=(zones, 1))
+    amplitude = rng.uniform(0.05, 0.2, size=(zones, 1))
+    hour = np.arange(hours)
+    values = (base + amplitude * np.sin(2 * np.pi * hour / PERIOD + phase) + 0.0005 * hour
+              + rng.normal(0, 0.03, size=(zones, hours)))
+    values[rng.random((zones, hours)) < 0.05] = np.nan
+    return np.clip(values, 0, 1)
+
+
+class _PerZone:
+    """The same model updated zone by zone in plain Python, for comparison"""
+
+    def __init__(self, zones, alpha, beta, gamma):
+        self.alpha, self.beta, self.gamma = alpha, beta, gamma
+        self.state = [[0.0, 0.0, [0.0] * PERIOD, 0.0, 0] for _ in range(zones)]
+
+    def update(self, values, position):
+        alpha, beta, gamma = self.alpha, self.beta, self.gamma
+        for state, value in zip(self.state, values):
+            level, trend, season, variance, points = state
+            expected = level + trend + season[position]
+            if value != value:
+                value = expected
+            elif not points:
+                state[0], state[4] = value, 1
+                continue
+            else:
+                weight = max(1.0 / points, 0.05)
+                state[3] = (1 - weight) * variance + weight * (value - expected) ** 2
+                state[4] = points + 1
+            if points:
+                new_level = alpha * (value - season[position]) + (1 - alpha) * (level + trend)
+                state[1] = beta * (new_level - level) + (1 - beta) * trend
+                season[position] = gamma * (value - new_level) + (1 - gamma) * season[position]
+                state[0] = new_level
+
+
+class Command(BaseCommand):
+    help = 'Measure per-zone stress forecast updates (vectorized vs per zone) and forecast accuracy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--zones', type=int, action='append', help='Zone counts to try (repeatable)')
+        parser.add_argument('--days', type=int, default=28, help='Days of hourly history per zone')
+        parser.add_argument('--horizon', type=int, default=24, help='Hours ahead to score forecasts at')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{options["days"]} days of hourly points per zone, forecasts scored '
+                          f'{options["horizon"]}h ahead')
+        self.stdout.write(f'{"zones":>7} {"update µs":>10} {"per zone ns":>12} {"python µs":>10} {"speedup":>8} '
+                          f'{"MAE":>6} {"naive MAE":>10} {"coverage":>9}')
+        for zones in options['zones'] or (100, 1000, 10000):
+            rng = np.random.default_rng(5)
+            hours = options['days'] * PERIOD
+            horizon = options['horizon']
+            series = _series(rng, zones, hours + horizon)
+            model = HoltWinters(zones)
+
+            started = time.perf_counter()
+            for hour in range(hours):
+                model.update(series[:, hour], hour % PERIOD)
+            update = (time.perf_counter() - started) / hours
+
+            baseline = _PerZone(zones, model.alpha, model.beta, model.gamma)
+            sample = min(hours, 24 * 7)
+            started = time.perf_counter()
+            for hour in range(sample):
+                baseline.update(series[:, hour].tolist(), hour % PERIOD)
+            python = (time.perf_counter() - started) / sample
+
+            mean, lower, upper = model.forecast(horizon, (hours - 1) % PERIOD)
+            actual = series[:, hours:hours + horizon]
+            known = ~np.isnan(actual)
+            error = np.abs(mean - actual)[known].mean()
+            # Naive forecast: the same hour yesterday
+            naive = np.abs(series[:, hours - PERIOD:hours - PERIOD + horizon] - actual)
+            naive_error = naive[known & ~np.isnan(naive)].mean()
+            coverage = ((actual >= lower) & (actual <= upper))[known].mean()
+            self.stdout.write(f'{zones:>7,} {update * 1e6:>10,.0f} {update * 1e9 / zones:>12,.0f} '
+                              f'{python * 1e6:>10,.0f} {python / update:>7.0f}x {error:>6.3f} '
+                              f'{naive_error:>10.3f} {coverage:>9.1%}')
@@ -0,0 +1,148 @@
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from app import views
+from app.services.logins import LoginGate
+
+PASSWORD = 'shift-change-benchmark'
+
+
+class Command(BaseCommand):
+    help = 'Measure a shift-change login storm, its effect on other endpoints, and per-request session cost'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operators', type=int, default=200, help='Operators logging in at once')
+        parser.add_argument('--workers', type=int, default=16, help='Request worker threads of the simulated server')
+        parser.add_argument('--probe', default='/api/summary-stats', help='Endpoint timed during the storm')
+        parser.add_argument('--probe-interval', type=float, default=0.02, help='Seconds between probe requests')
+        parser.add_argument('--mode', choices=('unbounded', 'gated'), action='append',
+                            help='Login handling to try (repeatable; default both)')
+        parser.add_argument('--requests', type=int, default=500, help='Authenticated requests per session backend')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        encoded = make_password(PASSWORD)
+        hash_ms = (time.perf_counter() - started) * 1000
+        users = User.objects.bulk_create([
+            User(username=f'bench-operator-{index}', password=encoded) for index in range(options['operators'])
+        ])
+        gate = views.login_gate
+        # Every turned-away login would otherwise log a 503
+        logging.getLogger('django.request').disabled = True
+        try:
+            with override_settings(ALLOWED_HOSTS=['*']):
+                self.stdout.write(f'{options["operators"]} operators, {options["workers"]} request workers, '
+                                  f'{hash_ms:.0f} ms per password hash')
+                idle = self._probe_only(options)
+                self.stdout.write(f'{options["probe"]} alone: p50 {idle[0]:.1f} ms, p99 {idle[1]:.1f} ms')
+                self.stdout.write(f'{"mode":>10} {"logins/s":>9} {"storm s":>8} {"login p50":>10} {"login p99":>10} '
+                                  f'{"503s":>6} {"probe p50":>10} {"probe p99":>10}')
+                for mode in options['mode'] or ('unbounded', 'gated'):
+                    if mode == 'unbounded':
+                        # Every request worker may hash at once, as before the gate
+                        views.login_gate = LoginGate(options['workers'], options['operators'], 3600)
+                    else:
+                        views.login_gate = LoginGate()
+                    try:
+                        self._storm(mode, users, options)
+                    finally:
+                        views.login_gate.shutdown()
+                        views.login_gate = gate
+
+                self.stdout.write('')
+                self.stdout.write(f'{"session":>15} {"µs/request":>11} {"queries":>8}')
+                for backend in ('db', 'cached_db', 'cache', 'signed_cookies'):
+                    self._session_cost(backend, users[0], options)
+        finally:
+            logging.getLogger('django.request').disabled = False
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    @staticmethod
+    def _request(method, path, body=None):
+        started = time.perf_counter()
+        client = Client()
+        if method == 'post':
+            response = client.post(path, json.dumps(body), content_type='application/json')
+        else:
+            response = client.get(path)
+        return response, time.perf_counter() - started
+
+    def _probe(self, server, stop, options):
+        """Probe latencies (ms, queueing for a worker included) until `stop` is set"""
+        latencies = []
+        while not stop.is_set():
+            started = time.perf_counter()
+            server.submit(self._request, 'get', options['probe']).result()
+            latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(options['probe_interval'])
+        return latencies
+
+    def _probe_only(self, options):
+        stop = threading.Event()
+        threading.Timer(2.0, stop.set).start()
+        with ThreadPoolExecutor(options['workers']) as server:
+            latencies = self._probe(server, stop, options)
+        return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+    def _storm(self, mode, users, options):
+        latencies, refused = [], [0]
+        lock = threading.Lock()
+
+        def operator(user, server):
+            # Logs in, waiting out Retry-After (with jitter) whenever it is turned away
+            started = time.perf_counter()
+            while True:
+                response, _ = server.submit(
+                    self._request, 'post', '/api/auth/login', {"username": user.username, "password": PASSWORD}
+                ).result()
+                if response.status_code != 503:
+                    break
+                with lock:
+                    refused[0] += 1
+                time.sleep(float(response['Retry-After']) * random.uniform(0.5, 1.5))
+            if response.status_code != 200:
+                raise RuntimeError(f'login failed with {response.status_code}: {response.content[:200]}')
+            with lock:
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        stop = threading.Event()
+        with ThreadPoolExecutor(options['workers']) as server:
+            with ThreadPoolExecutor(1) as prober:
+                probes = prober.submit(self._probe, server, stop, options)
+                started = time.perf_counter()
+                with ThreadPoolExecutor(len(users)) as operators:
+                    for future in [operators.submit(operator, user, server) for user in users]:
+                        future.result()
+                elapsed = time.perf_counter() - started
+                stop.set()
+                probe = probes.result()
+        self.stdout.write(f'{mode:>10} {len(latencies) / elapsed:>9,.1f} {elapsed:>8.1f} '
+                          f'{np.percentile(latencies, 50):>10,.0f} {np.percentile(latencies, 99):>10,.0f} '
+                          f'{refused[0]:>6} {np.percentile(probe, 50):>10.1f} {np.percentile(probe, 99):>10.1f}')
+
+    def _session_cost(self, backend, user, options):
+        with override_settings(SESSION_ENGINE=f'django.contrib.sessions.backends.{backend}'):
+            client = Client()
+            client.force_login(user)
+            client.get('/api/auth/me')
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for _ in range(options['requests']):
+                    response = client.get('/api/auth/me')
+                elapsed = time.perf_counter() - started
+            if not response.json().get('authenticated'):
+                raise RuntimeError(f'{backend} session was not kept')
+        self.stdout.write(f'{backend:>15} {elapsed * 1e6 / options["requests"]:>11,.0f} '
+                          f'{len(queries) / options["requests"]:>8.1f}')
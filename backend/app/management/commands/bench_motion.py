@@ -0,0 +1,68 @@
+import io
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from app.services.frames import FrameIngestor, synthetic_jpegs
+from app.services.motion import MotionDetector, MotionPool
+
+
+class Command(BaseCommand):
+    help = 'Benchmark motion detection throughput per core and the cameras each core can keep up with'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cameras', type=int, default=16)
+        parser.add_argument('--workers', type=int, action='append',
+                            help='Worker counts to try (repeatable; default 1..cores)')
+        parser.add_argument('--fps', type=float, default=15.0, help='Camera frame rate to size capacity against')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Measurement time per run')
+
+    def handle(self, *args, **options):
+        ingestor = FrameIngestor()
+        cameras = [f'BENCH_{index:03d}' for index in range(options['cameras'])]
+        try:
+            clip = synthetic_jpegs(ingestor.width, ingestor.height, count=ingestor.slots)
+            for camera in cameras:
+                for data in clip:
+                    ingestor.ingest(camera, data)
+
+            single = self._single_frame_ms(clip)
+            self.stdout.write(f'{ingestor.width}x{ingestor.height} frames, one frame scored in {single:.2f} ms')
+            self.stdout.write(f'{"workers":>8} {"frames/s":>10} {"per worker":>11} {"cameras@" + str(int(options["fps"])) + "fps":>14} '
+                              f'{"scaling":>8}')
+            baseline = None
+            for workers in options['workers'] or range(1, (os.cpu_count() or 1) + 1):
+                rate = self._run(cameras, workers, options['seconds'])
+                baseline = baseline or rate / workers
+                self.stdout.write(f'{workers:>8} {rate:>10,.0f} {rate / workers:>11,.0f} '
+                                  f'{rate / options["fps"]:>14,.1f} {rate / (baseline * workers):>8.0%}')
+        finally:
+            ingestor.close(remove=True)
+
+    @staticmethod
+    def _single_frame_ms(clip):
+        detector = MotionDetector()
+        frames = [np.asarray(Image.open(io.BytesIO(data)).convert('RGB')) for data in clip]
+        detector.update(frames[0])
+        started = time.perf_counter()
+        rounds = 200
+        for index in range(rounds):
+            detector.update(frames[index % len(frames)])
+        return (time.perf_counter() - started) * 1000 / rounds
+
+    @staticmethod
+    def _run(cameras, workers, seconds):
+        pool = MotionPool(cameras, workers=workers, sample_seconds=0.5, benchmark=True)
+        pool.start()
+        # Let the workers warm up before measuring
+        time.sleep(1.0)
+        before = sum(pool.frames_processed)
+        started = time.perf_counter()
+        time.sleep(seconds)
+        after = sum(pool.frames_processed)
+        elapsed = time.perf_counter() - started
+        pool.stop()
+        return (after - before) / elapsed
@@ -0,0 +1,94 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from app.services.notification_sinks import NotificationSinks
+from app.services.notifications import (
+    EmailChannel,
+    Notification,
+    NotificationDispatcher,
+    PushChannel,
+    SmsChannel,
+)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark notification delivery throughput against local stub SMTP and HTTP servers'
+
+    MODES = ('per-message', 'pooled', 'pooled+digest')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notifications', type=int, default=3000)
+        parser.add_argument('--recipients', type=int, default=5, help='Distinct recipients per channel')
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--delay', type=float, default=0.002,
+                            help='Seconds the stub servers take to accept each message')
+        parser.add_argument('--window', type=float, default=0.5, help='Digest window for the digest mode')
+        parser.add_argument('--mode', choices=self.MODES, action='append',
+                            help='Mode to run (repeatable; default all)')
+
+    def handle(self, *args, **options):
+        sinks = NotificationSinks(smtp_port=0, http_port=0, delay=options['delay']).start()
+        try:
+            with override_settings(
+                EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                EMAIL_HOST=sinks.host,
+                EMAIL_PORT=sinks.smtp_port,
+                EMAIL_HOST_USER='',
+                EMAIL_USE_TLS=False,
+            ):
+                self.stdout.write(f'{"mode":>14} {"notif/s":>9} {"wall s":>7} {"deliveries":>10} '
+                                  f'{"connections":>11} {"max submit ms":>13}')
+                for mode in options['mode'] or self.MODES:
+                    self._run(mode, sinks, options)
+        finally:
+            sinks.stop()
+
+    def _run(self, mode, sinks, options):
+        persistent = mode != 'per-message'
+        base = f'http://{sinks.host}:{sinks.http_port}'
+        channels = {
+            'email': EmailChannel(recipient='ops@example.com', persistent=persistent),
+            'sms': SmsChannel(recipient='+15550100', url=f'{base}/sms', pool_size=options['workers'],
+                              persistent=persistent),
+            'push': PushChannel(url=f'{base}/push', pool_size=options['workers'], persistent=persistent),
+        }
+        dispatcher = NotificationDispatcher(
+            channels=channels,
+            workers=options['workers'],
+            queue_size=options['notifications'],
+            digest_window=options['window'] if mode == 'pooled+digest' else 0,
+            retries=0,
+        )
+        before = dict(sinks.stats)
+        dispatcher.start()
+
+        rng = random.Random(0)
+        names = list(channels)
+        slowest_submit = 0.0
+        started = time.perf_counter()
+        for index in range(options['notifications']):
+            priority = 'High' if rng.random() < 0.02 else rng.choice(('Medium', 'Low'))
+            notification = Notification(
+                channel=names[index % len(names)],
+                priority=priority,
+                subject=f'[{priority}] Alert {index}',
+                body=f'Synthetic alert {index}',
+                alert_id=index,
+                recipient=f'{names[index % len(names)]}-{rng.randrange(options["recipients"])}',
+            )
+            submitted = time.perf_counter()
+            dispatcher.submit(notification)
+            slowest_submit = max(slowest_submit, time.perf_counter() - submitted)
+        dispatcher.stop()
+        elapsed = time.perf_counter() - started
+
+        stats = dispatcher.stats
+        connections = sinks.stats['connections'] - before['connections']
+        rate = stats['sent'] / elapsed if elapsed else 0
+        self.stdout.write(f'{mode:>14} {rate:>9,.0f} {elapsed:>7.2f} {stats["deliveries"]:>10} '
+                          f'{connections:>11} {slowest_submit * 1000:>13.2f}')
+        if stats['failed'] or stats['dropped']:
+            self.stdout.write(self.style.WARNING(f'{"":>14} failed={stats["failed"]} dropped={stats["dropped"]}'))
@@ -0,0 +1,65 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+
+from app.services.ai_stub import StubModel
+from app.services.gemini_service import GeminiService
+from app.services.prompt_digest import PromptDigester
+
+
+def synthetic_payload(readings: int, seed: int = 0) -> dict:
+    """Sensor readings with a level shift and a few outliers, plus a motion series"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 8, tzinfo=dt_timezone.utc)
+    rows = []
+    for index in range(readings):
+        value = rng.gauss(0.4 if index < readings * 0.7 else 0.65, 0.05)
+        if rng.random() < 0.002:
+            value += 0.8
+        rows.append({
+            "time": (start + timedelta(seconds=10 * index)).isoformat(),
+            "sensor": rng.choice(("VID-001", "VID-002", "AUD-001", "IOT-001")),
+            "value": round(value, 4),
+        })
+    return {
+        "location": "Building A - Lobby Area",
+        "readings": rows,
+        "motion": [round(rng.random() * 20 + (40 if index % 97 == 0 else 0), 2) for index in range(readings // 4)],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare prompt size and latency with and without payload digesting, against a stub model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readings', type=int, action='append',
+                            help='Payload sizes to try (repeatable; default 100, 1000, 10000)')
+        parser.add_argument('--budget', type=int, help='Override AI_PROMPT_TOKEN_BUDGET')
+        parser.add_argument('--base-latency', type=float, default=0.3, help='Stub latency per call, seconds')
+        parser.add_argument('--per-token-latency', type=float, default=0.0002,
+                            help='Stub latency per prompt token, seconds')
+
+    def handle(self, *args, **options):
+        service = GeminiService()
+        service.model = StubModel(options['base_latency'], options['per_token_latency'])
+        digester = PromptDigester(token_budget=options['budget'])
+
+        self.stdout.write(f'{"readings":>9} {"mode":>8} {"prompt tokens":>14} {"digest ms":>10} '
+                          f'{"latency s":>10} {"speedup":>8}')
+        for readings in options['readings'] or (100, 1000, 10000):
+            payload = synthetic_payload(readings)
+            raw_latency = None
+            for mode, active in (('raw', None), ('digest', digester)):
+                service.digester = active
+                started = time.perf_counter()
+                _, stats = service.prepare_prompt('sensor', payload)
+                prepared = time.perf_counter() - started
+                started = time.perf_counter()
+                result = asyncio.run(service.analyze_data('sensor', payload))
+                latency = time.perf_counter() - started
+                raw_latency = raw_latency or latency
+                self.stdout.write(f'{readings:>9} {mode:>8} {result["prompt"]["promptTokens"]:>14,} '
+                                  f'{prepared * 1000:>10.1f} {latency:>10.2f} {raw_latency / latency:>7.1f}x')
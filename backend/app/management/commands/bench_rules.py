@@ -0,0 +1,114 @@
+import time
+from collections import defaultdict, deque
+from types import SimpleNamespace
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.services.rules import RuleEngine, parse_duration
+
+
+# Rule shapes the benchmark cycles through, each with its own factor
+TEMPLATES = (
+    "type in ('audio', 'motion') and value * (0.5 + sensitivity) >= critical * {factor}",
+    "type in ('audio', 'motion') and mean('5m') >= high * {factor} and count('5m') >= 3",
+    "type == 'video' and value >= high * {factor} and value - mean('1h') >= medium",
+    "max('1m') - min('1m') > medium * {factor}",
+    "abs(value - mean('15m')) > low * {factor} and hour >= 6",
+)
+TYPES = np.array(['audio', 'motion', 'video'])
+
+
+class _PerReading:
+    """The rules evaluated the straightforward way: every rule, on every reading, with Python's eval()"""
+
+    def __init__(self, rules, cooldown):
+        self.rules = [(rule, compile(rule.expression, rule.name, 'eval')) for rule in rules]
+        self.cooldown = cooldown
+        self.windows = {seconds: defaultdict(deque) for seconds in (60, 300, 900, 3600)}
+        self.last_fired = {}
+
+    def evaluate(self, sensor_ids, types, values, times):
+        alerts = []
+        for sensor_id, sensor_type, value, when in zip(sensor_ids, types, values, times):
+            for seconds, readings in self.windows.items():
+                window = readings[sensor_id]
+                window.append((when, value))
+                while window[0][0] <= when - seconds:
+                    window.popleft()
+
+            def stat(function):
+                def apply(duration):
+                    values = [item[1] for item in self.windows[parse_duration(duration)][sensor_id]]
+                    return function(values) if values else float('nan')
+                return apply
+
+            names = {
+                "value": value, "type": sensor_type, "sensitivity": 0.5, "hour": (when % 86400) // 3600,
+                "mean": stat(lambda values: sum(values) / len(values)), "min": stat(min), "max": stat(max),
+                "sum": stat(sum), "count": stat(len), "abs": abs, **settings.ALERT_THRESHOLDS,
+            }
+            for rule, code in self.rules:
+                if eval(code, {"__builtins__": {}}, names):
+                    key = (rule.name, sensor_id)
+                    if when - self.last_fired.get(key, -np.inf) >= self.cooldown:
+                        self.last_fired[key] = when
+                        alerts.append((rule.name, sensor_id))
+        return alerts
+
+
+class Command(BaseCommand):
+    help = 'Measure alert rule evaluation (rules x readings per second), vectorized against per-reading eval()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rules', type=int, action='append', help='Rule counts to try (repeatable)')
+        parser.add_argument('--sensors', type=int, default=2000)
+        parser.add_argument('--batch', type=int, default=5000, help='Readings per evaluated batch')
+        parser.add_argument('--batches', type=int, default=20)
+        parser.add_argument('--baseline-readings', type=int, default=5000,
+                            help='Readings the per-reading baseline is timed on')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(7)
+        batches = []
+        now = 1_700_000_000.0
+        for _ in range(options['batches']):
+            # One reading per sensor every few seconds, batches arriving back to back
+            sensors = rng.integers(options['sensors'], size=options['batch'])
+            times = np.sort(now + rng.uniform(0, 5, size=options['batch']))
+            batches.append(([f'SEN-{sensor:05d}' for sensor in sensors], TYPES[sensors % len(TYPES)],
+                            rng.beta(2, 5, size=options['batch']), times))
+            now += 5
+
+        self.stdout.write(f'{options["sensors"]:,} sensors, batches of {options["batch"]:,} readings')
+        self.stdout.write(f'{"rules":>6} {"readings/s":>12} {"rule-evals/s":>14} {"alerts":>7} '
+                          f'{"per-reading/s":>14} {"speedup":>8}')
+        for count in options['rules'] or (5, 20, 100):
+            rules = [
+                SimpleNamespace(id=index, name=f'rule-{index}', priority='Medium', title='', cooldown=None,
+                                expression=TEMPLATES[index % len(TEMPLATES)].format(
+                                    factor=1 + index // len(TEMPLATES) * 0.01))
+                for index in range(count)
+            ]
+            engine = RuleEngine(live=False)
+            engine.load(rules)
+            engine.evaluate(*batches[0])
+            alerts = 0
+            started = time.perf_counter()
+            for batch in batches[1:]:
+                alerts += len(engine.evaluate(*batch))
+            elapsed = time.perf_counter() - started
+            readings = options['batch'] * (len(batches) - 1)
+            rate = readings / elapsed
+
+            baseline = _PerReading(rules, settings.ALERT_COOLDOWN_SECONDS)
+            sample = min(options['baseline_readings'], options['batch'])
+            started = time.perf_counter()
+            for batch in batches[:max(1, options['baseline_readings'] // options['batch'])]:
+                baseline.evaluate(*(column[:sample] for column in batch))
+            baseline_rate = sample * max(1, options['baseline_readings'] // options['batch']) \
+                / (time.perf_counter() - started)
+
+            self.stdout.write(f'{count:>6} {rate:>12,.0f} {rate * count:>14,.0f} {alerts:>7,} '
+                              f'{baseline_rate:>14,.0f} {rate / baseline_rate:>7.0f}x')
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Loads an entry point and the URLconf, as a worker does before its first request
+_PROBE = '''
+import importlib, time
+started = time.perf_counter()
+importlib.import_module({module!r})
+from django.urls import get_resolver
+get_resolver().url_patterns
+print((time.perf_counter() - started) * 1000)
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure cold-start import time of the WSGI/ASGI entry points and fail if it is over budget'
+
+    ENTRY_POINTS = {
+        'wsgi': 'surveillance_dashboard.wsgi',
+        'asgi': 'surveillance_dashboard.asgi',
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entry-point', choices=tuple(self.ENTRY_POINTS), action='append',
+                            help='Entry point to measure (repeatable; default all)')
+        parser.add_argument('--repeat', type=int, default=3, help='Cold starts per entry point; the fastest counts')
+        parser.add_argument('--max-ms', type=float, default=1000.0, help='Fail if a cold start takes longer')
+        parser.add_argument('--forbid', action='append', default=None,
+                            help='Module that must not be imported at startup (repeatable; '
+                                 'default google.generativeai)')
+        parser.add_argument('--top', type=int, default=8, help='Packages to list by import time')
+
+    def handle(self, *args, **options):
+        forbidden = options['forbid'] or ['google.generativeai']
+        problems = []
+        for name in options['entry_point'] or self.ENTRY_POINTS:
+            runs = [self._probe(self.ENTRY_POINTS[name]) for _ in range(options['repeat'])]
+            wall_ms, imports = min(runs, key=lambda run: run[0])
+            self.stdout.write(f'{name}: {wall_ms:.0f} ms to import {self.ENTRY_POINTS[name]} and load URLs '
+                              f'({len(imports)} modules)')
+
+            by_package = defaultdict(int)
+            for module, self_us in imports.items():
+                by_package[module.split('.')[0]] += self_us
+            for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:options['top']]:
+                self.stdout.write(f'  {package:<28} {self_us / 1000:>8.1f} ms')
+
+            if wall_ms > options['max_ms']:
+                problems.append(f'{name} cold start took {wall_ms:.0f} ms (budget {options["max_ms"]:.0f} ms)')
+            for module in forbidden:
+                if module in imports:
+                    problems.append(f'{name} imports {module} at startup')
+
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('Startup within budget'))
+
+    def _probe(self, module):
+        """Import `module` in a fresh interpreter; returns wall ms and self time in µs per imported module"""
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE',
+                                                                     'surveillance_dashboard.settings'))
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', _PROBE.format(module=module)],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if completed.returncode:
+            raise CommandError(f'Importing {module} failed:\n{completed.stderr[-2000:]}')
+
+        imports = {}
+        for line in completed.stderr.splitlines():
+            # "import time:  self [us] | cumulative | imported package"
+            if not line.startswith('import time:') or 'imported package' in line:
+                continue
+            self_us, _, package = line[len('import time:'):].split('|')
+            imports[package.strip()] = int(self_us)
+        return float(completed.stdout.strip().splitlines()[-1]), imports
@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.services.ai_stub import StubModel
+from app.services.gemini_service import GeminiService
+
+from .bench_prompt import synthetic_payload
+
+
+class Command(BaseCommand):
+    help = 'Compare time to first result for blocking and streaming AI analysis, against a stub model'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readings', type=int, default=1000, help='Sensor readings in the payload')
+        parser.add_argument('--base-latency', type=float, default=0.3, help='Stub latency per call, seconds')
+        parser.add_argument('--per-token-latency', type=float, default=0.0002,
+                            help='Stub latency per prompt token, seconds')
+        parser.add_argument('--output-token-latency', type=float, default=0.02,
+                            help='Stub generation time per response token, seconds')
+
+    def handle(self, *args, **options):
+        service = GeminiService()
+        service.model = StubModel(options['base_latency'], options['per_token_latency'],
+                                  output_token_latency=options['output_token_latency'])
+        payload = synthetic_payload(options['readings'])
+
+        started = time.perf_counter()
+        asyncio.run(service.analyze_data('sensor', payload))
+        blocking = time.perf_counter() - started
+        self.stdout.write(f'{"blocking":>10}: first byte {blocking:.2f}s, risk_level {blocking:.2f}s, '
+                          f'complete {blocking:.2f}s')
+
+        marks = {}
+        started = time.perf_counter()
+        for event in service.stream_analysis('sensor', payload):
+            elapsed = time.perf_counter() - started
+            marks.setdefault('first byte', elapsed)
+            if event['event'] == 'token':
+                marks.setdefault('first token', elapsed)
+            elif event['event'] == 'field':
+                marks.setdefault(event['key'], elapsed)
+        marks['complete'] = time.perf_counter() - started
+        self.stdout.write(f'{"streaming":>10}: ' + ', '.join(f'{name} {seconds:.2f}s' for name, seconds in marks.items()))
@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from app.models import Alert
+from app.services.view_cache import view_cache
+
+
+class Command(BaseCommand):
+    help = 'Compare dashboard endpoint latency with the view cache off, local and shared'
+
+    ENDPOINTS = ('/api/summary-stats', '/api/live-feeds', '/api/sensors', '/api/sensors?zone=2',
+                 '/api/incidents/resolved')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--write-every', type=int, default=100,
+                            help='Create an alert every N requests, invalidating the summary')
+        parser.add_argument('--mode', choices=('off', 'default', 'shared'), action='append',
+                            help='Cache to use (repeatable; default all)')
+
+    def handle(self, *args, **options):
+        caches = dict(settings.CACHES, off={'BACKEND': 'django.core.cache.backends.dummy.DummyCache'})
+        self.stdout.write(f'{"cache":>8} {"req/s":>8} {"p50 ms":>7} {"p99 ms":>7} {"hits":>6} {"computed":>8}')
+        created = []
+        with override_settings(CACHES=caches, ALLOWED_HOSTS=['*']):
+            try:
+                for mode in options['mode'] or ('off', 'default', 'shared'):
+                    created += self._run(mode, options)
+            finally:
+                Alert.objects.filter(id__in=created).delete()
+
+    def _run(self, mode, options):
+        client = Client()
+        view_cache.alias = mode
+        view_cache.invalidate('alerts', 'cameras', 'incidents', 'sensors', 'zones')
+        before = dict(view_cache.stats)
+        created = []
+        latencies = []
+        started = time.perf_counter()
+        for index in range(options['requests']):
+            if options['write_every'] and index % options['write_every'] == options['write_every'] - 1:
+                created.append(Alert.objects.create(title='Benchmark alert', location='Lobby Area').id)
+            request_started = time.perf_counter()
+            response = client.get(self.ENDPOINTS[index % len(self.ENDPOINTS)])
+            latencies.append(time.perf_counter() - request_started)
+            if response.status_code != 200:
+                self.stdout.write(self.style.ERROR(f'{response.status_code} {response.content[:200]}'))
+                break
+        elapsed = time.perf_counter() - started
+        latencies = np.array(latencies) * 1000
+        hits = view_cache.stats['hits'] - before['hits']
+        computed = view_cache.stats['computed'] - before['computed']
+        self.stdout.write(f'{mode:>8} {len(latencies) / elapsed:>8,.0f} {np.percentile(latencies, 50):>7.2f} '
+                          f'{np.percentile(latencies, 99):>7.2f} {hits:>6} {computed:>8}')
+        return created
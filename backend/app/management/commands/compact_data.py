@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.services.retention import CompactionJob
+
+
+class Command(BaseCommand):
+    help = 'Roll up aged sensor readings and alerts and drop data past the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, help='Override DATA_RETENTION_DAYS')
+        parser.add_argument('--batch-size', type=int, help='Override COMPACTION_BATCH_SIZE')
+        parser.add_argument('--no-export', action='store_true', help='Do not export expired data to Parquet')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between delete batches to give writers room')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running, compacting every N seconds (0 runs once)')
+
+    def handle(self, *args, **options):
+        job = CompactionJob(
+            retention_days=options['retention_days'],
+            batch_size=options['batch_size'],
+            export=False if options['no_export'] else None,
+            pause=options['pause'],
+        )
+        while True:
+            stats = job.run()
+            self.stdout.write(self.style.SUCCESS(
+                'Compaction finished: ' + ', '.join(f'{key}={value}' for key, value in stats.items())
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from app.services.archive import FORMATS, ArchiveService
+from app.services.exports import ExportService
+
+
+class Command(BaseCommand):
+    help = 'Export resolved incidents or sensor history to a columnar file under EXPORT_DIR'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=ExportService.DATASETS)
+        parser.add_argument('--format', choices=list(FORMATS), default='parquet')
+        parser.add_argument('--compression', help='Codec override, e.g. zstd or lz4 (arrow defaults to none)')
+        parser.add_argument('--since', help='ISO-8601 start time (inclusive)')
+        parser.add_argument('--until', help='ISO-8601 end time (exclusive)')
+        parser.add_argument('--sensor', help='Only export readings from this sensor')
+
+    def handle(self, *args, **options):
+        since = self._parse(options['since'])
+        until = self._parse(options['until'])
+        archive = ArchiveService(format=options['format'], compression=options['compression'])
+        path, rows = ExportService(archive).export(
+            options['dataset'], since=since, until=until, sensor_id=options['sensor'],
+        )
+        if path is None:
+            self.stdout.write('Nothing to export')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Exported {rows} rows to {path}'))
+
+    @staticmethod
+    def _parse(value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise CommandError(f"Invalid datetime '{value}'")
+        return parsed
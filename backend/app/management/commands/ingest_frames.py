@@ -0,0 +1,92 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.services.frames import FrameIngestor, open_source
+
+
+class Command(BaseCommand):
+    help = ('Ingest camera streams into shared-memory frame rings. Each source is CAMERA=SOURCE, where SOURCE '
+            'is an MJPEG URL, an MJPEG/JPEG file, a directory of JPEGs, or synthetic[:WIDTHxHEIGHT].')
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='+', metavar='CAMERA=SOURCE')
+        parser.add_argument('--fps', type=float, default=15.0, help='Frames per second per camera (0 = unthrottled)')
+        parser.add_argument('--loop', action='store_true', help='Repeat file and directory sources')
+        parser.add_argument('--duration', type=float, default=0.0, help='Stop after N seconds (0 = run until stopped)')
+        parser.add_argument('--report', type=float, default=5.0, help='Seconds between stats reports')
+
+    def handle(self, *args, **options):
+        sources = []
+        for value in options['sources']:
+            camera, _, source = value.partition('=')
+            if not camera or not source:
+                raise CommandError(f"Expected CAMERA=SOURCE, got '{value}'")
+            sources.append((camera, source))
+
+        ingestor = FrameIngestor()
+        stop = threading.Event()
+        errors = {}
+        threads = [
+            threading.Thread(
+                target=self._ingest,
+                args=(ingestor, camera, source, options['fps'], options['loop'], stop, errors),
+                name=f'ingest-{camera}',
+                daemon=True,
+            )
+            for camera, source in sources
+        ]
+        for thread in threads:
+            thread.start()
+
+        started = time.monotonic()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                stop.wait(options['report'])
+                self._report(ingestor)
+                if options['duration'] and time.monotonic() - started >= options['duration']:
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            self._report(ingestor)
+            ingestor.close()
+        for camera, error in errors.items():
+            self.stderr.write(f'{camera}: {error}')
+
+    @staticmethod
+    def _ingest(ingestor, camera, source, fps, loop, stop, errors):
+        interval = 1.0 / fps if fps > 0 else 0.0
+        next_frame = time.monotonic()
+        try:
+            for data in open_source(source, loop=loop):
+                if stop.is_set():
+                    return
+                ingestor.ingest(camera, data)
+                if interval:
+                    next_frame += interval
+                    delay = next_frame - time.monotonic()
+                    if delay > 0:
+                        stop.wait(delay)
+                    else:
+                        next_frame = time.monotonic()
+        except Exception as e:
+            errors[camera] = e
+
+    def _report(self, ingestor):
+        stats = ingestor.stats()
+        for camera, feed in sorted(stats.items()):
+            self.stdout.write(
+                f'{camera:>12}: {feed["fps"]:6.1f} fps  {feed["frames"]:>8} frames  '
+                f'{feed["width"]}x{feed["height"]}  {feed["memoryBytes"] / 2 ** 20:6.1f} MiB'
+            )
+        if len(stats) > 1:
+            total_fps = sum(feed['fps'] for feed in stats.values())
+            total_memory = sum(feed['memoryBytes'] for feed in stats.values())
+            self.stdout.write(self.style.SUCCESS(
+                f'{"total":>12}: {total_fps:6.1f} fps  {total_memory / 2 ** 20:22.1f} MiB'
+            ))
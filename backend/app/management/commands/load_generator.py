@@ -0,0 +1,88 @@
+import asyncio
+import itertools
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import Zone
+from app.services.loadgen import (
+    SENSOR_KINDS, TrafficReplayer, TrafficSimulator, parse_start, read_traffic, write_traffic,
+)
+
+
+def _sensor_counts(value):
+    counts = {}
+    for part in value.split(','):
+        kind, _, count = part.partition('=')
+        if kind not in SENSOR_KINDS or not count.isdigit():
+            raise CommandError(f"--sensors takes kind=count pairs with kinds {', '.join(SENSOR_KINDS)}")
+        counts[kind] = int(count)
+    return counts
+
+
+class Command(BaseCommand):
+    help = ('Simulate a sensor fleet against the ingestion and alert APIs, or replay recorded traffic '
+            '(TRAFFIC_RECORD_FILE) at N times its original speed')
+
+    def add_arguments(self, parser):
+        actions = parser.add_subparsers(dest='action', required=True)
+
+        simulate = actions.add_parser('simulate', help='Generate traffic from simulated sensors')
+        simulate.add_argument('--sensors', default='video=200,audio=200,iot=1000',
+                              help='Sensors per kind (default video=200,audio=200,iot=1000)')
+        simulate.add_argument('--hours', type=float, default=1.0, help='Simulated hours of traffic')
+        simulate.add_argument('--start', help='Simulated start time, ISO 8601 (default midnight UTC today)')
+        simulate.add_argument('--interval', type=float, default=10.0, help='Seconds between readings per sensor')
+        simulate.add_argument('--incidents-per-hour', type=float, default=2.0)
+        simulate.add_argument('--batch', type=int, default=1, help='Readings per request')
+        simulate.add_argument('--seed', type=int, default=0)
+        simulate.add_argument('--out', help='Write the traffic to this file instead of sending it')
+        self._add_target(simulate)
+
+        replay = actions.add_parser('replay', help='Send recorded or saved traffic again')
+        replay.add_argument('file', help='Traffic file from TRAFFIC_RECORD_FILE or simulate --out')
+        self._add_target(replay)
+
+    @staticmethod
+    def _add_target(parser):
+        parser.add_argument('--target', default='http://127.0.0.1:8000', help='Server to send to')
+        parser.add_argument('--speed', type=float, default=1.0, help='Times faster than the original schedule')
+        parser.add_argument('--connections', type=int, default=32, help='Keep-alive connections')
+        parser.add_argument('--limit', type=int, help='Stop after this many requests')
+        parser.add_argument('--header', action='append', default=[], metavar='NAME:VALUE',
+                            help='Extra request header, e.g. Authorization:Bearer ... (repeatable)')
+
+    def handle(self, *args, **options):
+        if options['action'] == 'simulate':
+            locations = list(Zone.objects.filter(parent__isnull=False).values_list('name', flat=True)) or \
+                [f'Zone {index}' for index in range(1, 9)]
+            simulator = TrafficSimulator(
+                _sensor_counts(options['sensors']),
+                locations,
+                interval=options['interval'],
+                incidents_per_hour=options['incidents_per_hour'],
+                batch=options['batch'],
+                seed=options['seed'],
+            )
+            requests = simulator.requests(parse_start(options['start']), options['hours'] * 3600)
+            if options['out']:
+                written = write_traffic(options['out'], itertools.islice(requests, options['limit']))
+                self.stdout.write(self.style.SUCCESS(f'Wrote {written} requests to {options["out"]}'))
+                return
+        else:
+            requests = read_traffic(options['file'])
+
+        headers = dict(header.split(':', 1) for header in options['header'])
+        replayer = TrafficReplayer(options['target'], speed=options['speed'], connections=options['connections'],
+                                   headers={name.strip(): value.strip() for name, value in headers.items()})
+        self.stdout.write(f'Sending to {options["target"]} at {options["speed"]:g}x over '
+                          f'{options["connections"]} connections')
+        summary = asyncio.run(replayer.run(requests, options['limit']))
+        statuses = ', '.join(f'{status}: {count}' for status, count in summary['statuses'].items())
+        self.stdout.write(
+            f'{summary["sent"]} requests in {summary["seconds"]:.1f}s ({summary["rps"]:,.0f}/s), '
+            f'latency p50 {summary["p50_ms"]:.1f} ms, p99 {summary["p99_ms"]:.1f} ms, max {summary["max_ms"]:.1f} ms; '
+            f'fell behind schedule by up to {summary["max_lag_ms"]:.0f} ms; '
+            f'{summary["connections_opened"]} connections opened'
+        )
+        style = self.style.SUCCESS if set(summary['statuses']) <= {200, 201, 202} else self.style.WARNING
+        self.stdout.write(style(f'Statuses: {statuses}'))
@@ -0,0 +1,44 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from app.services.notification_sinks import NotificationSinks
+
+
+class Command(BaseCommand):
+    help = ('Run local stand-in SMTP and SMS/push HTTP servers that print what they receive. '
+            'Point EMAIL_HOST/EMAIL_PORT and SMS_GATEWAY_URL/PUSH_GATEWAY_URL at them for development.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--smtp-port', type=int, default=1025)
+        parser.add_argument('--http-port', type=int, default=8025)
+        parser.add_argument('--delay', type=float, default=0.0,
+                            help='Seconds to wait before acknowledging each message, to simulate a slow provider')
+        parser.add_argument('--quiet', action='store_true', help='Only print a running count')
+
+    def handle(self, *args, **options):
+        sinks = NotificationSinks(
+            host=options['host'],
+            smtp_port=options['smtp_port'],
+            http_port=options['http_port'],
+            delay=options['delay'],
+            on_message=self._quiet_count if options['quiet'] else self._print,
+        )
+        self.stdout.write(f'SMTP sink on {options["host"]}:{options["smtp_port"]}, '
+                          f'SMS/push sink on http://{options["host"]}:{options["http_port"]}/<channel>')
+        self.sinks = sinks
+        try:
+            asyncio.run(sinks.serve())
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f'Received {sinks.stats["messages"]} messages over {sinks.stats["connections"]} connections'
+        ))
+
+    def _print(self, kind, summary):
+        self.stdout.write(f'[{kind}] {summary}')
+
+    def _quiet_count(self, kind, summary):
+        if self.sinks.stats['messages'] % 100 == 0:
+            self.stdout.write(f'{self.sinks.stats["messages"]} messages')
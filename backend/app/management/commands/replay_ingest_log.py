@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from app.services.ingest_log import recover_orphans
+
+
+class Command(BaseCommand):
+    help = ('Apply ingestion logs that no running worker holds, such as those left by a crash. '
+            'Workers do this themselves when they start; this is for when none will.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', help='Log root (default INGEST_LOG_DIR)')
+
+    def handle(self, *args, **options):
+        applied = recover_orphans(options['dir'])
+        self.stdout.write(self.style.SUCCESS(f'Applied {applied} logged records'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from app.services.ai_jobs import AnalysisWorkerPool
+from app.services.gemini_service import get_gemini_service
+
+
+class Command(BaseCommand):
+    help = 'Run queued AI analyses, interactive jobs before batch jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, help='Override AI_JOB_WORKERS')
+        parser.add_argument('--threads', type=int, help='Override AI_JOB_THREADS')
+        parser.add_argument('--interactive-slots', type=int, help='Override AI_JOB_INTERACTIVE_SLOTS')
+
+    def handle(self, *args, **options):
+        pool = AnalysisWorkerPool(
+            get_gemini_service,
+            processes=options['processes'],
+            threads=options['threads'],
+            interactive_slots=options['interactive_slots'],
+        )
+        pool.start()
+        self.stdout.write(f'Started {pool.processes} analysis worker process(es); Ctrl+C to stop')
+        try:
+            pool.join()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.stop()
+            self.stdout.write(self.style.SUCCESS('Analysis workers stopped'))
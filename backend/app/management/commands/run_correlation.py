@@ -0,0 +1,48 @@
+import queue
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.services import events
+from app.services.correlation import FusionService
+
+
+class Command(BaseCommand):
+    help = 'Fuse alerts from video, audio and IoT sensors close in time and zone into incidents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scope', choices=('zone', 'building', 'site'), help='Override CORRELATION_SCOPE')
+        parser.add_argument('--duration', type=float, default=0.0, help='Stop after N seconds (0 = run until stopped)')
+
+    def handle(self, *args, **options):
+        if settings.EVENT_BUS_BACKEND == 'local':
+            self.stdout.write(self.style.WARNING(
+                'EVENT_BUS_BACKEND is local: only alerts raised in this process will be correlated'
+            ))
+        service = FusionService(scope=options['scope'])
+        # Bounded, so a backlog holds up the event bus instead of growing here
+        alerts = queue.Queue(maxsize=10000)
+        bus = events.get_event_bus()
+        unsubscribe = bus.subscribe(lambda event: alerts.put(event.payload), (events.ALERT_CREATED,))
+        self.stdout.write(f'Correlating alerts per {options["scope"] or settings.CORRELATION_SCOPE} within '
+                          f'{service.correlator.window:g}s')
+        started = time.monotonic()
+        try:
+            while not options['duration'] or time.monotonic() - started < options['duration']:
+                try:
+                    service.handle(alerts.get(timeout=1.0))
+                except queue.Empty:
+                    pass
+                before = service.stats["incidents"]
+                service.tick(time.time())
+                if service.stats["incidents"] != before:
+                    self.stdout.write(', '.join(f'{key}={value}' for key, value in service.stats.items()))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            unsubscribe()
+            service.close()
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{key}={value}' for key, value in {**service.stats, **service.correlator.stats}.items())
+        ))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.services.escalation import EscalationScheduler
+from app.services.notifications import NotificationDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Announce new alerts and escalate unacknowledged ones through the notification channels'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between escalation checks')
+        parser.add_argument('--workers', type=int, help='Override NOTIFICATION_WORKERS')
+        parser.add_argument('--once', action='store_true', help='Run a single check and exit')
+        parser.add_argument('--drain-timeout', type=float, default=30.0,
+                            help='Seconds to wait for queued notifications on exit')
+
+    def handle(self, *args, **options):
+        dispatcher = NotificationDispatcher(workers=options['workers'])
+        if not dispatcher.channels:
+            self.stdout.write(self.style.WARNING(
+                'No notification channels configured; escalations will be recorded but not sent'
+            ))
+        dispatcher.start()
+        scheduler = EscalationScheduler(dispatcher)
+        try:
+            self.stdout.write(f'Recovered {scheduler.recover()} scheduled alerts; '
+                              f'channels: {", ".join(dispatcher.channels) or "none"}')
+            while True:
+                stats = scheduler.tick()
+                if stats['raised'] or stats['escalated']:
+                    self.stdout.write(', '.join(f'{key}={value}' for key, value in stats.items()))
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            dispatcher.stop(timeout=options['drain_timeout'])
+            self.stdout.write(self.style.SUCCESS(
+                'Notifications: ' + ', '.join(f'{key}={value}' for key, value in dispatcher.stats.items())
+            ))
@@ -0,0 +1,32 @@
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.services.events import EventBroker
+
+
+class Command(BaseCommand):
+    help = ('Run the event broker that shares alert, sensor and settings events between API worker '
+            'processes (EVENT_BUS_BACKEND=unix) and nodes (EVENT_BUS_BACKEND=tcp)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--unix', nargs='?', const=settings.EVENT_BUS_SOCKET, metavar='PATH',
+                            help=f'Listen on a Unix socket (default path {settings.EVENT_BUS_SOCKET})')
+        parser.add_argument('--tcp', nargs='?', const=settings.EVENT_BUS_ADDRESS, metavar='HOST:PORT',
+                            help=f'Listen on TCP (default {settings.EVENT_BUS_ADDRESS})')
+
+    def handle(self, *args, **options):
+        if not options['unix'] and not options['tcp']:
+            raise CommandError('Give --unix, --tcp or both')
+        broker = EventBroker(unix_path=options['unix'], tcp_address=options['tcp'])
+        listening = [f'unix:{options["unix"]}'] if options['unix'] else []
+        listening += [f'tcp://{options["tcp"]}'] if options['tcp'] else []
+        self.stdout.write(f'Event broker (epoch {broker.epoch}) on {", ".join(listening)}')
+        try:
+            asyncio.run(broker.serve())
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f'Relayed {broker.stats["published"]} events over {broker.stats["connections"]} connections'
+        ))
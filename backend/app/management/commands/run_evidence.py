@@ -0,0 +1,43 @@
+import queue
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.services import events
+from app.services.evidence import EvidenceCapture
+
+
+class Command(BaseCommand):
+    help = 'Store a snapshot and short clip from the camera behind each new alert'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=0.0, help='Stop after N seconds (0 = run until stopped)')
+
+    def handle(self, *args, **options):
+        if settings.EVENT_BUS_BACKEND == 'local':
+            self.stdout.write(self.style.WARNING(
+                'EVENT_BUS_BACKEND is local: only alerts raised in this process will get evidence'
+            ))
+        capture = EvidenceCapture()
+        # Bounded, so a backlog holds up the event bus instead of growing here
+        alerts = queue.Queue(maxsize=10000)
+        bus = events.get_event_bus()
+        unsubscribe = bus.subscribe(lambda event: alerts.put(event.payload), (events.ALERT_CREATED,))
+        self.stdout.write(f'Capturing evidence into {capture.store.directory}')
+        started = time.monotonic()
+        try:
+            while not options['duration'] or time.monotonic() - started < options['duration']:
+                try:
+                    alert = alerts.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+                # Soon after the alert, or the frames that explain it are gone from the ring
+                if capture.capture(alert):
+                    self.stdout.write(', '.join(f'{key}={value}' for key, value in capture.stats.items()))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            unsubscribe()
+            capture.store.close()
+        self.stdout.write(self.style.SUCCESS(', '.join(f'{key}={value}' for key, value in capture.stats.items())))
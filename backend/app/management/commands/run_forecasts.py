@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.services.forecast import StressForecaster
+
+
+class Command(BaseCommand):
+    help = 'Fold the latest hours of readings into the per-zone stress forecasts served by /api/stress-index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-hours', type=int, help='Override FORECAST_HISTORY_HOURS')
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running, checking for completed hours every N seconds (0 runs once)')
+
+    def handle(self, *args, **options):
+        forecaster = StressForecaster(history_hours=options['history_hours'])
+        while True:
+            stats = forecaster.run()
+            if stats['hours'] or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(
+                    'Forecasts updated: ' + ', '.join(f'{key}={value}' for key, value in stats.items())
+                ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
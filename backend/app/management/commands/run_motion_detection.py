@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.models import Camera
+from app.services.motion import MotionPool, store_samples
+
+
+class Command(BaseCommand):
+    help = 'Score motion on ingested camera frames with a worker process per core and store it for the motion chart'
+
+    def add_arguments(self, parser):
+        parser.add_argument('cameras', nargs='*', help='Camera names (default: every camera)')
+        parser.add_argument('--workers', type=int, help='Override MOTION_WORKERS')
+        parser.add_argument('--sample-seconds', type=float, help='Override MOTION_SAMPLE_SECONDS')
+        parser.add_argument('--duration', type=float, default=0.0, help='Stop after N seconds (0 = run until stopped)')
+
+    def handle(self, *args, **options):
+        cameras = options['cameras'] or list(Camera.objects.order_by('name').values_list('name', flat=True))
+        if not cameras:
+            self.stdout.write(self.style.WARNING('No cameras to watch'))
+            return
+        pool = MotionPool(cameras, workers=options['workers'], sample_seconds=options['sample_seconds'])
+        self.stdout.write(f'Watching {len(cameras)} cameras with {pool.workers} workers')
+        pool.start()
+        started = time.monotonic()
+        stored = 0
+        try:
+            while not options['duration'] or time.monotonic() - started < options['duration']:
+                samples = list(pool.samples(timeout=pool.sample_seconds))
+                if samples:
+                    stored += store_samples(samples)
+                    self.stdout.write(
+                        f'{sum(pool.frames_processed)} frames scored; '
+                        + ', '.join(f'{camera}={score:.1f}' for camera, _, score in samples)
+                    )
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.stop()
+            stored += store_samples(list(pool.samples()))
+        self.stdout.write(self.style.SUCCESS(f'Stored {stored} motion samples'))
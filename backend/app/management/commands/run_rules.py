@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.services.rules import RuleRunner
+
+
+class Command(BaseCommand):
+    help = 'Evaluate the alert rules over every stored sensor reading and raise the alerts they find'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0.5,
+                            help='Seconds to wait when there are no new readings')
+        parser.add_argument('--duration', type=float, default=0.0, help='Stop after N seconds (0 = run until stopped)')
+
+    def handle(self, *args, **options):
+        runner = RuleRunner()
+        if not runner.claim():
+            raise CommandError(f'Another run_rules holds {settings.ALERT_RULES_LOCK_FILE}')
+        runner.start()
+        self.stdout.write(f'Evaluating {len(runner.engine.rules)} rules from reading {runner.position}')
+        started = time.monotonic()
+        try:
+            while not options['duration'] or time.monotonic() - started < options['duration']:
+                before = runner.stats["alerts"]
+                if not runner.run_once():
+                    time.sleep(options['interval'])
+                elif runner.stats["alerts"] != before:
+                    self.stdout.write(', '.join(f'{key}={value}' for key, value in runner.stats.items()))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            runner.close()
+        self.stdout.write(self.style.SUCCESS(', '.join(f'{key}={value}' for key, value in runner.stats.items())))
@@ -0,0 +1,185 @@
+import json
+import math
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .services.loadgen import USER_AGENT
+from .services.rate_limit import Admission, SharedTokenBuckets, get_admission, get_buckets
+
+
+class TrafficRecorder:
+    """
+    Appends each request to the ingestion and alert APIs to TRAFFIC_RECORD_FILE
+
+    One JSON line per request ({ts, method, path, body}), the format
+    `manage.py load_generator replay` reads; the generator's own requests are
+    left out. Removes itself when no file is set.
+    """
+
+    PATHS = ('/api/ingest/', '/api/alerts/')
+
+    def __init__(self, get_response):
+        if not settings.TRAFFIC_RECORD_FILE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self._file = open(settings.TRAFFIC_RECORD_FILE, 'a', buffering=1)
+        self._lock = threading.Lock()
+
+    def __call__(self, request):
+        if (request.method == 'POST' and request.path.startswith(self.PATHS)
+                and request.headers.get('User-Agent') != USER_AGENT):
+            try:
+                body = json.loads(request.body) if request.body else None
+            except ValueError:
+                # Not JSON, so not something the replay could send
+                return self.get_response(request)
+            line = json.dumps({"ts": time.time(), "method": request.method, "path": request.get_full_path(),
+                               "body": body}, separators=(',', ':'))
+            with self._lock:
+                self._file.write(line + '\n')
+        return self.get_response(request)
+
+
+def _api_path(path: str) -> str:
+    """
+    The path as served under /api/. app.urls is mounted at the root as well
+    (see surveillance_dashboard/urls.py), so /auth/login has to meet the
+    limits and exemptions configured for /api/auth/login.
+    """
+    if path.startswith(('/api/', '/admin/', '/' + settings.STATIC_URL.lstrip('/'))):
+        return path
+    return '/api' + path
+
+
+def _refusal(origin: Optional[str], message: str, retry_after: int) -> Tuple[bytes, List[Tuple[str, str]]]:
+    """A JSON error with Retry-After, and the CORS headers the dashboard needs to read it"""
+    body = json.dumps({"error": message}).encode()
+    headers = [('Content-Type', 'application/json'), ('Content-Length', str(len(body))),
+               ('Retry-After', str(retry_after))]
+    if origin and (settings.CORS_ALLOW_ALL_ORIGINS or origin in settings.CORS_ALLOWED_ORIGINS):
+        headers += [('Access-Control-Allow-Origin', origin), ('Access-Control-Expose-Headers', 'Retry-After'),
+                    ('Vary', 'Origin')]
+        if settings.CORS_ALLOW_CREDENTIALS:
+            headers.append(('Access-Control-Allow-Credentials', 'true'))
+    return body, headers
+
+
+def _refuse(environ, start_response, status: str, message: str, retry_after: int):
+    body, headers = _refusal(environ.get('HTTP_ORIGIN'), message, retry_after)
+    start_response(status, headers)
+    return [body]
+
+
+class RateLimiter:
+    """
+    WSGI middleware: per-client token buckets for the route prefixes in RATE_LIMITS
+
+    A client over its limit gets 429 with a Retry-After of the seconds until
+    its next token. It wraps the WSGI application rather than sitting in
+    MIDDLEWARE, so a refused request costs a few microseconds instead of
+    Django building and tearing down a request. The buckets are shared by
+    every worker process on the host (see SharedTokenBuckets), so the limit
+    holds however requests are spread. Paths served from the root mount are
+    matched as their /api/ equivalents.
+    """
+
+    def __init__(self, application, rules: Optional[List[Tuple[str, float, int]]] = None,
+                 buckets: Optional[SharedTokenBuckets] = None):
+        self.application = application
+        self.rules = [(prefix, per_minute / 60.0, burst)
+                      for prefix, per_minute, burst in (settings.RATE_LIMITS if rules is None else rules)]
+        self.header = 'HTTP_' + settings.RATE_LIMIT_CLIENT_HEADER.upper().replace('-', '_')
+        self.buckets = buckets or (get_buckets() if any(rate for _, rate, _ in self.rules) else None)
+
+    @staticmethod
+    def _first(forwarded: str) -> str:
+        # X-Forwarded-For lists the client first, then each proxy
+        return forwarded.split(',')[0].strip()
+
+    def _client(self, environ) -> str:
+        if settings.RATE_LIMIT_CLIENT_HEADER:
+            client = self._first(environ.get(self.header, ''))
+            if client:
+                return client
+        return environ.get('REMOTE_ADDR', '')
+
+    def wait(self, path: str, client) -> float:
+        """
+        Seconds until the client may make this request, 0 if it may now;
+        `client` is called for the client's name only when a limit applies
+        """
+        path = _api_path(path)
+        for prefix, rate, burst in self.rules:
+            if path.startswith(prefix):
+                return rate and self.buckets.take(f'{prefix} {client()}', rate, burst)
+        return 0.0
+
+    def __call__(self, environ, start_response):
+        wait = self.wait(environ.get('PATH_INFO', ''), lambda: self._client(environ))
+        if wait:
+            return _refuse(environ, start_response, '429 Too Many Requests', 'Too many requests', math.ceil(wait))
+        return self.application(environ, start_response)
+
+
+class AsgiRateLimiter(RateLimiter):
+    """
+    RateLimiter for the ASGI application (see asgi.py), sharing the same
+    buckets, so a client gets one limit whichever server it reaches
+    """
+
+    def _client(self, scope) -> str:
+        if settings.RATE_LIMIT_CLIENT_HEADER:
+            name = settings.RATE_LIMIT_CLIENT_HEADER.lower().encode()
+            for key, value in scope.get('headers', ()):
+                if key == name:
+                    client = self._first(value.decode('latin-1'))
+                    if client:
+                        return client
+        return (scope.get('client') or ('',))[0]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            wait = self.wait(scope.get('path', ''), lambda: self._client(scope))
+            if wait:
+                origin = dict(scope.get('headers', ())).get(b'origin')
+                body, headers = _refusal(origin and origin.decode('latin-1'), 'Too many requests',
+                                         math.ceil(wait))
+                await send({"type": "http.response.start", "status": 429,
+                            "headers": [(key.lower().encode(), value.encode()) for key, value in headers]})
+                await send({"type": "http.response.body", "body": body})
+                return
+        await self.application(scope, receive, send)
+
+
+class AdmissionControl:
+    """
+    WSGI middleware: sheds requests with 503 and Retry-After once this
+    process has ADMISSION_MAX_CONCURRENT in progress and ADMISSION_QUEUE_SIZE
+    waiting (see Admission)
+
+    Paths in ADMISSION_EXEMPT_PATHS (matched as their /api/ equivalents)
+    always go through. The slot is given back when the application returns
+    its response, so a streaming response holds one only while the view sets
+    it up. There is no ASGI equivalent: Admission blocks a thread while a
+    request waits its turn, which an event loop cannot afford.
+    """
+
+    def __init__(self, application, admission: Optional[Admission] = None):
+        self.application = application
+        self.exempt = tuple(settings.ADMISSION_EXEMPT_PATHS)
+        self.admission = admission or (get_admission() if settings.ADMISSION_MAX_CONCURRENT else None)
+
+    def __call__(self, environ, start_response):
+        if self.admission is None or _api_path(environ.get('PATH_INFO', '')).startswith(self.exempt):
+            return self.application(environ, start_response)
+        if not self.admission.acquire():
+            return _refuse(environ, start_response, '503 Service Unavailable', 'Server busy, try again shortly',
+                           self.admission.retry_after)
+        try:
+            return self.application(environ, start_response)
+        finally:
+            self.admission.release()
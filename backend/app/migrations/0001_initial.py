@@ -0,0 +1,73 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Alert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('icon', models.CharField(default='warning', max_length=32)),
+                ('title', models.CharField(max_length=200)),
+                ('location', models.CharField(max_length=200)),
+                ('priority', models.CharField(default='Medium', max_length=16)),
+                ('description', models.TextField(blank=True, default='')),
+                ('status', models.CharField(default='open', max_length=16)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AlertRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('priority', models.CharField(max_length=16)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReadingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensor_id', models.CharField(max_length=32)),
+                ('sensor_type', models.CharField(max_length=16)),
+                ('resolution', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=8)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.FloatField(default=0.0)),
+                ('min_value', models.FloatField()),
+                ('max_value', models.FloatField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SensorReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensor_id', models.CharField(max_length=32)),
+                ('sensor_type', models.CharField(max_length=16)),
+                ('value', models.FloatField()),
+                ('recorded_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='alertrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'priority'), name='unique_alert_rollup_day'),
+        ),
+        migrations.AddConstraint(
+            model_name='readingrollup',
+            constraint=models.UniqueConstraint(fields=('resolution', 'bucket_start', 'sensor_id'), name='unique_reading_rollup_bucket'),
+        ),
+        migrations.AddIndex(
+            model_name='sensorreading',
+            index=models.Index(fields=['sensor_id', 'recorded_at'], name='app_sensorr_sensor__097cb8_idx'),
+        ),
+    ]
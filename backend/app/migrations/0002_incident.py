@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Incident',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reference', models.CharField(max_length=32, unique=True)),
+                ('title', models.CharField(max_length=200)),
+                ('location', models.CharField(max_length=200)),
+                ('priority', models.CharField(default='Medium', max_length=16)),
+                ('description', models.TextField(blank=True, default='')),
+                ('status', models.CharField(default='open', max_length=16)),
+                ('resolved_by', models.CharField(blank=True, default='', max_length=100)),
+                ('resolved_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('original_alert_time', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
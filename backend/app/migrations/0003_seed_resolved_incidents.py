@@ -0,0 +1,73 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:31
+
+from datetime import datetime, timezone
+
+from django.db import migrations
+
+
+# The incidents previously hardcoded in get_resolved_incidents
+RESOLVED_INCIDENTS = [
+    ("INC_001", "Unauthorized Access Attempt", "CAM_05 - Main Entrance", "High",
+     "2024-01-15 14:30", "Security Team",
+     "Unauthorized person detected at main entrance. Incident resolved after security verification.",
+     "2024-01-15 14:15"),
+    ("INC_002", "Camera Malfunction", "CAM_08 - Parking Lot", "Medium",
+     "2024-01-15 13:45", "Technical Team",
+     "Camera obstruction detected. Camera cleaned and repositioned.",
+     "2024-01-15 13:20"),
+    ("INC_003", "Suspicious Activity", "CAM_03 - Perimeter", "High",
+     "2024-01-15 12:00", "Security Team",
+     "Unusual movement patterns detected. Verified as authorized maintenance personnel.",
+     "2024-01-15 11:45"),
+    ("INC_004", "High Stress Index", "CAM_07 - Lobby Area", "Medium",
+     "2024-01-15 10:30", "System Auto-Resolve",
+     "Environmental stress index exceeded threshold. Returned to normal levels.",
+     "2024-01-15 10:15"),
+    ("INC_005", "Audio Anomaly", "CAM_09 - Conference Hall", "Low",
+     "2024-01-15 09:00", "System Auto-Resolve",
+     "Unusual audio frequency patterns detected. Confirmed as normal conference activity.",
+     "2024-01-15 08:45"),
+    ("INC_006", "Motion Detection Anomaly", "CAM_12 - Storage Room", "High",
+     "2024-01-14 18:30", "Security Team",
+     "Unexpected motion detected during off-hours. Verified as scheduled maintenance.",
+     "2024-01-14 18:15"),
+]
+
+
+def _parse(value):
+    return datetime.strptime(value, '%Y-%m-%d %H:%M').replace(tzinfo=timezone.utc)
+
+
+def seed_incidents(apps, schema_editor):
+    Incident = apps.get_model('app', 'Incident')
+    Incident.objects.bulk_create([
+        Incident(
+            reference=reference,
+            title=title,
+            location=location,
+            priority=priority,
+            resolved_at=_parse(resolved_at),
+            resolved_by=resolved_by,
+            description=description,
+            status='resolved',
+            original_alert_time=_parse(original_alert_time),
+        )
+        for reference, title, location, priority, resolved_at, resolved_by, description, original_alert_time
+        in RESOLVED_INCIDENTS
+    ])
+
+
+def remove_incidents(apps, schema_editor):
+    Incident = apps.get_model('app', 'Incident')
+    Incident.objects.filter(reference__in=[row[0] for row in RESOLVED_INCIDENTS]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_incident'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_incidents, remove_incidents),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# Full-text indexes kept in sync with their content tables by triggers.
+# Only created on SQLite; other backends fall back to ORM filtering.
+FTS_TABLES = {
+    'app_incident': ['title', 'description', 'location', 'resolved_by'],
+    'app_alert': ['title', 'description', 'location'],
+}
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, columns in FTS_TABLES.items():
+        fts = f'{table}_fts'
+        cols = ', '.join(columns)
+        new_values = ', '.join(f'new.{column}' for column in columns)
+        old_values = ', '.join(f'old.{column}' for column in columns)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', "
+            f"content_rowid='id', tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END"
+        )
+        schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in FTS_TABLES:
+        fts = f'{table}_fts'
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_seed_resolved_incidents'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='incident',
+            name='original_alert_time',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['priority', 'created_at'], name='app_alert_priorit_786996_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alert',
+            index=models.Index(fields=['status', 'created_at'], name='app_alert_status_21121b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['priority', 'original_alert_time'], name='app_inciden_priorit_8153d3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incident',
+            index=models.Index(fields=['status', 'original_alert_time'], name='app_inciden_status_7febef_idx'),
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
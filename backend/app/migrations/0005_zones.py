@@ -0,0 +1,54 @@
+# Generated by Django 5.0.1 on 2026-10-19 08:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Zone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kind', models.CharField(choices=[('site', 'Site'), ('building', 'Building'), ('zone', 'Zone')], default='zone', max_length=16)),
+                ('path', models.CharField(db_index=True, default='', editable=False, max_length=255)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='app.zone')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Sensor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensor_id', models.CharField(max_length=32, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('sensor_type', models.CharField(max_length=16)),
+                ('location', models.CharField(blank=True, default='', max_length=200)),
+                ('status', models.CharField(default='active', max_length=16)),
+                ('sensitivity', models.FloatField(default=0.5)),
+                ('last_update', models.DateTimeField(default=django.utils.timezone.now)),
+                ('zone', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sensors', to='app.zone')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Camera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32, unique=True)),
+                ('location', models.CharField(blank=True, default='', max_length=200)),
+                ('status', models.CharField(default='active', max_length=16)),
+                ('zone', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cameras', to='app.zone')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='zone',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alerts', to='app.zone'),
+        ),
+    ]
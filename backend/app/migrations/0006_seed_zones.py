@@ -0,0 +1,108 @@
+# Generated by Django 5.0.1 on 2026-10-19 08:10
+
+from datetime import datetime, timedelta, timezone
+
+from django.db import migrations
+
+
+# site -> building -> zones
+ZONES = {
+    "HQ Campus": {
+        "Building A": [
+            "Main Entrance", "Entrance Hall", "Lobby Area", "Conference Hall", "Storage Room", "Server Room",
+        ],
+        "Grounds": ["Parking Lot", "Perimeter"],
+    },
+}
+
+# The feeds, sensors and alerts previously hardcoded in views.py
+CAMERAS = [
+    ("CAM_01", "Main Entrance", "Main Entrance"),
+    ("CAM_02", "Parking Lot", "Parking Lot"),
+    ("CAM_03", "Perimeter", "Perimeter"),
+    ("CAM_04", "Building A", "Building A"),
+]
+
+SENSORS = [
+    ("VID-001", "Main Entrance Camera", "video", "Main Entrance", "active", "2025-01-08T09:10:00", 0.7, "Main Entrance"),
+    ("VID-002", "Parking Lot Camera", "video", "Parking Lot A", "active", "2025-01-08T09:09:00", 0.6, "Parking Lot"),
+    ("AUD-001", "Lobby Audio Sensor", "audio", "Lobby Area", "active", "2025-01-08T09:08:00", 0.5, "Lobby Area"),
+    ("IOT-001", "Temperature Sensor", "iot", "Server Room", "inactive", "2025-01-08T08:00:00", 0.8, "Server Room"),
+]
+
+ALERTS = [
+    ("person", "Unauthorized Person Detected", "CAM_12 - Entrance Hall", "High", 2,
+     "This alert was triggered by the AI surveillance system based on multi-sensor fusion analysis.",
+     "Entrance Hall"),
+    ("no_photography", "Camera Obstructed", "CAM_08 - Parking Lot", "Medium", 15,
+     "Camera obstruction detected in parking lot area.", "Parking Lot"),
+    ("directions_run", "Suspicious Activity Detected", "CAM_03 - Perimeter", "High", 28,
+     "Unusual movement patterns detected at perimeter.", "Perimeter"),
+]
+
+
+def seed(apps, schema_editor):
+    Zone = apps.get_model('app', 'Zone')
+    Camera = apps.get_model('app', 'Camera')
+    Sensor = apps.get_model('app', 'Sensor')
+    Alert = apps.get_model('app', 'Alert')
+
+    # Historical models don't run Zone.save(), so paths are set here
+    def create_zone(name, kind, parent=None):
+        zone = Zone.objects.create(name=name, kind=kind, parent=parent)
+        zone.path = f'{parent.path if parent else "/"}{zone.id}/'
+        zone.save(update_fields=['path'])
+        return zone
+
+    zones = {}
+    for site_name, buildings in ZONES.items():
+        site = create_zone(site_name, 'site')
+        for building_name, zone_names in buildings.items():
+            building = zones[building_name] = create_zone(building_name, 'building', site)
+            for zone_name in zone_names:
+                zones[zone_name] = create_zone(zone_name, 'zone', building)
+
+    for name, location, zone in CAMERAS:
+        Camera.objects.create(name=name, location=location, status='active', zone=zones[zone])
+
+    for sensor_id, name, sensor_type, location, status, last_update, sensitivity, zone in SENSORS:
+        Sensor.objects.create(
+            sensor_id=sensor_id,
+            name=name,
+            sensor_type=sensor_type,
+            location=location,
+            status=status,
+            last_update=datetime.fromisoformat(last_update).replace(tzinfo=timezone.utc),
+            sensitivity=sensitivity,
+            zone=zones[zone],
+        )
+
+    now = datetime.now(timezone.utc)
+    for icon, title, location, priority, minutes_ago, description, zone in ALERTS:
+        Alert.objects.create(
+            icon=icon,
+            title=title,
+            location=location,
+            priority=priority,
+            description=description,
+            created_at=now - timedelta(minutes=minutes_ago),
+            zone=zones[zone],
+        )
+
+
+def unseed(apps, schema_editor):
+    apps.get_model('app', 'Alert').objects.filter(title__in=[row[1] for row in ALERTS]).delete()
+    apps.get_model('app', 'Sensor').objects.filter(sensor_id__in=[row[0] for row in SENSORS]).delete()
+    apps.get_model('app', 'Camera').objects.filter(name__in=[row[0] for row in CAMERAS]).delete()
+    apps.get_model('app', 'Zone').objects.filter(name__in=list(ZONES)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_zones'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed, unseed),
+    ]
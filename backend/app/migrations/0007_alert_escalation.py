@@ -0,0 +1,41 @@
+# Generated by Django 5.0.1 on 2026-10-19 08:15
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def schedule_open_alerts(apps, schema_editor):
+    # Alerts raised before escalation existed get their first deadline from creation time
+    Alert = apps.get_model('app', 'Alert')
+    for alert in Alert.objects.filter(status='open', escalate_at__isnull=True):
+        deadline = settings.ESCALATION_DEADLINES.get(alert.priority, settings.ESCALATION_DEADLINES['Low'])
+        alert.escalate_at = alert.created_at + timedelta(seconds=deadline)
+        alert.save(update_fields=['escalate_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_seed_zones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='acknowledged_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='escalate_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='escalation_level',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(schedule_open_alerts, migrations.RunPython.noop),
+    ]
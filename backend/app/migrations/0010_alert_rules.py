@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_ingest_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('expression', models.TextField()),
+                ('priority', models.CharField(default='Medium', max_length=16)),
+                ('title', models.CharField(blank=True, default='', max_length=200)),
+                ('enabled', models.BooleanField(default=True)),
+                ('cooldown', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
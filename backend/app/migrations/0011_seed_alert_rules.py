@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:30
+
+from django.db import migrations
+
+
+# Rules applying the alert thresholds from the settings page, which nothing applied before
+RULES = [
+    ("Critical stress level", "type in ('audio', 'motion') and value * (0.5 + sensitivity) >= critical", "High"),
+    ("Sustained high stress", "type in ('audio', 'motion') and mean('5m') >= high and count('5m') >= 3", "Medium"),
+    ("Video activity spike", "type == 'video' and value >= high and value - mean('1h') >= medium", "Medium"),
+]
+
+
+def seed(apps, schema_editor):
+    AlertRule = apps.get_model('app', 'AlertRule')
+    AlertRule.objects.bulk_create(
+        AlertRule(name=name, expression=expression, priority=priority) for name, expression, priority in RULES
+    )
+
+
+def unseed(apps, schema_editor):
+    AlertRule = apps.get_model('app', 'AlertRule')
+    AlertRule.objects.filter(name__in=[name for name, _, _ in RULES]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_alert_rules'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed, unseed),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_seed_alert_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alert',
+            name='incident',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alerts', to='app.incident'),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='sensor_id',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='alert',
+            name='source',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='incident',
+            name='evidence',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='incident',
+            name='zone',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='incidents', to='app.zone'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_fused_incidents'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StressForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=16, unique=True)),
+                ('hour', models.DateTimeField()),
+                ('level', models.FloatField(default=0.0)),
+                ('trend', models.FloatField(default=0.0)),
+                ('season', models.JSONField(default=list)),
+                ('variance', models.FloatField(default=0.0)),
+                ('points', models.PositiveIntegerField(default=0)),
+                ('forecast', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('zone', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.zone')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_stress_forecasts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stressforecast',
+            name='history',
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -0,0 +1,420 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from django.utils.timesince import timesince
+
+
+class SensorReading(models.Model):
+    """
+    A single raw reading reported by a sensor
+    """
+    sensor_id = models.CharField(max_length=32)
+    sensor_type = models.CharField(max_length=16)
+    value = models.FloatField()
+    recorded_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sensor_id', 'recorded_at']),
+        ]
+
+    def to_dict(self):
+        return {
+            "sensorId": self.sensor_id,
+            "type": self.sensor_type,
+            "value": self.value,
+            "recordedAt": self.recorded_at.isoformat(),
+        }
+
+
+class ReadingRollup(models.Model):
+    """
+    Aggregated sensor readings for one sensor over one time bucket
+    """
+    HOURLY = 'hour'
+    DAILY = 'day'
+    RESOLUTION_CHOICES = [
+        (HOURLY, 'Hourly'),
+        (DAILY, 'Daily'),
+    ]
+
+    sensor_id = models.CharField(max_length=32)
+    sensor_type = models.CharField(max_length=16)
+    resolution = models.CharField(max_length=8, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    total = models.FloatField(default=0.0)
+    min_value = models.FloatField()
+    max_value = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['resolution', 'bucket_start', 'sensor_id'],
+                name='unique_reading_rollup_bucket',
+            ),
+        ]
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return {
+            "sensorId": self.sensor_id,
+            "type": self.sensor_type,
+            "resolution": self.resolution,
+            "bucketStart": self.bucket_start.isoformat(),
+            "count": self.count,
+            "min": self.min_value,
+            "max": self.max_value,
+            "mean": round(self.mean, 4),
+        }
+
+
+class Zone(models.Model):
+    """
+    A node in the site -> building -> zone hierarchy.
+
+    `path` holds the ids of the node and its ancestors ("/1/4/9/"), so a whole
+    subtree is one indexed range scan on path instead of a recursive walk.
+    """
+    SITE = 'site'
+    BUILDING = 'building'
+    ZONE = 'zone'
+    KIND_CHOICES = [
+        (SITE, 'Site'),
+        (BUILDING, 'Building'),
+        (ZONE, 'Zone'),
+    ]
+
+    name = models.CharField(max_length=100)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, default=ZONE)
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='children')
+    path = models.CharField(max_length=255, db_index=True, editable=False, default='')
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        path = f'{self.parent.path if self.parent else "/"}{self.id}/'
+        if path != self.path:
+            old_path, self.path = self.path, path
+            Zone.objects.filter(id=self.id).update(path=path)
+            if old_path:
+                # Re-parenting moves the whole subtree
+                for child in Zone.objects.filter(parent=self):
+                    child.save()
+        from .services.zones import zone_index
+        zone_index.invalidate()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from .services.zones import zone_index
+        zone_index.invalidate()
+        return result
+
+    def subtree(self):
+        """This zone and every zone below it"""
+        # Every descendant path starts with self.path; '0' is the character after '/'
+        return Zone.objects.filter(path__gte=self.path, path__lt=self.path[:-1] + '0')
+
+    def to_dict(self):
+        return {
+            "id": str(self.id),
+            "name": self.name,
+            "kind": self.kind,
+            "parentId": str(self.parent_id) if self.parent_id else None,
+            "path": self.path,
+        }
+
+
+class Sensor(models.Model):
+    """
+    A video, audio or IoT sensor registered with the system
+    """
+    sensor_id = models.CharField(max_length=32, unique=True)
+    name = models.CharField(max_length=100)
+    sensor_type = models.CharField(max_length=16)
+    location = models.CharField(max_length=200, blank=True, default='')
+    status = models.CharField(max_length=16, default='active')
+    sensitivity = models.FloatField(default=0.5)
+    last_update = models.DateTimeField(default=timezone.now)
+    zone = models.ForeignKey(Zone, null=True, blank=True, on_delete=models.SET_NULL, related_name='sensors')
+
+    def save(self, *args, **kwargs):
+        if self.zone_id is None and self.location:
+            from .services.zones import zone_index
+            self.zone_id = zone_index.resolve(self.location)
+        super().save(*args, **kwargs)
+
+    def to_dict(self):
+        return {
+            "id": self.sensor_id,
+            "name": self.name,
+            "type": self.sensor_type,
+            "location": self.location,
+            "status": self.status,
+            "lastUpdate": self.last_update.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            "sensitivity": self.sensitivity,
+            "zoneId": str(self.zone_id) if self.zone_id else None,
+        }
+
+
+class Camera(models.Model):
+    """
+    A camera exposed as a live feed
+    """
+    name = models.CharField(max_length=32, unique=True)
+    location = models.CharField(max_length=200, blank=True, default='')
+    status = models.CharField(max_length=16, default='active')
+    zone = models.ForeignKey(Zone, null=True, blank=True, on_delete=models.SET_NULL, related_name='cameras')
+
+    def save(self, *args, **kwargs):
+        from .services.zones import zone_index
+        if self.zone_id is None and self.location:
+            self.zone_id = zone_index.resolve(self.location)
+        super().save(*args, **kwargs)
+        zone_index.invalidate()
+
+    def to_dict(self):
+        return {
+            "id": str(self.id),
+            "name": self.name,
+            "status": self.status,
+            "location": self.location,
+            "zoneId": str(self.zone_id) if self.zone_id else None,
+        }
+
+
+class Alert(models.Model):
+    """
+    An alert raised by the surveillance system
+    """
+    PRIORITY_COLORS = {
+        'High': 'red',
+        'Medium': 'yellow',
+        'Low': 'blue',
+    }
+
+    icon = models.CharField(max_length=32, default='warning')
+    title = models.CharField(max_length=200)
+    location = models.CharField(max_length=200)
+    priority = models.CharField(max_length=16, default='Medium')
+    description = models.TextField(blank=True, default='')
+    status = models.CharField(max_length=16, default='open')
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    zone = models.ForeignKey(Zone, null=True, blank=True, on_delete=models.SET_NULL, related_name='alerts')
+    acknowledged_at = models.DateTimeField(null=True, blank=True)
+    escalation_level = models.PositiveSmallIntegerField(default=0)
+    # Next escalation deadline; cleared once the alert is acknowledged or fully escalated
+    escalate_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Kind of sensor that raised it (video, audio or iot) and which one, when known
+    source = models.CharField(max_length=16, blank=True, default='')
+    sensor_id = models.CharField(max_length=32, blank=True, default='')
+    # The fused incident this alert is evidence for; see services/correlation.py
+    incident = models.ForeignKey('Incident', null=True, blank=True, on_delete=models.SET_NULL, related_name='alerts')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['priority', 'created_at']),
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.zone_id is None and self.location:
+            from .services.zones import zone_index
+            self.zone_id = zone_index.resolve(self.location)
+        if self._state.adding and self.status == 'open' and self.escalate_at is None:
+            deadline = settings.ESCALATION_DEADLINES.get(self.priority, settings.ESCALATION_DEADLINES['Low'])
+            self.escalate_at = self.created_at + timedelta(seconds=deadline)
+        super().save(*args, **kwargs)
+
+    def acknowledge(self):
+        """Mark the alert acknowledged, stopping any further escalation"""
+        self.status = 'acknowledged'
+        self.acknowledged_at = timezone.now()
+        self.escalate_at = None
+        self.save(update_fields=['status', 'acknowledged_at', 'escalate_at'])
+
+    def to_dict(self):
+        return {
+            "id": str(self.id),
+            "icon": self.icon,
+            "title": self.title,
+            "location": self.location,
+            "priority": self.priority,
+            "time": timesince(self.created_at).split(',')[0].replace('\xa0', ' ') + ' ago',
+            "priorityColor": self.PRIORITY_COLORS.get(self.priority, 'gray'),
+            "description": self.description,
+            "status": self.status,
+            "createdAt": self.created_at.isoformat(),
+            "zoneId": str(self.zone_id) if self.zone_id else None,
+            "escalationLevel": self.escalation_level,
+            "source": self.source,
+            "sensorId": self.sensor_id,
+        }
+
+
+class AlertRollup(models.Model):
+    """
+    Daily alert counts per priority, kept after the alerts themselves expire
+    """
+    day = models.DateField()
+    priority = models.CharField(max_length=16)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'priority'],
+                name='unique_alert_rollup_day',
+            ),
+        ]
+
+
+class Incident(models.Model):
+    """
+    An incident raised from one or more alerts and tracked until resolved
+    """
+    reference = models.CharField(max_length=32, unique=True)
+    title = models.CharField(max_length=200)
+    location = models.CharField(max_length=200)
+    priority = models.CharField(max_length=16, default='Medium')
+    description = models.TextField(blank=True, default='')
+    status = models.CharField(max_length=16, default='open')
+    resolved_by = models.CharField(max_length=100, blank=True, default='')
+    resolved_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    original_alert_time = models.DateTimeField(default=timezone.now, db_index=True)
+    zone = models.ForeignKey(Zone, null=True, blank=True, on_delete=models.SET_NULL, related_name='incidents')
+    # Events fused into this incident, oldest first: time, source, sensor, alert and title of each
+    evidence = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['priority', 'original_alert_time']),
+            models.Index(fields=['status', 'original_alert_time']),
+        ]
+
+    def to_dict(self):
+        return {
+            "id": self.reference,
+            "title": self.title,
+            "location": self.location,
+            "priority": self.priority,
+            "resolvedAt": self.resolved_at.strftime('%Y-%m-%d %H:%M') if self.resolved_at else None,
+            "resolvedBy": self.resolved_by,
+            "description": self.description,
+            "status": self.status,
+            "originalAlertTime": self.original_alert_time.strftime('%Y-%m-%d %H:%M'),
+            "zoneId": str(self.zone_id) if self.zone_id else None,
+            "evidence": self.evidence,
+        }
+
+
+class AnalysisJob(models.Model):
+    """
+    An AI analysis queued for, running on or finished by an analysis worker
+    """
+    LANES = ('interactive', 'batch')
+
+    # Index into LANES; lower lanes are always claimed first
+    lane = models.PositiveSmallIntegerField(default=0)
+    data_type = models.CharField(max_length=32)
+    content = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, default='queued')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=64, blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # A running job whose lease runs out is assumed lost with its worker and queued again
+    lease_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'lane', 'id']),
+        ]
+
+    def to_dict(self, include_result=True):
+        data = {
+            "id": str(self.id),
+            "lane": self.LANES[self.lane],
+            "type": self.data_type,
+            "status": self.status,
+            "attempts": self.attempts,
+            "createdAt": self.created_at.isoformat(),
+            "startedAt": self.started_at.isoformat() if self.started_at else None,
+            "finishedAt": self.finished_at.isoformat() if self.finished_at else None,
+        }
+        if include_result:
+            data["result"] = self.result
+            data["error"] = self.error or None
+        return data
+
+
+class IngestCheckpoint(models.Model):
+    """
+    How far an ingestion log has been applied to the database
+
+    Updated in the same transaction as the rows it covers, so each logged
+    record is applied exactly once, crash or not.
+    """
+    # Host and slot of the log
+    name = models.CharField(max_length=128, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class AlertRule(models.Model):
+    """
+    A condition over sensor readings that raises an alert, e.g.
+    `type == 'audio' and mean('5m') > high`; see services/rules.py
+    """
+    name = models.CharField(max_length=100)
+    expression = models.TextField()
+    priority = models.CharField(max_length=16, default='Medium')
+    # Alert title; the rule name when blank
+    title = models.CharField(max_length=200, blank=True, default='')
+    enabled = models.BooleanField(default=True)
+    # Seconds before the rule may fire again for the same sensor; ALERT_COOLDOWN_SECONDS when null
+    cooldown = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def to_dict(self):
+        return {
+            "id": str(self.id),
+            "name": self.name,
+            "expression": self.expression,
+            "priority": self.priority,
+            "title": self.title,
+            "enabled": self.enabled,
+            "cooldown": self.cooldown,
+            "updatedAt": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class StressForecast(models.Model):
+    """
+    Holt-Winters state and latest forecast of the hourly stress index of a zone
+    (or of the whole site, for key 'all'); see services/forecast.py
+    """
+    key = models.CharField(max_length=16, unique=True)
+    zone = models.ForeignKey(Zone, null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    # Start of the last hour folded into the state
+    hour = models.DateTimeField()
+    level = models.FloatField(default=0.0)
+    trend = models.FloatField(default=0.0)
+    # Additive effect of each hour of the day (UTC)
+    season = models.JSONField(default=list)
+    # Smoothed square of the one-hour-ahead error, for prediction intervals
+    variance = models.FloatField(default=0.0)
+    points = models.PositiveIntegerField(default=0)
+    # Hourly points {time, stress} measured over the day up to `hour`, for hours with readings
+    history = models.JSONField(default=list)
+    # Hourly points {time, stress, lower, upper} from the hour after `hour`
+    forecast = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -1,16 +1,12 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
-from app.services.gemini_service import GeminiService
+from app.services.gemini_service import get_gemini_service
 
 router = APIRouter()
 
-# Initialize Gemini service (will handle missing API key gracefully)
-try:
-    gemini_service = GeminiService()
-except Exception as e:
-    print(f"Warning: Could not initialize Gemini service: {e}")
-    gemini_service = None
+# Shared per process; the Gemini SDK itself is only loaded by the first analysis
+gemini_service = get_gemini_service()
 
 class AnalyzeRequest(BaseModel):
     type: str
@@ -21,13 +17,6 @@ async def analyze_with_ai(request: AnalyzeRequest) -> Dict[str, Any]:
     """
     Analyze data using Gemini AI
     """
-    if not gemini_service:
-        return {
-            "success": False,
-            "error": "Gemini service not initialized. Please set GEMINI_API_KEY environment variable.",
-            "data_type": request.type
-        }
-    
     try:
         result = await gemini_service.analyze_data(request.type, request.content)
         return result
@@ -44,7 +33,7 @@ async def ai_health_check() -> Dict[str, str]:
         return {
             "status": "operational",
             "service": "gemini",
-            "message": "Gemini API is configured"
+            "message": "Gemini API is configured" if gemini_service.configured else "Gemini API not configured"
         }
     except Exception as e:
         return {
@@ -0,0 +1,325 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from django.conf import settings
+
+from .prompt_digest import PromptDigester
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, holding at most `burst`.
+
+    Refilled lazily from the monotonic clock on each call, so there is no timer
+    thread. Low-priority callers can ask to leave `reserve` tokens in the bucket
+    so they never use up the burst that high-priority callers rely on.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self, reserve: float) -> float:
+        """Take a token if one is free, otherwise return seconds until one will be"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1 + reserve:
+                self._tokens -= 1
+                return 0.0
+            return (1 + reserve - self._tokens) / self.rate
+
+    def acquire(self, timeout: float = 0.0, reserve: float = 0.0) -> bool:
+        """Take a token, leaving at least `reserve` behind, waiting up to `timeout` seconds"""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self._take(reserve)
+            if not wait:
+                return True
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for a while.
+
+    Closed: calls go through; `failure_threshold` failures in a row (errors,
+    timeouts or calls slower than `slow_seconds`) open the circuit. Open: calls
+    are refused for `reset_seconds`. Half-open: one probe call is let through;
+    success closes the circuit, failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int, slow_seconds: float, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.slow_seconds = slow_seconds
+        self.reset_seconds = reset_seconds
+        self.opened = 0
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_seconds:
+                    return False
+                self._state = self.HALF_OPEN
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def cancel(self) -> None:
+        """Give back a call that allow() let through but that was never made"""
+        with self._lock:
+            self._probing = False
+
+    def record(self, success: bool, elapsed: float = 0.0) -> None:
+        """Report how an allowed call went"""
+        failed = not success or elapsed > self.slow_seconds
+        with self._lock:
+            self._probing = False
+            if not failed:
+                self._state = self.CLOSED
+                self._failures = 0
+                return
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+def heuristic_analysis(data_type: str, content: Dict[str, Any], reason: str) -> Dict[str, Any]:
+    """
+    Local stand-in for a model analysis, used while the model is unavailable
+
+    The content is digested the same way it would be for a prompt, and risk is
+    judged from how many anomalies and level shifts its series contain.
+    """
+    digest = PromptDigester().reduce(content)
+    anomalies: List[Dict[str, Any]] = []
+    shifts: List[Dict[str, Any]] = []
+
+    def walk(value: Any, path: str) -> None:
+        if isinstance(value, dict):
+            anomalies.extend(dict(item, field=path) for item in value.get("anomalies", []))
+            shifts.extend(dict(item, field=path) for item in value.get("changePoints", []))
+            for key, item in value.items():
+                if key not in ("anomalies", "changePoints"):
+                    walk(item, f"{path}.{key}" if path else key)
+
+    walk(digest, '')
+    score = len(anomalies) + 2 * len(shifts)
+    risk_level = "High" if score >= 6 else "Medium" if score >= 2 else "Low"
+    observations = [f"{item['field']}: outlier {item['value']} at {item['at']}" for item in anomalies[:3]]
+    observations += [f"{item['field']}: level shift from {item['before']} to {item['after']} at {item['at']}"
+                     for item in shifts[:3]]
+    return {
+        "success": True,
+        "analysis": json.dumps({
+            "risk_level": risk_level,
+            "observations": observations or ["No anomalies detected in the submitted data"],
+            "recommendations": ["Review flagged readings manually"] if observations else [],
+            "confidence": 0.4,
+        }),
+        "data_type": data_type,
+        "confidence": 0.4,
+        "fallback": True,
+        "reason": reason,
+    }
+
+
+class AIGateway:
+    """
+    Protects request workers from a slow or failing model.
+
+    Each analysis goes through, in order:
+      * the circuit breaker - while it is open, answer with the heuristic at once
+      * admission - at most `max_concurrent` model calls run and `queue_size`
+        more wait; anything beyond that is shed straight to the heuristic
+      * the rate limiter - a token bucket matched to the API quota; a request
+        that cannot get a token within `queue_timeout` falls back
+      * the model call itself, abandoned after `timeout` seconds
+
+    Failures, timeouts and slow calls feed the breaker. An abandoned call keeps
+    its concurrency slot until it actually returns, so a hung model can never
+    tie up more than `max_concurrent` threads. Every outcome is counted in
+    `stats`.
+    """
+
+    def __init__(
+        self,
+        service,
+        rate: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_concurrent: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        timeout: Optional[float] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        fallback: Callable[[str, Dict[str, Any], str], Dict[str, Any]] = heuristic_analysis,
+    ):
+        self.service = service
+        self.limiter = TokenBucket(
+            rate if rate is not None else settings.AI_RATE_LIMIT_PER_MINUTE / 60.0,
+            burst or settings.AI_RATE_LIMIT_BURST,
+        )
+        self.max_concurrent = max_concurrent or settings.AI_MAX_CONCURRENT
+        self.queue_size = settings.AI_QUEUE_SIZE if queue_size is None else queue_size
+        self.queue_timeout = settings.AI_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self.timeout = timeout or settings.AI_TIMEOUT
+        self.breaker = breaker or CircuitBreaker(
+            settings.AI_BREAKER_FAILURES, settings.AI_BREAKER_SLOW_SECONDS, settings.AI_BREAKER_RESET_SECONDS
+        )
+        self.fallback = fallback
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._executor = ThreadPoolExecutor(self.max_concurrent, thread_name_prefix='ai-gateway')
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self.stats = {"calls": 0, "failed": 0, "timed_out": 0, "circuit_open": 0, "overloaded": 0,
+                      "rate_limited": 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def _admit(self, reserve: float = 0.0) -> Optional[str]:
+        """Take a concurrency slot and a rate token, or return why not"""
+        if not self.breaker.allow():
+            return "circuit_open"
+        deadline = time.monotonic() + self.queue_timeout
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                queued = self._waiting < self.queue_size
+                if queued:
+                    self._waiting += 1
+            if not queued:
+                # A refused request never reaches the model, so says nothing about it
+                self.breaker.cancel()
+                return "overloaded"
+            try:
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+            if not acquired:
+                self.breaker.cancel()
+                return "overloaded"
+        if not self.limiter.acquire(max(0.0, deadline - time.monotonic()), reserve):
+            self._slots.release()
+            self.breaker.cancel()
+            return "rate_limited"
+        return None
+
+    def _fall_back(self, data_type: str, content: Dict[str, Any], reason: str, **extra) -> Dict[str, Any]:
+        self._count(reason)
+        result = self.fallback(data_type, content, reason)
+        result.update(extra)
+        return result
+
+    def _call(self, data_type: str, content: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return asyncio.run(self.service.analyze_data(data_type, content))
+        finally:
+            self._slots.release()
+
+    def analyze(self, data_type: str, content: Dict[str, Any], reserve: float = 0.0) -> Dict[str, Any]:
+        """
+        Analyze with the model if it is healthy and has capacity, otherwise with the heuristic
+
+        Background callers pass a `reserve` of rate tokens to leave for interactive ones.
+        """
+        refused = self._admit(reserve)
+        if refused:
+            return self._fall_back(data_type, content, refused)
+
+        self._count("calls")
+        started = time.monotonic()
+        try:
+            future = self._executor.submit(self._call, data_type, content)
+        except BaseException:
+            self._slots.release()
+            raise
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self.breaker.record(False)
+            return self._fall_back(data_type, content, "timed_out")
+        except Exception as e:
+            self.breaker.record(False)
+            return self._fall_back(data_type, content, "failed", error=str(e))
+
+        self.breaker.record(result.get("success", False), time.monotonic() - started)
+        if not result.get("success"):
+            return self._fall_back(data_type, content, "failed", error=result.get("error"))
+        return result
+
+    def stream(self, data_type: str, content: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming counterpart of analyze()
+
+        Admission works the same way. The model call is not abandoned part way
+        through, since the client is already receiving it; the response's
+        outcome and total time still feed the breaker, unless the client closes
+        the stream first: that says nothing about the model.
+        """
+        refused = self._admit()
+        if refused:
+            yield dict(self._fall_back(data_type, content, refused), event="result")
+            return
+
+        self._count("calls")
+        started = time.monotonic()
+        success = False
+        closed = False
+        try:
+            for event in self.service.stream_analysis(data_type, content):
+                if event["event"] == "result":
+                    success = True
+                elif event["event"] == "error":
+                    self._count("failed")
+                yield event
+        except GeneratorExit:
+            closed = True
+            raise
+        finally:
+            self._slots.release()
+            if closed:
+                self.breaker.cancel()
+            else:
+                self.breaker.record(success, time.monotonic() - started)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, circuit=self.breaker.state, waiting=self._waiting,
+                        circuit_opened=self.breaker.opened)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,247 @@
+import multiprocessing
+import os
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.db.models import Count, F
+from django.utils import timezone
+
+from ..models import AnalysisJob
+from .ai_gateway import AIGateway
+
+
+INTERACTIVE, BATCH = 0, 1
+
+# Gateway refusals that say nothing about the job itself: batch jobs go back in the
+# queue to wait for capacity instead of settling for the heuristic
+_RETRY_LATER = ('circuit_open', 'overloaded', 'rate_limited')
+
+
+def lane_index(name: str) -> int:
+    """Lane number for a lane name, raising ValueError for unknown lanes"""
+    try:
+        return AnalysisJob.LANES.index(name)
+    except ValueError:
+        raise ValueError(f"Unknown lane '{name}'; expected one of {', '.join(AnalysisJob.LANES)}")
+
+
+def enqueue(data_type: str, content: Dict[str, Any], lane: str = 'interactive') -> AnalysisJob:
+    return AnalysisJob.objects.create(data_type=data_type, content=content, lane=lane_index(lane))
+
+
+def claim(worker: str, lanes: Sequence[int], lease_seconds: float) -> Optional[AnalysisJob]:
+    """
+    Take the next queued job from the given lanes, lowest lane first, oldest first
+
+    The job is marked running with a conditional update, so when several workers
+    go for the same job exactly one gets it and the others move on to the next.
+    """
+    while True:
+        job_id = (
+            AnalysisJob.objects.filter(status='queued', lane__in=lanes)
+            .order_by('lane', 'id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        now = timezone.now()
+        claimed = AnalysisJob.objects.filter(id=job_id, status='queued').update(
+            status='running',
+            worker=worker,
+            started_at=now,
+            lease_until=now + timedelta(seconds=lease_seconds),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return AnalysisJob.objects.get(id=job_id)
+
+
+def requeue_expired(max_attempts: int) -> int:
+    """Queue running jobs whose worker has gone quiet again, or fail them if they are out of attempts"""
+    now = timezone.now()
+    expired = AnalysisJob.objects.filter(status='running', lease_until__lt=now)
+    expired.filter(attempts__gte=max_attempts).update(
+        status='failed', error='Worker lost', finished_at=now, lease_until=None
+    )
+    return expired.update(status='queued', worker='', lease_until=None)
+
+
+def queue_depth() -> Dict[str, Dict[str, int]]:
+    """Job counts per lane and status"""
+    depth = {lane: {} for lane in AnalysisJob.LANES}
+    for row in AnalysisJob.objects.values('lane', 'status').annotate(count=Count('id')):
+        depth[AnalysisJob.LANES[row['lane']]][row['status']] = row['count']
+    return depth
+
+
+class AnalysisWorker:
+    """
+    Runs queued analyses on a few threads of one process.
+
+    Interactive work always comes first, three ways:
+      * claims take the lowest lane first, so an interactive job jumps every
+        queued batch job
+      * the first `interactive_slots` threads only ever take interactive jobs,
+        so a batch backlog can never occupy every thread
+      * batch calls leave `batch_reserve` rate tokens in the gateway's bucket,
+        so a batch backlog can't spend the quota interactive calls need
+
+    A model call that has started is never interrupted, so an interactive job
+    can still wait for a free thread if every thread is busy; size the
+    interactive slots for the interactive load.
+
+    Batch jobs refused by the gateway (circuit open, overloaded, rate limited)
+    go back in the queue, and failed ones are retried up to `max_attempts`.
+    Interactive jobs take the gateway's heuristic answer rather than wait.
+    """
+
+    def __init__(
+        self,
+        gateway: AIGateway,
+        name: Optional[str] = None,
+        threads: Optional[int] = None,
+        interactive_slots: Optional[int] = None,
+        batch_reserve: Optional[float] = None,
+        poll_seconds: Optional[float] = None,
+        lease_seconds: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+    ):
+        self.gateway = gateway
+        self.name = name or f'{os.uname().nodename}:{os.getpid()}'
+        self.threads = threads or settings.AI_JOB_THREADS
+        self.interactive_slots = min(
+            self.threads, settings.AI_JOB_INTERACTIVE_SLOTS if interactive_slots is None else interactive_slots
+        )
+        self.batch_reserve = settings.AI_JOB_BATCH_RESERVE if batch_reserve is None else batch_reserve
+        self.poll_seconds = poll_seconds or settings.AI_JOB_POLL_SECONDS
+        self.lease_seconds = lease_seconds or settings.AI_JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or settings.AI_JOB_MAX_ATTEMPTS
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self.stats = {"done": 0, "failed": 0, "requeued": 0}
+
+    def start(self) -> None:
+        self._threads = [
+            threading.Thread(target=self._slot, args=(index,), name=f'ai-job-{index}', daemon=True)
+            for index in range(self.threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop claiming jobs and wait for running ones to finish"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def _slot(self, index: int) -> None:
+        lanes = (INTERACTIVE,) if index < self.interactive_slots else (INTERACTIVE, BATCH)
+        next_sweep = 0.0
+        try:
+            while not self._stop.is_set():
+                try:
+                    if index == 0 and time.monotonic() >= next_sweep:
+                        requeue_expired(self.max_attempts)
+                        next_sweep = time.monotonic() + self.lease_seconds / 4
+                    job = claim(self.name, lanes, self.lease_seconds)
+                    if job is not None:
+                        self._run(job)
+                        continue
+                except OperationalError:
+                    # sqlite busy with another writer for too long; a job caught
+                    # mid-update is picked up again when its lease runs out
+                    close_old_connections()
+                self._stop.wait(self.poll_seconds)
+        finally:
+            connection.close()
+
+    def _run(self, job: AnalysisJob) -> None:
+        batch = job.lane != INTERACTIVE
+        result = self.gateway.analyze(job.data_type, job.content, reserve=self.batch_reserve if batch else 0)
+        running = AnalysisJob.objects.filter(id=job.id, status='running', worker=self.name, attempts=job.attempts)
+
+        if batch and result.get('fallback'):
+            refused = result['reason'] in _RETRY_LATER
+            if refused or job.attempts < self.max_attempts:
+                # A refusal never reached the model, so it doesn't use up an attempt
+                running.update(status='queued', worker='', lease_until=None,
+                               attempts=F('attempts') - 1 if refused else F('attempts'))
+                self._count("requeued")
+                self._stop.wait(1.0)
+                return
+
+        success = bool(result.get('success'))
+        running.update(
+            status='done' if success else 'failed',
+            result=result,
+            error='' if success else str(result.get('error') or ''),
+            finished_at=timezone.now(),
+            lease_until=None,
+        )
+        self._count("done" if success else "failed")
+
+
+def _serve(threads: int, rate: float, service_factory: Callable[[], Any], stop, options) -> None:
+    """Worker process: run an AnalysisWorker until told to stop"""
+    # Connections inherited from the parent must not be shared across processes
+    connections.close_all()
+    gateway = AIGateway(service_factory(), rate=rate, max_concurrent=threads, queue_size=0)
+    worker = AnalysisWorker(gateway, name=f'{os.uname().nodename}:{os.getpid()}', threads=threads, **options)
+    worker.start()
+    try:
+        stop.wait()
+    except KeyboardInterrupt:
+        pass
+    worker.stop()
+    gateway.shutdown()
+
+
+class AnalysisWorkerPool:
+    """
+    Analysis worker processes sharing the job table.
+
+    The API quota is split evenly between the processes, each of which enforces
+    its share with its own gateway. Processes are forked, so this is for POSIX
+    systems.
+    """
+
+    def __init__(self, service_factory: Callable[[], Any], processes: Optional[int] = None,
+                 threads: Optional[int] = None, rate: Optional[float] = None, **options):
+        self.processes = processes or settings.AI_JOB_WORKERS
+        threads = threads or settings.AI_JOB_THREADS
+        # Requests per second for all processes together
+        rate = (rate or settings.AI_RATE_LIMIT_PER_MINUTE / 60.0) / self.processes
+        context = multiprocessing.get_context('fork')
+        self._stop = context.Event()
+        connections.close_all()
+        self._processes = [
+            context.Process(
+                target=_serve,
+                args=(threads, rate, service_factory, self._stop, options),
+                name=f'ai-jobs-{index}',
+                daemon=True,
+            )
+            for index in range(self.processes)
+        ]
+
+    def start(self) -> None:
+        for process in self._processes:
+            process.start()
+
+    def join(self) -> None:
+        for process in self._processes:
+            process.join()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.join()
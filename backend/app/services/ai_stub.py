@@ -0,0 +1,86 @@
+import json
+import random
+import threading
+import time
+from typing import Iterator, Optional
+
+from .prompt_digest import estimate_tokens
+
+
+DEFAULT_RESPONSE = {
+    "risk_level": "Medium",
+    "observations": ["Activity levels are above the usual baseline", "Two short spikes in the recent window"],
+    "recommendations": ["Review the flagged camera feeds", "Confirm the area is clear"],
+    "confidence": 0.8,
+}
+
+
+class StubError(RuntimeError):
+    """Injected model failure"""
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubModel:
+    """
+    Local stand-in for a Gemini GenerativeModel, for benchmarks and development.
+
+    generate_content() sleeps for `base_latency` plus `per_token_latency` per
+    estimated prompt token, so prompt size shows up in latency the way it does
+    with the real model, then returns a fixed JSON analysis. Generating the
+    response takes another `output_token_latency` per response token; with
+    stream=True it is yielded in chunks of about `chunk_tokens` tokens as they
+    are "generated", like the real model's streaming responses.
+
+    Faults can be injected for resilience testing: a share `error_rate` of calls
+    raise StubError after their latency, and a share `slow_rate` take
+    `slow_latency` seconds longer. Both can be changed while calls are running.
+    """
+
+    def __init__(self, base_latency: float = 0.3, per_token_latency: float = 0.0002,
+                 response: Optional[dict] = None, output_token_latency: float = 0.0, chunk_tokens: int = 4,
+                 error_rate: float = 0.0, slow_rate: float = 0.0, slow_latency: float = 30.0,
+                 seed: Optional[int] = None):
+        self.base_latency = base_latency
+        self.per_token_latency = per_token_latency
+        self.output_token_latency = output_token_latency
+        self.chunk_tokens = chunk_tokens
+        self.response = json.dumps(response or DEFAULT_RESPONSE, indent=2)
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def latency(self, prompt: str) -> float:
+        """Seconds until the first response token, without injected slowness"""
+        return self.base_latency + self.per_token_latency * estimate_tokens(prompt)
+
+    def _fault(self, prompt: str) -> None:
+        """Wait out the first-token latency, injecting slowness and errors"""
+        with self._lock:
+            self.calls += 1
+            slow = self._rng.random() < self.slow_rate
+            failed = self._rng.random() < self.error_rate
+        time.sleep(self.latency(prompt) + (self.slow_latency if slow else 0.0))
+        if failed:
+            raise StubError('Injected model failure')
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        if stream:
+            return self._stream(prompt)
+        self._fault(prompt)
+        time.sleep(self.output_token_latency * estimate_tokens(self.response))
+        return StubResponse(self.response)
+
+    def _stream(self, prompt: str) -> Iterator[StubResponse]:
+        self._fault(prompt)
+        size = self.chunk_tokens * 4
+        for start in range(0, len(self.response), size):
+            chunk = self.response[start:start + size]
+            time.sleep(self.output_token_latency * estimate_tokens(chunk))
+            yield StubResponse(chunk)
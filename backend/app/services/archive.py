@@ -0,0 +1,205 @@
+import io
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from django.conf import settings
+
+
+READING_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('sensor_id', pa.string()),
+    ('sensor_type', pa.string()),
+    ('recorded_at', pa.timestamp('us', tz='UTC')),
+    ('value', pa.float64()),
+])
+
+ALERT_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('icon', pa.string()),
+    ('title', pa.string()),
+    ('location', pa.string()),
+    ('priority', pa.string()),
+    ('description', pa.string()),
+    ('status', pa.string()),
+    ('created_at', pa.timestamp('us', tz='UTC')),
+])
+
+INCIDENT_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('reference', pa.string()),
+    ('title', pa.string()),
+    ('location', pa.string()),
+    ('priority', pa.string()),
+    ('description', pa.string()),
+    ('status', pa.string()),
+    ('resolved_by', pa.string()),
+    ('resolved_at', pa.timestamp('us', tz='UTC')),
+    ('original_alert_time', pa.timestamp('us', tz='UTC')),
+])
+
+# File extension per supported export format
+FORMATS = {
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+}
+
+
+def iter_chunks(queryset, fields: Sequence[str], chunk_size: int = 5000) -> Iterator[List[Tuple]]:
+    """
+    Keyset-paginate a queryset by id so each chunk is a small, index-backed read.
+
+    The first field must be `id`.
+    """
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id).order_by('id').values_list(*fields)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1][0]
+
+
+def to_table(schema: pa.Schema, rows: Sequence[Tuple]) -> pa.Table:
+    """Transpose row tuples into a columnar Arrow table"""
+    columns: List[list] = [[] for _ in schema]
+    for row in rows:
+        for index, value in enumerate(row):
+            columns[index].append(value)
+    return pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write target that hands back whatever has been written since the last drain"""
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+class ArchiveService:
+    """
+    Writes rows to compressed columnar files and reads them back.
+
+    Two formats are supported:
+      - parquet: zstd-compressed, the most compact option for long-term archives
+      - arrow: Arrow IPC file format; left uncompressed by default so the file can
+        be memory-mapped and read back without copying or decoding
+    """
+
+    def __init__(
+        self,
+        export_dir: Optional[Path] = None,
+        format: str = 'parquet',
+        compression: Optional[str] = None,
+    ):
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported export format '{format}'. Use one of: {', '.join(FORMATS)}")
+        self.export_dir = Path(export_dir or getattr(settings, 'EXPORT_DIR', 'exports'))
+        self.format = format
+        self.compression = compression if compression is not None else ('zstd' if format == 'parquet' else None)
+
+    def write_partition(
+        self,
+        dataset: str,
+        partition: str,
+        schema: pa.Schema,
+        chunks: Iterable[Sequence[Tuple]],
+    ) -> Tuple[Optional[Path], int]:
+        """
+        Stream row chunks into a single file.
+
+        Each chunk becomes one row group (Parquet) or record batch (Arrow), so only
+        one chunk is held in memory at a time. The file is written under a
+        temporary name and renamed once closed, so a crash never leaves a
+        truncated file behind.
+
+        Returns:
+            The written path (None when there were no rows) and the row count
+        """
+        directory = self.export_dir / dataset / partition
+        directory.mkdir(parents=True, exist_ok=True)
+        extension = FORMATS[self.format]
+        writer = None
+        tmp_path = None
+        first_id = None
+        rows_written = 0
+        try:
+            for chunk in chunks:
+                if not chunk:
+                    continue
+                if writer is None:
+                    first_id = chunk[0][0]
+                    tmp_path = directory / f'.part-{first_id:012d}{extension}.tmp'
+                    writer = self._open_writer(tmp_path, schema)
+                writer.write_table(to_table(schema, chunk))
+                rows_written += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            return None, 0
+
+        # Parts are named after their first row id, so re-running an interrupted
+        # export adds a new part instead of overwriting rows that are already gone
+        # from the database.
+        path = directory / f'part-{first_id:012d}{extension}'
+        with open(tmp_path, 'rb') as handle:
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, path)
+        return path, rows_written
+
+    def stream(self, schema: pa.Schema, chunks: Iterable[Sequence[Tuple]]) -> Iterator[bytes]:
+        """
+        Encode row chunks as an Arrow IPC stream, yielding bytes after every chunk.
+
+        Suitable as the body of a streaming HTTP response: memory use is bounded by
+        one chunk regardless of the export size.
+        """
+        sink = _DrainableSink()
+        options = ipc.IpcWriteOptions(compression=self.compression if self.format == 'arrow' else None)
+        with ipc.new_stream(sink, schema, options=options) as writer:
+            for chunk in chunks:
+                if chunk:
+                    writer.write_table(to_table(schema, chunk))
+                    yield sink.drain()
+        yield sink.drain()
+
+    @staticmethod
+    def load(path: Path) -> pa.Table:
+        """
+        Read an exported file back.
+
+        Files are memory-mapped; uncompressed Arrow files are then read zero-copy,
+        with the table's buffers pointing straight into the mapping.
+        """
+        path = Path(path)
+        if path.suffix == FORMATS['arrow']:
+            source = pa.memory_map(str(path), 'r')
+            return ipc.open_file(source).read_all()
+        return pq.read_table(path, memory_map=True)
+
+    def _open_writer(self, path: Path, schema: pa.Schema):
+        if self.format == 'arrow':
+            options = ipc.IpcWriteOptions(compression=self.compression)
+            return ipc.new_file(str(path), schema, options=options)
+        return pq.ParquetWriter(path, schema, compression=self.compression)
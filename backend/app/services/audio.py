@@ -0,0 +1,254 @@
+import base64
+import binascii
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from ..models import SensorReading
+
+
+# Band edges in Hz; energies are reported per band
+BAND_EDGES = (0, 250, 500, 1000, 2000, 4000, 8000)
+
+# Audio stress scores are stored as sensor readings of this type
+AUDIO_SENSOR_TYPE = 'audio'
+
+_EPSILON = 1e-10
+
+
+def pcm16_to_float(data: bytes) -> np.ndarray:
+    """Little-endian signed 16-bit mono PCM to floats in [-1, 1)"""
+    return np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+
+
+class AudioFeatureExtractor:
+    """
+    Streaming audio features for one sensor.
+
+    PCM arrives in chunks of any size. Samples are cut into overlapping Hann
+    windows (`window` samples every `hop`), carrying the tail of each chunk over
+    to the next so no window is lost at chunk boundaries. Every full batch of
+    windows is analysed at once: one batched real FFT, a band-matrix product for
+    band energies, RMS and spectral centroid, and spike detection against a
+    slowly adapting loudness baseline.
+
+    Per-window values are never kept. Every `summary_seconds` they are folded
+    into one compact feature vector (a few floats), which is what the stress
+    index and AI analysis see instead of raw audio.
+    """
+
+    def __init__(
+        self,
+        sample_rate: Optional[int] = None,
+        window: Optional[int] = None,
+        hop: Optional[int] = None,
+        summary_seconds: Optional[float] = None,
+        spike_db: Optional[float] = None,
+    ):
+        self.sample_rate = sample_rate or settings.AUDIO_SAMPLE_RATE
+        self.window = window or settings.AUDIO_WINDOW
+        self.hop = hop or self.window // 2
+        self.summary_seconds = summary_seconds or settings.AUDIO_SUMMARY_SECONDS
+        self.spike_db = settings.AUDIO_SPIKE_DB if spike_db is None else spike_db
+
+        self._hann = np.hanning(self.window).astype(np.float32)
+        frequencies = np.fft.rfftfreq(self.window, 1.0 / self.sample_rate)
+        nyquist = self.sample_rate // 2
+        edges = [edge for edge in BAND_EDGES if edge < nyquist] + [nyquist]
+        self.band_names = [f'{low}-{high}' for low, high in zip(edges, edges[1:])]
+        masks = [(frequencies >= low) & (frequencies < high) for low, high in zip(edges, edges[1:])]
+        masks[-1] |= frequencies == nyquist
+        self._bands = np.stack(masks, axis=1).astype(np.float32)
+        self._frequencies = frequencies.astype(np.float32)
+        # Baseline follows the median loudness with a ~5 second time constant
+        self._baseline_rate = min(1.0, self.hop / (self.sample_rate * 5.0))
+
+        self._carry = np.zeros(0, dtype=np.float32)
+        self._odd_byte = b''
+        self._baseline_db: Optional[float] = None
+        self._above = False
+        self._pending: List[Dict[str, np.ndarray]] = []
+        self._pending_windows = 0
+        self._windows_per_summary = max(1, int(round(self.summary_seconds * self.sample_rate / self.hop)))
+        self._summary_start: Optional[datetime] = None
+
+    def feed(self, samples: Union[bytes, np.ndarray], received_at: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Add a chunk of audio (16-bit PCM bytes or float samples)
+
+        Returns:
+            Feature summaries completed by this chunk, oldest first
+        """
+        if isinstance(samples, (bytes, bytearray, memoryview)):
+            data = self._odd_byte + bytes(samples)
+            self._odd_byte = data[len(data) & ~1:]
+            samples = pcm16_to_float(data[:len(data) & ~1])
+        samples = np.asarray(samples, dtype=np.float32)
+        if self._summary_start is None:
+            self._summary_start = received_at or timezone.now()
+
+        buffer = np.concatenate([self._carry, samples]) if len(self._carry) else samples
+        if len(buffer) < self.window:
+            self._carry = buffer
+            return []
+        count = (len(buffer) - self.window) // self.hop + 1
+        frames = np.lib.stride_tricks.sliding_window_view(buffer, self.window)[::self.hop][:count]
+        self._carry = buffer[count * self.hop:].copy()
+        self._analyse(frames)
+
+        summaries = []
+        while self._pending_windows >= self._windows_per_summary:
+            summaries.append(self._summarise(self._windows_per_summary))
+        return summaries
+
+    def flush(self) -> Optional[Dict[str, Any]]:
+        """Summarise whatever has been analysed since the last summary"""
+        return self._summarise(self._pending_windows) if self._pending_windows else None
+
+    def _analyse(self, frames: np.ndarray) -> None:
+        rms_db = 20 * np.log10(np.sqrt(np.mean(np.square(frames), axis=1)) + _EPSILON)
+        power = np.square(np.abs(np.fft.rfft(frames * self._hann, axis=1))).astype(np.float32)
+        band_energy = power @ self._bands
+        total = power.sum(axis=1)
+        centroid = (power @ self._frequencies) / (total + _EPSILON)
+
+        if self._baseline_db is None:
+            self._baseline_db = float(np.median(rms_db))
+        spiking = rms_db > self._baseline_db + self.spike_db
+        # A spike is a window that crosses above the threshold
+        onsets = spiking & ~np.concatenate([[self._above], spiking[:-1]])
+        self._above = bool(spiking[-1])
+        baseline = np.full(len(frames), self._baseline_db, dtype=np.float32)
+        rate = 1.0 - (1.0 - self._baseline_rate) ** len(frames)
+        self._baseline_db += rate * (float(np.median(rms_db)) - self._baseline_db)
+
+        self._pending.append({
+            'rms_db': rms_db,
+            'band_energy': band_energy,
+            'centroid': centroid,
+            'onsets': onsets,
+            'baseline': baseline,
+        })
+        self._pending_windows += len(frames)
+
+    def _summarise(self, windows: int) -> Dict[str, Any]:
+        merged = {key: np.concatenate([part[key] for part in self._pending]) for key in self._pending[0]}
+        taken = {key: value[:windows] for key, value in merged.items()}
+        rest = {key: value[windows:] for key, value in merged.items()}
+        self._pending = [rest] if len(rest['rms_db']) else []
+        self._pending_windows -= windows
+
+        seconds = windows * self.hop / self.sample_rate
+        start = self._summary_start
+        self._summary_start = start + timedelta(seconds=seconds)
+
+        band_db = 10 * np.log10(taken['band_energy'].mean(axis=0) + _EPSILON)
+        band_share = taken['band_energy'].sum(axis=0) / (taken['band_energy'].sum() + _EPSILON)
+        rms_db = taken['rms_db']
+        baseline_db = float(taken['baseline'].mean())
+        spikes = int(np.count_nonzero(taken['onsets']))
+        peak_db = float(rms_db.max())
+        summary = {
+            "start": start.isoformat(),
+            "seconds": round(seconds, 3),
+            "rmsDb": round(float(rms_db.mean()), 1),
+            "peakDb": round(peak_db, 1),
+            "baselineDb": round(baseline_db, 1),
+            "spikes": spikes,
+            "centroidHz": round(float(taken['centroid'].mean()), 1),
+            "bandsDb": {name: round(float(value), 1) for name, value in zip(self.band_names, band_db)},
+        }
+        summary["stress"] = self.stress_score(peak_db - baseline_db, spikes, seconds,
+                                              float(band_share[-2:].sum()))
+        return summary
+
+    @staticmethod
+    def stress_score(peak_over_baseline_db: float, spikes: int, seconds: float, high_band_share: float) -> float:
+        """
+        Audio stress contribution between 0 and 1
+
+        Loudness above the ambient baseline counts most, then how often sudden
+        spikes occur, then how much energy sits in the upper bands (shouting,
+        breaking glass, alarms).
+        """
+        loudness = min(max(peak_over_baseline_db / 30.0, 0.0), 1.0)
+        spike_rate = min(spikes / max(seconds / 5.0, 1.0), 1.0)
+        return round(0.5 * loudness + 0.3 * spike_rate + 0.2 * min(high_band_share * 2, 1.0), 3)
+
+
+class AudioStreams:
+    """One feature extractor per audio sensor, so chunks from successive requests join up"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._extractors: Dict[str, AudioFeatureExtractor] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+
+    def feed(self, sensor_id: str, samples: Union[bytes, np.ndarray], sample_rate: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Feed a chunk for one sensor, storing and returning any completed summaries"""
+        with self._lock:
+            extractor = self._extractors.get(sensor_id)
+            if extractor is None or (sample_rate and extractor.sample_rate != sample_rate):
+                extractor = self._extractors[sensor_id] = AudioFeatureExtractor(sample_rate=sample_rate)
+                self._locks[sensor_id] = threading.Lock()
+            lock = self._locks[sensor_id]
+        with lock:
+            summaries = extractor.feed(samples)
+        store_summaries(sensor_id, summaries)
+        return summaries
+
+
+def store_summaries(sensor_id: str, summaries: Sequence[Dict[str, Any]]) -> None:
+    """Save each summary's stress score as a sensor reading"""
+    SensorReading.objects.bulk_create([
+        SensorReading(
+            sensor_id=sensor_id,
+            sensor_type=AUDIO_SENSOR_TYPE,
+            value=summary["stress"],
+            recorded_at=datetime.fromisoformat(summary["start"]).astimezone(dt_timezone.utc),
+        )
+        for summary in summaries
+    ])
+
+
+def summarise_content(content: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Replace raw audio in an AI analysis request with its feature summary
+
+    `content["pcm"]` (base64 16-bit mono PCM, at `content["sampleRate"]`) is
+    analysed and swapped for `content["features"]`, so the prompt carries a few
+    numbers per interval instead of the audio itself. Raises ValueError for
+    content that is not an object, PCM that is not base64 text, or a sample
+    rate that is not a positive integer.
+    """
+    if not isinstance(content, dict):
+        raise ValueError("'content' must be an object")
+    if 'pcm' not in content:
+        return content
+    if not isinstance(content['pcm'], str):
+        raise ValueError("'content.pcm' must be base64-encoded 16-bit PCM")
+    try:
+        pcm = base64.b64decode(content['pcm'], validate=True)
+    except binascii.Error:
+        raise ValueError("'content.pcm' is not valid base64")
+    try:
+        sample_rate = int(content.get('sampleRate') or settings.AUDIO_SAMPLE_RATE)
+    except (TypeError, ValueError):
+        sample_rate = 0
+    if sample_rate <= 0:
+        raise ValueError("'content.sampleRate' must be a positive integer")
+    extractor = AudioFeatureExtractor(sample_rate=sample_rate)
+    summaries = extractor.feed(pcm)
+    last = extractor.flush()
+    if last is not None:
+        summaries.append(last)
+    summarised = {key: value for key, value in content.items() if key not in ('pcm', 'sampleRate')}
+    summarised['features'] = summaries
+    return summarised
+
+
+audio_streams = AudioStreams()
@@ -0,0 +1,341 @@
+import bisect
+import heapq
+import itertools
+import logging
+from datetime import datetime, timezone as dt_timezone
+from operator import attrgetter
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from ..models import Alert, Incident, Zone
+from .notifications import PRIORITY_RANK
+from .view_cache import view_cache
+
+
+logger = logging.getLogger(__name__)
+
+# Kinds of sensor an alert can come from; fusion needs evidence from more than one
+VIDEO, AUDIO, IOT = 'video', 'audio', 'iot'
+SOURCES = (VIDEO, AUDIO, IOT)
+_SENSOR_SOURCES = {'video': VIDEO, 'motion': VIDEO, 'camera': VIDEO, 'audio': AUDIO}
+
+# Zone hierarchy level two events must share to be correlated
+SCOPE_DEPTHS = {'site': 1, 'building': 2, 'zone': 3}
+
+
+def source_of(sensor_type: str) -> str:
+    """The kind of source (video, audio or iot) a sensor type belongs to"""
+    return _SENSOR_SOURCES.get(sensor_type.lower(), IOT)
+
+
+class Evidence(NamedTuple):
+    time: float
+    # Where the event happened, at the correlation scope: a zone path prefix or a location
+    scope: str
+    source: str
+    sensor: str
+    alert_id: Optional[int]
+    priority: str
+    title: str
+    location: str
+    zone_id: Optional[int]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "time": datetime.fromtimestamp(self.time, dt_timezone.utc).isoformat(),
+            "source": self.source,
+            "sensorId": self.sensor,
+            "alertId": str(self.alert_id) if self.alert_id is not None else None,
+            "priority": self.priority,
+            "title": self.title,
+        }
+
+
+class Cluster:
+    """Events in one scope that are no more than the correlation window apart"""
+
+    __slots__ = ('id', 'scope', 'start', 'end', 'deadline', 'evidence', 'sources', 'dropped', 'incident_id')
+
+    def __init__(self, id: int, evidence: Evidence):
+        self.id = id
+        self.scope = evidence.scope
+        self.start = self.end = evidence.time
+        self.deadline = 0.0
+        self.evidence = [evidence]
+        self.sources = {evidence.source: 1}
+        # Events counted in `sources` but not kept in `evidence`
+        self.dropped = 0
+        self.incident_id: Optional[int] = None
+
+    @property
+    def events(self) -> int:
+        return len(self.evidence) + self.dropped
+
+    @property
+    def primary(self) -> Evidence:
+        """The most urgent event, earliest first among equals"""
+        return min(self.evidence, key=lambda item: (PRIORITY_RANK.get(item.priority, len(PRIORITY_RANK)), item.time))
+
+
+class Correlator:
+    """
+    Groups a stream of events into clusters of events that happened in the same
+    scope (zone, building or site) within `window` seconds of each other. A
+    cluster spans at most `max_span` seconds, so continuous activity in a busy
+    zone is reported as a series of incidents rather than one without end.
+
+    Live clusters are indexed per scope in a list sorted by start time, so an
+    event only looks at the few clusters in its scope that could still reach
+    it, and a heap orders all clusters by the time they can no longer grow:
+    `window` seconds after their last event (or `max_span` after their first),
+    plus `lateness` seconds for events that arrive out of order. The watermark (the newest event time or clock
+    reading seen) closes clusters as it passes their deadlines, and events
+    older than watermark - lateness are not correlated at all.
+
+    Memory stays bounded however long the stream runs: at most `max_open`
+    clusters are kept (the one closest to its deadline is closed early to make
+    room) and each keeps its first `max_evidence` events, counting the rest.
+
+    add() and advance() return what happened as (action, cluster) pairs:
+    'fused' when a cluster first has events from `min_sources` kinds of
+    source, 'joined' for each later event of a fused cluster, and 'closed'
+    when a cluster stops growing.
+    """
+
+    def __init__(self, window: Optional[float] = None, lateness: Optional[float] = None,
+                 max_span: Optional[float] = None, min_sources: Optional[int] = None,
+                 max_open: Optional[int] = None, max_evidence: Optional[int] = None):
+        self.window = settings.CORRELATION_WINDOW_SECONDS if window is None else window
+        self.lateness = settings.CORRELATION_LATENESS_SECONDS if lateness is None else lateness
+        self.max_span = max_span or settings.CORRELATION_MAX_SPAN_SECONDS
+        self.min_sources = min_sources or settings.CORRELATION_MIN_SOURCES
+        self.max_open = max_open or settings.CORRELATION_MAX_OPEN
+        self.max_evidence = max_evidence or settings.CORRELATION_MAX_EVIDENCE
+        self.watermark = float('-inf')
+        self._clusters: Dict[int, Cluster] = {}
+        self._index: Dict[str, List[Cluster]] = {}
+        self._deadlines: List[Tuple[float, int]] = []
+        self._ids = itertools.count(1)
+        self.stats = {"events": 0, "late": 0, "clusters": 0, "fused": 0, "evicted": 0}
+
+    def __len__(self) -> int:
+        return len(self._clusters)
+
+    def add(self, evidence: Evidence) -> List[Tuple[str, Cluster]]:
+        self.stats["events"] += 1
+        if evidence.time < self.watermark - self.lateness:
+            self.stats["late"] += 1
+            return []
+        actions = []
+        cluster = self._find(evidence)
+        if cluster is None:
+            cluster = Cluster(next(self._ids), evidence)
+            self._clusters[cluster.id] = cluster
+            bisect.insort(self._index.setdefault(cluster.scope, []), cluster, key=attrgetter('start'))
+            self.stats["clusters"] += 1
+            was_fused = False
+        else:
+            was_fused = self._fused(cluster)
+            self._extend(cluster, evidence)
+        if was_fused:
+            actions.append(('joined', cluster))
+        elif self._fused(cluster):
+            self.stats["fused"] += 1
+            actions.append(('fused', cluster))
+
+        cluster.deadline = min(cluster.end + self.window, cluster.start + self.max_span) + self.lateness
+        heapq.heappush(self._deadlines, (cluster.deadline, cluster.id))
+        while len(self._clusters) > self.max_open:
+            self.stats["evicted"] += 1
+            actions.extend(self._close_next())
+        actions.extend(self.advance(evidence.time))
+        if len(self._deadlines) > 2 * len(self._clusters) + 1024:
+            # Drop heap entries left behind by clusters that grew since
+            self._deadlines = [(cluster.deadline, cluster.id) for cluster in self._clusters.values()]
+            heapq.heapify(self._deadlines)
+        return actions
+
+    def advance(self, now: float) -> List[Tuple[str, Cluster]]:
+        """Move the watermark to `now` (if later), closing the clusters it passes"""
+        self.watermark = max(self.watermark, now)
+        actions = []
+        while self._deadlines and self._deadlines[0][0] <= self.watermark:
+            actions.extend(self._close_next(until=self.watermark))
+        return actions
+
+    def close_all(self) -> List[Tuple[str, Cluster]]:
+        actions = []
+        while self._clusters:
+            actions.extend(self._close_next())
+        return actions
+
+    def _fused(self, cluster: Cluster) -> bool:
+        return len(cluster.sources) >= self.min_sources
+
+    def _find(self, evidence: Evidence) -> Optional[Cluster]:
+        clusters = self._index.get(evidence.scope)
+        if not clusters:
+            return None
+        # Clusters starting after time + window can't reach it; of the rest, take the latest that does
+        reachable = bisect.bisect_right(clusters, evidence.time + self.window, key=attrgetter('start'))
+        for cluster in reversed(clusters[:reachable]):
+            if (cluster.end + self.window >= evidence.time
+                    and max(cluster.end, evidence.time) - min(cluster.start, evidence.time) <= self.max_span):
+                return cluster
+        return None
+
+    def _extend(self, cluster: Cluster, evidence: Evidence) -> None:
+        if evidence.time < cluster.start:
+            clusters = self._index[cluster.scope]
+            clusters.remove(cluster)
+            cluster.start = evidence.time
+            bisect.insort(clusters, cluster, key=attrgetter('start'))
+        cluster.end = max(cluster.end, evidence.time)
+        cluster.sources[evidence.source] = cluster.sources.get(evidence.source, 0) + 1
+        if len(cluster.evidence) < self.max_evidence:
+            cluster.evidence.append(evidence)
+        else:
+            cluster.dropped += 1
+
+    def _close_next(self, until: float = float('inf')) -> List[Tuple[str, Cluster]]:
+        """Close the live cluster with the earliest deadline, if that is no later than `until`"""
+        while self._deadlines and self._deadlines[0][0] <= until:
+            deadline, cluster_id = heapq.heappop(self._deadlines)
+            cluster = self._clusters.get(cluster_id)
+            # Entries for clusters that have grown since, or are gone, are skipped
+            if cluster is not None and cluster.deadline == deadline:
+                del self._clusters[cluster_id]
+                clusters = self._index[cluster.scope]
+                clusters.remove(cluster)
+                if not clusters:
+                    del self._index[cluster.scope]
+                return [('closed', cluster)]
+        return []
+
+
+class FusionService:
+    """
+    Fuses alerts from different kinds of sensor into incidents.
+
+    Alerts (as published on the event bus) are fed through a Correlator. When
+    a cluster first holds alerts from several kinds of source, one Incident is
+    opened with every alert as evidence; the most urgent alert stays open to
+    carry the escalation and the others are marked 'fused', so operators see
+    one incident instead of several separate alerts. Alerts that join the
+    cluster later are added to the same incident.
+    """
+
+    def __init__(self, correlator: Optional[Correlator] = None, scope: Optional[str] = None):
+        self.correlator = correlator or Correlator()
+        self.depth = SCOPE_DEPTHS[scope or settings.CORRELATION_SCOPE]
+        self._paths: Dict[int, str] = {}
+        self.stats = {"alerts": 0, "incidents": 0, "fused_alerts": 0}
+
+    def handle(self, alert: Dict[str, Any]) -> None:
+        """Correlate one alert, given as Alert.to_dict()"""
+        evidence = self.evidence(alert)
+        if evidence is not None:
+            self.stats["alerts"] += 1
+            self._apply(self.correlator.add(evidence))
+
+    def tick(self, now: float) -> None:
+        self._apply(self.correlator.advance(now))
+
+    def close(self) -> None:
+        self._apply(self.correlator.close_all())
+
+    def evidence(self, alert: Dict[str, Any]) -> Optional[Evidence]:
+        """Evidence for an alert, or None for alerts that can't be correlated"""
+        if alert.get("source") not in SOURCES or alert.get("status") != 'open':
+            return None
+        created_at = parse_datetime(alert.get("createdAt") or '')
+        if created_at is None:
+            return None
+        zone_id = int(alert["zoneId"]) if alert.get("zoneId") else None
+        return Evidence(
+            time=created_at.timestamp(),
+            scope=self._scope(zone_id, alert.get("location", '')),
+            source=alert["source"],
+            sensor=alert.get("sensorId") or '',
+            alert_id=int(alert["id"]),
+            priority=alert.get("priority", 'Medium'),
+            title=alert.get("title", ''),
+            location=alert.get("location", ''),
+            zone_id=zone_id,
+        )
+
+    def _scope(self, zone_id: Optional[int], location: str) -> str:
+        if zone_id is None:
+            return f'location:{location.strip().lower()}'
+        path = self._paths.get(zone_id)
+        if path is None:
+            path = self._paths[zone_id] = Zone.objects.filter(id=zone_id).values_list('path', flat=True).first() or ''
+        ids = path.strip('/').split('/')
+        return '/' + '/'.join(ids[:self.depth]) + '/' if path else f'zone:{zone_id}'
+
+    def _apply(self, actions: List[Tuple[str, Cluster]]) -> None:
+        for action, cluster in actions:
+            try:
+                if action == 'fused':
+                    self._open(cluster)
+                elif cluster.incident_id is not None:
+                    self._update(cluster)
+            except Exception:
+                logger.exception('Could not record fused incident for %d alerts', cluster.events)
+
+    def _open(self, cluster: Cluster) -> None:
+        primary = cluster.primary
+        with transaction.atomic():
+            incident = Incident.objects.create(
+                reference=f'FUS_{primary.alert_id}',
+                title=f'Correlated {self._sources(cluster)} activity',
+                location=primary.location,
+                priority=primary.priority,
+                description=self._description(cluster),
+                status='open',
+                original_alert_time=datetime.fromtimestamp(cluster.start, dt_timezone.utc),
+                zone_id=primary.zone_id,
+                evidence=[item.to_dict() for item in cluster.evidence],
+            )
+            cluster.incident_id = incident.id
+            self._link(cluster)
+        self.stats["incidents"] += 1
+
+    def _update(self, cluster: Cluster) -> None:
+        primary = cluster.primary
+        with transaction.atomic():
+            Incident.objects.filter(id=cluster.incident_id).update(
+                title=f'Correlated {self._sources(cluster)} activity',
+                priority=primary.priority,
+                description=self._description(cluster),
+                evidence=[item.to_dict() for item in cluster.evidence],
+            )
+            self._link(cluster)
+
+    def _link(self, cluster: Cluster) -> None:
+        primary = cluster.primary.alert_id
+        alert_ids = [item.alert_id for item in cluster.evidence]
+        Alert.objects.filter(id__in=alert_ids, incident__isnull=True).update(incident_id=cluster.incident_id)
+        # A more urgent alert joining takes over from the previous primary, which is fused in turn
+        self.stats["fused_alerts"] += Alert.objects.filter(
+            id__in=[alert_id for alert_id in alert_ids if alert_id != primary], status='open',
+        ).update(status='fused', escalate_at=None)
+        view_cache.invalidate('alerts', 'incidents')
+
+    @staticmethod
+    def _sources(cluster: Cluster) -> str:
+        names = [source for source in SOURCES if source in cluster.sources]
+        return ' and '.join([', '.join(names[:-1]), names[-1]]) if len(names) > 1 else names[0]
+
+    def _description(self, cluster: Cluster) -> str:
+        start = datetime.fromtimestamp(cluster.start, dt_timezone.utc).strftime('%H:%M:%S')
+        end = datetime.fromtimestamp(cluster.end, dt_timezone.utc).strftime('%H:%M:%S')
+        counts = ', '.join(f'{cluster.sources[source]} {source}' for source in SOURCES if source in cluster.sources)
+        description = (f'{cluster.events} alerts ({counts}) in {cluster.primary.location} between {start} and '
+                       f'{end} UTC, fused by cross-sensor correlation.')
+        if cluster.dropped:
+            description += f' The first {len(cluster.evidence)} are listed as evidence.'
+        return description
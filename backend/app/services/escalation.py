@@ -0,0 +1,140 @@
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from ..models import Alert
+from .notifications import PRIORITY_RANK, Notification, NotificationDispatcher
+
+
+# (deadline timestamp, priority rank, created_at timestamp, alert id)
+_Entry = Tuple[float, int, float, int]
+
+
+class EscalationScheduler:
+    """
+    Escalates open alerts that stay unacknowledged past their deadline.
+
+    Deadlines are stored on the alerts themselves (`escalate_at`), so the database
+    is the durable copy of the schedule and recover() rebuilds the in-memory heap
+    from it after a restart. The heap is ordered by deadline, then priority, then
+    age, so each tick only touches alerts that are due and handles the most urgent
+    first.
+
+    Escalations are written with a conditional update before anything is sent, so
+    an alert acknowledged in the meantime is skipped and two schedulers never
+    escalate the same deadline twice. A crash can lose in-flight notifications but
+    never repeats or skips an escalation.
+    """
+
+    def __init__(
+        self,
+        dispatcher: NotificationDispatcher,
+        deadlines: Optional[Dict[str, int]] = None,
+        max_level: Optional[int] = None,
+    ):
+        self.dispatcher = dispatcher
+        self.deadlines = deadlines or settings.ESCALATION_DEADLINES
+        self.max_level = max_level if max_level is not None else settings.ESCALATION_MAX_LEVEL
+        self._heap: List[_Entry] = []
+        self._last_id = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def recover(self) -> int:
+        """
+        Rebuild the schedule from every pending deadline in the database
+
+        Returns:
+            The number of scheduled alerts
+        """
+        rows = Alert.objects.filter(status='open', escalate_at__isnull=False).values_list(
+            'id', 'priority', 'created_at', 'escalate_at'
+        )
+        self._heap = [self._entry(*row) for row in rows]
+        heapq.heapify(self._heap)
+        self._last_id = Alert.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+        return len(self._heap)
+
+    def poll(self) -> int:
+        """
+        Schedule and announce alerts raised since the last poll
+
+        Returns:
+            The number of new alerts
+        """
+        alerts = list(Alert.objects.filter(id__gt=self._last_id).order_by('id'))
+        for alert in alerts:
+            self._last_id = alert.id
+            if alert.status != 'open':
+                continue
+            if alert.escalate_at is not None:
+                heapq.heappush(self._heap, self._entry(alert.id, alert.priority, alert.created_at, alert.escalate_at))
+            self.notify(alert, 'New alert')
+        return len(alerts)
+
+    def tick(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Pick up new alerts and escalate every alert whose deadline has passed
+
+        Returns:
+            Counts of new, due and escalated alerts
+        """
+        now = now or timezone.now()
+        raised = self.poll()
+
+        due = []
+        while self._heap and self._heap[0][0] <= now.timestamp():
+            due.append(heapq.heappop(self._heap))
+        due.sort(key=lambda entry: entry[1:])
+
+        escalated = sum(1 for entry in due if self.escalate(entry[3], entry[0], now))
+        return {'raised': raised, 'due': len(due), 'escalated': escalated, 'scheduled': len(self._heap)}
+
+    def escalate(self, alert_id: int, deadline: float, now: datetime) -> bool:
+        """
+        Escalate one alert if it is still open and its deadline hasn't moved
+
+        Returns:
+            True when the alert was escalated
+        """
+        alert = Alert.objects.filter(id=alert_id, status='open').first()
+        if alert is None or alert.escalate_at is None or alert.escalate_at.timestamp() != deadline:
+            return False
+
+        level = alert.escalation_level + 1
+        next_at = None
+        if level < self.max_level:
+            next_at = now + timedelta(seconds=self._deadline(alert.priority) * 2 ** level)
+        updated = Alert.objects.filter(id=alert.id, status='open', escalate_at=alert.escalate_at).update(
+            escalation_level=level,
+            escalate_at=next_at,
+        )
+        if not updated:
+            return False
+
+        alert.escalation_level = level
+        alert.escalate_at = next_at
+        if next_at is not None:
+            heapq.heappush(self._heap, self._entry(alert.id, alert.priority, alert.created_at, next_at))
+        self.notify(alert, f'Escalation level {level}')
+        return True
+
+    def notify(self, alert: Alert, event: str) -> None:
+        """Queue a notification about an alert on every configured channel"""
+        subject = f'[{alert.priority}] {event}: {alert.title}'
+        body = f'{alert.title} at {alert.location}\n\n{alert.description}'.strip()
+        for channel in self.dispatcher.channels:
+            self.dispatcher.submit(Notification(channel, alert.priority, subject, body, alert.id))
+
+    def _deadline(self, priority: str) -> int:
+        return self.deadlines.get(priority, self.deadlines['Low'])
+
+    @staticmethod
+    def _entry(alert_id: int, priority: str, created_at: datetime, escalate_at: datetime) -> _Entry:
+        rank = PRIORITY_RANK.get(priority, len(PRIORITY_RANK))
+        return escalate_at.timestamp(), rank, created_at.timestamp(), alert_id
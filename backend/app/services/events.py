@@ -0,0 +1,661 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+ALERT_CREATED = 'alert.created'
+SENSOR_UPDATED = 'sensor.updated'
+SETTINGS_CHANGED = 'settings.changed'
+RULES_CHANGED = 'rules.changed'
+TOPICS = (ALERT_CREATED, SENSOR_UPDATED, SETTINGS_CHANGED, RULES_CHANGED)
+
+# Frames are a 4-byte big-endian length followed by that many bytes of JSON
+_HEADER = struct.Struct('>I')
+_MAX_FRAME = 16 * 1024 * 1024
+
+# Publishers remembered for de-duplication; the oldest are forgotten first
+_MAX_ORIGINS = 10000
+
+
+class Event(NamedTuple):
+    topic: str
+    payload: Dict[str, Any]
+    # Publishing process and its sequence number: unique per event, in publish order
+    origin: str
+    seq: int
+    # Position in the bus's stream; offsets only compare within one epoch
+    epoch: str
+    offset: int
+    ts: float
+
+    @property
+    def id(self) -> str:
+        return f'{self.epoch}-{self.offset}'
+
+
+def encode_frame(message: Dict[str, Any]) -> bytes:
+    body = json.dumps(message, default=str, separators=(',', ':')).encode()
+    return _HEADER.pack(len(body)) + body
+
+
+def parse_event_id(event_id: Optional[str]) -> Tuple[Optional[str], Optional[int]]:
+    """Epoch and offset of an Event.id, or (None, None) if it isn't one"""
+    epoch, _, offset = (event_id or '').rpartition('-')
+    if not epoch or not offset.isdigit():
+        return None, None
+    return epoch, int(offset)
+
+
+def parse_address(address: str) -> Tuple[int, Any]:
+    """Socket family and address for 'unix:/path' or 'tcp://host:port' (or just 'host:port')"""
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[len('unix:'):]
+    host, _, port = address.replace('tcp://', '', 1).rpartition(':')
+    return socket.AF_INET, (host or '127.0.0.1', int(port))
+
+
+class EventBus:
+    """
+    Publish/subscribe for live-state events (alert created, sensor updated,
+    settings changed).
+
+    publish() never waits on subscribers: events go into a pending queue that a
+    background thread sends on in batches. At most `queue_size` events may be
+    pending or unconfirmed at once; past that publish() waits up to `timeout`
+    seconds for room and then gives up, returning False, so a stalled bus slows
+    publishers down instead of growing without bound.
+
+    Subscribers are called on the bus thread, in stream order, with each event
+    exactly once; they must hand work off rather than block. The last
+    `history_size` events are kept so a subscriber can resume from an event id
+    it already saw.
+    """
+
+    def __init__(self, queue_size: Optional[int] = None, batch_size: Optional[int] = None,
+                 linger: Optional[float] = None, publish_timeout: Optional[float] = None,
+                 history_size: Optional[int] = None):
+        self.queue_size = queue_size or settings.EVENT_BUS_QUEUE_SIZE
+        self.batch_size = batch_size or settings.EVENT_BUS_BATCH_SIZE
+        self.linger = settings.EVENT_BUS_LINGER if linger is None else linger
+        self.publish_timeout = settings.EVENT_BUS_PUBLISH_TIMEOUT if publish_timeout is None else publish_timeout
+        self.origin = uuid.uuid4().hex
+        self.epoch = uuid.uuid4().hex[:12]
+        self._seq = 0
+        self._capacity = threading.BoundedSemaphore(self.queue_size)
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._condition = threading.Condition()
+        self._subscribers: List[Tuple[Callable[[Event], None], Optional[frozenset]]] = []
+        self._subscribers_lock = threading.Lock()
+        self._history: Deque[Event] = deque(maxlen=history_size or settings.EVENT_BUS_HISTORY)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopping = False
+        self.stats = {"published": 0, "delivered": 0, "batches": 0, "timed_out": 0, "duplicates": 0}
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None and not self._stopping:
+                self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """Send what is pending (waiting up to `timeout` seconds) and stop"""
+        deadline = time.monotonic() + (timeout or 0)
+        with self._condition:
+            while self._unsettled() and time.monotonic() < deadline:
+                self._condition.wait(0.05)
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _unsettled(self) -> int:
+        return len(self._pending)
+
+    def publish(self, topic: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> bool:
+        """Queue an event, waiting up to `timeout` seconds for room; False if there was none"""
+        if not self._capacity.acquire(timeout=self.publish_timeout if timeout is None else timeout):
+            self.stats["timed_out"] += 1
+            logger.warning('Event bus full; dropped %s event', topic)
+            return False
+        with self._condition:
+            self._seq += 1
+            self._pending.append({"t": topic, "p": payload, "o": self.origin, "s": self._seq, "ts": time.time()})
+            self.stats["published"] += 1
+            self._condition.notify_all()
+        self.start()
+        return True
+
+    def subscribe(self, handler: Callable[[Event], None], topics: Optional[Iterable[str]] = None,
+                  since: Optional[str] = None) -> Callable[[], None]:
+        """
+        Call `handler` with every event on `topics` (all topics if None)
+
+        Given the id of an event already seen, events after it that are still in
+        the history are passed to the handler first. Returns a function that
+        unsubscribes.
+        """
+        entry = (handler, frozenset(topics) if topics is not None else None)
+        epoch, offset = parse_event_id(since)
+        with self._subscribers_lock:
+            if epoch == self.epoch:
+                for event in self._history:
+                    if (event.epoch == epoch and event.offset > offset
+                            and (entry[1] is None or event.topic in entry[1])):
+                        self._call(handler, event)
+            self._subscribers.append(entry)
+
+        def unsubscribe():
+            with self._subscribers_lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+        self.start()
+        return unsubscribe
+
+    def _deliver(self, events: List[Event]) -> None:
+        with self._subscribers_lock:
+            for event in events:
+                self._history.append(event)
+                for handler, topics in self._subscribers:
+                    if topics is None or event.topic in topics:
+                        self._call(handler, event)
+            self.stats["delivered"] += len(events)
+
+    @staticmethod
+    def _call(handler: Callable[[Event], None], event: Event) -> None:
+        try:
+            handler(event)
+        except Exception:
+            logger.exception('Event subscriber failed on %s', event.topic)
+
+    def _idle(self) -> bool:
+        return not self._pending and not self._stopping
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        """Wait for pending events and take up to a batch of them, lingering briefly to fill it"""
+        with self._condition:
+            while self._idle():
+                self._condition.wait()
+            if len(self._pending) < self.batch_size and self.linger and not self._stopping:
+                self._condition.wait(self.linger)
+            return [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+
+    def _run(self) -> None:
+        raise NotImplementedError
+
+    def status(self) -> Dict[str, Any]:
+        with self._condition:
+            return dict(self.stats, backend=type(self).__name__, pending=len(self._pending), epoch=self.epoch)
+
+
+class LocalEventBus(EventBus):
+    """In-process bus: events reach subscribers in this process only"""
+
+    def _run(self) -> None:
+        offset = 0
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                if self._stopping:
+                    return
+                continue
+            events = []
+            for message in batch:
+                offset += 1
+                events.append(Event(message["t"], message["p"], message["o"], message["s"], self.epoch, offset,
+                                    message["ts"]))
+            self.stats["batches"] += 1
+            self._deliver(events)
+            for _ in batch:
+                self._capacity.release()
+            with self._condition:
+                self._condition.notify_all()
+
+
+class RemoteEventBus(EventBus):
+    """
+    Bus shared through an EventBroker over a Unix socket (one host) or TCP
+    (several nodes), so every worker process sees every event.
+
+    Batches stay unconfirmed, and keep their room in the queue, until the
+    broker acknowledges them; after a lost connection they are sent again and
+    the broker drops any it already had. On reconnecting the bus also asks the
+    broker to replay the events it missed, and drops any event it has seen
+    before (by publisher and sequence number), so subscribers get each event
+    once even across broker restarts.
+    """
+
+    def __init__(self, address: str, reconnect_seconds: float = 0.1, **options):
+        super().__init__(**options)
+        self.address = address
+        self.family, self.sockaddr = parse_address(address)
+        self.reconnect_seconds = reconnect_seconds
+        self.epoch = ''
+        self.connected = threading.Event()
+        self._unacked: Deque[Dict[str, Any]] = deque()
+        self._offset: Optional[int] = None
+        self._seen: 'OrderedDict[str, int]' = OrderedDict()
+        self._socket: Optional[socket.socket] = None
+        self.stats.update(reconnects=0, resent=0)
+
+    def _unsettled(self) -> int:
+        return len(self._pending) + len(self._unacked)
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        super().stop(timeout)
+        sock = self._socket
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _run(self) -> None:
+        delay = self.reconnect_seconds
+        while not self._stopping:
+            try:
+                sock = self._connect()
+            except OSError as e:
+                logger.warning('Event broker %s unavailable: %s', self.address, e)
+                time.sleep(delay)
+                delay = min(delay * 2, 5.0)
+                continue
+            delay = self.reconnect_seconds
+            reader = threading.Thread(target=self._read, args=(sock,), name='RemoteEventBus-reader', daemon=True)
+            reader.start()
+            try:
+                self._send(sock)
+            except OSError as e:
+                if not self._stopping:
+                    logger.warning('Lost event broker %s: %s', self.address, e)
+            finally:
+                self.connected.clear()
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                sock.close()
+                reader.join()
+                self._socket = None
+                if not self._stopping:
+                    self.stats["reconnects"] += 1
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.sockaddr)
+            if self.family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # Replay from where we left off; a bus that had caught up with another
+            # broker epoch wants everything the new broker has
+            sock.sendall(encode_frame({"op": "hello", "epoch": self.epoch or None,
+                                       "since": self._offset if self.epoch else None}))
+            welcome = _recv_frame(sock)
+        except BaseException:
+            sock.close()
+            raise
+        if welcome is None or welcome.get("op") != "welcome":
+            sock.close()
+            raise OSError('Event broker did not answer hello')
+        with self._subscribers_lock:
+            if welcome["epoch"] != self.epoch:
+                self.epoch = welcome["epoch"]
+                self._offset = welcome["offset"]
+        self._socket = sock
+        self.connected.set()
+        return sock
+
+    def _send(self, sock: socket.socket) -> None:
+        with self._condition:
+            resend = list(self._unacked)
+        # Unconfirmed batches go first, so the broker sees each publisher's events in order
+        for start in range(0, len(resend), self.batch_size):
+            sock.sendall(encode_frame({"op": "pub", "events": resend[start:start + self.batch_size]}))
+            self.stats["resent"] += len(resend[start:start + self.batch_size])
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                if self._stopping:
+                    return
+                if not self.connected.is_set():
+                    raise OSError('connection closed')
+                continue
+            with self._condition:
+                self._unacked.extend(batch)
+            sock.sendall(encode_frame({"op": "pub", "events": batch}))
+            self.stats["batches"] += 1
+
+    def _idle(self) -> bool:
+        # Wake up for a dropped connection as well as for new events
+        return super()._idle() and self.connected.is_set()
+
+    def _read(self, sock: socket.socket) -> None:
+        try:
+            while True:
+                message = _recv_frame(sock)
+                if message is None:
+                    break
+                if message["op"] == "ack":
+                    self._ack(message["seq"])
+                elif message["op"] == "events":
+                    self._receive(message["epoch"], message["events"])
+        except (OSError, ValueError) as e:
+            if not self._stopping:
+                logger.warning('Event broker connection failed: %s', e)
+        finally:
+            self.connected.clear()
+            with self._condition:
+                self._condition.notify_all()
+
+    def _ack(self, seq: int) -> None:
+        released = 0
+        with self._condition:
+            while self._unacked and self._unacked[0]["s"] <= seq:
+                self._unacked.popleft()
+                released += 1
+            self._condition.notify_all()
+        for _ in range(released):
+            self._capacity.release()
+
+    def _receive(self, epoch: str, messages: List[Dict[str, Any]]) -> None:
+        events = []
+        for message in messages:
+            if self._seen.get(message["o"], 0) >= message["s"]:
+                self.stats["duplicates"] += 1
+                continue
+            self._seen[message["o"]] = message["s"]
+            self._seen.move_to_end(message["o"])
+            if len(self._seen) > _MAX_ORIGINS:
+                self._seen.popitem(last=False)
+            events.append(Event(message["t"], message["p"], message["o"], message["s"], epoch, message["n"],
+                                message["ts"]))
+        if messages and epoch == self.epoch:
+            self._offset = messages[-1]["n"]
+        if events:
+            self._deliver(events)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv_frame(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > _MAX_FRAME:
+        raise ValueError(f'Event frame of {size} bytes is too large')
+    body = _recv_exactly(sock, size)
+    return None if body is None else json.loads(body)
+
+
+class EventBroker:
+    """
+    Relays events between RemoteEventBus clients, over a Unix socket, TCP or both.
+
+    Every published event gets the next offset in the broker's stream and goes
+    to every connected client, including its publisher, in offset order. A
+    batch is acknowledged once it has been queued for every client; events a
+    publisher sends again after a lost acknowledgement are recognised by their
+    sequence number and dropped.
+
+    Each client may have `client_queue` events waiting to be written. When a
+    client's queue is full, publishing stops until it has room, which stops
+    acknowledgements and so holds publishers back; a client that makes no room
+    for `slow_client_seconds` is disconnected so it can't stall everyone. The
+    last `buffer_size` events are kept so a client that reconnects can be sent
+    what it missed. The epoch changes whenever the broker starts, telling
+    clients that offsets from before no longer apply; events acknowledged but
+    not yet written when a broker goes down are lost with it.
+    """
+
+    def __init__(self, unix_path: Optional[str] = None, tcp_address: Optional[str] = None,
+                 buffer_size: Optional[int] = None, client_queue: Optional[int] = None,
+                 batch_size: Optional[int] = None, slow_client_seconds: Optional[float] = None):
+        self.unix_path = unix_path
+        self.tcp_address = tcp_address
+        self.batch_size = batch_size or settings.EVENT_BUS_BATCH_SIZE
+        self.client_queue = client_queue or settings.EVENT_BUS_CLIENT_QUEUE
+        self.slow_client_seconds = slow_client_seconds or settings.EVENT_BUS_SLOW_CLIENT_SECONDS
+        self.epoch = uuid.uuid4().hex[:12]
+        self.offset = 0
+        self._buffer: Deque[Dict[str, Any]] = deque(maxlen=buffer_size or settings.EVENT_BUS_HISTORY)
+        self._last_seq: 'OrderedDict[str, int]' = OrderedDict()
+        self._clients: Dict[asyncio.StreamWriter, asyncio.Queue] = {}
+        self._publishing: Optional[asyncio.Lock] = None
+        self._servers: List[asyncio.AbstractServer] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+        self.stats = {"connections": 0, "published": 0, "duplicates": 0, "replayed": 0, "missed": 0,
+                      "disconnected_slow": 0}
+
+    async def serve(self) -> None:
+        """Accept clients until cancelled"""
+        self._publishing = asyncio.Lock()
+        if self.unix_path:
+            if os.path.exists(self.unix_path):
+                os.unlink(self.unix_path)
+            self._servers.append(await asyncio.start_unix_server(self._client, path=self.unix_path))
+        if self.tcp_address:
+            _, (host, port) = parse_address(self.tcp_address)
+            self._servers.append(await asyncio.start_server(self._client, host, port))
+        self._started.set()
+        try:
+            await asyncio.gather(*(server.serve_forever() for server in self._servers))
+        finally:
+            for server in self._servers:
+                server.close()
+            for writer in list(self._clients):
+                writer.close()
+            if self.unix_path and os.path.exists(self.unix_path):
+                os.unlink(self.unix_path)
+
+    def start(self) -> None:
+        """Serve on a background thread"""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_until_complete, args=(self._main(),),
+                                        name='EventBroker', daemon=True)
+        self._thread.start()
+        self._started.wait(5)
+
+    async def _main(self) -> None:
+        self._task = asyncio.current_task()
+        try:
+            await self.serve()
+        except asyncio.CancelledError:
+            pass
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._task.cancel)
+            self._thread.join(5)
+            self._loop.close()
+            self._loop = None
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats["connections"] += 1
+        client_queue: asyncio.Queue = asyncio.Queue(self.client_queue)
+        sender = None
+        try:
+            hello = await _read_frame(reader)
+            if hello is None or hello.get("op") != "hello":
+                return
+            writer.write(encode_frame({"op": "welcome", "epoch": self.epoch, "offset": self.offset}))
+            since = hello.get("since")
+            if hello.get("epoch") is not None:
+                # A client from another epoch missed whatever this broker has seen so far
+                since = since if hello["epoch"] == self.epoch else 0
+                missed = [event for event in self._buffer if event["n"] > since]
+                if self._buffer and self._buffer[0]["n"] > since + 1:
+                    self.stats["missed"] += self._buffer[0]["n"] - since - 1
+                    logger.warning('Event bus client reconnected %d events too late to catch up',
+                                   self._buffer[0]["n"] - since - 1)
+                for start in range(0, len(missed), self.batch_size):
+                    writer.write(encode_frame({"op": "events", "epoch": self.epoch,
+                                               "events": missed[start:start + self.batch_size]}))
+                self.stats["replayed"] += len(missed)
+            # No await since the replay was written, so nothing was published in between
+            self._clients[writer] = client_queue
+            sender = asyncio.ensure_future(self._send(writer, client_queue))
+            while True:
+                message = await _read_frame(reader)
+                if message is None:
+                    break
+                if message.get("op") == "pub" and message["events"]:
+                    await self._publish(message["events"])
+                    writer.write(encode_frame({"op": "ack", "seq": message["events"][-1]["s"]}))
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self._clients.pop(writer, None)
+            if sender is not None:
+                sender.cancel()
+            writer.close()
+
+    async def _publish(self, events: List[Dict[str, Any]]) -> None:
+        # One batch at a time, so every client gets events in offset order
+        async with self._publishing:
+            for event in events:
+                if self._last_seq.get(event["o"], 0) >= event["s"]:
+                    self.stats["duplicates"] += 1
+                    continue
+                self._last_seq[event["o"]] = event["s"]
+                self._last_seq.move_to_end(event["o"])
+                if len(self._last_seq) > _MAX_ORIGINS:
+                    self._last_seq.popitem(last=False)
+                self.offset += 1
+                event = dict(event, n=self.offset)
+                self._buffer.append(event)
+                self.stats["published"] += 1
+                for writer, client_queue in list(self._clients.items()):
+                    try:
+                        client_queue.put_nowait(event)
+                    except asyncio.QueueFull:
+                        await self._wait_for_room(writer, client_queue, event)
+
+    async def _wait_for_room(self, writer: asyncio.StreamWriter, client_queue: asyncio.Queue,
+                             event: Dict[str, Any]) -> None:
+        try:
+            await asyncio.wait_for(client_queue.put(event), self.slow_client_seconds)
+        except asyncio.TimeoutError:
+            if self._clients.pop(writer, None) is not None:
+                self.stats["disconnected_slow"] += 1
+                logger.warning('Disconnecting event bus client stuck %d events behind', self.client_queue)
+                writer.transport.abort()
+
+    async def _send(self, writer: asyncio.StreamWriter, client_queue: asyncio.Queue) -> None:
+        try:
+            while True:
+                batch = [await client_queue.get()]
+                while len(batch) < self.batch_size and not client_queue.empty():
+                    batch.append(client_queue.get_nowait())
+                writer.write(encode_frame({"op": "events", "epoch": self.epoch, "events": batch}))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    try:
+        header = await reader.readexactly(_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > _MAX_FRAME:
+        raise ValueError(f'Event frame of {size} bytes is too large')
+    return json.loads(await reader.readexactly(size))
+
+
+def create_event_bus(backend: Optional[str] = None, **options) -> EventBus:
+    """Event bus for EVENT_BUS_BACKEND: 'local', 'unix' (EVENT_BUS_SOCKET) or 'tcp' (EVENT_BUS_ADDRESS)"""
+    backend = backend or settings.EVENT_BUS_BACKEND
+    if backend == 'local':
+        return LocalEventBus(**options)
+    if backend == 'unix':
+        return RemoteEventBus(f'unix:{settings.EVENT_BUS_SOCKET}', **options)
+    if backend == 'tcp':
+        return RemoteEventBus(f'tcp://{settings.EVENT_BUS_ADDRESS}', **options)
+    raise ValueError(f"Unknown event bus backend '{backend}'; expected local, unix or tcp")
+
+
+_bus: Optional[EventBus] = None
+_bus_lock = threading.Lock()
+
+
+def get_event_bus() -> EventBus:
+    """The process-wide event bus, created on first call"""
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                _bus = create_event_bus()
+    return _bus
+
+
+def publish(topic: str, payload: Dict[str, Any]) -> bool:
+    return get_event_bus().publish(topic, payload)
+
+
+def _reset_after_fork() -> None:
+    # The parent's bus thread and connection don't exist in a forked child: start afresh
+    global _bus, _bus_lock
+    _bus = None
+    _bus_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def sse_stream(bus: EventBus, topics: Optional[Iterable[str]] = None, since: Optional[str] = None,
+               heartbeat: float = 15.0, backlog: int = 1000) -> Iterator[str]:
+    """
+    Server-sent events for a bus subscription, resuming after the event id `since`
+
+    A client that lets `backlog` events pile up is cut off; browsers reconnect
+    with Last-Event-ID and are sent what they missed from the bus history.
+    """
+    events: 'queue.Queue[Event]' = queue.Queue(backlog)
+    overflowed = threading.Event()
+
+    def handler(event: Event) -> None:
+        try:
+            events.put_nowait(event)
+        except queue.Full:
+            overflowed.set()
+
+    unsubscribe = bus.subscribe(handler, topics, since)
+    try:
+        yield 'retry: 1000\n\n'
+        while not overflowed.is_set():
+            try:
+                event = events.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            yield f'id: {event.id}\nevent: {event.topic}\ndata: {json.dumps(event.payload, default=str)}\n\n'
+    finally:
+        unsubscribe()
@@ -0,0 +1,407 @@
+import bisect
+import fcntl
+import io
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+from ..models import Camera
+from .frames import FrameRing, iter_jpegs
+
+
+SNAPSHOT, CLIP = 'snapshot', 'clip'
+KINDS = (SNAPSHOT, CLIP)
+CONTENT_TYPES = {SNAPSHOT: 'image/jpeg', CLIP: 'multipart/x-mixed-replace; boundary=frame'}
+_BOUNDARY = b'--frame'
+
+# One record per blob: its key, position across all segments, length, CRC-32 and when it was stored
+_INDEX = np.dtype([('key', '<i8'), ('position', '<i8'), ('length', '<u4'), ('crc', '<u4'), ('time', '<f8')])
+_SEGMENT_SUFFIX = '.blob'
+_INDEX_FILE = 'index'
+# Writers lock this file; it holds the start of the segment being appended to and the index generation
+_LOCK_FILE = 'lock'
+_LOCK = struct.Struct('<QQ')
+# Index records appended since the sorted copy of the keys was last brought up to date are
+# searched linearly, up to this many
+_UNSORTED_MAX = 4096
+
+
+class Blob(NamedTuple):
+    data: bytes
+    crc: int
+    time: float
+
+
+class BlobStore:
+    """
+    Append-only store for millions of small blobs in a handful of files.
+
+    Blobs are appended to segment files of about `segment_bytes`, each named
+    after the position of its first byte across the whole store, as the
+    ingestion log's are. A fixed-width index file gets one 32-byte record per
+    blob (key, position, length, CRC-32, time). A million snapshots therefore
+    cost a few dozen segment files and a 32 MB index rather than a million
+    inodes or a million database rows.
+
+    Any number of processes can write: appends are serialised by a lock on
+    the store's lock file, held for two writes. Readers memory-map the index
+    and the segments and never lock. The index is searched through a sorted
+    copy of its keys; records appended since are scanned with NumPy until
+    there are `_UNSORTED_MAX` of them, which are then merged into the copy.
+    When a key is stored twice, the later blob wins. A blob whose CRC does
+    not match (torn by a crash before it reached the disk) reads as missing.
+
+    Space is reclaimed a whole segment at a time, oldest first (see evict()),
+    so nothing is ever rewritten in place.
+    """
+
+    def __init__(self, directory: str, segment_bytes: Optional[int] = None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes or settings.EVIDENCE_SEGMENT_BYTES
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, _INDEX_FILE)
+        self._lock_fd = os.open(os.path.join(directory, _LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        # Byte-range and flock locks belong to the process, so threads also need one of their own
+        self._lock = threading.Lock()
+        # Writer state: the open segment and index, and the generation of the index they belong to
+        self._segment_fd: Optional[int] = None
+        self._segment_start = -1
+        self._index_fd: Optional[int] = None
+        self._generation = -1
+        # Reader state
+        self._index_id = None
+        self._index = np.zeros(0, dtype=_INDEX)
+        self._sorted_count = 0
+        self._sorted_keys = np.zeros(0, dtype=np.int64)
+        self._sorted_rows = np.zeros(0, dtype=np.int64)
+        self._segments: List[int] = []
+        self._maps: Dict[int, mmap.mmap] = {}
+        self.stats = {"appended": 0, "bytes": 0}
+
+    def _segment_path(self, start: int) -> str:
+        return os.path.join(self.directory, f'{start:020d}{_SEGMENT_SUFFIX}')
+
+    def segments(self) -> List[int]:
+        """Start positions of the segments on disk, oldest first"""
+        return sorted(int(name[:-len(_SEGMENT_SUFFIX)]) for name in os.listdir(self.directory)
+                      if name.endswith(_SEGMENT_SUFFIX))
+
+    @contextmanager
+    def _writing(self):
+        """Hold the store's write lock; yields the active segment start and index generation"""
+        with self._lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                header = os.pread(self._lock_fd, _LOCK.size, 0)
+                yield _LOCK.unpack(header) if len(header) == _LOCK.size else (0, 0)
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def append(self, key: int, data: bytes, when: Optional[float] = None) -> int:
+        """Store a blob under `key`, replacing any earlier one; returns its position"""
+        record = np.zeros(1, dtype=_INDEX)
+        with self._writing() as (start, generation):
+            if generation != self._generation or self._index_fd is None:
+                # The index was rewritten by an eviction since this process last wrote
+                if self._index_fd is not None:
+                    os.close(self._index_fd)
+                self._index_fd = os.open(self._index_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                self._generation = generation
+            if start != self._segment_start or self._segment_fd is None:
+                self._open_segment(start)
+            size = os.fstat(self._segment_fd).st_size
+            if size and size + len(data) > self.segment_bytes:
+                start, size = start + size, 0
+                self._open_segment(start)
+                os.pwrite(self._lock_fd, _LOCK.pack(start, generation), 0)
+            os.pwrite(self._segment_fd, data, size)
+            record[0] = (key, start + size, len(data), zlib.crc32(data), time.time() if when is None else when)
+            os.write(self._index_fd, record.tobytes())
+            self.stats["appended"] += 1
+            self.stats["bytes"] += len(data)
+        return start + size
+
+    def _open_segment(self, start: int) -> None:
+        if self._segment_fd is not None:
+            os.close(self._segment_fd)
+        self._segment_fd = os.open(self._segment_path(start), os.O_WRONLY | os.O_CREAT, 0o644)
+        self._segment_start = start
+
+    def get(self, key: int) -> Optional[Blob]:
+        """The latest blob stored under `key`, or None"""
+        with self._lock:
+            self._refresh()
+            row = self._find(key)
+            if row is None:
+                return None
+            _, position, length, crc, stored = self._index[row].item()
+            data = self._read(position, length)
+        if data is None or zlib.crc32(data) != crc:
+            return None
+        return Blob(data, crc, stored)
+
+    def _refresh(self) -> None:
+        """Pick up index records appended, or an index rewritten, since the last look"""
+        try:
+            stat = os.stat(self._index_path)
+        except FileNotFoundError:
+            return
+        count = stat.st_size // _INDEX.itemsize
+        if self._index_id == stat.st_ino and count == len(self._index):
+            return
+        if self._index_id != stat.st_ino:
+            self._index_id = stat.st_ino
+            self._sorted_count = 0
+            self._sorted_keys = self._sorted_rows = np.zeros(0, dtype=np.int64)
+            self._segments = self.segments()
+            for start in [start for start in self._maps if start not in self._segments]:
+                self._maps.pop(start).close()
+        if count:
+            # A plain array over the mapping: np.memmap costs microseconds per indexing operation
+            with open(self._index_path, 'rb') as file:
+                index = mmap.mmap(file.fileno(), count * _INDEX.itemsize, access=mmap.ACCESS_READ)
+            self._index = np.frombuffer(index, dtype=_INDEX)
+        else:
+            self._index = np.zeros(0, dtype=_INDEX)
+        if count - self._sorted_count > _UNSORTED_MAX:
+            # Stable, and inserted after equal keys, so the last of equal keys is the latest record
+            rows = self._sorted_count + np.argsort(self._index['key'][self._sorted_count:], kind='stable')
+            keys = np.asarray(self._index['key'][rows])
+            at = np.searchsorted(self._sorted_keys, keys, side='right')
+            self._sorted_keys = np.insert(self._sorted_keys, at, keys)
+            self._sorted_rows = np.insert(self._sorted_rows, at, rows)
+            self._sorted_count = count
+
+    def _find(self, key: int) -> Optional[int]:
+        if self._sorted_count < len(self._index):
+            tail = np.flatnonzero(self._index['key'][self._sorted_count:] == key)
+            if len(tail):
+                return self._sorted_count + int(tail[-1])
+        found = int(np.searchsorted(self._sorted_keys, key, side='right')) - 1
+        if found >= 0 and self._sorted_keys[found] == key:
+            return int(self._sorted_rows[found])
+        return None
+
+    def _read(self, position: int, length: int) -> Optional[bytes]:
+        for relist in (False, True):
+            if relist:
+                # Possibly in a segment started since the last listing
+                self._segments = self.segments()
+            found = bisect.bisect_right(self._segments, position) - 1
+            if found >= 0:
+                start = self._segments[found]
+                data = self._slice(start, position - start, length)
+                if data is not None:
+                    return data
+        return None
+
+    def _slice(self, start: int, offset: int, length: int) -> Optional[bytes]:
+        segment = self._maps.get(start)
+        if segment is None or offset + length > len(segment):
+            # Not mapped yet, or mapped before this blob was appended
+            if segment is not None:
+                self._maps.pop(start).close()
+            try:
+                with open(self._segment_path(start), 'rb') as file:
+                    segment = self._maps[start] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (FileNotFoundError, ValueError):
+                # Evicted meanwhile, or still empty
+                return None
+        if offset + length > len(segment):
+            return None
+        return segment[offset:offset + length]
+
+    def evict(self, before: float, max_bytes: Optional[int] = None) -> Dict[str, int]:
+        """
+        Delete whole segments, oldest first, while their newest blob is older than
+        `before` (a Unix time) or the store is larger than `max_bytes`
+
+        The segment being appended to is always kept. The index is rewritten
+        without the deleted blobs' records.
+        """
+        evicted = {"segments": 0, "bytes": 0, "blobs": 0}
+        with self._writing() as (active, generation):
+            segments = self.segments()
+            sizes = {start: os.path.getsize(self._segment_path(start)) for start in segments}
+            total = sum(sizes.values())
+            index = np.fromfile(self._index_path, dtype=_INDEX) if os.path.exists(self._index_path) \
+                else np.zeros(0, dtype=_INDEX)
+            dropped = []
+            for start in segments[:-1]:
+                stored = index['time'][(index['position'] >= start) & (index['position'] < start + sizes[start])]
+                if stored.max(initial=0.0) >= before and (max_bytes is None or total <= max_bytes):
+                    break
+                dropped.append(start)
+                total -= sizes[start]
+            if not dropped:
+                return evicted
+
+            first = segments[len(dropped)]
+            kept = index[index['position'] >= first]
+            with open(self._index_path + '.tmp', 'wb') as file:
+                kept.tofile(file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(self._index_path + '.tmp', self._index_path)
+            os.pwrite(self._lock_fd, _LOCK.pack(max(active, segments[-1]), generation + 1), 0)
+            for start in dropped:
+                os.unlink(self._segment_path(start))
+                evicted["segments"] += 1
+                evicted["bytes"] += sizes[start]
+            evicted["blobs"] = len(index) - len(kept)
+        return evicted
+
+    def usage(self) -> Dict[str, int]:
+        """Segments, bytes on disk and index records"""
+        segments = self.segments()
+        index_bytes = os.path.getsize(self._index_path) if os.path.exists(self._index_path) else 0
+        return {
+            "segments": len(segments),
+            "bytes": sum(os.path.getsize(self._segment_path(start)) for start in segments),
+            "records": index_bytes // _INDEX.itemsize,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            for fd in (self._segment_fd, self._index_fd):
+                if fd is not None:
+                    os.close(fd)
+            self._segment_fd = self._index_fd = None
+            for segment in self._maps.values():
+                segment.close()
+            self._maps.clear()
+            self._index = np.zeros(0, dtype=_INDEX)
+        os.close(self._lock_fd)
+
+
+class EvidenceStore(BlobStore):
+    """A BlobStore in EVIDENCE_DIR keyed by alert and kind of evidence (snapshot or clip)"""
+
+    def __init__(self, directory: Optional[str] = None, segment_bytes: Optional[int] = None):
+        super().__init__(str(directory or settings.EVIDENCE_DIR), segment_bytes)
+
+    @staticmethod
+    def key(alert_id: int, kind: str) -> int:
+        return int(alert_id) * len(KINDS) + KINDS.index(kind)
+
+    def put(self, alert_id: int, kind: str, data: bytes) -> int:
+        return self.append(self.key(alert_id, kind), data)
+
+    def fetch(self, alert_id: int, kind: str) -> Optional[Blob]:
+        return self.get(self.key(alert_id, kind))
+
+
+def mjpeg(jpegs: Iterable[bytes]) -> bytes:
+    """JPEG frames as a multipart/x-mixed-replace body, which browsers play in an <img>"""
+    parts = [_BOUNDARY + b'\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n' % len(jpeg) + jpeg + b'\r\n'
+             for jpeg in jpegs]
+    return b''.join(parts) + _BOUNDARY + b'--\r\n' if parts else b''
+
+
+def as_clip(data: bytes) -> bytes:
+    """An uploaded MJPEG stream or run of JPEG files, re-framed the way clips are stored"""
+    return mjpeg(iter_jpegs([data]))
+
+
+class EvidenceCapture:
+    """
+    Takes the evidence for new alerts from the camera behind them.
+
+    The camera is the alert's sensor when that is a camera, else the one its
+    location names ("CAM_12 - Storage Room"), else the first camera in its
+    zone. Its frame ring (see FrameRing) is read straight from shared memory:
+    the newest frame becomes the snapshot, and up to `clip_frames` frames
+    still in the ring become the clip, both scaled to `width` pixels wide.
+    A camera that nothing is ingesting yields no evidence.
+    """
+
+    def __init__(self, store: Optional[EvidenceStore] = None, width: Optional[int] = None,
+                 clip_frames: Optional[int] = None, quality: Optional[int] = None):
+        self.store = store or EvidenceStore()
+        self.width = width or settings.EVIDENCE_WIDTH
+        self.clip_frames = clip_frames or settings.EVIDENCE_CLIP_FRAMES
+        self.quality = quality or settings.EVIDENCE_QUALITY
+        self._cameras: Dict[str, str] = {}
+        self.stats = {"alerts": 0, "captured": 0, "no_camera": 0, "no_frames": 0, "bytes": 0}
+
+    def camera_for(self, alert: Dict[str, Any]) -> Optional[str]:
+        candidates = [alert.get('sensorId') or '', (alert.get('location') or '').split(' - ')[0].strip()]
+        for refresh in (False, True):
+            if refresh or not self._cameras:
+                self._cameras = {name.lower(): name for name in Camera.objects.values_list('name', flat=True)}
+            for candidate in candidates:
+                if candidate.lower() in self._cameras:
+                    return self._cameras[candidate.lower()]
+        if alert.get('zoneId'):
+            return Camera.objects.filter(zone_id=alert['zoneId']).order_by('id').values_list('name', flat=True).first()
+        return None
+
+    def _frames(self, camera: str) -> List[np.ndarray]:
+        """Copies of the frames in the camera's ring, oldest first, skipping any overwritten while copied"""
+        ring = FrameRing.attach(camera)
+        if ring is None:
+            return []
+        try:
+            last = ring.last_seq
+            frames = []
+            for seq in range(max(1, last - min(self.clip_frames, ring.slots) + 1), last + 1):
+                frame = ring.read(seq)
+                if frame is not None:
+                    pixels = np.array(frame.pixels)
+                    if ring.is_current(seq):
+                        frames.append(pixels)
+            return frames
+        finally:
+            ring.close()
+
+    def _jpeg(self, pixels: np.ndarray) -> bytes:
+        image = Image.fromarray(pixels)
+        if image.width > self.width:
+            image = image.resize((self.width, max(1, image.height * self.width // image.width)), Image.BILINEAR)
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=self.quality)
+        return output.getvalue()
+
+    def capture(self, alert: Dict[str, Any]) -> Dict[str, int]:
+        """Store the snapshot and clip for an alert; returns the bytes stored per kind"""
+        self.stats["alerts"] += 1
+        camera = self.camera_for(alert)
+        if camera is None:
+            self.stats["no_camera"] += 1
+            return {}
+        frames = self._frames(camera)
+        if not frames:
+            self.stats["no_frames"] += 1
+            return {}
+        jpegs = [self._jpeg(pixels) for pixels in frames]
+        stored = {SNAPSHOT: jpegs[-1]}
+        if len(jpegs) > 1:
+            stored[CLIP] = mjpeg(jpegs)
+        for kind, data in stored.items():
+            self.store.put(int(alert['id']), kind, data)
+        self.stats["captured"] += 1
+        self.stats["bytes"] += sum(len(data) for data in stored.values())
+        return {kind: len(data) for kind, data in stored.items()}
+
+
+_store: Optional[EvidenceStore] = None
+_store_lock = threading.Lock()
+
+
+def get_evidence_store() -> EvidenceStore:
+    """The process-wide handle on the evidence store"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = EvidenceStore()
+    return _store
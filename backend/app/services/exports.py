@@ -0,0 +1,74 @@
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from django.utils import timezone
+
+from ..models import Incident, SensorReading
+from .archive import INCIDENT_SCHEMA, READING_SCHEMA, ArchiveService, iter_chunks
+
+
+class ExportService:
+    """
+    On-demand exports of resolved incidents and sensor history.
+
+    Rows are read in keyset-paginated chunks and written or streamed one chunk at
+    a time, so memory stays flat no matter how large the export is.
+    """
+
+    DATASETS = ('incidents', 'sensor-history')
+
+    def __init__(self, archive: Optional[ArchiveService] = None, chunk_size: int = 5000):
+        self.archive = archive or ArchiveService()
+        self.chunk_size = chunk_size
+
+    def export(
+        self,
+        dataset: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        sensor_id: Optional[str] = None,
+    ) -> Tuple[Optional[Path], int]:
+        """
+        Write a dataset to a file under EXPORT_DIR/<dataset>/<timestamp>/
+
+        Returns:
+            The written path (None when nothing matched) and the row count
+        """
+        schema, chunks = self._source(dataset, since, until, sensor_id)
+        partition = timezone.now().strftime('%Y%m%dT%H%M%S')
+        return self.archive.write_partition(dataset, partition, schema, chunks)
+
+    def stream(
+        self,
+        dataset: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        sensor_id: Optional[str] = None,
+    ) -> Iterator[bytes]:
+        """Yield a dataset as an Arrow IPC stream"""
+        schema, chunks = self._source(dataset, since, until, sensor_id)
+        return self.archive.stream(schema, chunks)
+
+    def _source(self, dataset, since, until, sensor_id):
+        if dataset == 'incidents':
+            queryset = Incident.objects.filter(status='resolved')
+            if since:
+                queryset = queryset.filter(resolved_at__gte=since)
+            if until:
+                queryset = queryset.filter(resolved_at__lt=until)
+            fields = [field.name for field in INCIDENT_SCHEMA]
+            return INCIDENT_SCHEMA, iter_chunks(queryset, fields, self.chunk_size)
+
+        if dataset == 'sensor-history':
+            queryset = SensorReading.objects.all()
+            if sensor_id:
+                queryset = queryset.filter(sensor_id=sensor_id)
+            if since:
+                queryset = queryset.filter(recorded_at__gte=since)
+            if until:
+                queryset = queryset.filter(recorded_at__lt=until)
+            fields = [field.name for field in READING_SCHEMA]
+            return READING_SCHEMA, iter_chunks(queryset, fields, self.chunk_size)
+
+        raise ValueError(f"Unknown export dataset '{dataset}'. Use one of: {', '.join(self.DATASETS)}")
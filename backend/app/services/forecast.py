@@ -0,0 +1,254 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Max, Min, Q, StdDev
+
+from ..models import Camera, Sensor, SensorReading, StressForecast, Zone
+from .correlation import SOURCES, source_of
+
+
+# Hours in a season: stress follows the time of day
+PERIOD = 24
+# Weight of each new one-hour-ahead error in the smoothed error variance
+ERROR_WEIGHT = 0.05
+# Forecast key for the whole site
+ALL = 'all'
+# Standard deviations above its own mean at which a sensor reporting in natural
+# units (degrees, decibels) counts as full stress
+FULL_STRESS_SPREADS = 3.0
+
+
+def stress_value(sensor_type: str, value: float, baseline: Optional[Tuple[float, float]] = None) -> float:
+    """
+    A reading's contribution to the stress index, between 0 and 1
+
+    Scores already between 0 and 1 count as they are. A sensor reporting in
+    natural units has a `baseline`, the mean and standard deviation of its
+    recent readings, and counts by how far it is above its own usual level.
+    """
+    if sensor_type == 'motion':
+        # Motion scores are the percentage of the frame that changed
+        value /= 100.0
+    elif baseline is not None:
+        mean, spread = baseline
+        value = (value - mean) / (FULL_STRESS_SPREADS * spread) if spread > 0 else 0.0
+    return min(max(value, 0.0), 1.0)
+
+
+class HoltWinters:
+    """
+    Additive Holt-Winters smoothing (level, trend and hour-of-day season) of
+    many hourly series at once.
+
+    Every series is a row of a few NumPy arrays, so folding in the next hour
+    of all series is a handful of vectorized operations and costs O(1) per
+    series, whatever the length of its history. Hours without data are filled
+    with the model's own expectation, which keeps all series on one clock; a
+    series starts at its first real value.
+
+    Prediction intervals come from the smoothed square of the one-hour-ahead
+    errors, widened per step ahead with the usual additive Holt-Winters
+    variance multipliers.
+    """
+
+    def __init__(self, series: int, alpha: Optional[float] = None, beta: Optional[float] = None,
+                 gamma: Optional[float] = None):
+        self.alpha = settings.FORECAST_ALPHA if alpha is None else alpha
+        self.beta = settings.FORECAST_BETA if beta is None else beta
+        self.gamma = settings.FORECAST_GAMMA if gamma is None else gamma
+        self.level = np.zeros(series)
+        self.trend = np.zeros(series)
+        self.season = np.zeros((series, PERIOD))
+        self.variance = np.zeros(series)
+        self.points = np.zeros(series, dtype=np.int64)
+
+    def update(self, values: np.ndarray, position: int) -> None:
+        """Fold in one hour (NaN where a series has no data); `position` is its hour of the day"""
+        seen = ~np.isnan(values)
+        started = self.points > 0
+        season = self.season[:, position]
+        expected = self.level + self.trend + season
+        values = np.where(seen, values, expected)
+
+        level = self.alpha * (values - season) + (1 - self.alpha) * (self.level + self.trend)
+        trend = self.beta * (level - self.level) + (1 - self.beta) * self.trend
+        weight = np.maximum(1.0 / np.maximum(self.points, 1), ERROR_WEIGHT)
+        scored = seen & started
+        self.variance = np.where(scored, (1 - weight) * self.variance + weight * (values - expected) ** 2,
+                                 self.variance)
+        self.season[:, position] = np.where(started, self.gamma * (values - level) + (1 - self.gamma) * season,
+                                            season)
+        first = seen & ~started
+        self.level = np.where(started, level, np.where(first, values, self.level))
+        self.trend = np.where(started, trend, self.trend)
+        self.points += seen
+
+    def forecast(self, hours: int, position: int, interval: Optional[float] = None
+                 ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Mean, lower and upper bounds for the `hours` hours after the hour at
+        `position`, one row per series, clipped to the 0-1 stress range
+        """
+        interval = settings.FORECAST_INTERVAL if interval is None else interval
+        steps = np.arange(1, hours + 1)
+        mean = (self.level[:, None] + steps * self.trend[:, None]
+                + self.season[:, (position + steps) % PERIOD])
+        multipliers = self.alpha * (1 + steps * self.beta) + self.gamma * (steps % PERIOD == 0)
+        spread = np.concatenate([[0.0], np.cumsum(multipliers[:-1] ** 2)])
+        margin = NormalDist().inv_cdf(0.5 + interval / 2) * np.sqrt(self.variance[:, None] * (1 + spread))
+        return np.clip(mean, 0, 1), np.clip(mean - margin, 0, 1), np.clip(mean + margin, 0, 1)
+
+
+class StressForecaster:
+    """
+    Keeps a Holt-Winters forecast of the hourly stress index of every zone,
+    and of the whole site, in StressForecast rows.
+
+    An hour's stress index is the mean, over the kinds of source (video,
+    audio, iot) that reported, of their sensors' mean readings scaled to 0-1
+    (see stress_value; sensors with readings outside 0-1 are measured against
+    their own FORECAST_HISTORY_HOURS of readings). A sensor or camera counts
+    towards its zone and every zone above it. Each run() folds the hours
+    completed since the last run into the models (at most
+    FORECAST_HISTORY_HOURS of them), keeps the last day of measured hours,
+    then stores a forecast FORECAST_MAX_HOURS ahead, so requests only read a row.
+    """
+
+    def __init__(self, max_hours: Optional[int] = None, history_hours: Optional[int] = None):
+        self.max_hours = max_hours or settings.FORECAST_MAX_HOURS
+        self.history_hours = history_hours or settings.FORECAST_HISTORY_HOURS
+
+    def run(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        now = now or datetime.now(dt_timezone.utc)
+        current = now.replace(minute=0, second=0, microsecond=0)
+        zones = list(Zone.objects.values_list('id', 'path'))
+        keys = [ALL] + [str(zone_id) for zone_id, _ in zones]
+        index = {key: row for row, key in enumerate(keys)}
+        saved = {forecast.key: forecast for forecast in StressForecast.objects.all()}
+
+        model = HoltWinters(len(keys))
+        for key, forecast in saved.items():
+            if key in index and len(forecast.season) == PERIOD:
+                row = index[key]
+                model.level[row], model.trend[row] = forecast.level, forecast.trend
+                model.season[row] = forecast.season
+                model.variance[row], model.points[row] = forecast.variance, forecast.points
+
+        # Every row moves on together, so any saved row tells where the models stopped
+        last = max((forecast.hour for forecast in saved.values()), default=None)
+        first = current - timedelta(hours=self.history_hours)
+        hour = max(last + timedelta(hours=1), first) if last else first
+        if hour >= current:
+            return {"hours": 0, "zones": len(keys)}
+
+        memberships = self._memberships(zones, index)
+        baselines = self._baselines(first, current)
+        measured = {key: list(forecast.history) for key, forecast in saved.items()}
+        folded = 0
+        while hour < current:
+            stress = self._stress(hour, memberships, baselines, len(keys))
+            model.update(stress, hour.hour)
+            for key, row in index.items():
+                if not np.isnan(stress[row]):
+                    measured.setdefault(key, []).append({"time": hour.isoformat(),
+                                                         "stress": round(float(stress[row]), 3)})
+            hour += timedelta(hours=1)
+            folded += 1
+        hour -= timedelta(hours=1)
+        day_start = (hour - timedelta(hours=PERIOD - 1)).isoformat()
+
+        mean, lower, upper = model.forecast(self.max_hours, hour.hour)
+        times = [(hour + timedelta(hours=step)).isoformat() for step in range(1, self.max_hours + 1)]
+        rows = []
+        for key, row in index.items():
+            forecast = saved.get(key) or StressForecast(key=key, zone_id=None if key == ALL else int(key))
+            forecast.hour, forecast.updated_at = hour, now
+            forecast.level, forecast.trend = float(model.level[row]), float(model.trend[row])
+            forecast.season = [round(float(value), 6) for value in model.season[row]]
+            forecast.variance, forecast.points = float(model.variance[row]), int(model.points[row])
+            forecast.history = [point for point in measured.get(key, []) if point["time"] >= day_start]
+            forecast.forecast = [] if not model.points[row] else [
+                {"time": time, "stress": round(float(m), 3), "lower": round(float(lo), 3), "upper": round(float(hi), 3)}
+                for time, m, lo, hi in zip(times, mean[row], lower[row], upper[row])
+            ]
+            rows.append(forecast)
+        with transaction.atomic():
+            StressForecast.objects.bulk_create([row for row in rows if row.pk is None], batch_size=500)
+            StressForecast.objects.bulk_update(
+                [row for row in rows if row.pk is not None],
+                ['hour', 'level', 'trend', 'season', 'variance', 'points', 'history', 'forecast', 'updated_at'],
+                batch_size=500,
+            )
+            # Zones deleted since the last run
+            StressForecast.objects.exclude(key__in=keys).delete()
+        return {"hours": folded, "zones": len(keys)}
+
+    @staticmethod
+    def _memberships(zones: List[Tuple[int, str]], index: Dict[str, int]) -> Dict[str, List[int]]:
+        """Forecast rows each sensor and camera counts towards: the site, its zone and the zones above"""
+        paths = {zone_id: path for zone_id, path in zones}
+        memberships = {}
+        for sensor_id, zone_id in list(Sensor.objects.values_list('sensor_id', 'zone_id')) + list(
+                Camera.objects.values_list('name', 'zone_id')):
+            ancestors = paths.get(zone_id, '').strip('/').split('/') if zone_id in paths else []
+            memberships[sensor_id] = [index[ALL]] + [index[ancestor] for ancestor in ancestors if ancestor in index]
+        return memberships
+
+    @staticmethod
+    def _baselines(start: datetime, end: datetime) -> Dict[str, Tuple[float, float]]:
+        """Mean and standard deviation of each sensor whose readings aren't 0-1 scores"""
+        sensors = (SensorReading.objects
+                   .filter(recorded_at__gte=start, recorded_at__lt=end)
+                   .exclude(sensor_type='motion')
+                   .values('sensor_id')
+                   .annotate(low=Min('value'), high=Max('value'), mean=Avg('value'), spread=StdDev('value'))
+                   .filter(Q(low__lt=0) | Q(high__gt=1))
+                   .values_list('sensor_id', 'mean', 'spread'))
+        return {sensor_id: (mean, spread or 0.0) for sensor_id, mean, spread in sensors}
+
+    @staticmethod
+    def _stress(hour: datetime, memberships: Dict[str, List[int]], baselines: Dict[str, Tuple[float, float]],
+                series: int) -> np.ndarray:
+        """Stress index of every row for the hour starting at `hour`, NaN for rows without readings"""
+        readings = (SensorReading.objects
+                    .filter(recorded_at__gte=hour, recorded_at__lt=hour + timedelta(hours=1))
+                    .values('sensor_id', 'sensor_type').annotate(mean=Avg('value'))
+                    .values_list('sensor_id', 'sensor_type', 'mean'))
+        rows, sources, values = [], [], []
+        for sensor_id, sensor_type, mean in readings:
+            value = stress_value(sensor_type, mean, baselines.get(sensor_id))
+            source = SOURCES.index(source_of(sensor_type))
+            # Sensors and cameras without a zone only count towards the whole site, row 0
+            for row in memberships.get(sensor_id, (0,)):
+                rows.append(row)
+                sources.append(source)
+                values.append(value)
+        if not rows:
+            return np.full(series, np.nan)
+        cells = np.asarray(rows) * len(SOURCES) + np.asarray(sources)
+        totals = np.bincount(cells, weights=values, minlength=series * len(SOURCES)).reshape(series, -1)
+        counts = np.bincount(cells, minlength=series * len(SOURCES)).reshape(series, -1)
+        reported = counts > 0
+        # Mean over the kinds of source that reported
+        per_source = np.divide(totals, counts, out=np.zeros_like(totals), where=reported)
+        sources_reported = reported.sum(axis=1)
+        return np.divide(per_source.sum(axis=1), sources_reported, out=np.full(series, np.nan),
+                         where=sources_reported > 0)
+
+
+def get_forecast(zone: Optional[Zone], hours: int) -> Optional[List[Dict[str, float]]]:
+    """The stored forecast of a zone (or the whole site), `hours` ahead; None if there is none yet"""
+    forecast = StressForecast.objects.filter(key=str(zone.id) if zone is not None else ALL).only('forecast').first()
+    if forecast is None or not forecast.forecast:
+        return None
+    return forecast.forecast[:hours]
+
+
+def get_history(zone: Optional[Zone]) -> List[Dict[str, float]]:
+    """Stress index of a zone (or the whole site) over the last day of hours folded into its forecast"""
+    forecast = StressForecast.objects.filter(key=str(zone.id) if zone is not None else ALL).only('history').first()
+    return forecast.history if forecast is not None else []
@@ -0,0 +1,485 @@
+import fcntl
+import io
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional
+
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+
+_MAGIC = b'SVFRAME1'
+# magic, width, height, channels, slots
+_HEADER = struct.Struct('<8sIIII')
+# Header, then write_seq (uint64), then per-slot seq (uint64) and timestamp (float64)
+_ALIGN = 64
+
+_SOI = b'\xff\xd8'
+_EOI = b'\xff\xd9'
+# Start of scan: the entropy-coded image data follows its header
+_SOS = 0xDA
+
+# A feed with no frame for this many seconds reports 0 fps
+_IDLE_SECONDS = 5.0
+
+
+class Frame(NamedTuple):
+    seq: int
+    timestamp: float
+    # A read-only view into shared memory, valid until the ring wraps around to this slot
+    pixels: np.ndarray
+
+
+def _ring_name(camera: str) -> str:
+    return settings.FRAME_SHM_PREFIX + re.sub(r'[^A-Za-z0-9_]', '_', camera)
+
+
+_tracker_lock = threading.Lock()
+
+
+def _open_untracked(name: str, create: bool = False, size: int = 0) -> shared_memory.SharedMemory:
+    """
+    Attach to (or create) a segment without registering it with the resource tracker
+
+    A registered segment is unlinked by the tracker when this process exits, even
+    though other processes are still using it. Before Python 3.13 attaching
+    registers the segment too. Unregistering afterwards isn't safe either: forked
+    workers share their parent's tracker and would drop each other's registrations.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    with _tracker_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None if rtype == 'shared_memory' else register(name, rtype)
+        try:
+            return shared_memory.SharedMemory(name=name, create=create, size=size)
+        finally:
+            resource_tracker.register = register
+
+
+class FrameRing:
+    """
+    A fixed-size ring of decoded frames for one camera in named shared memory.
+
+    Any number of analysis processes attach by camera name and read frames as
+    NumPy views straight out of the segment, with no pickling or copying. Each
+    slot carries the sequence number of the frame in it, cleared while the slot is
+    being rewritten: a reader that wants to be sure a frame wasn't overwritten
+    while it was using it checks is_current() afterwards.
+
+    The ring outlives the processes using it, so web workers taking uploads and an
+    ingest_frames process can all write to the same camera. Writers take turns
+    through writing(); nothing but remove() unlinks a ring.
+    """
+
+    def __init__(self, segment: shared_memory.SharedMemory):
+        self.segment = segment
+        self._write_lock = threading.Lock()
+        self._lock_fd: Optional[int] = None
+        magic, self.width, self.height, self.channels, self.slots = _HEADER.unpack_from(segment.buf, 0)
+        if magic != _MAGIC:
+            raise ValueError(f'Shared memory segment {segment.name} is not a frame ring')
+
+        offset = _HEADER.size
+        self._write_seq = np.ndarray((1,), dtype=np.uint64, buffer=segment.buf, offset=offset)
+        offset += 8
+        self._slot_seq = np.ndarray((self.slots,), dtype=np.uint64, buffer=segment.buf, offset=offset)
+        offset += 8 * self.slots
+        self._slot_time = np.ndarray((self.slots,), dtype=np.float64, buffer=segment.buf, offset=offset)
+        offset = self._data_offset(self.slots)
+        self._frames = np.ndarray(
+            (self.slots, self.height, self.width, self.channels),
+            dtype=np.uint8,
+            buffer=segment.buf,
+            offset=offset,
+        )
+
+    @staticmethod
+    def _data_offset(slots: int) -> int:
+        header = _HEADER.size + 8 + 16 * slots
+        return (header + _ALIGN - 1) // _ALIGN * _ALIGN
+
+    @classmethod
+    def open(cls, camera: str, width: int, height: int, slots: int, channels: int = 3) -> 'FrameRing':
+        """
+        Attach to a camera's ring for writing, creating it when there is none yet
+
+        An existing ring keeps the size it was created with; frames are scaled to it.
+        """
+        name = _ring_name(camera)
+        size = cls._data_offset(slots) + slots * height * width * channels
+        deadline = time.monotonic() + 1.0
+        while True:
+            try:
+                segment = _open_untracked(name, create=True, size=size)
+            except FileExistsError:
+                pass
+            else:
+                segment.buf[_HEADER.size:cls._data_offset(slots)] = bytes(cls._data_offset(slots) - _HEADER.size)
+                _HEADER.pack_into(segment.buf, 0, _MAGIC, width, height, channels, slots)
+                return cls(segment)
+            try:
+                ring = cls.attach(camera)
+            except ValueError:
+                # Another writer has just created it and hasn't written the header yet
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.001)
+                continue
+            if ring is not None:
+                return ring
+
+    @classmethod
+    def attach(cls, camera: str) -> Optional['FrameRing']:
+        """Attach to a camera's ring, or None when nothing has ingested it"""
+        try:
+            segment = _open_untracked(_ring_name(camera))
+        except FileNotFoundError:
+            return None
+        try:
+            return cls(segment)
+        except ValueError:
+            segment.close()
+            raise
+
+    @staticmethod
+    def remove(camera: str) -> None:
+        """Unlink a camera's ring; processes still attached keep their mapping until they close it"""
+        try:
+            segment = _open_untracked(_ring_name(camera))
+        except FileNotFoundError:
+            return
+        segment.close()
+        # It was never registered with the resource tracker, so it mustn't be unregistered either
+        with _tracker_lock:
+            unregister = resource_tracker.unregister
+            resource_tracker.unregister = (
+                lambda name, rtype: None if rtype == 'shared_memory' else unregister(name, rtype)
+            )
+            try:
+                segment.unlink()
+            finally:
+                resource_tracker.unregister = unregister
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.segment.size
+
+    @property
+    def last_seq(self) -> int:
+        return int(self._write_seq[0])
+
+    def slot(self, seq: int) -> np.ndarray:
+        """The writable pixel buffer a frame with this sequence number goes into"""
+        return self._frames[seq % self.slots]
+
+    def begin(self) -> int:
+        """Claim the next slot for writing; fill slot(seq) and then call commit(seq)"""
+        seq = self.last_seq + 1
+        self._slot_seq[seq % self.slots] = 0
+        return seq
+
+    def commit(self, seq: int, timestamp: float) -> None:
+        index = seq % self.slots
+        self._slot_time[index] = timestamp
+        self._slot_seq[index] = seq
+        self._write_seq[0] = seq
+
+    @contextmanager
+    def writing(self):
+        """Hold the ring's writer lock, across threads and processes, for begin() to commit()"""
+        with self._write_lock:
+            if self._lock_fd is None:
+                # A lock file per ring in FRAME_LOCK_DIR, opened by writers only
+                os.makedirs(settings.FRAME_LOCK_DIR, exist_ok=True)
+                path = os.path.join(settings.FRAME_LOCK_DIR, f'{self.segment.name.lstrip("/")}.lock')
+                self._lock_fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def write(self, pixels: np.ndarray, timestamp: Optional[float] = None) -> int:
+        with self.writing():
+            seq = self.begin()
+            self.slot(seq)[...] = pixels
+            self.commit(seq, time.time() if timestamp is None else timestamp)
+        return seq
+
+    def latest(self) -> Optional[Frame]:
+        seq = self.last_seq
+        return self.read(seq) if seq else None
+
+    def read(self, seq: int) -> Optional[Frame]:
+        """A frame by sequence number, or None when it has been overwritten or isn't written yet"""
+        index = seq % self.slots
+        if seq <= 0 or int(self._slot_seq[index]) != seq:
+            return None
+        view = self._frames[index].view()
+        view.flags.writeable = False
+        return Frame(seq, float(self._slot_time[index]), view)
+
+    def is_current(self, seq: int) -> bool:
+        return int(self._slot_seq[seq % self.slots]) == seq
+
+    def stats(self, now: Optional[float] = None) -> Dict[str, float]:
+        """Frames written, recent frame rate (over the frames still in the ring) and memory used"""
+        now = time.time() if now is None else now
+        last = self.last_seq
+        valid = (self._slot_seq > 0) & (self._slot_seq + self.slots > last)
+        times = self._slot_time[valid]
+        fps = 0.0
+        if len(times) > 1 and now - times.max() < _IDLE_SECONDS:
+            span = times.max() - times.min()
+            fps = (len(times) - 1) / span if span > 0 else 0.0
+        return {
+            "frames": last,
+            "fps": round(fps, 2),
+            "width": self.width,
+            "height": self.height,
+            "memoryBytes": self.memory_bytes,
+        }
+
+    def close(self) -> None:
+        # Views into the segment must be gone before it can be closed
+        self._write_seq = self._slot_seq = self._slot_time = self._frames = None
+        self.segment.close()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+
+def _scan_start(buffer: bytearray) -> int:
+    """
+    Where to start looking for the end of the JPEG at the start of `buffer`
+
+    Header segments are stepped over by their length fields, so the SOI/EOI of
+    an EXIF thumbnail in an APPn segment can't end the image early. Returns the
+    start of the entropy-coded data after the SOS header, or -1 while the
+    headers haven't all arrived. Something that isn't a marker where one should
+    be is searched from there.
+    """
+    position = len(_SOI)
+    while True:
+        if position + 4 > len(buffer):
+            return -1
+        if buffer[position] != 0xFF:
+            return position
+        marker = buffer[position + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            position += 1
+            continue
+        if marker == _EOI[1]:
+            return position
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            # Markers without a length
+            position += 2
+            continue
+        position += 2 + int.from_bytes(buffer[position + 2:position + 4], 'big')
+        if marker == _SOS:
+            return position if position <= len(buffer) else -1
+
+
+def iter_jpegs(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Split a byte stream into JPEG images
+
+    Works on MJPEG (multipart/x-mixed-replace) bodies and on plain concatenated
+    JPEG files by looking for start-of-image markers, walking each image's
+    header segments and then scanning for its end-of-image marker, so part
+    headers and boundaries are skipped without being parsed. Consumed bytes are
+    dropped from the front of one buffer rather than copied into a new one on
+    every chunk.
+    """
+    buffer = bytearray()
+    # Where the current image's end-of-image marker is searched from; -1 until its headers are in
+    scan = -1
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            if scan < 0:
+                start = buffer.find(_SOI)
+                if start < 0:
+                    del buffer[:-1]
+                    break
+                del buffer[:start]
+                scan = _scan_start(buffer)
+                if scan < 0:
+                    break
+            end = buffer.find(_EOI, scan)
+            if end < 0:
+                # The marker may straddle this chunk and the next
+                scan = max(scan, len(buffer) - 1)
+                break
+            yield bytes(buffer[:end + 2])
+            del buffer[:end + 2]
+            scan = -1
+
+
+def decode_into(data: bytes, target: np.ndarray) -> None:
+    """
+    Decode a JPEG straight into a (height, width, 3) buffer
+
+    JPEG draft mode lets the decoder scale down by 1/2, 1/4 or 1/8 while decoding,
+    so large frames are never fully decoded only to be shrunk afterwards.
+    """
+    height, width = target.shape[:2]
+    image = Image.open(io.BytesIO(data))
+    image.draft('RGB', (width, height))
+    image = image.convert('RGB')
+    if image.size != (width, height):
+        image = image.resize((width, height), Image.BILINEAR)
+    target[...] = np.asarray(image)
+
+
+class FrameIngestor:
+    """
+    Decodes camera frames into per-camera shared-memory rings.
+
+    Every frame is scaled to FRAME_WIDTH x FRAME_HEIGHT so a ring's memory is fixed
+    (slots x width x height x 3 bytes) no matter what the camera sends. Several
+    processes may ingest the same camera; their frames interleave in its ring.
+    """
+
+    def __init__(self, width: Optional[int] = None, height: Optional[int] = None, slots: Optional[int] = None):
+        self.width = width or settings.FRAME_WIDTH
+        self.height = height or settings.FRAME_HEIGHT
+        self.slots = slots or settings.FRAME_RING_SLOTS
+        self._rings: Dict[str, FrameRing] = {}
+        self._lock = threading.Lock()
+
+    def ring(self, camera: str) -> FrameRing:
+        with self._lock:
+            ring = self._rings.get(camera)
+            if ring is None:
+                ring = self._rings[camera] = FrameRing.open(camera, self.width, self.height, self.slots)
+            return ring
+
+    def ingest(self, camera: str, data: bytes, timestamp: Optional[float] = None) -> int:
+        """
+        Decode one JPEG frame into the camera's ring
+
+        Returns:
+            The frame's sequence number
+        """
+        ring = self.ring(camera)
+        with ring.writing():
+            seq = ring.begin()
+            decode_into(data, ring.slot(seq))
+            ring.commit(seq, time.time() if timestamp is None else timestamp)
+        return seq
+
+    def ingest_stream(self, camera: str, chunks: Iterable[bytes]) -> Dict[str, int]:
+        """
+        Ingest every frame of an MJPEG byte stream
+
+        A frame that doesn't decode is skipped, so one corrupt frame doesn't end a
+        camera's long-running upload.
+
+        Returns:
+            Counts of frames ingested and frames skipped
+        """
+        counts = {"frames": 0, "skipped": 0}
+        for data in iter_jpegs(chunks):
+            try:
+                self.ingest(camera, data)
+            except (OSError, ValueError):
+                # Unidentified or truncated images are OSErrors to PIL
+                counts["skipped"] += 1
+                continue
+            counts["frames"] += 1
+        return counts
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {camera: ring.stats() for camera, ring in self._rings.items()}
+
+    def close(self, remove: bool = False) -> None:
+        """Detach from the rings, unlinking them too when `remove` is set"""
+        with self._lock:
+            for camera, ring in self._rings.items():
+                ring.close()
+                if remove:
+                    FrameRing.remove(camera)
+            self._rings.clear()
+
+
+def synthetic_jpegs(width: int = 1280, height: int = 720, count: int = 30, seed: int = 0) -> list:
+    """
+    A short looping clip of JPEG frames: a bright block moving over a noisy background
+
+    Stands in for a real camera when testing and benchmarking.
+    """
+    rng = np.random.default_rng(seed)
+    background = rng.integers(40, 80, size=(height, width, 3), dtype=np.uint8)
+    size = max(height // 6, 1)
+    frames = []
+    for index in range(count):
+        pixels = background.copy()
+        x = (width - size) * index // max(count - 1, 1)
+        y = (height - size) // 2
+        pixels[y:y + size, x:x + size] = 220
+        pixels ^= rng.integers(0, 8, size=pixels.shape, dtype=np.uint8)
+        output = io.BytesIO()
+        Image.fromarray(pixels).save(output, format='JPEG', quality=80)
+        frames.append(output.getvalue())
+    return frames
+
+
+def open_source(source: str, loop: bool = False) -> Iterator[bytes]:
+    """
+    Yield JPEG frames from a stand-in camera stream
+
+    `source` is an http(s) MJPEG URL, an MJPEG/JPEG file, a directory of JPEG files,
+    or `synthetic[:WIDTHxHEIGHT]`. Files, directories and synthetic clips repeat
+    forever when `loop` is set (synthetic clips always do).
+    """
+    if source.startswith(('http://', 'https://')):
+        import requests
+        with requests.get(source, stream=True, timeout=settings.NOTIFICATION_TIMEOUT) as response:
+            response.raise_for_status()
+            yield from iter_jpegs(response.iter_content(65536))
+        return
+
+    if source.startswith('synthetic'):
+        _, _, size = source.partition(':')
+        width, height = (int(value) for value in size.lower().split('x')) if size else (1280, 720)
+        clip = synthetic_jpegs(width, height)
+        while True:
+            yield from clip
+
+    path = Path(source)
+    while True:
+        if path.is_dir():
+            for file in sorted(path.glob('*.jp*g')):
+                yield file.read_bytes()
+        else:
+            with open(path, 'rb') as handle:
+                yield from iter_jpegs(iter(lambda: handle.read(65536), b''))
+        if not loop:
+            return
+
+
+def feed_stats(camera: str) -> Optional[Dict[str, float]]:
+    """
+    Ingest stats for a camera being ingested by any process, or None
+
+    Attaches afresh on every call (a couple of syscalls) so a ring removed and
+    recreated is always the one reported.
+    """
+    ring = FrameRing.attach(camera)
+    if ring is None:
+        return None
+    try:
+        return ring.stats()
+    finally:
+        ring.close()
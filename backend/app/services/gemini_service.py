@@ -1,17 +1,57 @@
 import os
-import google.generativeai as genai
-from typing import Dict, Any, Optional
+import threading
+from typing import Dict, Any, Iterator, Optional
 from django.conf import settings
+from .json_stream import JsonObjectStream
+from .prompt_digest import PromptDigester, estimate_tokens, to_json
+
+# Marks a model that has not been created yet (None means no API key)
+_UNSET = object()
+
 
 class GeminiService:
-    def __init__(self):
-        api_key = getattr(settings, 'GEMINI_API_KEY', None) or os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            self.model = None
+    """
+    Gemini analysis client.
+
+    The SDK is imported and configured on first use of `model`, not when the
+    service is created, so importing views or running management commands
+    doesn't pay for it. Use get_gemini_service() for the shared instance.
+    """
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key or getattr(settings, 'GEMINI_API_KEY', None) or os.getenv("GEMINI_API_KEY")
+        self._model = _UNSET
+        self._lock = threading.Lock()
+        # Shrinks large payloads before they are put in a prompt; None sends content as is
+        self.digester = PromptDigester()
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    @property
+    def model(self):
+        if self._model is _UNSET:
+            with self._lock:
+                if self._model is _UNSET:
+                    self._model = self._create_model()
+        return self._model
+
+    @model.setter
+    def model(self, value):
+        self._model = value
+
+    def _create_model(self):
+        if not self.api_key:
             print("Warning: GEMINI_API_KEY not set. AI analysis will return mock data.")
-        else:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-pro')
+            return None
+        try:
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            return genai.GenerativeModel('gemini-pro')
+        except Exception as e:
+            print(f"Warning: Could not initialize Gemini service: {e}")
+            return None
     
     async def analyze_data(self, data_type: str, content: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -24,6 +64,7 @@ class GeminiService:
         Returns:
             Analysis results from Gemini
         """
+        prompt, prompt_stats = self.prepare_prompt(data_type, content)
         if not self.model:
             # Return mock analysis if Gemini is not configured
             return {
@@ -31,25 +72,99 @@ class GeminiService:
                 "analysis": f"Mock analysis for {data_type} data. Please configure GEMINI_API_KEY for real AI analysis.",
                 "data_type": data_type,
                 "confidence": 0.75,
-                "mock": True
+                "mock": True,
+                "prompt": prompt_stats
             }
         
         try:
-            prompt = self._build_prompt(data_type, content)
             response = self.model.generate_content(prompt)
             
             return {
                 "success": True,
                 "analysis": response.text,
                 "data_type": data_type,
-                "confidence": 0.85  # Placeholder - could be extracted from response
+                "confidence": 0.85,  # Placeholder - could be extracted from response
+                "prompt": prompt_stats
             }
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e),
-                "data_type": data_type
+                "data_type": data_type,
+                "prompt": prompt_stats
             }
+
+    def stream_analysis(self, data_type: str, content: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Analyze surveillance data, yielding events as the response is generated
+
+        Events, in order:
+            start  - prompt metrics, before the model is called
+            token  - each chunk of response text as it arrives
+            item   - each element of a list field (observations, recommendations) once complete
+            field  - each top-level field of the JSON response once complete
+            result - the same result analyze_data returns, plus the parsed fields
+            error  - instead of result, if the model call fails
+        """
+        prompt, prompt_stats = self.prepare_prompt(data_type, content)
+        yield {"event": "start", "data_type": data_type, "prompt": prompt_stats}
+        if not self.model:
+            yield {
+                "event": "result",
+                "success": True,
+                "analysis": f"Mock analysis for {data_type} data. Please configure GEMINI_API_KEY for real AI analysis.",
+                "data_type": data_type,
+                "confidence": 0.75,
+                "mock": True,
+                "prompt": prompt_stats
+            }
+            return
+
+        parser: Optional[JsonObjectStream] = JsonObjectStream()
+        text = []
+        try:
+            for chunk in self.model.generate_content(prompt, stream=True):
+                text.append(chunk.text)
+                yield {"event": "token", "text": chunk.text}
+                if parser is None:
+                    continue
+                try:
+                    events = parser.feed(chunk.text)
+                except ValueError:
+                    # Not the JSON we asked for; keep streaming the text
+                    parser = None
+                    continue
+                for kind, key, value in events:
+                    yield {"event": kind, "key": key, "value": value}
+        except Exception as e:
+            yield {"event": "error", "success": False, "error": str(e), "data_type": data_type, "prompt": prompt_stats}
+            return
+
+        yield {
+            "event": "result",
+            "success": True,
+            "analysis": ''.join(text),
+            "parsed": parser.result if parser is not None else None,
+            "data_type": data_type,
+            "confidence": 0.85,
+            "prompt": prompt_stats
+        }
+
+    def prepare_prompt(self, data_type: str, content: Dict[str, Any]):
+        """
+        Digest the content and build the prompt
+
+        Returns:
+            The prompt and its size metrics (estimated tokens before and after digesting)
+        """
+        if self.digester is not None:
+            content, stats = self.digester.digest(content)
+        else:
+            stats = {"rawTokens": estimate_tokens(to_json(content))}
+        # The prompt templates are indented; leading whitespace is only wasted tokens
+        prompt = '\n'.join(line.strip() for line in self._build_prompt(data_type, content).splitlines() if line.strip())
+        stats["promptTokens"] = estimate_tokens(prompt)
+        return prompt, stats
     
     def _build_prompt(self, data_type: str, content: Dict[str, Any]) -> str:
         """Build a prompt for Gemini based on data type"""
@@ -57,7 +172,7 @@ class GeminiService:
         base_prompt = f"""
         You are an AI surveillance system analyst. Analyze the following {data_type} surveillance data:
         
-        Data: {content}
+        Data: {to_json(content)}
         
         Provide:
         1. Risk assessment (Low/Medium/High/Critical)
@@ -101,3 +216,27 @@ class GeminiService:
         else:
             return base_prompt
 
+
+_service: Optional[GeminiService] = None
+_service_lock = threading.Lock()
+
+
+def get_gemini_service() -> GeminiService:
+    """The process-wide GeminiService, created on first call"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = GeminiService()
+    return _service
+
+
+def _reset_after_fork() -> None:
+    # A forked child must not inherit a lock some other parent thread was holding
+    global _service_lock
+    _service_lock = threading.Lock()
+    if _service is not None:
+        _service._lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
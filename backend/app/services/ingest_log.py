@@ -0,0 +1,563 @@
+import fcntl
+import json
+import logging
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, OperationalError, connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from ..models import Alert, IngestCheckpoint, SensorReading
+from .correlation import SOURCES
+
+
+logger = logging.getLogger(__name__)
+
+READING, ALERT = 'reading', 'alert'
+
+# Each record is its payload length and CRC-32 followed by the payload (JSON)
+_RECORD = struct.Struct('>II')
+_SEGMENT_SUFFIX = '.log'
+# Records the database rejects for good are kept here, one JSON line each, in the log's directory
+DEAD_LETTER_FILE = 'dead-letter.jsonl'
+# Errors a record fails with however often it is retried. Anything else (a locked or
+# unreachable database) leaves it in the log, to be applied once the database recovers.
+_REJECTED = (IntegrityError, DataError, ValueError, KeyError, TypeError)
+
+
+class IngestLog:
+    """
+    Append-only, fsync'd log of ingested records, in segment files.
+
+    Appends are written straight to the current segment and then wait for a
+    group commit: a flusher thread calls fdatasync once for everything written
+    since the last one, after `commit_ms` milliseconds or as soon as
+    `commit_batch` records are waiting, whichever comes first. Many concurrent
+    writers therefore share each fsync, and append() returning means the
+    records survive a crash.
+
+    Positions are byte offsets across the whole log; each segment is named after
+    the position of its first record, and a new one is started once the current
+    one passes `segment_bytes`. Segments are read back through mmap. On opening,
+    a torn record at the end of the last segment (from a crash mid-write) is cut
+    off.
+
+    Only one process may write a log directory; see claim_slot().
+    """
+
+    def __init__(self, directory: str, segment_bytes: Optional[int] = None, commit_ms: Optional[float] = None,
+                 commit_batch: Optional[int] = None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes or settings.INGEST_LOG_SEGMENT_BYTES
+        self.commit_seconds = (settings.INGEST_LOG_COMMIT_MS if commit_ms is None else commit_ms) / 1000.0
+        self.commit_batch = commit_batch or settings.INGEST_LOG_COMMIT_BATCH
+        os.makedirs(directory, exist_ok=True)
+        self.id = self._log_id()
+        self._condition = threading.Condition()
+        # Serialises fdatasync with segment rotation, which closes the file being synced
+        self._sync_lock = threading.Lock()
+        self._waiting = 0
+        self._first_waiting_at = 0.0
+        self._closing = False
+        self.stats = {"appended": 0, "commits": 0, "segments": 0}
+
+        segments = self.segments()
+        if segments:
+            self._start = segments[-1]
+            self._size = self._recover(self._segment_path(self._start))
+        else:
+            self._start, self._size = 0, 0
+        self._fd = os.open(self._segment_path(self._start), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._sync_directory()
+        self.written = self.durable = self._start + self._size
+        self._flusher = threading.Thread(target=self._flush_loop, name='ingest-log-flush', daemon=True)
+        self._flusher.start()
+
+    def _log_id(self) -> str:
+        """Random id naming this log for good, so a log directory that is wiped and recreated starts afresh"""
+        path = os.path.join(self.directory, 'log-id')
+        if not os.path.exists(path):
+            with open(path + '.tmp', 'w') as file:
+                file.write(uuid.uuid4().hex)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(path + '.tmp', path)
+        with open(path) as file:
+            return file.read().strip()
+
+    def _segment_path(self, start: int) -> str:
+        return os.path.join(self.directory, f'{start:020d}{_SEGMENT_SUFFIX}')
+
+    def segments(self) -> List[int]:
+        """Start positions of the segments on disk, oldest first"""
+        return sorted(int(name[:-len(_SEGMENT_SUFFIX)]) for name in os.listdir(self.directory)
+                      if name.endswith(_SEGMENT_SUFFIX))
+
+    def _sync_directory(self) -> None:
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _recover(self, path: str) -> int:
+        """Length of the intact records at the start of a segment, cutting off anything after them"""
+        size = os.path.getsize(path)
+        valid = 0
+        if size:
+            with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for _, end in _scan(data, 0, size):
+                    valid = end
+        if valid < size:
+            logger.warning('Cutting %d bytes of torn records off %s', size - valid, path)
+            os.truncate(path, valid)
+        return valid
+
+    def append(self, records: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """Log (kind, data) records, returning the log position after them once they are on disk"""
+        payloads = [json.dumps({"k": kind, "d": data}, default=str, separators=(',', ':')).encode()
+                    for kind, data in records]
+        encoded = b''.join(_RECORD.pack(len(payload), zlib.crc32(payload)) + payload for payload in payloads)
+        if not encoded:
+            return self.durable
+        with self._condition:
+            if self._size and self._size + len(encoded) > self.segment_bytes:
+                self._rotate()
+            view = memoryview(encoded)
+            while view:
+                view = view[os.write(self._fd, view):]
+            self._size += len(encoded)
+            self.written += len(encoded)
+            end = self.written
+            if not self._waiting:
+                self._first_waiting_at = time.monotonic()
+            self._waiting += len(payloads)
+            self.stats["appended"] += len(payloads)
+            self._condition.notify_all()
+            while self.durable < end:
+                self._condition.wait()
+        return end
+
+    def _rotate(self) -> None:
+        """Finish the current segment and start the next; called holding the condition"""
+        with self._sync_lock:
+            os.fdatasync(self._fd)
+            os.close(self._fd)
+            self._start += self._size
+            self._size = 0
+            self._fd = os.open(self._segment_path(self._start), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._sync_directory()
+        self.durable = self.written
+        self.stats["segments"] += 1
+        self._condition.notify_all()
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._condition:
+                while self.durable == self.written and not self._closing:
+                    self._condition.wait()
+                if self.durable == self.written:
+                    return
+                # Let more writers join this commit, up to the batch size or the commit interval
+                deadline = self._first_waiting_at + self.commit_seconds
+                while self._waiting < self.commit_batch and not self._closing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                target = self.written
+                self._waiting = 0
+            with self._sync_lock:
+                # Earlier segments were synced when they were rotated out
+                os.fdatasync(self._fd)
+            with self._condition:
+                self.durable = max(self.durable, target)
+                self.stats["commits"] += 1
+                self._condition.notify_all()
+
+    def read(self, position: int, limit: int) -> Tuple[List[Tuple[str, Dict[str, Any]]], int]:
+        """Up to `limit` committed records from `position` on, and the position after them"""
+        records: List[Tuple[str, Dict[str, Any]]] = []
+        durable = self.durable
+        for start in self.segments():
+            path = self._segment_path(start)
+            size = min(os.path.getsize(path), durable - start)
+            if start + size <= position or size <= 0:
+                continue
+            if start > position:
+                # The records in between were discarded; nothing left to read there
+                position = start
+            with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                for payload, end in _scan(data, position - start, size):
+                    record = json.loads(payload)
+                    records.append((record["k"], record["d"]))
+                    position = start + end
+                    if len(records) == limit:
+                        return records, position
+        return records, position
+
+    def discard(self, position: int) -> int:
+        """Delete segments that end at or before `position`, except the current one"""
+        segments = self.segments()
+        removed = 0
+        for start, following in zip(segments, segments[1:]):
+            if following <= position and start != self._start:
+                os.unlink(self._segment_path(start))
+                removed += 1
+        return removed
+
+    def close(self) -> None:
+        with self._condition:
+            self._closing = True
+            self._condition.notify_all()
+        self._flusher.join()
+        os.close(self._fd)
+
+
+def _scan(data, offset: int, end: int):
+    """(payload, end offset) of each intact record in data[offset:end]"""
+    while offset + _RECORD.size <= end:
+        length, crc = _RECORD.unpack_from(data, offset)
+        stop = offset + _RECORD.size + length
+        if stop > end:
+            return
+        payload = data[offset + _RECORD.size:stop]
+        if zlib.crc32(payload) != crc:
+            return
+        yield payload, stop
+        offset = stop
+
+
+def claim_slot(root: Optional[str] = None, only_free: bool = False) -> Optional[Tuple[str, int]]:
+    """
+    Lock a log directory under `root` for this process: (name, lock fd)
+
+    Slots are tried in order and the first one no other process holds is
+    taken, creating a new one if all are busy; a process that restarts after a
+    crash takes its old slot back and so recovers its log. The lock goes with
+    the process. With `only_free`, only existing slots are tried, and None is
+    returned when none is free.
+    """
+    root = root or settings.INGEST_LOG_DIR
+    os.makedirs(root, exist_ok=True)
+    existing = sorted(int(name[5:]) for name in os.listdir(root) if name.startswith('slot-') and name[5:].isdigit())
+    candidates = existing if only_free else range(max(existing, default=-1) + 2)
+    for index in candidates:
+        directory = os.path.join(root, f'slot-{index}')
+        os.makedirs(directory, exist_ok=True)
+        fd = os.open(os.path.join(directory, 'lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            continue
+        return directory, fd
+    return None
+
+
+def release_slot(fd: int) -> None:
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def reading_record(data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Log record for a posted sensor reading, raising ValueError if it could never be applied"""
+    sensor_id, sensor_type, value = data.get("sensorId"), data.get("type"), data.get("value")
+    if not isinstance(sensor_id, str) or not 0 < len(sensor_id) <= 32:
+        raise ValueError("Each reading needs a 'sensorId' of up to 32 characters")
+    if not isinstance(sensor_type, str) or not 0 < len(sensor_type) <= 16:
+        raise ValueError("Each reading needs a 'type' of up to 16 characters")
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        raise ValueError("Each reading needs a numeric 'value'")
+    record = {"sensorId": sensor_id, "type": sensor_type, "value": float(value)}
+    if data.get("recordedAt") is not None:
+        if not isinstance(data["recordedAt"], str) or parse_datetime(data["recordedAt"]) is None:
+            raise ValueError("'recordedAt' must be an ISO 8601 timestamp")
+        record["recordedAt"] = data["recordedAt"]
+    return READING, record
+
+
+def alert_record(data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    """Log record for a posted alert, raising ValueError if it could never be applied"""
+    record = {}
+    for key, limit, required in (("title", 200, True), ("location", 200, True), ("icon", 32, False),
+                                 ("priority", 16, False), ("description", None, False), ("sensorId", 32, False)):
+        value = data.get(key)
+        if value is None and not required:
+            continue
+        if not isinstance(value, str) or not value or (limit and len(value) > limit):
+            raise ValueError(f"Alert '{key}' must be text" + (f" of up to {limit} characters" if limit else ""))
+        record[key] = value
+    if data.get("source") is not None:
+        if data["source"] not in SOURCES:
+            raise ValueError(f"Alert 'source' must be one of {', '.join(SOURCES)}")
+        record["source"] = data["source"]
+    if record.get("priority", "Medium") not in Alert.PRIORITY_COLORS:
+        raise ValueError(f"Alert 'priority' must be one of {', '.join(Alert.PRIORITY_COLORS)}")
+    record["createdAt"] = data.get("createdAt") or datetime.now(dt_timezone.utc).isoformat()
+    if not isinstance(record["createdAt"], str) or parse_datetime(record["createdAt"]) is None:
+        raise ValueError("'createdAt' must be an ISO 8601 timestamp")
+    return ALERT, record
+
+
+def _parse_time(value: Optional[str]) -> datetime:
+    parsed = parse_datetime(value) if value else None
+    if parsed is None:
+        return datetime.now(dt_timezone.utc)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=dt_timezone.utc)
+
+
+def _apply(records: List[Tuple[str, Dict[str, Any]]]) -> None:
+    """Write a batch of logged records to their tables"""
+    readings = [
+        SensorReading(sensor_id=data["sensorId"], sensor_type=data["type"], value=data["value"],
+                      recorded_at=_parse_time(data.get("recordedAt")))
+        for kind, data in records if kind == READING
+    ]
+    SensorReading.objects.bulk_create(readings, batch_size=500)
+    for kind, data in records:
+        if kind == ALERT:
+            # Saved one by one: Alert.save() resolves the zone and sets the escalation deadline,
+            # and creation is announced on the event bus
+            Alert(
+                title=data["title"],
+                location=data["location"],
+                priority=data.get("priority", "Medium"),
+                description=data.get("description", ""),
+                icon=data.get("icon", "warning"),
+                source=data.get("source", ""),
+                sensor_id=data.get("sensorId", ""),
+                created_at=_parse_time(data.get("createdAt")),
+            ).save()
+
+
+class LogApplier:
+    """
+    Bulk-loads committed log records into the database in the background.
+
+    Each batch of up to `batch_size` records goes in with one transaction that
+    also moves the log's IngestCheckpoint, so a crash at any point leaves every
+    record either applied once or still waiting. Fully applied segments are
+    deleted. While the database is busy (OperationalError, such as SQLite's
+    "database is locked") a batch is retried with backoff for up to
+    `retry_seconds`, then left where it is for the next pass: those records
+    were acknowledged, so they are never dropped. A batch the database rejects
+    outright is retried record by record; records that fail with one of
+    `_REJECTED` are written to DEAD_LETTER_FILE and skipped, so one bad record
+    cannot stall the log.
+
+    Alert rules are not run here but by RuleRunner, which sees the readings
+    of every worker's log once they are in the table.
+    """
+
+    def __init__(self, log: IngestLog, batch_size: Optional[int] = None, interval: Optional[float] = None,
+                 retry_seconds: Optional[float] = None):
+        self.log = log
+        self.name = f'{socket.gethostname()}:{os.path.basename(log.directory)}:{log.id}'
+        self.batch_size = batch_size or settings.INGEST_APPLY_BATCH
+        self.interval = settings.INGEST_APPLY_INTERVAL if interval is None else interval
+        self.retry_seconds = settings.INGEST_APPLY_RETRY_SECONDS if retry_seconds is None else retry_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"applied": 0, "batches": 0, "retries": 0, "deadLettered": 0}
+
+    @property
+    def position(self) -> int:
+        return (IngestCheckpoint.objects.filter(name=self.name).values_list('position', flat=True).first() or 0)
+
+    def apply_pending(self) -> int:
+        """
+        Apply every committed record not yet applied; returns how many were
+
+        Raises OperationalError, with the checkpoint unmoved, when the database
+        stays unavailable for longer than `retry_seconds`.
+        """
+        applied = 0
+        position = self.position
+        while True:
+            records, end = self.log.read(position, self.batch_size)
+            if end == position:
+                break
+            self._apply_batch(records, end)
+            applied += len(records)
+            self.stats["applied"] += len(records)
+            self.stats["batches"] += 1
+            position = end
+            self.log.discard(position)
+        return applied
+
+    def _apply_batch(self, records: List[Tuple[str, Dict[str, Any]]], end: int) -> None:
+        """Apply a batch and move the checkpoint to `end`, retrying while the database is busy"""
+        delay = 0.05
+        deadline = time.monotonic() + self.retry_seconds
+        while True:
+            try:
+                try:
+                    with transaction.atomic():
+                        _apply(records)
+                        IngestCheckpoint.objects.update_or_create(name=self.name, defaults={"position": end})
+                    return
+                except OperationalError:
+                    raise
+                except Exception:
+                    logger.exception('Applying ingestion log batch failed; retrying record by record')
+                    self._apply_one_by_one(records, end)
+                    return
+            except OperationalError:
+                if time.monotonic() + delay > deadline or self._stop.is_set():
+                    raise
+                logger.warning('Database unavailable applying ingestion log; retrying in %.2fs', delay)
+                self.stats["retries"] += 1
+                self._stop.wait(delay)
+                delay = min(delay * 2, 5.0)
+
+    def _apply_one_by_one(self, records: List[Tuple[str, Dict[str, Any]]], end: int) -> None:
+        rejected = []
+        with transaction.atomic():
+            for record in records:
+                try:
+                    with transaction.atomic():
+                        _apply([record])
+                except _REJECTED as e:
+                    logger.exception('Dead-lettering unusable %s record: %r', *record)
+                    rejected.append((record, e))
+            IngestCheckpoint.objects.update_or_create(name=self.name, defaults={"position": end})
+        # Only once committed: a rolled-back pass will reject the same records again
+        self._dead_letter(rejected)
+
+    def _dead_letter(self, rejected: List[Tuple[Tuple[str, Dict[str, Any]], Exception]]) -> None:
+        if not rejected:
+            return
+        failed_at = datetime.now(dt_timezone.utc).isoformat()
+        with open(os.path.join(self.log.directory, DEAD_LETTER_FILE), 'a') as file:
+            for (kind, data), error in rejected:
+                file.write(json.dumps({"kind": kind, "data": data, "error": repr(error), "failedAt": failed_at},
+                                      separators=(',', ':'), default=str) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        self.stats["deadLettered"] += len(rejected)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name='ingest-log-apply', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        recovered = False
+        try:
+            while not self._stop.is_set():
+                try:
+                    if not recovered:
+                        recover_orphans(os.path.dirname(self.log.directory))
+                        recovered = True
+                    if not self.apply_pending():
+                        self._stop.wait(self.interval)
+                except Exception:
+                    # Nothing is lost: the checkpoint only moves with applied records
+                    logger.exception('Ingestion log applier failed')
+                    self._stop.wait(1.0)
+            # Apply what was committed before stopping; anything left is applied on restart
+            try:
+                self.apply_pending()
+            except OperationalError:
+                logger.exception('Database unavailable; leaving the rest of the ingestion log for restart')
+        finally:
+            connection.close()
+
+
+def recover_orphans(root: Optional[str] = None) -> int:
+    """
+    Apply the logs of slots no running process holds, such as those left by a crash
+
+    Returns the number of records applied.
+    """
+    applied = 0
+    claimed = []
+    try:
+        # A slot already claimed is locked, even against this process, so this ends
+        while True:
+            slot = claim_slot(root, only_free=True)
+            if slot is None:
+                break
+            claimed.append(slot)
+        for directory, _ in claimed:
+            if not any(name.endswith(_SEGMENT_SUFFIX) for name in os.listdir(directory)):
+                continue
+            log = IngestLog(directory)
+            try:
+                applied += LogApplier(log).apply_pending()
+            finally:
+                log.close()
+    finally:
+        for _, fd in claimed:
+            release_slot(fd)
+    return applied
+
+
+class IngestService:
+    """This process's ingestion log and its applier"""
+
+    def __init__(self, root: Optional[str] = None):
+        directory, self._lock_fd = claim_slot(root)
+        self.log = IngestLog(directory)
+        self.applier = LogApplier(self.log)
+        self.applier.start()
+
+    def append(self, records: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        return self.log.append(records)
+
+    def status(self) -> Dict[str, Any]:
+        applied = self.applier.position
+        return {
+            "slot": self.applier.name,
+            "position": self.log.durable,
+            "applied": applied,
+            "lagBytes": self.log.durable - applied,
+            "segments": len(self.log.segments()),
+            "appended": self.log.stats["appended"],
+            "commits": self.log.stats["commits"],
+        }
+
+    def close(self) -> None:
+        self.applier.stop()
+        self.log.close()
+        release_slot(self._lock_fd)
+
+
+_service: Optional[IngestService] = None
+_service_lock = threading.Lock()
+
+
+def get_ingest_service() -> IngestService:
+    """The process-wide ingestion log, claiming a slot on first call"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = IngestService()
+    return _service
+
+
+def _reset_after_fork() -> None:
+    # The slot lock is shared with the parent; the child must claim its own
+    global _service, _service_lock
+    if _service is not None:
+        os.close(_service._lock_fd)
+    _service = None
+    _service_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,106 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# (kind, key, value): ("item", key, element) as each element of a top-level array
+# completes, ("field", key, value) as each top-level field completes
+Event = Tuple[str, str, Any]
+
+
+class JsonObjectStream:
+    """
+    Incremental parser for one JSON object arriving in arbitrary text chunks.
+
+    Model responses are streamed a few characters at a time, so fields are
+    reported as soon as they are complete instead of after the closing brace:
+    `risk_level` as soon as its string ends, and each entry of `observations`
+    or `recommendations` as soon as the next comma is seen. Anything before the
+    opening brace (such as a ```json fence) is skipped.
+
+    Only the top level is tracked: the scanner counts nesting depth outside
+    strings and hands each complete value to json.loads, so every character is
+    looked at once.
+    """
+
+    def __init__(self):
+        self.result: Dict[str, Any] = {}
+        self.done = False
+        self._buffer = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key: Optional[str] = None
+        self._key_start: Optional[int] = None
+        self._value_start: Optional[int] = None
+        self._items: Optional[List[Any]] = None
+        self._item_start: Optional[int] = None
+
+    def feed(self, text: str) -> List[Event]:
+        """Add a chunk of text, returning the events it completes"""
+        if self.done:
+            return []
+        self._buffer += text
+        events: List[Event] = []
+        buffer = self._buffer
+        for index in range(self._pos, len(buffer)):
+            char = buffer[index]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if self._depth == 0:
+                if char == '{':
+                    self._depth = 1
+                    self._key_start = index + 1
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+                if (self._depth == 2 and char == '[' and self._value_start is not None
+                        and not buffer[self._value_start:index].strip()):
+                    self._items = []
+                    self._item_start = index + 1
+            elif char in '}]':
+                if self._depth == 2 and self._items is not None:
+                    self._item(buffer, index, events)
+                    self._items = None
+                elif self._depth == 1:
+                    self._field(buffer, index, events)
+                    self.done = True
+                    self._depth = 0
+                    break
+                self._depth -= 1
+            elif char == ':' and self._depth == 1 and self._key_start is not None:
+                self._key = json.loads(buffer[self._key_start:index])
+                self._key_start = None
+                self._value_start = index + 1
+            elif char == ',':
+                if self._depth == 1:
+                    self._field(buffer, index, events)
+                    self._key_start = index + 1
+                elif self._depth == 2 and self._items is not None:
+                    self._item(buffer, index, events)
+                    self._item_start = index + 1
+        self._pos = len(buffer)
+        return events
+
+    def _field(self, buffer: str, end: int, events: List[Event]) -> None:
+        if self._key is None:
+            return
+        value = json.loads(buffer[self._value_start:end])
+        self.result[self._key] = value
+        events.append(("field", self._key, value))
+        self._key = None
+        self._value_start = None
+
+    def _item(self, buffer: str, end: int, events: List[Event]) -> None:
+        text = buffer[self._item_start:end].strip()
+        if text:
+            value = json.loads(text)
+            self._items.append(value)
+            events.append(("item", self._key, value))
@@ -0,0 +1,336 @@
+import asyncio
+import json
+import math
+import ssl
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+
+# Sent with every generated request; the traffic recorder leaves these out
+USER_AGENT = 'surveillance-load-generator'
+
+READINGS_PATH = '/api/ingest/readings'
+ALERTS_PATH = '/api/ingest/alerts'
+
+# Sensor kinds: id prefix, and the level, activity swing and noise of their readings
+SENSOR_KINDS = {
+    'video': ('VID', 0.05, 0.55, 0.04),   # motion score, 0-1
+    'audio': ('AUD', 38.0, 24.0, 2.0),    # sound level, dB
+    'iot': ('IOT', 20.5, 2.5, 0.15),      # temperature, degrees C
+}
+
+# How much an incident raises each kind's readings while it lasts
+INCIDENT_EFFECT = {'video': 0.45, 'audio': 28.0, 'iot': 1.5}
+
+INCIDENT_TITLES = ('Unusual Activity Detected', 'Loud Noise Detected', 'Crowd Forming', 'Perimeter Breach')
+
+
+def activity(hour: np.ndarray) -> np.ndarray:
+    """Share of peak activity at each hour of day: quiet at night, a morning rise, a midday peak, an evening tail"""
+    morning = np.exp(-((hour - 9.0) / 2.0) ** 2) * 0.6
+    midday = np.exp(-((hour - 13.5) / 3.5) ** 2)
+    evening = np.exp(-((hour - 18.5) / 2.0) ** 2) * 0.5
+    return np.clip(0.05 + morning + midday + evening, 0.0, 1.0)
+
+
+class TrafficSimulator:
+    """
+    Synthetic traffic from a fleet of video, audio and IoT sensors.
+
+    Every sensor reports once per `interval` seconds at its own phase within
+    the interval. Readings follow the time of day (busy around midday, quiet at
+    night), with a per-sensor gain and Gaussian noise, plus a slow daily
+    temperature swing for IoT sensors. Incidents arrive as a Poisson process:
+    each raises the readings of every sensor in one location for a few minutes
+    and posts an alert there when it starts.
+
+    requests() yields (timestamp, method, path, body) in timestamp order,
+    grouping up to `batch` readings per request, as a gateway would.
+    """
+
+    def __init__(self, sensors: Dict[str, int], locations: Sequence[str], interval: float = 10.0,
+                 incidents_per_hour: float = 2.0, batch: int = 1, seed: int = 0):
+        self.interval = interval
+        self.incidents_per_hour = incidents_per_hour
+        self.batch = max(1, batch)
+        self.locations = list(locations)
+        self._rng = np.random.default_rng(seed)
+
+        kinds, ids = [], []
+        for kind, count in sensors.items():
+            prefix = SENSOR_KINDS[kind][0]
+            kinds += [kind] * count
+            ids += [f'{prefix}-{index:05d}' for index in range(1, count + 1)]
+        self.kinds = np.array(kinds)
+        self.ids = ids
+        count = len(ids)
+        self._level = np.array([SENSOR_KINDS[kind][1] for kind in kinds])
+        self._swing = np.array([SENSOR_KINDS[kind][2] for kind in kinds]) * self._rng.uniform(0.6, 1.4, count)
+        self._noise = np.array([SENSOR_KINDS[kind][3] for kind in kinds])
+        self._effect = np.array([INCIDENT_EFFECT[kind] for kind in kinds])
+        self._location = self._rng.integers(0, len(self.locations), count)
+        self._phase = self._rng.uniform(0, interval, count)
+        # Sensors in the order they report within each interval
+        self._order = np.argsort(self._phase)
+
+    def _incidents(self, start: float, duration: float) -> List[Tuple[float, float, int]]:
+        """(start, end, location) of each incident in the window"""
+        incidents = []
+        rate = self.incidents_per_hour / 3600.0
+        at = start
+        while rate > 0:
+            at += self._rng.exponential(1 / rate)
+            if at >= start + duration:
+                break
+            incidents.append((at, at + self._rng.uniform(60, 300), int(self._rng.integers(len(self.locations)))))
+        return incidents
+
+    def requests(self, start: float, duration: float) -> Iterator[Tuple[float, str, str, Dict[str, Any]]]:
+        incidents = self._incidents(start, duration)
+        alerts = iter(incidents)
+        next_alert = next(alerts, None)
+        offsets = self._phase[self._order]
+        sensors = self._order
+        for tick in np.arange(start, start + duration, self.interval):
+            times = tick + offsets
+            # Hour of day (UTC) in the middle of the tick
+            hour = ((tick + self.interval / 2) % 86400) / 3600
+            values = self._level[sensors] + self._swing[sensors] * activity(np.array(hour))
+            iot = self.kinds[sensors] == 'iot'
+            # Temperature also follows the sun, warmest mid-afternoon
+            values[iot] += 1.5 * math.sin(2 * math.pi * (hour - 9) / 24)
+            values += self._rng.normal(0, self._noise[sensors])
+            for began, ended, location in incidents:
+                if began < tick + self.interval and ended > tick:
+                    affected = (self._location[sensors] == location) & (times >= began) & (times < ended)
+                    values[affected] += self._effect[sensors][affected]
+            video = self.kinds[sensors] == 'video'
+            values[video] = np.clip(values[video], 0, 1)
+
+            pending: List[Dict[str, Any]] = []
+            for at, sensor, value in zip(times, sensors, values):
+                while next_alert is not None and next_alert[0] <= at:
+                    yield self._alert(*next_alert)
+                    next_alert = next(alerts, None)
+                pending.append({
+                    "sensorId": self.ids[sensor],
+                    "type": self.kinds[sensor],
+                    "value": round(float(value), 3),
+                    "recordedAt": datetime.fromtimestamp(at, dt_timezone.utc).isoformat(),
+                })
+                if len(pending) == self.batch:
+                    yield float(at), 'POST', READINGS_PATH, {"readings": pending}
+                    pending = []
+            if pending:
+                yield float(times[-1]), 'POST', READINGS_PATH, {"readings": pending}
+        while next_alert is not None:
+            yield self._alert(*next_alert)
+            next_alert = next(alerts, None)
+
+    def _alert(self, began: float, ended: float, location: int) -> Tuple[float, str, str, Dict[str, Any]]:
+        minutes = (ended - began) / 60
+        return began, 'POST', ALERTS_PATH, {"alerts": [{
+            "title": INCIDENT_TITLES[int(self._rng.integers(len(INCIDENT_TITLES)))],
+            "location": self.locations[location],
+            "priority": 'High' if minutes > 3 else 'Medium',
+            "description": f'Simulated incident lasting {minutes:.0f} minutes',
+            "createdAt": datetime.fromtimestamp(began, dt_timezone.utc).isoformat(),
+        }]}
+
+
+def write_traffic(path: str, requests: Iterable[Tuple[float, str, str, Dict[str, Any]]]) -> int:
+    """Save requests as JSON lines, one {ts, method, path, body} per line"""
+    written = 0
+    with open(path, 'w') as file:
+        for ts, method, target, body in requests:
+            file.write(json.dumps({"ts": ts, "method": method, "path": target, "body": body},
+                                  separators=(',', ':')) + '\n')
+            written += 1
+    return written
+
+
+def read_traffic(path: str) -> Iterator[Tuple[float, str, str, Dict[str, Any]]]:
+    with open(path) as file:
+        for line in file:
+            if line.strip():
+                record = json.loads(line)
+                yield record["ts"], record["method"], record["path"], record.get("body")
+
+
+class _Connection:
+    """One keep-alive HTTP/1.1 connection"""
+
+    def __init__(self, host: str, port: int, tls: bool, headers: Dict[str, str]):
+        self.host = host
+        self.port = port
+        self.tls = tls
+        self.headers = headers
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.opened = 0
+
+    async def _open(self) -> None:
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port, ssl=ssl.create_default_context() if self.tls else None
+        )
+        self.opened += 1
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, body: Optional[bytes]) -> Tuple[int, bytes]:
+        reused = self.writer is not None
+        if not reused:
+            await self._open()
+        try:
+            return await self._exchange(method, path, body)
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            self.close()
+            # A kept-alive connection the server had already closed: nothing was processed, so send again
+            if reused and not getattr(e, 'partial', b''):
+                await self._open()
+                return await self._exchange(method, path, body)
+            raise
+
+    async def _exchange(self, method: str, path: str, body: Optional[bytes]) -> Tuple[int, bytes]:
+        head = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', 'Connection: keep-alive',
+                f'User-Agent: {USER_AGENT}']
+        head += [f'{name}: {value}' for name, value in self.headers.items()]
+        if body is not None:
+            head += ['Content-Type: application/json', f'Content-Length: {len(body)}']
+        self.writer.write(('\r\n'.join(head) + '\r\n\r\n').encode() + (body or b''))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(b'', None)
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'content-length' in headers:
+            data = await self.reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+                chunks.append(chunk[:-2])
+            data = b''.join(chunks)
+        else:
+            data = await self.reader.read()
+            headers['connection'] = 'close'
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, data
+
+
+class TrafficReplayer:
+    """
+    Sends recorded or simulated requests to a server on their original schedule, `speed` times faster.
+
+    Open loop: each request is due at its scheduled time whether or not earlier
+    ones have finished, and its latency is measured from when it was due, so a
+    server that falls behind shows it in the latencies instead of quietly being
+    sent less. Requests go over a pool of `connections` keep-alive connections.
+    """
+
+    def __init__(self, target: str, speed: float = 1.0, connections: int = 32,
+                 headers: Optional[Dict[str, str]] = None, timeout: float = 30.0):
+        url = urlsplit(target)
+        self.base_path = url.path.rstrip('/')
+        self.speed = speed
+        self.timeout = timeout
+        tls = url.scheme == 'https'
+        self._connections = [
+            _Connection(url.hostname, url.port or (443 if tls else 80), tls, headers or {})
+            for _ in range(connections)
+        ]
+        self.latencies: List[float] = []
+        self.statuses: Dict[Any, int] = {}
+        self.max_lag = 0.0
+
+    async def run(self, requests: Iterable[Tuple[float, str, str, Dict[str, Any]]],
+                  limit: Optional[int] = None) -> Dict[str, Any]:
+        idle: asyncio.Queue = asyncio.Queue()
+        for connection in self._connections:
+            idle.put_nowait(connection)
+        # Bounds the requests waiting for a connection, so a slow server can't grow them forever
+        backlog = asyncio.Semaphore(len(self._connections) * 64)
+        tasks = set()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        first = None
+        sent = 0
+        for ts, method, path, body in requests:
+            if limit is not None and sent >= limit:
+                break
+            first = ts if first is None else first
+            due = started + (ts - first) / self.speed
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await backlog.acquire()
+            task = asyncio.ensure_future(self._send(idle, backlog, due, method, path, body))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            sent += 1
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = loop.time() - started
+        for connection in self._connections:
+            connection.close()
+        return self.summary(sent, elapsed)
+
+    async def _send(self, idle: asyncio.Queue, backlog: asyncio.Semaphore, due: float, method: str, path: str,
+                    body: Optional[Dict[str, Any]]) -> None:
+        loop = asyncio.get_running_loop()
+        connection = await idle.get()
+        self.max_lag = max(self.max_lag, loop.time() - due)
+        try:
+            payload = json.dumps(body, separators=(',', ':')).encode() if body is not None else None
+            status, _ = await asyncio.wait_for(connection.request(method, self.base_path + path, payload),
+                                               self.timeout)
+        except Exception as e:
+            connection.close()
+            status = type(e).__name__
+        finally:
+            idle.put_nowait(connection)
+            backlog.release()
+        self.latencies.append(loop.time() - due)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def summary(self, sent: int, elapsed: float) -> Dict[str, Any]:
+        latencies = np.array(self.latencies or [0.0]) * 1000
+        return {
+            "sent": sent,
+            "seconds": elapsed,
+            "rps": sent / elapsed if elapsed else 0.0,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "max_ms": float(latencies.max()),
+            "max_lag_ms": self.max_lag * 1000,
+            "statuses": dict(sorted(self.statuses.items(), key=str)),
+            "connections_opened": sum(connection.opened for connection in self._connections),
+        }
+
+
+def parse_start(value: Optional[str]) -> float:
+    """Simulation start as a timestamp: an ISO 8601 time, or the start of today (UTC) by default"""
+    if value:
+        parsed = datetime.fromisoformat(value)
+        return (parsed if parsed.tzinfo else parsed.replace(tzinfo=dt_timezone.utc)).timestamp()
+    now = datetime.now(dt_timezone.utc)
+    return (now - timedelta(hours=now.hour, minutes=now.minute, seconds=now.second,
+                            microseconds=now.microsecond)).timestamp()
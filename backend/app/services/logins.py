@@ -0,0 +1,97 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+
+
+class LoginOverloaded(Exception):
+    """Raised when every password-check slot is busy and the queue for them is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__('Too many logins in progress, try again shortly')
+        self.retry_after = retry_after
+
+
+class LoginGate:
+    """
+    Keeps password hashing from crowding out every other request.
+
+    Django's authenticate() hashes the password with PBKDF2 at several hundred
+    thousand iterations: a large fraction of a second of CPU per login. At
+    shift change hundreds of operators log in together, and unbounded, every
+    request worker ends up hashing while the dashboard's other endpoints wait
+    for CPU.
+
+    Here at most `max_concurrent` checks run at once, on the gate's own
+    threads (hashlib releases the GIL, so they use that many cores and no
+    more), `queue_size` more wait up to `queue_timeout` seconds for a slot,
+    and anything beyond that raises LoginOverloaded so the login view can
+    answer 503 with a Retry-After at once instead of tying up a worker.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None, queue_size: Optional[int] = None,
+                 queue_timeout: Optional[float] = None):
+        self.max_concurrent = max_concurrent or settings.LOGIN_MAX_CONCURRENT
+        self.queue_size = settings.LOGIN_QUEUE_SIZE if queue_size is None else queue_size
+        self.queue_timeout = settings.LOGIN_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self.retry_after = max(1, math.ceil(self.queue_timeout))
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._executor = ThreadPoolExecutor(self.max_concurrent, thread_name_prefix='login')
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self.stats = {"checks": 0, "succeeded": 0, "overloaded": 0, "seconds": 0.0}
+
+    def _admit(self) -> bool:
+        """Take a check slot, waiting in the queue if there is room in it"""
+        if self._slots.acquire(blocking=False):
+            return True
+        with self._lock:
+            queued = self._waiting < self.queue_size
+            if queued:
+                self._waiting += 1
+        if not queued:
+            return False
+        try:
+            return self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def _check(self, request, username: str, password: str):
+        started = time.monotonic()
+        try:
+            return authenticate(request, username=username, password=password)
+        finally:
+            self._slots.release()
+            with self._lock:
+                self.stats["seconds"] += time.monotonic() - started
+
+    def authenticate(self, request, username: str, password: str):
+        """The user these credentials belong to, or None; raises LoginOverloaded when full"""
+        if not self._admit():
+            with self._lock:
+                self.stats["overloaded"] += 1
+            raise LoginOverloaded(self.retry_after)
+        try:
+            future = self._executor.submit(self._check, request, username, password)
+        except BaseException:
+            self._slots.release()
+            raise
+        user = future.result()
+        with self._lock:
+            self.stats["checks"] += 1
+            self.stats["succeeded"] += user is not None
+        return user
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            checks = self.stats["checks"]
+            return dict(self.stats, seconds=round(self.stats["seconds"], 3), waiting=self._waiting,
+                        mean_ms=round(self.stats["seconds"] * 1000 / checks, 1) if checks else None)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
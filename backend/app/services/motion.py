@@ -0,0 +1,232 @@
+import multiprocessing
+import os
+import queue
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Avg
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from ..models import SensorReading
+from .frames import FrameRing
+
+
+# Motion scores are stored as sensor readings of this type, one series per camera
+MOTION_SENSOR_TYPE = 'motion'
+
+# ITU-R BT.601 luma weights
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+# (camera, unix timestamp, mean motion score)
+Sample = Tuple[str, float, float]
+
+
+class MotionDetector:
+    """
+    Background-subtraction motion scoring for one camera.
+
+    Frames are reduced to grayscale at 1/downscale resolution and compared with a
+    running-average background; the score is the percentage of pixels that
+    differ from it by more than `threshold` grey levels. Everything is a handful
+    of vectorized NumPy operations on preallocated buffers.
+    """
+
+    def __init__(self, downscale: Optional[int] = None, threshold: Optional[float] = None,
+                 alpha: Optional[float] = None):
+        self.downscale = downscale or settings.MOTION_DOWNSCALE
+        self.threshold = settings.MOTION_THRESHOLD if threshold is None else threshold
+        self.alpha = settings.MOTION_BACKGROUND_ALPHA if alpha is None else alpha
+        self._background: Optional[np.ndarray] = None
+        self._gray: Optional[np.ndarray] = None
+        self._diff: Optional[np.ndarray] = None
+
+    def update(self, pixels: np.ndarray) -> float:
+        """Score one (height, width, 3) frame against the background, then fold it in"""
+        small = pixels[::self.downscale, ::self.downscale]
+        if self._background is None or self._background.shape != small.shape[:2]:
+            self._background = np.dot(small, _LUMA).astype(np.float32)
+            self._gray = np.empty_like(self._background)
+            self._diff = np.empty_like(self._background)
+            return 0.0
+
+        np.dot(small, _LUMA, out=self._gray)
+        np.subtract(self._gray, self._background, out=self._diff)
+        self._background += self.alpha * self._diff
+        np.abs(self._diff, out=self._diff)
+        return float(np.count_nonzero(self._diff > self.threshold)) * 100.0 / self._diff.size
+
+
+def _detect(index: int, shard: Sequence[str], sample_seconds: float, results, processed, stop,
+            benchmark: bool) -> None:
+    """
+    Worker process: score new frames for a shard of cameras
+
+    Frames are read in place from the cameras' shared-memory rings. Scores are
+    averaged per camera over `sample_seconds` and sent back as a few small tuples.
+    In benchmark mode every frame in the ring is scored over and over, new or not.
+    """
+    detectors = {camera: MotionDetector() for camera in shard}
+    rings: Dict[str, FrameRing] = {}
+    last_seq: Dict[str, int] = {}
+    # Per camera: sum of scores, frames scored and the time of the newest frame
+    sums: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0, 0.0])
+    count = 0
+    next_flush = time.monotonic() + sample_seconds
+
+    while not stop.is_set():
+        busy = False
+        for camera in shard:
+            ring = rings.get(camera)
+            if ring is None:
+                ring = FrameRing.attach(camera)
+                if ring is None:
+                    continue
+                rings[camera] = ring
+            seq = ring.last_seq
+            if benchmark:
+                seq -= count % ring.slots
+            elif seq == last_seq.get(camera):
+                continue
+            frame = ring.read(seq)
+            if frame is None:
+                continue
+            score = detectors[camera].update(frame.pixels)
+            timestamp = frame.timestamp
+            del frame
+            # The ingester may have lapped us and rewritten the slot mid-read
+            if not ring.is_current(seq):
+                continue
+            last_seq[camera] = seq
+            sums[camera][0] += score
+            sums[camera][1] += 1
+            sums[camera][2] = max(sums[camera][2], timestamp)
+            count += 1
+            busy = True
+
+        if time.monotonic() >= next_flush:
+            # Stamped with the newest frame's time, not the time of the flush
+            samples = [(camera, latest, total / n) for camera, (total, n, latest) in sums.items() if n]
+            if samples and not benchmark:
+                results.put(samples)
+            sums.clear()
+            processed[index] = count
+            next_flush += sample_seconds
+            # Re-attach so rings recreated by a restarted ingester are picked up
+            for ring in rings.values():
+                ring.close()
+            rings.clear()
+        if not busy:
+            stop.wait(0.005)
+
+    processed[index] = count
+    for ring in rings.values():
+        ring.close()
+
+
+class MotionPool:
+    """
+    Scores camera motion on a pool of worker processes, one per core by default.
+
+    Cameras are sharded round-robin across the workers, and each worker reads its
+    cameras' frames straight from shared memory, so adding cores adds cameras
+    linearly: nothing but a few floats per camera per sample crosses a process
+    boundary. Workers are forked, so this is for POSIX systems.
+    """
+
+    def __init__(self, cameras: Sequence[str], workers: Optional[int] = None,
+                 sample_seconds: Optional[float] = None, benchmark: bool = False):
+        workers = workers or settings.MOTION_WORKERS or os.cpu_count() or 1
+        self.workers = max(1, min(workers, len(cameras)))
+        self.shards = [list(cameras[index::self.workers]) for index in range(self.workers)]
+        self.sample_seconds = sample_seconds or settings.MOTION_SAMPLE_SECONDS
+        self.benchmark = benchmark
+        context = multiprocessing.get_context('fork')
+        self._results = context.Queue()
+        self._processed = context.Array('q', self.workers, lock=False)
+        self._stop = context.Event()
+        self._processes = [
+            context.Process(
+                target=_detect,
+                args=(index, shard, self.sample_seconds, self._results, self._processed, self._stop, benchmark),
+                name=f'motion-{index}',
+                daemon=True,
+            )
+            for index, shard in enumerate(self.shards)
+        ]
+
+    def start(self) -> None:
+        for process in self._processes:
+            process.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        for process in self._processes:
+            process.join()
+
+    @property
+    def frames_processed(self) -> List[int]:
+        """Frames scored so far by each worker, as of its last sample"""
+        return list(self._processed)
+
+    def samples(self, timeout: float = 0.0) -> Iterator[Sample]:
+        """Yield the samples reported so far, waiting up to `timeout` for the first batch"""
+        try:
+            batch = self._results.get(timeout=timeout) if timeout else self._results.get_nowait()
+            while True:
+                yield from batch
+                batch = self._results.get_nowait()
+        except queue.Empty:
+            return
+
+
+def store_samples(samples: Sequence[Sample]) -> int:
+    """Save motion samples as sensor readings"""
+    readings = [
+        SensorReading(
+            sensor_id=camera,
+            sensor_type=MOTION_SENSOR_TYPE,
+            value=round(score, 3),
+            recorded_at=datetime.fromtimestamp(timestamp, tz=dt_timezone.utc),
+        )
+        for camera, timestamp, score in samples
+    ]
+    SensorReading.objects.bulk_create(readings)
+    return len(readings)
+
+
+def motion_series(hours: int = 24, bucket_hours: int = 2, camera: Optional[str] = None,
+                  now: Optional[datetime] = None) -> List[Dict[str, object]]:
+    """
+    Mean motion score per time bucket over the last `hours`, oldest first
+
+    Buckets with no samples report 0.
+    """
+    now = timezone.localtime(now or timezone.now())
+    end = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    start = end - timedelta(hours=hours)
+    readings = SensorReading.objects.filter(sensor_type=MOTION_SENSOR_TYPE, recorded_at__gte=start)
+    if camera:
+        readings = readings.filter(sensor_id=camera)
+    hourly = {
+        row['hour']: row['motion']
+        for row in readings.annotate(hour=TruncHour('recorded_at')).values('hour').annotate(motion=Avg('value'))
+    }
+
+    series = []
+    for index in range(hours // bucket_hours):
+        bucket_start = start + timedelta(hours=index * bucket_hours)
+        values = [
+            hourly[hour]
+            for hour in (bucket_start + timedelta(hours=offset) for offset in range(bucket_hours))
+            if hour in hourly
+        ]
+        series.append({
+            "time": f"{bucket_start.hour}:00",
+            "motion": round(sum(values) / len(values), 2) if values else 0,
+        })
+    return series
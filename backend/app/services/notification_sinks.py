@@ -0,0 +1,146 @@
+import asyncio
+import json
+import threading
+from typing import Callable, Optional
+
+
+class NotificationSinks:
+    """
+    Stand-in SMTP and HTTP (SMS/push) servers that accept and count everything.
+
+    Used for local development and for benchmarking notification delivery. The
+    SMTP side speaks just enough of the protocol for smtplib; the HTTP side
+    accepts JSON POSTs to /<channel> on keep-alive connections. `delay` holds
+    each message before acknowledging it, to simulate a slow provider.
+    """
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        smtp_port: int = 1025,
+        http_port: int = 8025,
+        delay: float = 0.0,
+        on_message: Optional[Callable[[str, str], None]] = None,
+    ):
+        self.host = host
+        self.smtp_port = smtp_port
+        self.http_port = http_port
+        self.delay = delay
+        self.on_message = on_message
+        self.stats = {'connections': 0, 'messages': 0}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped: Optional[asyncio.Event] = None
+
+    async def serve(self, ready: Optional[threading.Event] = None) -> None:
+        """Serve until stop() is called; ports of 0 are replaced by the ones actually bound"""
+        self._stopped = asyncio.Event()
+        smtp = await asyncio.start_server(self._smtp_session, self.host, self.smtp_port)
+        http = await asyncio.start_server(self._http_request, self.host, self.http_port)
+        self.smtp_port = smtp.sockets[0].getsockname()[1]
+        self.http_port = http.sockets[0].getsockname()[1]
+        if ready is not None:
+            ready.set()
+        async with smtp, http:
+            await self._stopped.wait()
+
+    def start(self) -> 'NotificationSinks':
+        """Serve from a background thread"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.serve(ready))
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name='notification-sinks', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._stopped.set)
+            self._thread.join()
+            self._thread = None
+
+    def _record(self, kind: str, summary: str) -> None:
+        self.stats['messages'] += 1
+        if self.on_message is not None:
+            self.on_message(kind, summary)
+
+    async def _smtp_session(self, reader, writer):
+        self.stats['connections'] += 1
+
+        async def reply(line):
+            writer.write(f'{line}\r\n'.encode())
+            await writer.drain()
+
+        try:
+            await reply('220 notification-sink ESMTP')
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors='replace').strip().upper()
+                if command.startswith('EHLO'):
+                    await reply('250-notification-sink\r\n250 8BITMIME')
+                elif command.startswith('DATA'):
+                    await reply('354 End data with <CR><LF>.<CR><LF>')
+                    subject = ''
+                    while True:
+                        data = await reader.readline()
+                        if not data or data in (b'.\r\n', b'.\n'):
+                            break
+                        if data.lower().startswith(b'subject:'):
+                            subject = data[8:].decode(errors='replace').strip()
+                    await asyncio.sleep(self.delay)
+                    self._record('email', subject)
+                    await reply('250 OK: queued')
+                elif command.startswith('QUIT'):
+                    await reply('221 Bye')
+                    break
+                else:
+                    await reply('250 OK')
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _http_request(self, reader, writer):
+        self.stats['connections'] += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                length = 0
+                keep_alive = True
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode(errors='replace').partition(':')
+                    name = name.strip().lower()
+                    if name == 'content-length':
+                        length = int(value.strip())
+                    elif name == 'connection' and value.strip().lower() == 'close':
+                        keep_alive = False
+                body = await reader.readexactly(length) if length else b''
+                parts = request_line.split()
+                path = parts[1].decode(errors='replace') if len(parts) > 1 else '/'
+                try:
+                    payload = json.loads(body or b'{}')
+                except ValueError:
+                    payload = {}
+                await asyncio.sleep(self.delay)
+                self._record(path.strip('/') or 'http', payload.get('message') or payload.get('title') or '')
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: 15\r\n\r\n'
+                             b'{"status":"ok"}')
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
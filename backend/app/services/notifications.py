@@ -0,0 +1,325 @@
+import asyncio
+import itertools
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import requests
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger(__name__)
+
+# Lower ranks are delivered first when notifications queue up
+PRIORITY_RANK = {
+    'High': 0,
+    'Medium': 1,
+    'Low': 2,
+}
+
+
+class Notification(NamedTuple):
+    channel: str
+    priority: str
+    subject: str
+    body: str
+    alert_id: Optional[int] = None
+    # None sends to the channel's configured recipient
+    recipient: Optional[str] = None
+
+
+def _rank(notification: Notification) -> int:
+    return PRIORITY_RANK.get(notification.priority, len(PRIORITY_RANK))
+
+
+def render(batch: List[Notification]) -> Tuple[str, str]:
+    """Subject and body for one notification, or a digest of several"""
+    if len(batch) == 1:
+        return batch[0].subject, batch[0].body
+    top = min(batch, key=_rank).priority
+    subject = f'[{top}] {len(batch)} alert notifications'
+    body = '\n\n'.join(f'{notification.subject}\n{notification.body}' for notification in batch)
+    return subject, body
+
+
+class EmailChannel:
+    """
+    Sends email over a persistent SMTP connection per worker thread.
+
+    A connection that fails is closed and reopened on the next send. With
+    `persistent=False` every message opens and closes its own connection.
+    """
+
+    def __init__(self, recipient: Optional[str] = None, persistent: bool = True):
+        self.recipient = recipient or settings.ALERT_EMAIL
+        self.persistent = persistent
+        self._local = threading.local()
+
+    def __call__(self, batch: List[Notification]) -> None:
+        subject, body = render(batch)
+        connection = self._connection()
+        message = EmailMessage(
+            subject,
+            body,
+            settings.DEFAULT_FROM_EMAIL,
+            [batch[0].recipient or self.recipient],
+            connection=connection,
+        )
+        try:
+            connection.send_messages([message])
+        except Exception:
+            self.close()
+            raise
+        if not self.persistent:
+            self.close()
+
+    def close(self) -> None:
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _connection(self):
+        if getattr(self._local, 'connection', None) is None:
+            self._local.connection = get_connection(fail_silently=False)
+            self._local.connection.open()
+        return self._local.connection
+
+
+class HttpChannel:
+    """
+    POSTs JSON to a gateway through a shared, pooled keep-alive session.
+
+    With `persistent=False` every request uses a fresh connection.
+    """
+
+    def __init__(self, url: str, pool_size: Optional[int] = None, persistent: bool = True):
+        self.url = url
+        self.persistent = persistent
+        self.session = requests.Session()
+        pool_size = pool_size or settings.NOTIFICATION_WORKERS
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+
+    def __call__(self, batch: List[Notification]) -> None:
+        payload = self.payload(batch)
+        if self.persistent:
+            response = self.session.post(self.url, json=payload, timeout=settings.NOTIFICATION_TIMEOUT)
+        else:
+            response = requests.post(self.url, json=payload, timeout=settings.NOTIFICATION_TIMEOUT,
+                                     headers={'Connection': 'close'})
+        response.raise_for_status()
+
+    def payload(self, batch: List[Notification]) -> dict:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class SmsChannel(HttpChannel):
+    def __init__(self, recipient: Optional[str] = None, url: Optional[str] = None, **kwargs):
+        super().__init__(url or settings.SMS_GATEWAY_URL, **kwargs)
+        self.recipient = recipient or settings.ALERT_SMS
+
+    def payload(self, batch: List[Notification]) -> dict:
+        if len(batch) == 1:
+            message = f'{batch[0].subject}: {batch[0].body}'
+        else:
+            message = f'{len(batch)} alerts: ' + '; '.join(notification.subject for notification in batch)
+        return {"to": batch[0].recipient or self.recipient, "message": message[:160]}
+
+
+class PushChannel(HttpChannel):
+    def __init__(self, url: Optional[str] = None, **kwargs):
+        super().__init__(url or settings.PUSH_GATEWAY_URL, **kwargs)
+
+    def payload(self, batch: List[Notification]) -> dict:
+        subject, body = render(batch)
+        return {
+            "title": subject,
+            "body": body,
+            "priority": min(batch, key=_rank).priority,
+            "alertIds": [notification.alert_id for notification in batch],
+        }
+
+
+def configured_channels(persistent: bool = True) -> Dict[str, Callable[[List[Notification]], None]]:
+    """Senders for every channel that is switched on and has somewhere to deliver to"""
+    channels = {}
+    if settings.NOTIFY_EMAIL and settings.ALERT_EMAIL:
+        channels['email'] = EmailChannel(persistent=persistent)
+    if settings.NOTIFY_SMS and settings.ALERT_SMS and settings.SMS_GATEWAY_URL:
+        channels['sms'] = SmsChannel(persistent=persistent)
+    if settings.NOTIFY_PUSH and settings.PUSH_GATEWAY_URL:
+        channels['push'] = PushChannel(persistent=persistent)
+    return channels
+
+
+class NotificationDispatcher:
+    """
+    Delivers notifications from a bounded pool of workers on a background event loop.
+
+    submit() never blocks: it hands the notification to the loop and returns. At
+    most `queue_size` notifications wait at a time; beyond that new ones are
+    dropped and counted rather than stalling whoever raised the alert.
+
+    Notifications for the same channel and recipient that arrive within
+    `digest_window` seconds of each other are coalesced into one digest message,
+    so an alert storm costs a handful of sends instead of one per alert. A High
+    priority notification flushes its digest immediately. Queued deliveries go
+    out highest priority first; failed ones are retried up to `retries` times
+    with jittered exponential backoff.
+
+    The senders themselves (SMTP, HTTP) are blocking, so each worker runs its send
+    on a thread pool of the same size as the worker pool. Channels keep their
+    connections open between sends.
+    """
+
+    def __init__(
+        self,
+        channels: Optional[Dict[str, Callable[[List[Notification]], None]]] = None,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        digest_window: Optional[float] = None,
+        digest_max: Optional[int] = None,
+        retries: Optional[int] = None,
+        backoff: Optional[float] = None,
+    ):
+        self.channels = configured_channels() if channels is None else channels
+        self.workers = workers or settings.NOTIFICATION_WORKERS
+        self.queue_size = queue_size or settings.NOTIFICATION_QUEUE_SIZE
+        self.digest_window = settings.NOTIFICATION_DIGEST_WINDOW if digest_window is None else digest_window
+        self.digest_max = digest_max or settings.NOTIFICATION_DIGEST_MAX
+        self.retries = settings.NOTIFICATION_RETRIES if retries is None else retries
+        self.backoff = settings.NOTIFICATION_RETRY_BACKOFF if backoff is None else backoff
+        self.stats = {'queued': 0, 'sent': 0, 'deliveries': 0, 'retried': 0, 'failed': 0, 'dropped': 0}
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._sequence = itertools.count()
+        self._digests: Dict[Tuple[str, Optional[str]], List[Notification]] = {}
+        self._timers: Dict[Tuple[str, Optional[str]], asyncio.TimerHandle] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name='notifications', daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Send any open digests, wait up to `timeout` seconds for delivery, then shut the pool down"""
+        if self._thread is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._drain(), self._loop).result(timeout)
+        except TimeoutError:
+            logger.warning('Stopping with %d notifications undelivered', self._pending)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
+        for channel in self.channels.values():
+            if hasattr(channel, 'close'):
+                channel.close()
+
+    def submit(self, notification: Notification) -> bool:
+        """
+        Queue a notification for delivery
+
+        Returns:
+            False when the channel is not configured or the queue is full
+        """
+        if notification.channel not in self.channels or self._loop is None:
+            return False
+        with self._lock:
+            if self._pending >= self.queue_size:
+                self.stats['dropped'] += 1
+                return False
+            self._pending += 1
+            self.stats['queued'] += 1
+        self._loop.call_soon_threadsafe(self._collect, notification)
+        return True
+
+    def _collect(self, notification: Notification) -> None:
+        """Add a notification to its digest, flushing the digest when it is due"""
+        key = (notification.channel, notification.recipient)
+        digest = self._digests.setdefault(key, [])
+        digest.append(notification)
+        if self.digest_window <= 0 or notification.priority == 'High' or len(digest) >= self.digest_max:
+            self._flush(key)
+        elif len(digest) == 1:
+            self._timers[key] = self._loop.call_later(self.digest_window, self._flush, key)
+
+    def _flush(self, key: Tuple[str, Optional[str]]) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._digests.pop(key, None)
+        if batch:
+            self._enqueue(batch, 0)
+
+    def _enqueue(self, batch: List[Notification], attempt: int) -> None:
+        rank = min(_rank(notification) for notification in batch)
+        self._queue.put_nowait((rank, next(self._sequence), attempt, batch))
+
+    async def _drain(self) -> None:
+        for key in list(self._digests):
+            self._flush(key)
+        while self._pending:
+            await asyncio.sleep(0.05)
+
+    def _run(self, ready: threading.Event) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.PriorityQueue()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='notify')
+        workers = [self._loop.create_task(self._worker(executor)) for _ in range(self.workers)]
+        ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self._loop.run_until_complete(asyncio.gather(*workers, return_exceptions=True))
+            executor.shutdown(wait=True)
+            self._loop.close()
+
+    async def _worker(self, executor: ThreadPoolExecutor) -> None:
+        while True:
+            _, _, attempt, batch = await self._queue.get()
+            channel = batch[0].channel
+            try:
+                await self._loop.run_in_executor(executor, self.channels[channel], batch)
+                outcome = 'sent'
+            except Exception as e:
+                if attempt < self.retries:
+                    delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+                    logger.warning('Sending %s notification failed (%s); retrying in %.1fs', channel, e, delay)
+                    self._loop.call_later(delay, self._enqueue, batch, attempt + 1)
+                    outcome = 'retried'
+                else:
+                    logger.exception('Giving up on %s notification for alerts %s', channel,
+                                     [notification.alert_id for notification in batch])
+                    outcome = 'failed'
+            finally:
+                self._queue.task_done()
+
+            with self._lock:
+                if outcome == 'retried':
+                    self.stats['retried'] += 1
+                    continue
+                self._pending -= len(batch)
+                self.stats[outcome] += len(batch)
+                if outcome == 'sent':
+                    self.stats['deliveries'] += 1
@@ -0,0 +1,194 @@
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+
+# Record keys treated as timestamps when digesting lists of records
+_TIME_KEYS = ('time', 'timestamp', 'recordedAt', 'recorded_at', 'createdAt', 'created_at', 'date')
+
+# Lists up to this long are passed through as they are
+_SHORT_LIST = 16
+
+# Longest string kept per detail level (0 = terse ... 2 = full)
+_MAX_STRING = (60, 160, 400)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: about four characters per token for English text and JSON"""
+    return (len(text) + 3) // 4
+
+
+def to_json(value: Any) -> str:
+    return json.dumps(value, default=str, separators=(',', ':'), ensure_ascii=False)
+
+
+def _round(value: float) -> float:
+    return float(f'{value:.4g}')
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class PromptDigester:
+    """
+    Shrinks analysis payloads to fit a prompt token budget.
+
+    Long numeric series become statistical digests (count, range, mean,
+    percentiles, change points, top anomalies); lists of records get a digest per
+    numeric field and the most common values of text fields; long strings are
+    cut. Content that already fits the budget is left alone; otherwise the
+    digest is built at full detail first and made terser until its JSON fits.
+    """
+
+    def __init__(self, token_budget: Optional[int] = None):
+        self.token_budget = token_budget or settings.AI_PROMPT_TOKEN_BUDGET
+
+    def digest(self, content: Any) -> Tuple[Any, Dict[str, int]]:
+        """
+        Reduce content to fit the token budget
+
+        Returns:
+            The digested content and its size metrics
+        """
+        raw_tokens = estimate_tokens(to_json(content))
+        if raw_tokens <= self.token_budget:
+            return content, {"rawTokens": raw_tokens, "digestTokens": raw_tokens, "detail": None}
+        for detail in (2, 1, 0):
+            digested = self.reduce(content, detail)
+            tokens = estimate_tokens(to_json(digested))
+            if tokens <= self.token_budget:
+                break
+        else:
+            text = to_json(digested)[:self.token_budget * 4]
+            digested = {"truncated": True, "data": text}
+            tokens = estimate_tokens(to_json(digested))
+        return digested, {"rawTokens": raw_tokens, "digestTokens": tokens, "detail": detail}
+
+    def reduce(self, value: Any, detail: int = 2) -> Any:
+        """Digest at one detail level (0 = terse ... 2 = full), whatever the budget"""
+        if isinstance(value, dict):
+            return {key: self.reduce(item, detail) for key, item in value.items()}
+        if isinstance(value, str):
+            limit = _MAX_STRING[detail]
+            return value if len(value) <= limit else value[:limit] + '…'
+        if isinstance(value, (list, tuple)):
+            if len(value) <= _SHORT_LIST and detail == 2:
+                return [self.reduce(item, detail) for item in value]
+            if value and all(_is_number(item) or item is None for item in value):
+                return self.series(value, detail)
+            if value and all(isinstance(item, dict) for item in value):
+                return self.records(value, detail)
+            sample = 3 if detail else 1
+            return {"count": len(value), "sample": [self.reduce(item, detail) for item in value[:sample]]}
+        return value
+
+    def series(self, values: Sequence[Optional[float]], detail: int = 2,
+               labels: Optional[Sequence[Any]] = None) -> Dict[str, Any]:
+        """Statistical digest of a numeric series; anomalies and change points are labelled by index or label"""
+        data = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+        present = ~np.isnan(data)
+        if not present.any():
+            return {"count": len(data)}
+        finite = data[present]
+        digest: Dict[str, Any] = {
+            "count": len(data),
+            "min": _round(finite.min()),
+            "max": _round(finite.max()),
+            "mean": _round(finite.mean()),
+            "last": _round(finite[-1]),
+        }
+        if detail == 0:
+            return digest
+
+        percentiles = (50, 95) if detail == 1 else (5, 25, 50, 75, 95)
+        digest["std"] = _round(finite.std())
+        digest["first"] = _round(finite[0])
+        digest.update({f"p{p}": _round(value) for p, value in zip(percentiles, np.percentile(finite, percentiles))})
+
+        def label(index):
+            return labels[index] if labels is not None else int(index)
+
+        top = 3 if detail == 1 else 5
+        anomalies = self._anomalies(data, top)
+        if anomalies:
+            digest["anomalies"] = [{"at": label(i), "value": _round(data[i]), "z": _round(z)} for i, z in anomalies]
+        changes = self._change_points(data, 2 if detail == 1 else 3)
+        if changes:
+            digest["changePoints"] = [
+                {"at": label(i), "before": _round(before), "after": _round(after)} for i, before, after in changes
+            ]
+        return digest
+
+    def records(self, rows: Sequence[Dict[str, Any]], detail: int = 2) -> Dict[str, Any]:
+        """Digest a list of records field by field"""
+        time_key = next((key for key in _TIME_KEYS if key in rows[0]), None)
+        labels = [row.get(time_key) for row in rows] if time_key else None
+        digest: Dict[str, Any] = {"count": len(rows)}
+        if time_key:
+            digest["timeRange"] = [labels[0], labels[-1]]
+
+        fields: Dict[str, Any] = {}
+        keys: List[str] = []
+        for row in rows:
+            keys.extend(key for key in row if key not in keys)
+        for key in keys:
+            if key == time_key:
+                continue
+            values = [row.get(key) for row in rows]
+            if all(_is_number(value) or value is None for value in values):
+                fields[key] = self.series(values, detail, labels)
+            elif all(isinstance(value, str) or value is None for value in values):
+                counts: Dict[str, int] = {}
+                for value in values:
+                    if value is not None:
+                        counts[value] = counts.get(value, 0) + 1
+                top = sorted(counts.items(), key=lambda item: -item[1])[:(1, 3, 5)[detail]]
+                fields[key] = {"distinct": len(counts), "top": {self.reduce(k, 0): n for k, n in top}}
+        digest["fields"] = fields
+        return digest
+
+    @staticmethod
+    def _anomalies(data: np.ndarray, top: int, threshold: float = 3.5) -> List[Tuple[int, float]]:
+        """Largest robust z-scores (median / MAD) above the threshold, most extreme first"""
+        present = ~np.isnan(data)
+        median = np.median(data[present])
+        mad = np.median(np.abs(data[present] - median)) * 1.4826
+        if mad == 0:
+            return []
+        z = np.where(present, (data - median) / mad, 0.0)
+        candidates = np.argsort(-np.abs(z))[:top]
+        return [(int(i), float(z[i])) for i in candidates if abs(z[i]) >= threshold]
+
+    @staticmethod
+    def _change_points(data: np.ndarray, top: int, threshold: float = 1.0) -> List[Tuple[int, float, float]]:
+        """
+        Indices where the mean level shifts by more than `threshold` standard deviations
+
+        Compares the mean of the `w` points before each index with the `w` points
+        after it, using cumulative sums so the whole scan is O(n).
+        """
+        positions = np.flatnonzero(~np.isnan(data))
+        values = data[positions]
+        n = len(values)
+        w = max(5, n // 20)
+        std = values.std()
+        if n < 2 * w or std == 0:
+            return []
+        cumulative = np.concatenate([[0.0], np.cumsum(values)])
+        splits = np.arange(w, n - w + 1)
+        before = (cumulative[splits] - cumulative[splits - w]) / w
+        after = (cumulative[splits + w] - cumulative[splits]) / w
+        shift = np.abs(after - before) / std
+
+        found: List[Tuple[int, float, float]] = []
+        for index in np.argsort(-shift):
+            if shift[index] < threshold or len(found) == top:
+                break
+            split = int(splits[index])
+            if all(abs(split - other) >= w for other, _, _ in found):
+                found.append((split, float(before[index]), float(after[index])))
+        found = [(int(positions[split]), before, after) for split, before, after in found]
+        return sorted(found)
@@ -0,0 +1,175 @@
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+
+
+_MAGIC = b'SVRATE01'
+# magic, groups; padded to a cache line
+_HEADER = struct.Struct('<8sI')
+_HEADER_BYTES = 64
+# Buckets per group: a key lives in one group, in whichever of its slots holds it
+GROUP_SLOTS = 8
+# Per slot: key hash (uint64, 0 = empty), tokens and the monotonic time they were counted at
+_SLOT = struct.Struct('<Qdd')
+_GROUP = struct.Struct('<' + 'Qdd' * GROUP_SLOTS)
+
+
+class SharedTokenBuckets:
+    """
+    Token buckets for many keys in a memory-mapped file, shared by every
+    process on the host that maps it.
+
+    The file (on /dev/shm by default, so it never touches a disk) is a hash
+    table of fixed-size groups. A key hashes to one group and takes whichever
+    of its GROUP_SLOTS slots already holds it, or else the one idle longest:
+    a bucket that has been idle long enough to refill loses nothing by being
+    evicted. Each check locks only its group, with a byte-range lock held for
+    a few microseconds, so workers rarely contend and no request touches the
+    database. The clock is CLOCK_MONOTONIC, which all processes share.
+    """
+
+    def __init__(self, path: Optional[str] = None, buckets: Optional[int] = None):
+        self.path = path or settings.RATE_LIMIT_FILE
+        groups = max(1, (buckets or settings.RATE_LIMIT_BUCKETS) // GROUP_SLOTS)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        # Whoever gets here first lays the file out. Later processes adopt its size even if
+        # configured differently: shrinking it under a process that has it mapped would crash that one.
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(self._fd, _HEADER.size, 0)
+            magic, self.groups = _HEADER.unpack(header) if len(header) == _HEADER.size else (None, 0)
+            if magic != _MAGIC or os.fstat(self._fd).st_size != self._size(self.groups):
+                self.groups = groups
+                os.ftruncate(self._fd, self._size(groups))
+                os.pwrite(self._fd, _HEADER.pack(_MAGIC, groups), 0)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        self._map = mmap.mmap(self._fd, self._size(self.groups))
+        # Byte-range locks belong to the process, so threads also need one of their own
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(groups: int) -> int:
+        return _HEADER_BYTES + groups * _GROUP.size
+
+    def take(self, key: str, rate: float, burst: int) -> float:
+        """
+        Take a token from `key`'s bucket (`rate` per second, holding at most
+        `burst`); 0 if one was free, otherwise seconds until one will be
+        """
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+        offset = _HEADER_BYTES + digest % self.groups * _GROUP.size
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, _GROUP.size, offset)
+            try:
+                now = time.monotonic()
+                fields = _GROUP.unpack_from(self._map, offset)
+                slot, oldest = 0, math.inf
+                for index in range(GROUP_SLOTS):
+                    held, tokens, updated = fields[3 * index:3 * index + 3]
+                    if held == digest:
+                        slot = index
+                        tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+                        break
+                    if updated < oldest:
+                        slot, oldest = index, updated
+                else:
+                    tokens = float(burst)
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+                _SLOT.pack_into(self._map, offset + slot * _SLOT.size, digest,
+                                tokens - 1 if not wait else tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, _GROUP.size, offset)
+        return wait
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+
+class Admission:
+    """
+    Concurrency-based admission control for one process.
+
+    At most `max_concurrent` requests are worked on at once; `queue_size` more
+    wait up to `queue_timeout` seconds for a turn, and anything beyond that is
+    refused at once. Keeping the work in progress near what the process can
+    actually do keeps latency flat under overload: excess requests are turned
+    away in microseconds instead of queueing until every response is too late
+    to be useful.
+    """
+
+    def __init__(self, max_concurrent: Optional[int] = None, queue_size: Optional[int] = None,
+                 queue_timeout: Optional[float] = None):
+        self.max_concurrent = max_concurrent or settings.ADMISSION_MAX_CONCURRENT
+        self.queue_size = settings.ADMISSION_QUEUE_SIZE if queue_size is None else queue_size
+        self.queue_timeout = settings.ADMISSION_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+        self.retry_after = max(1, math.ceil(self.queue_timeout))
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self.stats = {"admitted": 0, "queued": 0, "shed": 0}
+
+    def acquire(self) -> bool:
+        """Take a slot, waiting in the queue if there is room in it; False if the request is shed"""
+        if self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats["admitted"] += 1
+            return True
+        with self._lock:
+            queued = self._waiting < self.queue_size
+            if queued:
+                self._waiting += 1
+                self.stats["queued"] += 1
+            else:
+                self.stats["shed"] += 1
+        if not queued:
+            return False
+        acquired = False
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+                self.stats["admitted" if acquired else "shed"] += 1
+        return acquired
+
+    def release(self) -> None:
+        self._slots.release()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, waiting=self._waiting, max_concurrent=self.max_concurrent)
+
+
+_buckets: Optional[SharedTokenBuckets] = None
+_admission: Optional[Admission] = None
+_lock = threading.Lock()
+
+
+def get_buckets() -> SharedTokenBuckets:
+    """The process's mapping of the host-wide rate-limit table"""
+    global _buckets
+    if _buckets is None:
+        with _lock:
+            if _buckets is None:
+                _buckets = SharedTokenBuckets()
+    return _buckets
+
+
+def get_admission() -> Admission:
+    """The process-wide admission control"""
+    global _admission
+    if _admission is None:
+        with _lock:
+            if _admission is None:
+                _admission = Admission()
+    return _admission
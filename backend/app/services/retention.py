@@ -0,0 +1,240 @@
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..models import Alert, AlertRollup, ReadingRollup, SensorReading
+
+
+class CompactionJob:
+    """
+    Enforces the data retention policy.
+
+    Data ages out in four steps:
+      - raw sensor readings are rolled into hourly aggregates after
+        COMPACTION_RAW_MAX_AGE_DAYS
+      - hourly aggregates are rolled into daily aggregates after DATA_RETENTION_DAYS
+      - alerts are counted into daily per-priority aggregates and dropped after
+        DATA_RETENTION_DAYS
+      - alert evidence (snapshots and clips) is evicted a segment at a time after
+        EVIDENCE_RETENTION_DAYS, or sooner while it exceeds EVIDENCE_MAX_BYTES
+
+    Work is done one day partition at a time and deleted in batches of at most
+    `batch_size` rows, each batch in its own short transaction, so the database
+    write lock is never held for long. When export is enabled, a day partition is
+    written to Parquet before any of its rows are deleted.
+    """
+
+    def __init__(
+        self,
+        retention_days: Optional[int] = None,
+        raw_max_age_days: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        export: Optional[bool] = None,
+        archive=None,
+        pause: float = 0.0,
+    ):
+        self.retention_days = retention_days or getattr(settings, 'DATA_RETENTION_DAYS', 90)
+        self.raw_max_age_days = raw_max_age_days or getattr(settings, 'COMPACTION_RAW_MAX_AGE_DAYS', 7)
+        self.batch_size = batch_size or getattr(settings, 'COMPACTION_BATCH_SIZE', 5000)
+        self.export = getattr(settings, 'AUTO_EXPORT', False) if export is None else export
+        self.pause = pause
+        self.archive = archive
+        if self.export and self.archive is None:
+            from .archive import ArchiveService
+            self.archive = ArchiveService()
+        self.stats: Dict[str, float] = {}
+
+    def run(self, now: Optional[datetime] = None) -> Dict[str, float]:
+        """
+        Run one full compaction pass
+
+        Returns:
+            Counters for the rows compacted, deleted and exported
+        """
+        now = now or timezone.now()
+        self.stats = {
+            "readingsCompacted": 0,
+            "hourlyCompacted": 0,
+            "alertsCompacted": 0,
+            "rowsExported": 0,
+            "filesExported": 0,
+            "batches": 0,
+            "maxBatchSeconds": 0.0,
+            "evidenceSegmentsEvicted": 0,
+            "evidenceBytesEvicted": 0,
+        }
+        started = time.perf_counter()
+        self.compact_readings(now - timedelta(days=self.raw_max_age_days))
+        self.compact_hourly(now - timedelta(days=self.retention_days))
+        self.compact_alerts(now - timedelta(days=self.retention_days))
+        self.evict_evidence(now - timedelta(days=getattr(settings, 'EVIDENCE_RETENTION_DAYS', 30)))
+        self.stats["elapsedSeconds"] = round(time.perf_counter() - started, 3)
+        return self.stats
+
+    def compact_readings(self, cutoff: datetime) -> None:
+        """Roll raw readings older than cutoff into hourly aggregates"""
+        queryset = SensorReading.objects.filter(recorded_at__lt=cutoff)
+        fields = ('id', 'sensor_id', 'sensor_type', 'recorded_at', 'value')
+        for start, end in self._day_partitions(queryset, 'recorded_at', cutoff):
+            if self.export:
+                from .archive import READING_SCHEMA
+                self._export(
+                    'readings', start, READING_SCHEMA,
+                    queryset.filter(recorded_at__gte=start, recorded_at__lt=end), fields,
+                )
+            expired = queryset.filter(recorded_at__lt=end).order_by('recorded_at', 'id')
+            while True:
+                rows = list(expired.values_list(*fields)[:self.batch_size])
+                if not rows:
+                    break
+                buckets: Dict[Tuple[str, datetime], list] = {}
+                for _, sensor_id, sensor_type, recorded_at, value in rows:
+                    bucket_start = recorded_at.replace(minute=0, second=0, microsecond=0)
+                    self._accumulate(buckets, sensor_id, sensor_type, bucket_start, 1, value, value, value)
+                with self._batch():
+                    self._merge_rollups(ReadingRollup.HOURLY, buckets)
+                    SensorReading.objects.filter(id__in=[row[0] for row in rows]).delete()
+                self.stats["readingsCompacted"] += len(rows)
+
+    def compact_hourly(self, cutoff: datetime) -> None:
+        """Roll hourly aggregates older than cutoff into daily aggregates"""
+        expired = ReadingRollup.objects.filter(
+            resolution=ReadingRollup.HOURLY,
+            bucket_start__lt=cutoff,
+        ).order_by('bucket_start', 'id')
+        fields = ('id', 'sensor_id', 'sensor_type', 'bucket_start', 'count', 'total', 'min_value', 'max_value')
+        while True:
+            rows = list(expired.values_list(*fields)[:self.batch_size])
+            if not rows:
+                break
+            buckets: Dict[Tuple[str, datetime], list] = {}
+            for _, sensor_id, sensor_type, bucket_start, count, total, min_value, max_value in rows:
+                day_start = bucket_start.replace(hour=0, minute=0, second=0, microsecond=0)
+                self._accumulate(buckets, sensor_id, sensor_type, day_start, count, total, min_value, max_value)
+            with self._batch():
+                self._merge_rollups(ReadingRollup.DAILY, buckets)
+                ReadingRollup.objects.filter(id__in=[row[0] for row in rows]).delete()
+            self.stats["hourlyCompacted"] += len(rows)
+
+    def compact_alerts(self, cutoff: datetime) -> None:
+        """Count alerts older than cutoff into daily aggregates and drop them"""
+        queryset = Alert.objects.filter(created_at__lt=cutoff)
+        fields = ('id', 'icon', 'title', 'location', 'priority', 'description', 'status', 'created_at')
+        for start, end in self._day_partitions(queryset, 'created_at', cutoff):
+            if self.export:
+                from .archive import ALERT_SCHEMA
+                self._export(
+                    'alerts', start, ALERT_SCHEMA,
+                    queryset.filter(created_at__gte=start, created_at__lt=end), fields,
+                )
+            expired = queryset.filter(created_at__lt=end).order_by('created_at', 'id')
+            while True:
+                rows = list(expired.values_list('id', 'priority', 'created_at')[:self.batch_size])
+                if not rows:
+                    break
+                counts: Dict[Tuple, int] = {}
+                for _, priority, created_at in rows:
+                    key = (created_at.date(), priority)
+                    counts[key] = counts.get(key, 0) + 1
+                with self._batch():
+                    self._merge_alert_rollups(counts)
+                    Alert.objects.filter(id__in=[row[0] for row in rows]).delete()
+                self.stats["alertsCompacted"] += len(rows)
+
+    def evict_evidence(self, cutoff: datetime) -> None:
+        """Drop evidence segments whose blobs all predate cutoff, or the oldest ones while over the size cap"""
+        if not settings.EVIDENCE_DIR.exists():
+            return
+        from .evidence import get_evidence_store
+        evicted = get_evidence_store().evict(cutoff.timestamp(), settings.EVIDENCE_MAX_BYTES)
+        self.stats["evidenceSegmentsEvicted"] += evicted["segments"]
+        self.stats["evidenceBytesEvicted"] += evicted["bytes"]
+
+    @contextmanager
+    def _batch(self):
+        """Atomic block that records how long the write transaction was held"""
+        started = time.perf_counter()
+        with transaction.atomic():
+            yield
+        elapsed = time.perf_counter() - started
+        self.stats["batches"] += 1
+        self.stats["maxBatchSeconds"] = max(self.stats["maxBatchSeconds"], round(elapsed, 4))
+        if self.pause:
+            time.sleep(self.pause)
+
+    def _day_partitions(self, queryset, field: str, cutoff: datetime) -> Iterator[Tuple[datetime, datetime]]:
+        """Yield (start, end) UTC day windows, oldest first, until no expired rows remain"""
+        while True:
+            oldest = queryset.order_by(field).values_list(field, flat=True).first()
+            if oldest is None:
+                return
+            start = oldest.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            yield start, min(start + timedelta(days=1), cutoff)
+
+    def _export(self, dataset: str, day: datetime, schema, queryset, fields) -> None:
+        from .archive import iter_chunks
+        path, rows = self.archive.write_partition(
+            dataset,
+            day.strftime('%Y-%m-%d'),
+            schema,
+            iter_chunks(queryset, fields, self.batch_size),
+        )
+        if path is not None:
+            self.stats["filesExported"] += 1
+            self.stats["rowsExported"] += rows
+
+    @staticmethod
+    def _accumulate(buckets, sensor_id, sensor_type, bucket_start, count, total, min_value, max_value) -> None:
+        bucket = buckets.get((sensor_id, bucket_start))
+        if bucket is None:
+            buckets[(sensor_id, bucket_start)] = [sensor_type, count, total, min_value, max_value]
+        else:
+            bucket[1] += count
+            bucket[2] += total
+            bucket[3] = min(bucket[3], min_value)
+            bucket[4] = max(bucket[4], max_value)
+
+    @staticmethod
+    def _merge_rollups(resolution: str, buckets: Dict[Tuple[str, datetime], list]) -> None:
+        """
+        Add bucket aggregates onto existing rollup rows, creating missing ones.
+
+        Uses a single INSERT ... ON CONFLICT DO UPDATE per batch; building model
+        instances for every bucket costs more than the delete it accompanies.
+        """
+        table = connection.ops.quote_name(ReadingRollup._meta.db_table)
+        sql = (
+            f'INSERT INTO {table} '
+            '(sensor_id, sensor_type, resolution, bucket_start, count, total, min_value, max_value) '
+            'VALUES (%s, %s, %s, %s, %s, %s, %s, %s) '
+            'ON CONFLICT (resolution, bucket_start, sensor_id) DO UPDATE SET '
+            f'count = {table}.count + excluded.count, '
+            f'total = {table}.total + excluded.total, '
+            f'min_value = CASE WHEN excluded.min_value < {table}.min_value '
+            f'THEN excluded.min_value ELSE {table}.min_value END, '
+            f'max_value = CASE WHEN excluded.max_value > {table}.max_value '
+            f'THEN excluded.max_value ELSE {table}.max_value END'
+        )
+        adapt = connection.ops.adapt_datetimefield_value
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [
+                (sensor_id, sensor_type, resolution, adapt(bucket_start), count, total, min_value, max_value)
+                for (sensor_id, bucket_start), (sensor_type, count, total, min_value, max_value) in buckets.items()
+            ])
+
+    @staticmethod
+    def _merge_alert_rollups(counts: Dict[Tuple, int]) -> None:
+        """Add per-day, per-priority alert counts onto the existing rollup rows"""
+        table = connection.ops.quote_name(AlertRollup._meta.db_table)
+        sql = (
+            f'INSERT INTO {table} (day, priority, count) VALUES (%s, %s, %s) '
+            f'ON CONFLICT (day, priority) DO UPDATE SET count = {table}.count + excluded.count'
+        )
+        adapt = connection.ops.adapt_datefield_value
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [(adapt(day), priority, count) for (day, priority), count in counts.items()])
@@ -0,0 +1,593 @@
+import ast
+import fcntl
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Set
+
+import numpy as np
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+
+logger = logging.getLogger(__name__)
+
+# Sliding windows are kept in this many time buckets per sensor
+WINDOW_BUCKETS = 12
+
+_DURATION = re.compile(r'^(\d+(?:\.\d+)?)([smhd])$')
+_UNIT_SECONDS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Statistics a rule can take over a window, e.g. mean('5m')
+WINDOW_FUNCTIONS = ('mean', 'min', 'max', 'count', 'sum')
+
+_COMPARE = {
+    ast.Eq: np.equal, ast.NotEq: np.not_equal, ast.Lt: np.less, ast.LtE: np.less_equal,
+    ast.Gt: np.greater, ast.GtE: np.greater_equal,
+}
+_ARITHMETIC = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide}
+
+
+def parse_duration(text: str) -> float:
+    """Seconds in a duration like '30s', '5m', '1h' or '2d'"""
+    match = _DURATION.match(text.strip()) if isinstance(text, str) else None
+    if not match:
+        raise ValueError(f"Expected a duration like '30s', '5m' or '1h', not {text!r}")
+    return float(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+
+
+class WindowStats:
+    """
+    Per-sensor count, sum, min and max of readings over a sliding time window.
+
+    The window is split into WINDOW_BUCKETS buckets per sensor, held in flat
+    arrays indexed by sensor * buckets + bucket. A batch of readings is added
+    with a few vectorized scatter operations; a bucket is cleared when a
+    reading for a newer stretch of time lands in it, and buckets older than
+    the window are ignored when aggregating, so the window slides in steps of
+    one bucket.
+    """
+
+    def __init__(self, seconds: float, buckets: int = WINDOW_BUCKETS):
+        self.seconds = seconds
+        self.buckets = buckets
+        self.width = seconds / buckets
+        self.count = np.zeros(0)
+        self.sum = np.zeros(0)
+        self.min = np.zeros(0)
+        self.max = np.zeros(0)
+        # Which stretch of time (time // width) each bucket currently holds
+        self.epoch = np.zeros(0, dtype=np.int64)
+
+    def grow(self, sensors: int) -> None:
+        extra = sensors * self.buckets - len(self.count)
+        if extra > 0:
+            self.count = np.concatenate([self.count, np.zeros(extra)])
+            self.sum = np.concatenate([self.sum, np.zeros(extra)])
+            self.min = np.concatenate([self.min, np.full(extra, np.inf)])
+            self.max = np.concatenate([self.max, np.full(extra, -np.inf)])
+            self.epoch = np.concatenate([self.epoch, np.full(extra, -1, dtype=np.int64)])
+
+    def add(self, sensors: np.ndarray, values: np.ndarray, times: np.ndarray) -> None:
+        epochs = (times // self.width).astype(np.int64)
+        keys = sensors * self.buckets + epochs % self.buckets
+        # The newest stretch of time each touched bucket sees in this batch
+        newest = np.full(len(self.epoch), -1, dtype=np.int64)
+        np.maximum.at(newest, keys, epochs)
+        touched = np.flatnonzero(newest > self.epoch)
+        self.count[touched] = 0
+        self.sum[touched] = 0
+        self.min[touched] = np.inf
+        self.max[touched] = -np.inf
+        self.epoch[touched] = newest[touched]
+        # Readings too old for their bucket fall outside the window anyway
+        keep = epochs == self.epoch[keys]
+        keys, values = keys[keep], values[keep]
+        size = len(self.count)
+        self.count += np.bincount(keys, minlength=size)
+        self.sum += np.bincount(keys, weights=values, minlength=size)
+        np.minimum.at(self.min, keys, values)
+        np.maximum.at(self.max, keys, values)
+
+    def aggregate(self, stat: str, sensors: np.ndarray, now: float) -> np.ndarray:
+        """`stat` over the window ending at `now`, for each of `sensors` (NaN where there are no readings)"""
+        rows = sensors[:, None] * self.buckets + np.arange(self.buckets)
+        current = int(now // self.width)
+        live = (self.epoch[rows] > current - self.buckets) & (self.epoch[rows] <= current)
+        count = np.where(live, self.count[rows], 0).sum(axis=1)
+        if stat == 'count':
+            return count
+        if stat == 'min':
+            result = np.where(live, self.min[rows], np.inf).min(axis=1)
+        elif stat == 'max':
+            result = np.where(live, self.max[rows], -np.inf).max(axis=1)
+        else:
+            total = np.where(live, self.sum[rows], 0).sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                result = total / count if stat == 'mean' else total
+        return np.where(count > 0, result, np.nan)
+
+
+class Batch:
+    """The readings a rule is evaluated over, one array entry per reading"""
+
+    def __init__(self, engine: 'RuleEngine', sensors: np.ndarray, types: np.ndarray, values: np.ndarray,
+                 times: np.ndarray):
+        self.engine = engine
+        self.sensors = sensors
+        self.types = types
+        self.values = values
+        self.times = times
+        self.now = float(times.max()) if len(times) else 0.0
+        self._unique, self._inverse = np.unique(sensors, return_inverse=True)
+        self._windows: Dict[tuple, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def window(self, stat: str, seconds: float) -> np.ndarray:
+        key = (stat, seconds)
+        if key not in self._windows:
+            # Computed once per sensor in the batch, then spread over its readings
+            per_sensor = self.engine.windows[seconds].aggregate(stat, self._unique, self.now)
+            self._windows[key] = per_sensor[self._inverse]
+        return self._windows[key]
+
+    def name(self, name: str):
+        if name == 'value':
+            return self.values
+        if name == 'type':
+            return self.types
+        if name == 'sensitivity':
+            return self.engine.sensitivity[self.sensors]
+        if name == 'hour':
+            return (self.times % 86400) // 3600
+        return settings.ALERT_THRESHOLDS[name]
+
+
+# Names a rule can use, besides the alert thresholds (low, medium, high, critical)
+NAMES = ('value', 'type', 'sensitivity', 'hour')
+
+Predicate = Callable[[Batch], Any]
+
+
+class RuleCompiler:
+    """
+    Compiles a rule expression into a function of a Batch that returns one
+    boolean per reading, built from NumPy operations on whole arrays.
+
+    Expressions use Python syntax, restricted to:
+      * names: value, type, sensitivity, hour (of day, UTC) and the alert
+        thresholds low, medium, high, critical
+      * numbers, strings, tuples/lists (for `in`)
+      * arithmetic + - * /, comparisons (chained too), in / not in,
+        and / or / not, abs()
+      * window statistics mean/min/max/count/sum('5m') of the sensor's
+        readings over the last 5 minutes (any duration in s, m, h or d)
+      * in_zone('Building A'): the sensor is in that zone or below it
+    Missing window data (NaN) makes a comparison false.
+    """
+
+    def __init__(self, engine: 'RuleEngine'):
+        self.engine = engine
+        self.windows: Set[float] = set()
+
+    def compile(self, expression: str) -> Predicate:
+        try:
+            tree = ast.parse(expression, mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f'Invalid rule expression: {e.msg}') from None
+        node = self._node(tree.body)
+        return lambda batch: np.broadcast_to(np.asarray(node(batch), dtype=bool), (len(batch),))
+
+    def _node(self, node: ast.AST) -> Predicate:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str)) \
+                and not isinstance(node.value, bool):
+            value = node.value
+            return lambda batch: value
+        if isinstance(node, (ast.Tuple, ast.List)):
+            items = [self._constant(item) for item in node.elts]
+            return lambda batch: items
+        if isinstance(node, ast.Name):
+            name = node.id
+            if name not in NAMES and name not in settings.ALERT_THRESHOLDS:
+                raise ValueError(f"Unknown name '{name}'; rules can use {', '.join(NAMES + tuple(settings.ALERT_THRESHOLDS))}")
+            return lambda batch: batch.name(name)
+        if isinstance(node, ast.BoolOp):
+            parts = [self._node(value) for value in node.values]
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            return lambda batch: combine.reduce([np.asarray(part(batch), dtype=bool) for part in parts])
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+            operand = self._node(node.operand)
+            if isinstance(node.op, ast.Not):
+                return lambda batch: np.logical_not(operand(batch))
+            return lambda batch: np.negative(operand(batch))
+        if isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC:
+            left, right, operation = self._node(node.left), self._node(node.right), _ARITHMETIC[type(node.op)]
+            return lambda batch: operation(left(batch), right(batch))
+        if isinstance(node, ast.Compare):
+            return self._compare(node)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            return self._call(node.func.id, node.args)
+        raise ValueError(f'Rules cannot use {ast.unparse(node)!r}')
+
+    def _constant(self, node: ast.AST):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str)):
+            return node.value
+        raise ValueError(f'Expected a constant, not {ast.unparse(node)!r}')
+
+    def _compare(self, node: ast.Compare) -> Predicate:
+        operands = [self._node(node.left)] + [self._node(item) for item in node.comparators]
+        steps = []
+        for index, op in enumerate(node.ops):
+            left, right = operands[index], operands[index + 1]
+            if isinstance(op, (ast.In, ast.NotIn)):
+                negate = isinstance(op, ast.NotIn)
+                steps.append(lambda batch, left=left, right=right, negate=negate:
+                             np.isin(left(batch), right(batch), invert=negate))
+            elif type(op) in _COMPARE:
+                compare = _COMPARE[type(op)]
+                steps.append(lambda batch, left=left, right=right, compare=compare:
+                             compare(left(batch), right(batch)))
+            else:
+                raise ValueError(f'Rules cannot use {ast.unparse(node)!r}')
+        if len(steps) == 1:
+            return steps[0]
+        return lambda batch: np.logical_and.reduce([step(batch) for step in steps])
+
+    def _call(self, name: str, args: List[ast.AST]) -> Predicate:
+        if name in WINDOW_FUNCTIONS:
+            if len(args) != 1:
+                raise ValueError(f"{name}() takes one window, e.g. {name}('5m')")
+            seconds = parse_duration(self._constant(args[0]))
+            self.windows.add(seconds)
+            return lambda batch: batch.window(name, seconds)
+        if name == 'abs' and len(args) == 1:
+            operand = self._node(args[0])
+            return lambda batch: np.abs(operand(batch))
+        if name == 'in_zone' and len(args) == 1:
+            zone = self._constant(args[0])
+            members = self.engine.zone_members(zone)
+            return lambda batch: members()[batch.sensors]
+        raise ValueError(f"Unknown function '{name}'")
+
+
+class CompiledRule(NamedTuple):
+    id: Optional[int]
+    name: str
+    expression: str
+    priority: str
+    title: str
+    cooldown: float
+    predicate: Predicate
+
+
+class RuleEngine:
+    """
+    Evaluates the enabled AlertRules against batches of sensor readings.
+
+    Rules are compiled once (see RuleCompiler) and each batch is evaluated
+    rule by rule over all of its readings at once. Sensors are numbered as
+    they are first seen; their sensitivity and zone are kept in arrays indexed
+    by that number, and each window duration any rule uses has a WindowStats
+    fed with every batch before the rules run, so window statistics include
+    the batch itself.
+
+    A rule fires at most once per sensor per cooldown. Rule and sensor changes
+    arrive on the event bus and are picked up before the next batch, in every
+    process sharing the bus. An engine created with live=False never reads
+    the database or the bus; it runs the rules given to load() against
+    sensors it only knows from their readings.
+    """
+
+    def __init__(self, cooldown: Optional[float] = None, live: bool = True):
+        self.live = live
+        self.cooldown = settings.ALERT_COOLDOWN_SECONDS if cooldown is None else cooldown
+        self.rules: List[CompiledRule] = []
+        self.errors: Dict[str, str] = {}
+        self.windows: Dict[float, WindowStats] = {}
+        self.index: Dict[str, int] = {}
+        self.sensor_ids: List[str] = []
+        self.sensitivity = np.zeros(0)
+        self.zone_paths: List[str] = []
+        self.locations: List[str] = []
+        self.zone_ids: List[Optional[int]] = []
+        self._last_fired: Dict[Optional[int], np.ndarray] = {}
+        self._zone_members: Dict[str, np.ndarray] = {}
+        self._rules_stale = True
+        self._sensors_stale = True
+        self._lock = threading.Lock()
+        self._subscribed = False
+
+    def _subscribe(self) -> None:
+        from . import events
+
+        def changed(event):
+            if event.topic == events.RULES_CHANGED:
+                self._rules_stale = True
+            else:
+                self._sensors_stale = True
+        events.get_event_bus().subscribe(changed, (events.RULES_CHANGED, events.SENSOR_UPDATED))
+        self._subscribed = True
+
+    def load(self, rules: Sequence[Any]) -> None:
+        """Compile rules (AlertRule objects or anything with the same fields), skipping ones that don't compile"""
+        compiler = RuleCompiler(self)
+        compiled, errors = [], {}
+        for rule in rules:
+            try:
+                predicate = compiler.compile(rule.expression)
+            except ValueError as e:
+                errors[rule.name] = str(e)
+                logger.warning("Skipping alert rule '%s': %s", rule.name, e)
+                continue
+            cooldown = self.cooldown if rule.cooldown is None else rule.cooldown
+            compiled.append(CompiledRule(rule.id, rule.name, rule.expression, rule.priority,
+                                         rule.title or rule.name, cooldown, predicate))
+        self.windows = {seconds: self.windows.get(seconds) or WindowStats(seconds) for seconds in compiler.windows}
+        for stats in self.windows.values():
+            stats.grow(len(self.index))
+        self.rules, self.errors = compiled, errors
+        self._last_fired = {rule.id: self._last_fired.get(rule.id, np.full(len(self.index), -np.inf))
+                            for rule in compiled}
+
+    def reload(self) -> None:
+        from ..models import AlertRule, Sensor
+
+        if not self._subscribed:
+            self._subscribe()
+        if self._sensors_stale:
+            self._sensors_stale = False
+            for sensor_id, sensitivity, location, zone_id, path in Sensor.objects.values_list(
+                    'sensor_id', 'sensitivity', 'location', 'zone_id', 'zone__path'):
+                index = self._sensor(sensor_id)
+                self.sensitivity[index] = sensitivity
+                self.locations[index] = location or sensor_id
+                self.zone_ids[index] = zone_id
+                self.zone_paths[index] = path or ''
+            self._zone_members = {}
+        if self._rules_stale:
+            self._rules_stale = False
+            self.load(AlertRule.objects.filter(enabled=True).order_by('id'))
+
+    def _sensor(self, sensor_id: str) -> int:
+        index = self.index.get(sensor_id)
+        if index is None:
+            index = self.index[sensor_id] = len(self.index)
+            self.sensor_ids.append(sensor_id)
+            self.sensitivity = np.append(self.sensitivity, 0.5)
+            self.locations.append(sensor_id)
+            self.zone_ids.append(None)
+            self.zone_paths.append('')
+            self._zone_members = {}
+        return index
+
+    def zone_members(self, zone: str) -> Callable[[], np.ndarray]:
+        """Function returning, per sensor number, whether the sensor is in the zone (by name or id) or below it"""
+        from ..models import Zone
+        from .zones import zone_index
+
+        try:
+            marker = f'/{zone_index.get(zone).id}/'
+        except Zone.DoesNotExist:
+            raise ValueError(f"Unknown zone '{zone}'") from None
+
+        def members() -> np.ndarray:
+            if marker not in self._zone_members:
+                self._zone_members[marker] = np.array([marker in path for path in self.zone_paths], dtype=bool)
+            return self._zone_members[marker]
+        return members
+
+    def evaluate(self, sensor_ids: Sequence[str], types: Sequence[str], values: Sequence[float],
+                 times: Sequence[float]) -> List[Dict[str, Any]]:
+        """
+        Run every rule over a batch of readings (times as Unix timestamps)
+
+        Returns the alerts to raise: at most one per rule and sensor, for the
+        sensor's first matching reading outside the rule's cooldown.
+        """
+        if not len(values):
+            return []
+        with self._lock:
+            if self.live:
+                self.reload()
+            ids, inverse = np.unique(np.asarray(sensor_ids), return_inverse=True)
+            numbers = np.array([self._sensor(sensor_id) for sensor_id in ids], dtype=np.int64)
+            batch = Batch(self, numbers[inverse], np.asarray(types), np.asarray(values, dtype=np.float64),
+                          np.asarray(times, dtype=np.float64))
+            for stats in self.windows.values():
+                stats.grow(len(self.index))
+                stats.add(batch.sensors, batch.values, batch.times)
+
+            alerts = []
+            for rule in self.rules:
+                try:
+                    matched = np.flatnonzero(rule.predicate(batch))
+                except Exception:
+                    logger.exception("Alert rule '%s' failed", rule.name)
+                    continue
+                if not len(matched):
+                    continue
+                last_fired = self._last_fired[rule.id]
+                if len(last_fired) < len(self.index):
+                    last_fired = self._last_fired[rule.id] = np.concatenate(
+                        [last_fired, np.full(len(self.index) - len(last_fired), -np.inf)])
+                # The first matching reading per sensor that is out of the sensor's cooldown
+                matched = matched[batch.times[matched] - last_fired[batch.sensors[matched]] >= rule.cooldown]
+                sensors, first = np.unique(batch.sensors[matched], return_index=True)
+                rows = matched[first]
+                last_fired[sensors] = batch.times[rows]
+                for row in rows:
+                    alerts.append(self._alert(rule, batch, int(row)))
+            return alerts
+
+    def warm(self, sensor_ids: Sequence[str], values: Sequence[float], times: Sequence[float]) -> None:
+        """Feed readings into the windows without running the rules, e.g. history after a restart"""
+        if not len(values):
+            return
+        with self._lock:
+            if self.live:
+                self.reload()
+            ids, inverse = np.unique(np.asarray(sensor_ids), return_inverse=True)
+            numbers = np.array([self._sensor(sensor_id) for sensor_id in ids], dtype=np.int64)
+            for stats in self.windows.values():
+                stats.grow(len(self.index))
+                stats.add(numbers[inverse], np.asarray(values, dtype=np.float64), np.asarray(times, dtype=np.float64))
+
+    def mark_fired(self, title: str, sensor_id: str, when: float) -> None:
+        """Start the cooldown of the rules raising alerts titled `title` for a sensor, as of `when`"""
+        with self._lock:
+            if self.live:
+                self.reload()
+            sensor = self._sensor(sensor_id)
+            for rule in self.rules:
+                if rule.title == title:
+                    last_fired = self._last_fired[rule.id]
+                    if len(last_fired) < len(self.index):
+                        last_fired = self._last_fired[rule.id] = np.concatenate(
+                            [last_fired, np.full(len(self.index) - len(last_fired), -np.inf)])
+                    last_fired[sensor] = max(last_fired[sensor], when)
+
+    @property
+    def longest_window(self) -> float:
+        return max(self.windows, default=0.0)
+
+    @property
+    def longest_cooldown(self) -> float:
+        return max((rule.cooldown for rule in self.rules), default=0.0)
+
+    def _alert(self, rule: CompiledRule, batch: Batch, row: int) -> Dict[str, Any]:
+        sensor = int(batch.sensors[row])
+        return {
+            "rule": rule.name,
+            "ruleId": rule.id,
+            "priority": rule.priority,
+            "title": rule.title,
+            "sensorId": self.sensor_ids[sensor],
+            "type": str(batch.types[row]),
+            "location": self.locations[sensor],
+            "zoneId": self.zone_ids[sensor],
+            "value": float(batch.values[row]),
+            "time": float(batch.times[row]),
+        }
+
+
+class RuleRunner:
+    """
+    Runs the alert rules over every stored sensor reading, in one process.
+
+    Rule windows and cooldowns only mean something when a single engine sees
+    all of a sensor's readings, so rules are not evaluated by the ingestion
+    log appliers (one per worker, each with a share of the readings) but here,
+    reading SensorReading in id order from a checkpoint. Alerts raised by a
+    batch are saved in the same transaction that moves the checkpoint, so a
+    crash never raises them twice; a busy database is retried with backoff
+    without evaluating the batch again. One runner per database: claim() takes
+    a lock on ALERT_RULES_LOCK_FILE and fails while another runner holds it.
+
+    On start, windows are refilled from the readings already past the
+    checkpoint and cooldowns from the alerts rules recently raised, so a
+    restart neither forgets recent history nor repeats alerts.
+    """
+
+    CHECKPOINT = 'alert-rules'
+
+    def __init__(self, engine: Optional[RuleEngine] = None, batch_size: Optional[int] = None):
+        self.engine = engine or RuleEngine()
+        self.batch_size = batch_size or settings.INGEST_APPLY_BATCH
+        self.position = 0
+        self._lock_fd: Optional[int] = None
+        self.stats = {"readings": 0, "batches": 0, "alerts": 0, "retries": 0}
+
+    def claim(self) -> bool:
+        """Become the only runner; False if another one is running"""
+        fd = os.open(settings.ALERT_RULES_LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def start(self, now: Optional[float] = None) -> None:
+        """Load the checkpoint and refill windows and cooldowns from recent history"""
+        from ..models import Alert, IngestCheckpoint, SensorReading
+
+        now = time.time() if now is None else now
+        checkpoint = IngestCheckpoint.objects.filter(name=self.CHECKPOINT).values_list('position', flat=True).first()
+        if checkpoint is None:
+            # First run: rules apply from now on, not to the whole history
+            checkpoint = SensorReading.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            IngestCheckpoint.objects.update_or_create(name=self.CHECKPOINT, defaults={"position": checkpoint})
+        self.position = checkpoint
+        self.engine.reload()
+
+        since = datetime.fromtimestamp(now - self.engine.longest_window, dt_timezone.utc)
+        history = list(SensorReading.objects.filter(id__lte=self.position, recorded_at__gte=since)
+                       .order_by('id').values_list('sensor_id', 'value', 'recorded_at'))
+        if history:
+            sensor_ids, values, recorded = zip(*history)
+            self.engine.warm(sensor_ids, values, [when.timestamp() for when in recorded])
+        since = datetime.fromtimestamp(now - self.engine.longest_cooldown, dt_timezone.utc)
+        for title, sensor_id, created_at in (Alert.objects.filter(created_at__gte=since).exclude(sensor_id='')
+                                             .values_list('title', 'sensor_id', 'created_at')):
+            self.engine.mark_fired(title, sensor_id, created_at.timestamp())
+
+    def run_once(self) -> int:
+        """Evaluate the next batch of readings; returns how many there were"""
+        from ..models import SensorReading
+
+        readings = list(SensorReading.objects.filter(id__gt=self.position).order_by('id')
+                        .values_list('id', 'sensor_id', 'sensor_type', 'value', 'recorded_at')[:self.batch_size])
+        if not readings:
+            return 0
+        ids, sensor_ids, types, values, recorded = zip(*readings)
+        matches = self.engine.evaluate(sensor_ids, types, values, [when.timestamp() for when in recorded])
+        self._save(matches, ids[-1])
+        self.position = ids[-1]
+        self.stats["readings"] += len(readings)
+        self.stats["batches"] += 1
+        self.stats["alerts"] += len(matches)
+        return len(readings)
+
+    def _save(self, matches: List[Dict[str, Any]], position: int) -> None:
+        """Raise the batch's alerts and move the checkpoint together, waiting out a busy database"""
+        from ..models import Alert, IngestCheckpoint
+        from .correlation import source_of
+
+        delay = 0.05
+        while True:
+            try:
+                with transaction.atomic():
+                    for match in matches:
+                        Alert(
+                            title=match["title"],
+                            location=match["location"],
+                            priority=match["priority"],
+                            description=f"Rule '{match['rule']}' matched {match['sensorId']} at {match['value']:.2f}",
+                            zone_id=match["zoneId"],
+                            source=source_of(match["type"]),
+                            sensor_id=match["sensorId"],
+                            created_at=datetime.fromtimestamp(match["time"], dt_timezone.utc),
+                        ).save()
+                    IngestCheckpoint.objects.update_or_create(name=self.CHECKPOINT, defaults={"position": position})
+                return
+            except OperationalError:
+                logger.warning('Database unavailable saving rule alerts; retrying in %.2fs', delay)
+                self.stats["retries"] += 1
+                time.sleep(delay)
+                delay = min(delay * 2, 5.0)
+
+    def close(self) -> None:
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+
+def validate_expression(expression: str) -> None:
+    """Raise ValueError if an expression would not compile"""
+    RuleCompiler(RuleEngine(live=False)).compile(expression)
@@ -0,0 +1,263 @@
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.exceptions import FullResultSet
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ..models import Alert, Incident
+
+
+# Relative time phrases understood inside a free-text query
+_UNITS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+    'month': timedelta(days=30),
+    'year': timedelta(days=365),
+}
+_RELATIVE_TIME = re.compile(
+    r'\b(?:(?P<today>today)|(?P<yesterday>yesterday)'
+    r'|(?:last|past)\s+(?:(?P<count>\d+)\s+)?(?P<unit>hour|day|week|month|year)s?)\b',
+    re.IGNORECASE,
+)
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+class SearchService:
+    """
+    Full-text and faceted search over incidents and alerts.
+
+    On SQLite, text matching goes through the FTS5 indexes created in migration
+    0004 (kept in sync by triggers). Other backends fall back to case-insensitive
+    ORM filtering.
+
+    Every query touches at most SEARCH_COUNT_LIMIT matching rows: totals are
+    counted up to that limit, and results are ranked by bm25 with exact facet
+    counts only when the match set fits under it. Broader queries return the
+    newest matches, a lower-bound total and no facets, so a one-word query over
+    a million incidents costs about the same as a narrow one.
+    """
+
+    # kind -> (model, time field, full-text columns)
+    SOURCES = {
+        'incidents': (Incident, 'original_alert_time', ('title', 'description', 'location', 'resolved_by')),
+        'alerts': (Alert, 'created_at', ('title', 'description', 'location')),
+    }
+    FACETS = ('priority', 'status')
+
+    def __init__(self, count_limit: Optional[int] = None):
+        self.count_limit = count_limit or getattr(settings, 'SEARCH_COUNT_LIMIT', 10000)
+
+    def search(
+        self,
+        query: str = '',
+        kind: str = 'incidents',
+        priority: Sequence[str] = (),
+        status: Sequence[str] = (),
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 20,
+        offset: int = 0,
+        now: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """
+        Search one kind of record
+
+        Relative time phrases in the query ("last month", "past 3 days",
+        "yesterday") become a time-range filter unless since/until are given.
+
+        Returns:
+            Matching records, the match count and facet counts
+        """
+        if kind not in self.SOURCES:
+            raise ValueError(f"Unknown search type '{kind}'. Use one of: {', '.join(self.SOURCES)}")
+        model, time_field, columns = self.SOURCES[kind]
+
+        text, phrase_since, phrase_until = self.parse_time_range(query, now or timezone.now())
+        since = since or phrase_since
+        until = until or phrase_until
+        terms = [token.lower() for token in _TOKEN.findall(text)]
+
+        base = model.objects.all()
+        if since:
+            base = base.filter(**{f'{time_field}__gte': since})
+        if until:
+            base = base.filter(**{f'{time_field}__lt': until})
+        filters = {'priority': list(priority), 'status': list(status)}
+        filtered = self._apply_filters(base, filters)
+
+        fts_match = self._fts_match(terms)
+        if fts_match:
+            fts = f'{model._meta.db_table}_fts'
+            total, facets = self._fts_counts(model, fts, fts_match, base, filtered, filters)
+            exact = facets is not None
+            order = f'bm25({fts})' if exact else f'{fts}.rowid DESC'
+            results = self._fts_page(model, fts, fts_match, filtered, order, limit, offset)
+        else:
+            base = self._icontains(base, columns, terms)
+            matches = self._icontains(filtered, columns, terms)
+            total = matches.order_by()[:self.count_limit + 1].count()
+            exact = total <= self.count_limit
+            results = list(matches.order_by(f'-{time_field}')[offset:offset + limit])
+            facets = self._facets(base, filters) if exact else None
+
+        return {
+            "query": query,
+            "type": kind,
+            "since": since.isoformat() if since else None,
+            "until": until.isoformat() if until else None,
+            "total": min(total, self.count_limit),
+            "totalExact": exact,
+            "orderedBy": "relevance" if fts_match and exact else "recent",
+            "results": [record.to_dict() for record in results],
+            "facets": facets,
+        }
+
+    @staticmethod
+    def parse_time_range(query: str, now: datetime) -> Tuple[str, Optional[datetime], Optional[datetime]]:
+        """
+        Pull a relative time phrase out of a query
+
+        Returns:
+            The remaining text and the (since, until) range, or None for either bound
+        """
+        match = _RELATIVE_TIME.search(query or '')
+        if not match:
+            return query or '', None, None
+        text = (query[:match.start()] + ' ' + query[match.end():]).strip()
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if match.group('today'):
+            return text, midnight, None
+        if match.group('yesterday'):
+            return text, midnight - timedelta(days=1), midnight
+        count = int(match.group('count') or 1)
+        return text, now - _UNITS[match.group('unit').lower()] * count, None
+
+    @staticmethod
+    def _apply_filters(queryset, filters: Dict[str, List[str]], skip: Optional[str] = None):
+        for field, values in filters.items():
+            if values and field != skip:
+                queryset = queryset.filter(**{f'{field}__in': values})
+        return queryset
+
+    @staticmethod
+    def _fts_match(terms: List[str]) -> Optional[str]:
+        """
+        Build an FTS5 query requiring every term, or None when FTS is unavailable
+
+        Every token is quoted so user input can't inject FTS syntax. Only the last
+        token is prefix-matched, to support search-as-you-type without paying for
+        prefix expansion on every term.
+        """
+        if not terms or connection.vendor != 'sqlite':
+            return None
+        quoted = [f'"{term}"' for term in terms]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    @staticmethod
+    def _fts_from(model, fts: str, queryset) -> Tuple[str, list]:
+        """
+        FROM/WHERE clause joining FTS hits to their rows and applying the queryset's filters
+
+        The FTS table drives the join (CROSS JOIN pins the order in SQLite), so the
+        filters are checked per hit by primary key instead of by scanning the table.
+        """
+        table = model._meta.db_table
+        sql = f'FROM {fts} CROSS JOIN "{table}" ON "{table}"."id" = {fts}.rowid WHERE {fts} MATCH %s'
+        try:
+            where_sql, where_params = queryset.query.get_compiler(connection=connection).compile(
+                queryset.query.where
+            )
+        except FullResultSet:
+            where_sql, where_params = '', []
+        if where_sql:
+            sql += f' AND {where_sql}'
+        return sql, list(where_params)
+
+    def _fts_counts(self, model, fts: str, fts_match: str, base, filtered, filters):
+        """
+        Count text matches and their facets
+
+        When the unfiltered match set fits under the count limit, a single
+        GROUP BY over every facet yields the total and all facet counts at once.
+        Otherwise only a capped count is taken.
+
+        Returns:
+            The (possibly capped) total and the facet counts, or None when capped
+        """
+        if self._fts_capped_count(model, fts, fts_match, base) > self.count_limit:
+            return self._fts_capped_count(model, fts, fts_match, filtered), None
+
+        table = model._meta.db_table
+        columns = ', '.join(f'"{table}"."{facet}"' for facet in self.FACETS)
+        from_sql, params = self._fts_from(model, fts, base)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT {columns}, COUNT(*) {from_sql} GROUP BY {columns}', [fts_match, *params])
+            cells = cursor.fetchall()
+
+        def selected(cell, skip=None):
+            return all(
+                not filters[field] or cell[index] in filters[field]
+                for index, field in enumerate(self.FACETS)
+                if field != skip
+            )
+
+        total = sum(cell[-1] for cell in cells if selected(cell))
+        facets = {}
+        for index, facet in enumerate(self.FACETS):
+            counts: Dict[str, int] = {}
+            for cell in cells:
+                if selected(cell, skip=facet):
+                    counts[cell[index]] = counts.get(cell[index], 0) + cell[-1]
+            facets[facet] = counts
+        return total, facets
+
+    def _fts_capped_count(self, model, fts: str, fts_match: str, queryset) -> int:
+        """Count matches, stopping one past the count limit"""
+        from_sql, params = self._fts_from(model, fts, queryset)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM (SELECT 1 {from_sql} LIMIT %s)',
+                [fts_match, *params, self.count_limit + 1],
+            )
+            return cursor.fetchone()[0]
+
+    def _fts_page(self, model, fts: str, fts_match: str, queryset, order: str, limit: int, offset: int) -> list:
+        """Fetch one page of matching records in the given order"""
+        from_sql, params = self._fts_from(model, fts, queryset)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {fts}.rowid {from_sql} ORDER BY {order} LIMIT %s OFFSET %s',
+                [fts_match, *params, limit, offset],
+            )
+            page_ids = [row[0] for row in cursor.fetchall()]
+        records = model.objects.in_bulk(page_ids)
+        return [records[record_id] for record_id in page_ids]
+
+    @staticmethod
+    def _icontains(queryset, columns, terms: List[str]):
+        """Fallback text filter requiring every term in at least one column"""
+        for term in terms:
+            condition = Q()
+            for column in columns:
+                condition |= Q(**{f'{column}__icontains': term})
+            queryset = queryset.filter(condition)
+        return queryset
+
+    def _facets(self, base, filters: Dict[str, List[str]]) -> Dict[str, Dict[str, int]]:
+        """
+        Count matches per facet value
+
+        Each facet is counted with every other facet's filter applied but not its
+        own, so the counts show what selecting another value would return.
+        """
+        facets = {}
+        for facet in self.FACETS:
+            rows = self._apply_filters(base, filters, skip=facet).order_by().values(facet).annotate(count=Count('id'))
+            facets[facet] = {row[facet]: row['count'] for row in rows}
+        return facets
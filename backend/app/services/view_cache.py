@@ -0,0 +1,188 @@
+import functools
+import hashlib
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class ViewCache:
+    """
+    Read-through cache for computed API responses, with tag invalidation.
+
+    Entries live in one of the Django cache backends: the shared file cache
+    ('shared'), which every worker process on the host sees, or the in-process
+    LRU ('default', LocMemCache). VIEW_CACHE_BACKEND picks one. Invalidation is a
+    write to the same cache, so with the in-process LRU a write made by another
+    process (run_rules, run_correlation, another worker) is never seen here; it
+    is only fit for a single process doing everything.
+
+    Every entry is tagged with the resources it was computed from. Each tag has
+    a version stored next to the entries; an entry records the versions it was
+    computed under and is only served while they are all still current, so
+    invalidating a tag is a single write however many entries carry it.
+
+    A cold key is computed once: callers in the same process wait on a per-key
+    lock, and other processes wait on a short lease taken with cache.add(),
+    polling for the value until the lease runs out.
+    """
+
+    def __init__(self, alias: Optional[str] = None, timeout: Optional[float] = None,
+                 lease_seconds: Optional[float] = None):
+        self.alias = alias or settings.VIEW_CACHE_BACKEND
+        self.timeout = timeout or settings.VIEW_CACHE_TIMEOUT
+        self.lease_seconds = lease_seconds or settings.VIEW_CACHE_LEASE_SECONDS
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "computed": 0, "waited": 0, "invalidated": 0}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    @staticmethod
+    def _tag_key(tag: str) -> str:
+        return f'tag:{tag}'
+
+    def _versions(self, tags: Sequence[str], known: Dict[str, Any]) -> List[str]:
+        """Current version of each tag, giving a fresh version to tags the cache has dropped"""
+        versions = []
+        for tag in tags:
+            version = known.get(self._tag_key(tag))
+            if version is None:
+                version = uuid.uuid4().hex
+                if not self.cache.add(self._tag_key(tag), version, None):
+                    version = self.cache.get(self._tag_key(tag), version)
+            versions.append(version)
+        return versions
+
+    def _lookup(self, key: str, tags: Sequence[str]):
+        """The cached value if it is still current, and the current tag versions"""
+        found = self.cache.get_many([key] + [self._tag_key(tag) for tag in tags])
+        versions = self._versions(tags, found)
+        entry = found.get(key)
+        if entry is not None and entry[0] == versions:
+            return entry[1], versions
+        return None, versions
+
+    def get_or_compute(self, key: str, tags: Sequence[str], compute: Callable[[], Any],
+                       timeout: Optional[float] = None) -> Any:
+        """Return the cached value for `key`, computing and storing it on a miss"""
+        tags = sorted(set(tags))
+        value, versions = self._lookup(key, tags)
+        if value is not None:
+            self._count("hits")
+            return value
+        self._count("misses")
+
+        with self._locks_lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            # Someone in this process may have filled it while we waited
+            value, versions = self._lookup(key, tags)
+            if value is not None:
+                self._count("waited")
+                return value
+
+            lease = f'{key}:lease'
+            if not self.cache.add(lease, 1, self.lease_seconds):
+                # Another process is computing it; wait for its result
+                deadline = time.monotonic() + self.lease_seconds
+                while time.monotonic() < deadline:
+                    time.sleep(0.02)
+                    value, versions = self._lookup(key, tags)
+                    if value is not None:
+                        self._count("waited")
+                        return value
+            try:
+                # Versions read before computing: an invalidation that lands while
+                # we compute leaves this entry already stale, never wrongly current
+                value = compute()
+                self.cache.set(key, (versions, value), timeout or self.timeout)
+                self._count("computed")
+            finally:
+                self.cache.delete(lease)
+        with self._locks_lock:
+            if self._locks.get(key) is lock and not lock.locked():
+                del self._locks[key]
+        return value
+
+    def invalidate(self, *tags: str) -> None:
+        """Make every entry carrying any of `tags` stale"""
+        self.cache.set_many({self._tag_key(tag): uuid.uuid4().hex for tag in tags}, None)
+        self._count("invalidated", len(tags))
+
+    def request_key(self, request) -> str:
+        query = '&'.join(f'{name}={value}' for name, values in sorted(request.query_params.lists())
+                         for value in values)
+        return f'view:{request.path}:{hashlib.md5(query.encode()).hexdigest()}'
+
+
+def zone_tags(resource: str, zone=None) -> List[str]:
+    """
+    Tags for a list of `resource` filtered to a zone's subtree, or unfiltered
+
+    Filtered lists are tagged per zone so a change in one zone leaves the lists
+    of unrelated zones alone; see changed_zone_tags().
+    """
+    if zone is None:
+        return [resource]
+    return [f'{resource}@{zone.id}', 'zones']
+
+
+def changed_zone_tags(resource: str, paths: Iterable[str]) -> List[str]:
+    """Tags to invalidate when a `resource` in zones with these paths changes: the zones and their ancestors"""
+    tags = {resource}
+    for path in paths:
+        tags.update(f'{resource}@{zone_id}' for zone_id in path.strip('/').split('/') if zone_id)
+    return sorted(tags)
+
+
+class CacheUnavailable(Exception):
+    """Raised inside a cached computation to return its response without caching it"""
+
+    def __init__(self, response: Response):
+        self.response = response
+
+
+def cached_view(*tags: str, timeout: Optional[float] = None):
+    """
+    Cache a GET view's response data under its path and query string
+
+    Place below @api_view. Only successful responses are cached; the response
+    reports X-Cache: hit or miss.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            computed = []
+
+            def compute():
+                response = view(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    raise CacheUnavailable(response)
+                computed.append(True)
+                return response.data
+
+            try:
+                data = view_cache.get_or_compute(view_cache.request_key(request), tags, compute, timeout)
+            except CacheUnavailable as e:
+                return e.response
+            response = Response(data)
+            response['X-Cache'] = 'miss' if computed else 'hit'
+            return response
+        return wrapper
+    return decorator
+
+
+view_cache = ViewCache()
@@ -0,0 +1,95 @@
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from django.db.models import QuerySet
+
+from ..models import Camera, Zone
+
+
+_CAMERA_NAME = re.compile(r'^\s*(CAM_\d+)\b', re.IGNORECASE)
+
+
+class ZoneIndex:
+    """
+    Resolves free-text locations to zones and filters querysets by zone subtree.
+
+    Locations look like "CAM_12 - Entrance Hall" or "Parking Lot A". A location
+    resolves to the zone of its camera when the camera is known, otherwise to the
+    zone with the longest name that prefixes the area part of the location.
+
+    The name lookups are cached per process and rebuilt lazily after any zone is
+    saved or deleted in this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._zone_names: Optional[List[Tuple[str, int]]] = None
+        self._camera_zones: Optional[Dict[str, int]] = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._zone_names = None
+            self._camera_zones = None
+
+    def resolve(self, location: str) -> Optional[int]:
+        """
+        Map a location string to a zone id
+
+        Returns:
+            The zone id, or None when nothing matches
+        """
+        if not location:
+            return None
+        zone_names, camera_zones = self._load()
+
+        area = location
+        camera = _CAMERA_NAME.match(location)
+        if camera:
+            zone_id = camera_zones.get(camera.group(1).upper())
+            if zone_id:
+                return zone_id
+            area = location[camera.end():].lstrip(' -')
+
+        area = area.strip().lower()
+        for name, zone_id in zone_names:
+            if area == name or area.startswith(name + ' '):
+                return zone_id
+        return None
+
+    @staticmethod
+    def get(ref: str) -> Zone:
+        """
+        Look up a zone by id or by (case-insensitive) name
+
+        Raises:
+            Zone.DoesNotExist: when no zone matches
+        """
+        if str(ref).isdigit():
+            return Zone.objects.get(id=int(ref))
+        zone = Zone.objects.filter(name__iexact=ref).order_by('path').first()
+        if zone is None:
+            raise Zone.DoesNotExist(f"Zone '{ref}' not found")
+        return zone
+
+    @staticmethod
+    def filter(queryset: QuerySet, zone: Zone) -> QuerySet:
+        """Restrict a queryset with a `zone` foreign key to a zone's subtree"""
+        return queryset.filter(zone__in=zone.subtree().values('id'))
+
+    def _load(self):
+        with self._lock:
+            if self._zone_names is None:
+                # Longest names first so "Parking Lot A" wins over "Parking Lot"
+                self._zone_names = sorted(
+                    ((name.lower(), zone_id) for zone_id, name in Zone.objects.values_list('id', 'name')),
+                    key=lambda item: -len(item[0]),
+                )
+                self._camera_zones = {
+                    name.upper(): zone_id
+                    for name, zone_id in Camera.objects.filter(zone__isnull=False).values_list('name', 'zone_id')
+                }
+            return self._zone_names, self._camera_zones
+
+
+zone_index = ZoneIndex()
@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Alert, AlertRule, Camera, Incident, Sensor, Zone
+from .services import events
+from .services.view_cache import changed_zone_tags, view_cache
+
+
+# Zoned models and the cache resource their lists are tagged with
+_ZONED = {Sensor: 'sensors', Camera: 'cameras'}
+
+
+@receiver(pre_save, sender=Sensor)
+@receiver(pre_save, sender=Camera)
+def remember_zone(sender, instance, **kwargs):
+    # A record moving between zones changes the lists of both
+    instance._previous_zone_id = (
+        sender.objects.filter(pk=instance.pk).values_list('zone_id', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Sensor)
+@receiver(post_save, sender=Camera)
+@receiver(post_delete, sender=Sensor)
+@receiver(post_delete, sender=Camera)
+def invalidate_zoned(sender, instance, **kwargs):
+    zone_ids = {instance.zone_id, getattr(instance, '_previous_zone_id', None)} - {None}
+    paths = Zone.objects.filter(id__in=zone_ids).values_list('path', flat=True) if zone_ids else []
+    view_cache.invalidate(*changed_zone_tags(_ZONED[sender], paths))
+
+
+# No post_delete for alerts: only retention deletes them, in bulk, long after they
+# stop counting towards anything cached, and a receiver would cost it fast deletes
+@receiver(post_save, sender=Alert)
+def invalidate_alerts(sender, instance, created=False, **kwargs):
+    view_cache.invalidate('alerts')
+    if created:
+        # Only once committed: subscribers such as the correlator write back to the alert
+        payload = instance.to_dict()
+        transaction.on_commit(lambda: events.publish(events.ALERT_CREATED, payload))
+
+
+@receiver(post_save, sender=Sensor)
+def publish_sensor(sender, instance, **kwargs):
+    events.publish(events.SENSOR_UPDATED, instance.to_dict())
+
+
+@receiver(post_save, sender=AlertRule)
+@receiver(post_delete, sender=AlertRule)
+def publish_rules(sender, instance, **kwargs):
+    events.publish(events.RULES_CHANGED, instance.to_dict())
+
+
+@receiver(post_save, sender=Incident)
+@receiver(post_delete, sender=Incident)
+def invalidate_incidents(sender, instance, **kwargs):
+    view_cache.invalidate('incidents')
+
+
+@receiver(post_save, sender=Zone)
+@receiver(post_delete, sender=Zone)
+def invalidate_zones(sender, instance, **kwargs):
+    view_cache.invalidate('zones')
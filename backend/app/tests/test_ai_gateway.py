@@ -0,0 +1,180 @@
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from app.services.ai_gateway import AIGateway, CircuitBreaker
+from app.services.ai_stub import StubModel
+from app.services.gemini_service import GeminiService
+
+
+CONTENT = {"readings": [0.2, 0.3, 0.25, 0.9]}
+
+
+class AIGatewayTests(SimpleTestCase):
+    """AIGateway in front of a StubModel with injected errors and slowness"""
+
+    def _gateway(self, model, breaker=None, **kwargs):
+        service = GeminiService(api_key='stub')
+        service.model = model
+        kwargs.setdefault('rate', 1000.0)
+        kwargs.setdefault('burst', 100)
+        kwargs.setdefault('max_concurrent', 2)
+        kwargs.setdefault('queue_size', 0)
+        kwargs.setdefault('queue_timeout', 0.0)
+        kwargs.setdefault('timeout', 5.0)
+        gateway = AIGateway(service, breaker=breaker or CircuitBreaker(3, 5.0, 60.0), **kwargs)
+        self.addCleanup(gateway.shutdown)
+        return gateway
+
+    @staticmethod
+    def _model(**kwargs):
+        kwargs.setdefault('base_latency', 0.0)
+        kwargs.setdefault('per_token_latency', 0.0)
+        return StubModel(seed=0, **kwargs)
+
+    def _in_background(self, gateway):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(gateway.analyze('sensor', CONTENT)))
+        thread.start()
+        self.addCleanup(thread.join)
+        return thread, results
+
+    def test_healthy_model_answers(self):
+        model = self._model()
+        gateway = self._gateway(model)
+        result = gateway.analyze('sensor', CONTENT)
+        self.assertTrue(result["success"])
+        self.assertNotIn("fallback", result)
+        self.assertEqual((model.calls, gateway.stats["calls"]), (1, 1))
+
+    def test_breaker_opens_after_failure_threshold(self):
+        model = self._model(error_rate=1.0)
+        breaker = CircuitBreaker(3, 5.0, 60.0)
+        gateway = self._gateway(model, breaker)
+        for _ in range(3):
+            self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+            result = gateway.analyze('sensor', CONTENT)
+            self.assertTrue(result["fallback"])
+            self.assertEqual(result["reason"], "failed")
+            self.assertEqual(result["error"], "Injected model failure")
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.opened, 1)
+
+        # Refused without calling the model
+        result = gateway.analyze('sensor', CONTENT)
+        self.assertEqual((result["fallback"], result["reason"]), (True, "circuit_open"))
+        self.assertEqual(model.calls, 3)
+        self.assertEqual((gateway.stats["failed"], gateway.stats["circuit_open"]), (3, 1))
+
+    def test_slow_calls_count_as_failures(self):
+        model = self._model(base_latency=0.1)
+        breaker = CircuitBreaker(2, 0.05, 60.0)
+        gateway = self._gateway(model, breaker)
+        for _ in range(2):
+            # Slow, but still answered by the model
+            self.assertNotIn("fallback", gateway.analyze('sensor', CONTENT))
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_lets_exactly_one_probe_through(self):
+        model = self._model(error_rate=1.0)
+        breaker = CircuitBreaker(1, 5.0, 0.1)
+        gateway = self._gateway(model, breaker, max_concurrent=4)
+        gateway.analyze('sensor', CONTENT)
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        time.sleep(0.15)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+
+        model.error_rate, model.base_latency = 0.0, 0.3
+        probe, results = self._in_background(gateway)
+        time.sleep(0.1)
+        for _ in range(3):
+            result = gateway.analyze('sensor', CONTENT)
+            self.assertEqual((result["fallback"], result["reason"]), (True, "circuit_open"))
+        probe.join()
+        self.assertEqual(model.calls, 2)
+
+        # The probe succeeded, so the circuit closed again
+        self.assertNotIn("fallback", results[0])
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        model.base_latency = 0.0
+        self.assertNotIn("fallback", gateway.analyze('sensor', CONTENT))
+
+    def test_failed_probe_opens_the_circuit_again(self):
+        model = self._model(error_rate=1.0)
+        breaker = CircuitBreaker(3, 5.0, 0.1)
+        gateway = self._gateway(model, breaker)
+        for _ in range(3):
+            gateway.analyze('sensor', CONTENT)
+        time.sleep(0.15)
+        self.assertEqual(gateway.analyze('sensor', CONTENT)["reason"], "failed")
+        # One failed probe is enough, below the failure threshold
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.opened, 2)
+
+    def test_requests_beyond_capacity_are_shed(self):
+        model = self._model(base_latency=0.3)
+        gateway = self._gateway(model, max_concurrent=1, queue_size=0)
+        busy, _ = self._in_background(gateway)
+        time.sleep(0.1)
+        result = gateway.analyze('sensor', CONTENT)
+        self.assertEqual((result["fallback"], result["reason"]), (True, "overloaded"))
+        self.assertIn("risk_level", result["analysis"])
+        busy.join()
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(gateway.stats["overloaded"], 1)
+
+    def test_requests_over_the_rate_limit_are_shed(self):
+        model = self._model()
+        gateway = self._gateway(model, rate=0.001, burst=1)
+        self.assertNotIn("fallback", gateway.analyze('sensor', CONTENT))
+        result = gateway.analyze('sensor', CONTENT)
+        self.assertEqual((result["fallback"], result["reason"]), (True, "rate_limited"))
+        self.assertEqual(model.calls, 1)
+
+    def test_abandoned_call_keeps_its_slot_until_it_returns(self):
+        model = self._model(base_latency=0.5)
+        breaker = CircuitBreaker(10, 5.0, 60.0)
+        gateway = self._gateway(model, breaker, max_concurrent=1, timeout=0.05)
+        started = time.monotonic()
+        result = gateway.analyze('sensor', CONTENT)
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertEqual((result["fallback"], result["reason"]), (True, "timed_out"))
+
+        # The model is still working on the abandoned call, holding the only slot
+        result = gateway.analyze('sensor', CONTENT)
+        self.assertEqual((result["fallback"], result["reason"]), (True, "overloaded"))
+        self.assertEqual(model.calls, 1)
+
+        time.sleep(0.6)
+        model.base_latency = 0.0
+        self.assertNotIn("fallback", gateway.analyze('sensor', CONTENT))
+        self.assertEqual(model.calls, 2)
+
+    def test_closing_a_stream_is_not_a_model_failure(self):
+        model = self._model(output_token_latency=0.001)
+        breaker = CircuitBreaker(1, 5.0, 60.0)
+        gateway = self._gateway(model, breaker, max_concurrent=1)
+        for _ in range(3):
+            stream = gateway.stream('sensor', CONTENT)
+            self.assertEqual(next(stream)["event"], "start")
+            self.assertEqual(next(stream)["event"], "token")
+            # The client hangs up mid-response
+            stream.close()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual((breaker.opened, gateway.stats["failed"]), (0, 0))
+
+        # Each closed stream gave its slot back
+        events = list(gateway.stream('sensor', CONTENT))
+        self.assertEqual(events[-1]["event"], "result")
+        self.assertNotIn("fallback", events[-1])
+
+    def test_stream_falls_back_while_the_circuit_is_open(self):
+        model = self._model(error_rate=1.0)
+        breaker = CircuitBreaker(1, 5.0, 60.0)
+        gateway = self._gateway(model, breaker)
+        gateway.analyze('sensor', CONTENT)
+        events = list(gateway.stream('sensor', CONTENT))
+        self.assertEqual(len(events), 1)
+        self.assertEqual((events[0]["event"], events[0]["fallback"], events[0]["reason"]),
+                         ("result", True, "circuit_open"))
@@ -0,0 +1,200 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from app.models import Alert
+from app.services.escalation import EscalationScheduler
+from app.services.notification_sinks import NotificationSinks
+from app.services.notifications import EmailChannel, NotificationDispatcher, SmsChannel
+
+
+DEADLINES = {'High': 300, 'Medium': 900, 'Low': 3600}
+
+
+class FlakyChannel:
+    """Fails the first `failures` sends, then hands batches to the real channel"""
+
+    def __init__(self, channel, failures):
+        self.channel = channel
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self, batch):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError('gateway unavailable')
+        self.channel(batch)
+
+    def close(self):
+        self.channel.close()
+
+
+class EscalationTests(TestCase):
+    """Alerts through EscalationScheduler and NotificationDispatcher to the stub SMTP and SMS servers"""
+
+    def setUp(self):
+        self.received = []
+        self._received_lock = threading.Lock()
+        self.sinks = NotificationSinks(smtp_port=0, http_port=0, on_message=self._record).start()
+        self.addCleanup(self.sinks.stop)
+        email = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.sinks.smtp_port,
+        )
+        email.enable()
+        self.addCleanup(email.disable)
+        # Only the alerts each test raises
+        Alert.objects.all().delete()
+        self.now = timezone.now()
+
+    def _record(self, kind, summary):
+        with self._received_lock:
+            self.received.append((kind, summary))
+
+    def _dispatcher(self, sms=None, **kwargs):
+        channels = {
+            'email': EmailChannel('ops@example.com'),
+            'sms': sms or SmsChannel('+15550100', url=f'http://127.0.0.1:{self.sinks.http_port}/sms'),
+        }
+        kwargs.setdefault('digest_window', 0)
+        dispatcher = NotificationDispatcher(channels, workers=2, backoff=0.01, **kwargs)
+        dispatcher.start()
+        self.addCleanup(dispatcher.stop, 5)
+        return dispatcher
+
+    def _wait_for(self, count, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while len(self.received) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        with self._received_lock:
+            return sorted(self.received)
+
+    def _alert(self, priority='High', title='Perimeter breach'):
+        return Alert.objects.create(title=title, location='North Gate', priority=priority, created_at=self.now)
+
+    def test_unacknowledged_alert_escalates_at_its_deadline(self):
+        dispatcher = self._dispatcher()
+        scheduler = EscalationScheduler(dispatcher, deadlines=DEADLINES, max_level=2)
+        self.assertEqual(scheduler.recover(), 0)
+        alert = self._alert()
+        self.assertEqual(alert.escalate_at, self.now + timedelta(seconds=300))
+
+        stats = scheduler.tick(self.now + timedelta(seconds=299))
+        self.assertEqual((stats['raised'], stats['escalated'], stats['scheduled']), (1, 0, 1))
+
+        stats = scheduler.tick(self.now + timedelta(seconds=300))
+        self.assertEqual((stats['due'], stats['escalated']), (1, 1))
+        alert.refresh_from_db()
+        self.assertEqual(alert.escalation_level, 1)
+        # The next deadline waits twice as long
+        self.assertEqual(alert.escalate_at, self.now + timedelta(seconds=300 + 600))
+
+        self.assertEqual(scheduler.tick(self.now + timedelta(seconds=899))['escalated'], 0)
+        self.assertEqual(scheduler.tick(self.now + timedelta(seconds=900))['escalated'], 1)
+        alert.refresh_from_db()
+        self.assertEqual(alert.escalation_level, 2)
+        # Fully escalated: nothing left to schedule
+        self.assertIsNone(alert.escalate_at)
+        self.assertEqual(scheduler.tick(self.now + timedelta(days=1))['scheduled'], 0)
+
+        self.assertEqual(self._wait_for(6), sorted([
+            ('email', '[High] New alert: Perimeter breach'),
+            ('email', '[High] Escalation level 1: Perimeter breach'),
+            ('email', '[High] Escalation level 2: Perimeter breach'),
+            ('sms', '[High] New alert: Perimeter breach: Perimeter breach at North Gate'),
+            ('sms', '[High] Escalation level 1: Perimeter breach: Perimeter breach at North Gate'),
+            ('sms', '[High] Escalation level 2: Perimeter breach: Perimeter breach at North Gate'),
+        ]))
+        self.assertEqual(dispatcher.stats['sent'], 6)
+
+    def test_acknowledged_alert_is_not_escalated(self):
+        scheduler = EscalationScheduler(self._dispatcher(), deadlines=DEADLINES)
+        scheduler.recover()
+        alert = self._alert()
+        scheduler.tick(self.now)
+        alert.acknowledge()
+
+        stats = scheduler.tick(self.now + timedelta(seconds=300))
+        self.assertEqual((stats['due'], stats['escalated']), (1, 0))
+        alert.refresh_from_db()
+        self.assertEqual(alert.escalation_level, 0)
+        self.assertEqual([subject for _, subject in self._wait_for(2)], [
+            '[High] New alert: Perimeter breach',
+            '[High] New alert: Perimeter breach: Perimeter breach at North Gate',
+        ])
+
+    def test_recover_rebuilds_the_schedule_after_a_restart(self):
+        first = EscalationScheduler(self._dispatcher(), deadlines=DEADLINES)
+        first.recover()
+        alert = self._alert(priority='Medium')
+        first.tick(self.now)
+
+        restarted = EscalationScheduler(self._dispatcher(), deadlines=DEADLINES)
+        self.assertEqual(restarted.recover(), 1)
+        stats = restarted.tick(self.now + timedelta(seconds=900))
+        # Already announced before the restart, so only escalated
+        self.assertEqual((stats['raised'], stats['escalated']), (0, 1))
+        alert.refresh_from_db()
+        self.assertEqual(alert.escalation_level, 1)
+
+    def test_failed_sends_are_retried(self):
+        sms = FlakyChannel(SmsChannel('+15550100', url=f'http://127.0.0.1:{self.sinks.http_port}/sms'), failures=2)
+        dispatcher = self._dispatcher(sms=sms, retries=3)
+        scheduler = EscalationScheduler(dispatcher, deadlines=DEADLINES)
+        scheduler.recover()
+        self._alert()
+        with self.assertLogs('app.services.notifications', 'WARNING') as logs:
+            scheduler.tick(self.now)
+            received = self._wait_for(2)
+
+        self.assertEqual([kind for kind, _ in received], ['email', 'sms'])
+        self.assertEqual(sms.calls, 3)
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual((dispatcher.stats['retried'], dispatcher.stats['sent'], dispatcher.stats['failed']),
+                         (2, 2, 0))
+
+    def test_sends_are_given_up_after_the_last_retry(self):
+        sms = FlakyChannel(SmsChannel('+15550100', url=f'http://127.0.0.1:{self.sinks.http_port}/sms'), failures=10)
+        dispatcher = self._dispatcher(sms=sms, retries=2)
+        scheduler = EscalationScheduler(dispatcher, deadlines=DEADLINES)
+        scheduler.recover()
+        self._alert()
+        with self.assertLogs('app.services.notifications', 'WARNING'):
+            scheduler.tick(self.now)
+            dispatcher.stop(5)
+
+        self.assertEqual([kind for kind, _ in self._wait_for(1)], ['email'])
+        self.assertEqual(sms.calls, 3)
+        self.assertEqual((dispatcher.stats['retried'], dispatcher.stats['failed']), (2, 1))
+
+    def test_alerts_within_the_digest_window_are_sent_as_one_digest(self):
+        dispatcher = self._dispatcher(digest_window=0.2)
+        scheduler = EscalationScheduler(dispatcher, deadlines=DEADLINES)
+        scheduler.recover()
+        for index in range(3):
+            self._alert(priority='Medium', title=f'Loud noise {index}')
+        self.assertEqual(scheduler.tick(self.now)['raised'], 3)
+
+        received = self._wait_for(2)
+        self.assertEqual(received[0], ('email', '[Medium] 3 alert notifications'))
+        self.assertTrue(received[1][1].startswith('3 alerts: [Medium] New alert: Loud noise 0; '))
+        self.assertEqual((dispatcher.stats['sent'], dispatcher.stats['deliveries']), (6, 2))
+
+    def test_high_priority_alert_flushes_the_digest(self):
+        dispatcher = self._dispatcher(digest_window=60)
+        scheduler = EscalationScheduler(dispatcher, deadlines=DEADLINES)
+        scheduler.recover()
+        self._alert(priority='Medium', title='Loud noise')
+        self._alert(priority='Low', title='Door left open')
+        self._alert(priority='High', title='Perimeter breach')
+        scheduler.tick(self.now)
+
+        # Well inside the 60 second window
+        received = self._wait_for(2, timeout=2)
+        self.assertEqual(received[0], ('email', '[High] 3 alert notifications'))
+        self.assertTrue(received[1][1].startswith('3 alerts: '))
@@ -9,20 +9,40 @@ urlpatterns = [
     # API endpoints (under /api prefix from main urls.py)
     path('summary-stats', views.get_summary_stats, name='summary-stats'),
     path('alerts/recent', views.get_recent_alerts, name='recent-alerts'),
+    path('alerts/queue', views.get_alert_queue, name='alert-queue'),
+    path('alerts/<int:alert_id>/acknowledge', views.acknowledge_alert, name='acknowledge-alert'),
+    path('alerts/<int:alert_id>/evidence', views.get_alert_evidence, name='alert-evidence'),
+    path('alerts/<int:alert_id>/evidence/<str:kind>', views.alert_evidence_blob, name='alert-evidence-blob'),
     path('stress-index', views.get_stress_index, name='stress-index'),
     path('motion-chart', views.get_motion_chart, name='motion-chart'),
     path('live-feeds', views.get_live_feeds, name='live-feeds'),
+    path('live-feeds/<str:camera_ref>/frames', views.upload_frames, name='upload-frames'),
     path('incidents/resolved', views.get_resolved_incidents, name='resolved-incidents'),
+    path('search', views.search_records, name='search'),
+    path('export/<str:dataset>', views.export_data, name='export-data'),
     path('auth/login', views.login_user, name='login'),
     path('auth/logout', views.logout_user, name='logout'),
     path('auth/me', views.get_current_user, name='get-current-user'),
     path('auth/verify-token', views.verify_auth0_token, name='verify-auth0-token'),
     path('ai/analyze', views.analyze_with_ai, name='ai-analyze'),
+    path('ai/analyze/stream', views.analyze_with_ai_stream, name='ai-analyze-stream'),
+    path('ai/jobs', views.ai_job_queue, name='ai-jobs'),
+    path('ai/jobs/<int:job_id>', views.get_ai_job, name='ai-job'),
     path('ai/health', views.ai_health_check, name='ai-health'),
     path('settings', views.get_settings, name='get-settings'),
     path('settings/save', views.save_settings, name='save-settings'),
+    path('events/stream', views.event_stream, name='event-stream'),
+    path('rules', views.alert_rules, name='alert-rules'),
+    path('rules/<int:rule_id>/update', views.update_alert_rule, name='update-alert-rule'),
+    path('rules/<int:rule_id>/delete', views.delete_alert_rule, name='delete-alert-rule'),
+    path('zones', views.get_zones, name='get-zones'),
+    path('zones/<str:zone_ref>/contents', views.get_zone_contents, name='zone-contents'),
     path('sensors', views.get_sensors, name='get-sensors'),
     path('sensors/create', views.create_sensor, name='create-sensor'),
+    path('ingest/readings', views.ingest_readings, name='ingest-readings'),
+    path('ingest/alerts', views.ingest_alerts, name='ingest-alerts'),
+    path('ingest/status', views.ingest_status, name='ingest-status'),
+    path('sensors/<str:sensor_id>/audio', views.upload_audio, name='upload-audio'),
     path('sensors/<str:sensor_id>/update', views.update_sensor, name='update-sensor'),
     path('sensors/<str:sensor_id>/delete', views.delete_sensor, name='delete-sensor'),
 ]
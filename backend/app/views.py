@@ -1,22 +1,51 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import login, logout
 from django.contrib.auth.models import User
+from django.conf import settings
+from django.db.models import Avg, Case, Value, When
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+from datetime import datetime, timedelta, timezone as dt_timezone
 from typing import Dict, List
+import json
 import random
-import math
 import jwt
 import requests
 import os
-from .services.gemini_service import GeminiService
+from .models import Alert, AlertRule, AnalysisJob, Camera, Incident, Sensor, SensorReading, Zone
+from .services import ai_jobs, events
+from .services.ai_gateway import AIGateway
+from .services.audio import AUDIO_SENSOR_TYPE, audio_streams, summarise_content
+from .services.evidence import CLIP, CONTENT_TYPES, KINDS, SNAPSHOT, as_clip, get_evidence_store
+from .services.forecast import get_forecast, get_history
+from .services.frames import FrameIngestor, feed_stats
+from .services.gemini_service import get_gemini_service
+from .services.ingest_log import alert_record, get_ingest_service, reading_record
+from .services.logins import LoginGate, LoginOverloaded
+from .services.motion import motion_series
+from .services.notifications import PRIORITY_RANK
+from .services.rate_limit import get_admission
+from .services.rules import validate_expression
+from .services.exports import ExportService
+from .services.search import SearchService
+from .services.view_cache import cached_view, view_cache, zone_tags
+from .services.zones import zone_index
 
-# Initialize Gemini service (will handle missing API key gracefully)
-try:
-    gemini_service = GeminiService()
-except Exception as e:
-    print(f"Warning: Could not initialize Gemini service: {e}")
-    gemini_service = None
+# Shared per process; the Gemini SDK itself is only loaded by the first analysis
+gemini_service = get_gemini_service()
+
+# Rate limits, sheds and falls back around the model so a struggling API can't tie up workers
+ai_gateway = AIGateway(gemini_service)
+
+# Bounds the password hashing a burst of logins can run at once
+login_gate = LoginGate()
+
+# Decodes uploaded frames into per-camera shared-memory rings
+frame_ingestor = FrameIngestor()
 
 
 @api_view(['GET'])
@@ -36,20 +65,20 @@ def health_check(request):
     """
     Health check endpoint
     """
-    return Response({"status": "healthy"})
+    return Response({"status": "healthy", "logins": login_gate.status(), "admission": get_admission().status()})
 
 
 @api_view(['GET'])
+@cached_view('alerts', 'cameras', 'incidents', timeout=60)
 def get_summary_stats(request):
     """
     Get summary statistics for the dashboard
     """
     try:
-        # In a real application, this would fetch from database
         return Response({
-            "activeCameras": 128,
-            "alerts24h": 16,
-            "resolvedIncidents": 42,
+            "activeCameras": Camera.objects.filter(status='active').count(),
+            "alerts24h": Alert.objects.filter(created_at__gte=timezone.now() - timedelta(hours=24)).count(),
+            "resolvedIncidents": Incident.objects.filter(status='resolved').count(),
             "systemStatus": "Operational"
         })
     except Exception as e:
@@ -65,39 +94,24 @@ def get_recent_alerts(request):
     Get recent alerts
     """
     try:
-        # In a real application, this would fetch from database
-        return Response([
-            {
-                "id": "1",
-                "icon": "person",
-                "title": "Unauthorized Person Detected",
-                "location": "CAM_12 - Entrance Hall",
-                "priority": "High",
-                "time": "2 min ago",
-                "priorityColor": "red",
-                "description": "This alert was triggered by the AI surveillance system based on multi-sensor fusion analysis."
-            },
-            {
-                "id": "2",
-                "icon": "no_photography",
-                "title": "Camera Obstructed",
-                "location": "CAM_08 - Parking Lot",
-                "priority": "Medium",
-                "time": "15 min ago",
-                "priorityColor": "yellow",
-                "description": "Camera obstruction detected in parking lot area."
-            },
-            {
-                "id": "3",
-                "icon": "directions_run",
-                "title": "Suspicious Activity Detected",
-                "location": "CAM_03 - Perimeter",
-                "priority": "High",
-                "time": "28 min ago",
-                "priorityColor": "red",
-                "description": "Unusual movement patterns detected at perimeter."
-            }
-        ])
+        alerts = Alert.objects.order_by('-created_at')
+        zone = _zone_param(request)
+        if zone is not None:
+            alerts = zone_index.filter(alerts, zone)
+        if request.query_params.get('status'):
+            alerts = alerts.filter(status=request.query_params['status'])
+        limit = _limit_param(request)
+        return Response([alert.to_dict() for alert in alerts[:limit]])
+    except ValueError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Zone.DoesNotExist as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_404_NOT_FOUND
+        )
     except Exception as e:
         return Response(
             {"error": str(e)},
@@ -106,30 +120,230 @@ def get_recent_alerts(request):
 
 
 @api_view(['GET'])
-def get_stress_index(request):
+def get_alert_queue(request):
     """
-    Get current stress index and trend data
+    Get open alerts in handling order: highest priority first, oldest first within a priority
     """
     try:
-        # Generate trend data for last 24 hours
-        trend = []
-        for i in range(24):
-            trend.append({
-                "time": f"{i}:00",
-                "stress": round(random.random() * 0.4 + 0.3 + math.sin(i / 3) * 0.2, 2)
-            })
-        
+        rank = Case(
+            *(When(priority=priority, then=Value(order)) for priority, order in PRIORITY_RANK.items()),
+            default=Value(len(PRIORITY_RANK)),
+        )
+        alerts = Alert.objects.filter(status='open').annotate(rank=rank).order_by('rank', 'created_at', 'id')
+        zone = _zone_param(request)
+        if zone is not None:
+            alerts = zone_index.filter(alerts, zone)
+        limit = _limit_param(request)
+        return Response([alert.to_dict() for alert in alerts[:limit]])
+    except ValueError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Zone.DoesNotExist as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+def acknowledge_alert(request, alert_id):
+    """
+    Acknowledge an alert, stopping its escalation
+    """
+    try:
+        alert = Alert.objects.filter(id=alert_id).first()
+        if alert is None:
+            return Response(
+                {"error": f"Alert {alert_id} not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if alert.status == 'open':
+            alert.acknowledge()
         return Response({
-            "current": 0.68,
-            "status": "Moderate",
-            "change1h": 0.12,
+            "success": True,
+            "message": "Alert acknowledged",
+            "alert": alert.to_dict()
+        })
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_alert_evidence(request, alert_id):
+    """
+    List the snapshot and clip stored for an alert
+    """
+    try:
+        if not Alert.objects.filter(id=alert_id).exists():
+            return Response(
+                {"error": f"Alert {alert_id} not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        evidence = {}
+        for kind in KINDS:
+            blob = get_evidence_store().fetch(alert_id, kind)
+            if blob is not None:
+                evidence[kind] = {
+                    "url": f"/api/alerts/{alert_id}/evidence/{kind}",
+                    "contentType": CONTENT_TYPES[kind],
+                    "bytes": len(blob.data),
+                    "capturedAt": datetime.fromtimestamp(blob.time, dt_timezone.utc).isoformat(),
+                }
+        return Response({"alertId": str(alert_id), "evidence": evidence})
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET', 'POST'])
+def alert_evidence_blob(request, alert_id, kind):
+    """
+    Serve an alert's snapshot (JPEG) or clip (MJPEG), with ranges and caching; POST stores one
+    """
+    try:
+        if kind not in KINDS:
+            return Response(
+                {"error": f"Unknown evidence '{kind}'"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if request.method == 'POST':
+            return _store_evidence(request, alert_id, kind)
+
+        blob = get_evidence_store().fetch(alert_id, kind)
+        if blob is None:
+            return Response(
+                {"error": f"No {kind} for alert {alert_id}"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        # A blob is never changed once stored, only replaced, so its CRC and time identify it
+        etag = f'"{blob.crc:08x}-{int(blob.time * 1000):x}"'
+        headers = {
+            "ETag": etag,
+            "Last-Modified": http_date(blob.time),
+            "Cache-Control": "private, max-age=3600",
+            "Accept-Ranges": "bytes",
+        }
+        if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        data, length = blob.data, len(blob.data)
+        if_range = request.headers.get('If-Range')
+        byte_range = _byte_range(request.headers.get('Range'), length) if if_range in (None, etag) else None
+        if byte_range == ():
+            return HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                                headers={**headers, "Content-Range": f"bytes */{length}"})
+        if byte_range:
+            start, end = byte_range
+            return HttpResponse(data[start:end + 1], content_type=CONTENT_TYPES[kind],
+                                status=status.HTTP_206_PARTIAL_CONTENT,
+                                headers={**headers, "Content-Range": f"bytes {start}-{end}/{length}"})
+        return HttpResponse(data, content_type=CONTENT_TYPES[kind], headers=headers)
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def _store_evidence(request, alert_id, kind):
+    """Store an uploaded JPEG snapshot, or a clip as an MJPEG stream or concatenated JPEGs"""
+    if not Alert.objects.filter(id=alert_id).exists():
+        return Response(
+            {"error": f"Alert {alert_id} not found"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    if int(request.META.get('CONTENT_LENGTH') or 0) > settings.EVIDENCE_MAX_BLOB_BYTES:
+        return Response(
+            {"error": f"Evidence is limited to {settings.EVIDENCE_MAX_BLOB_BYTES} bytes"},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+    data = request.body
+    if kind == CLIP:
+        data = as_clip(data)
+    if not data.startswith(b'\xff\xd8' if kind == SNAPSHOT else b'--frame') or \
+            len(data) > settings.EVIDENCE_MAX_BLOB_BYTES:
+        return Response(
+            {"error": "Request body is not a JPEG" if kind == SNAPSHOT else "No JPEG frames found in request body"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    get_evidence_store().put(alert_id, kind, data)
+    return Response({
+        "success": True,
+        "url": f"/api/alerts/{alert_id}/evidence/{kind}",
+        "bytes": len(data),
+    }, status=status.HTTP_201_CREATED)
+
+
+def _byte_range(header, length):
+    """
+    The (first, last) byte of a single-range Range header; () when it cannot be
+    satisfied, None when absent or not understood (the whole body is sent)
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[len('bytes='):].strip().partition('-')
+    try:
+        if not first:
+            suffix = int(last)
+            return (max(0, length - suffix), length - 1) if suffix > 0 and length else ()
+        first, last = int(first), int(last) if last else length - 1
+    except ValueError:
+        return None
+    if first >= length:
+        return ()
+    return (first, min(last, length - 1)) if first <= last else None
+
+
+@api_view(['GET'])
+def get_stress_index(request):
+    """
+    Get current stress index and trend data, with a forecast of the next N hours
+    (`?forecast=Nh`, for the whole site or `?zone=`)
+    """
+    try:
+        hours = _forecast_param(request)
+        zone = _zone_param(request)
+
+        # The hours run_forecasts has measured; empty until it has seen readings for the zone
+        trend = get_history(zone)
+        current = trend[-1]["stress"] if trend else None
+        data = {
+            "current": current,
+            "status": _stress_status(current),
+            "change1h": round(current - trend[-2]["stress"], 3) if len(trend) > 1 else None,
             "trend": trend,
             "sensorContributions": {
                 "video": 0.45,
-                "audio": 0.38,
+                "audio": _recent_mean(AUDIO_SENSOR_TYPE, default=0.38),
                 "iot": 0.52
             }
-        })
+        }
+        if hours:
+            # Precomputed by run_forecasts; empty until it has seen readings for the zone
+            data["forecast"] = get_forecast(zone, hours) or []
+        return Response(data)
+    except ValueError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Zone.DoesNotExist as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_404_NOT_FOUND
+        )
     except Exception as e:
         return Response(
             {"error": str(e)},
@@ -137,21 +351,54 @@ def get_stress_index(request):
         )
 
 
+def _limit_param(request, default=20, maximum=100):
+    """Number of items asked for with ?limit=, at most `maximum`; ValueError unless a positive integer"""
+    value = request.query_params.get('limit')
+    if value is None:
+        return default
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError("'limit' must be a positive integer")
+    return min(int(value), maximum)
+
+
+def _forecast_param(request):
+    """Hours ahead asked for with ?forecast=6h (or 6), 0 when not asked; ValueError outside 1..FORECAST_MAX_HOURS"""
+    value = request.query_params.get('forecast')
+    if not value:
+        return 0
+    hours = value[:-1] if value.endswith('h') else value
+    if not hours.isdigit() or not 1 <= int(hours) <= settings.FORECAST_MAX_HOURS:
+        raise ValueError(f"'forecast' must be a number of hours from 1h to {settings.FORECAST_MAX_HOURS}h")
+    return int(hours)
+
+
+def _stress_status(stress):
+    """Label of a stress index by the alert thresholds it reaches, or None when there is none yet"""
+    if stress is None:
+        return None
+    for level, label in (('critical', 'Critical'), ('high', 'High'), ('medium', 'Moderate'), ('low', 'Low')):
+        if stress >= settings.ALERT_THRESHOLDS[level]:
+            return label
+    return 'Normal'
+
+
+def _recent_mean(sensor_type, default, hours=1):
+    """Mean of a sensor type's readings over the last hours, or default when there are none"""
+    mean = SensorReading.objects.filter(
+        sensor_type=sensor_type,
+        recorded_at__gte=timezone.now() - timedelta(hours=hours),
+    ).aggregate(mean=Avg('value'))['mean']
+    return round(mean, 2) if mean is not None else default
+
+
 @api_view(['GET'])
 def get_motion_chart(request):
     """
     Get motion detection data for chart
     """
     try:
-        # Generate motion data for last 12 hours (2-hour intervals)
-        motion_data = []
-        for i in range(12):
-            motion_data.append({
-                "time": f"{i * 2}:00",
-                "motion": round(random.random() * 100, 2)
-            })
-        
-        return Response(motion_data)
+        # Mean motion score in 2-hour buckets over the last 24 hours
+        return Response(motion_series(hours=24, bucket_hours=2, camera=request.query_params.get('camera')))
     except Exception as e:
         return Response(
             {"error": str(e)},
@@ -165,12 +412,56 @@ def get_live_feeds(request):
     Get list of live camera feeds
     """
     try:
-        return Response([
-            {"id": "1", "name": "CAM_01", "status": "active", "location": "Main Entrance"},
-            {"id": "2", "name": "CAM_02", "status": "active", "location": "Parking Lot"},
-            {"id": "3", "name": "CAM_03", "status": "active", "location": "Perimeter"},
-            {"id": "4", "name": "CAM_04", "status": "active", "location": "Building A"},
-        ])
+        zone = _zone_param(request)
+
+        def list_cameras():
+            cameras = Camera.objects.order_by('id')
+            if zone is not None:
+                cameras = zone_index.filter(cameras, zone)
+            return [camera.to_dict() for camera in cameras]
+
+        # Ingest stats change with every frame, so only the camera list is cached
+        cameras = view_cache.get_or_compute(view_cache.request_key(request), zone_tags('cameras', zone), list_cameras)
+        return Response([{**camera, "ingest": feed_stats(camera["name"])} for camera in cameras])
+    except Zone.DoesNotExist as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+def upload_frames(request, camera_ref):
+    """
+    Ingest camera frames: a single JPEG body or an MJPEG (multipart/x-mixed-replace) stream
+    """
+    try:
+        camera = Camera.objects.filter(name__iexact=camera_ref).first()
+        if camera is None and camera_ref.isdigit():
+            camera = Camera.objects.filter(id=int(camera_ref)).first()
+        if camera is None:
+            return Response(
+                {"error": f"Camera {camera_ref} not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        counts = frame_ingestor.ingest_stream(camera.name, iter(lambda: request.stream.read(65536) if request.stream else b'', b''))
+        if not counts["frames"]:
+            return Response(
+                {"error": f"None of the {counts['skipped']} JPEG frames in the request body could be decoded"
+                 if counts["skipped"] else "No JPEG frames found in request body"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({
+            "success": True,
+            "camera": camera.name,
+            **counts,
+            "ingest": frame_ingestor.ring(camera.name).stats(),
+        })
     except Exception as e:
         return Response(
             {"error": str(e)},
@@ -183,13 +474,6 @@ def analyze_with_ai(request):
     """
     Analyze data using Gemini AI
     """
-    if not gemini_service:
-        return Response({
-            "success": False,
-            "error": "Gemini service not initialized. Please set GEMINI_API_KEY environment variable.",
-            "data_type": request.data.get('type', 'unknown')
-        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
-    
     try:
         data_type = request.data.get('type')
         content = request.data.get('content', {})
@@ -200,16 +484,57 @@ def analyze_with_ai(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Run async function in sync context
-        import asyncio
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        
-        result = loop.run_until_complete(gemini_service.analyze_data(data_type, content))
+        if data_type == 'audio':
+            # Send compact audio features to the model, never raw samples
+            content = summarise_content(content)
+
+        result = ai_gateway.analyze(data_type, content)
         return Response(result)
+    except ValueError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        return Response(
+            {"error": f"AI analysis failed: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+def analyze_with_ai_stream(request):
+    """
+    Analyze data using Gemini AI, streaming the response as server-sent events
+    """
+    try:
+        data_type = request.data.get('type')
+        content = request.data.get('content', {})
+
+        if not data_type:
+            return Response(
+                {"error": "Missing 'type' field in request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if data_type == 'audio':
+            # Send compact audio features to the model, never raw samples
+            content = summarise_content(content)
+
+        stream_events = ai_gateway.stream(data_type, content)
+        response = StreamingHttpResponse(
+            (f"event: {event.pop('event')}\ndata: {json.dumps(event, default=str)}\n\n" for event in stream_events),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    except ValueError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     except Exception as e:
         return Response(
             {"error": f"AI analysis failed: {str(e)}"},
@@ -217,6 +542,60 @@ def analyze_with_ai(request):
         )
 
 
+@api_view(['GET', 'POST'])
+def ai_job_queue(request):
+    """
+    Queue an AI analysis for the job workers (POST), or report queue depth per lane (GET)
+    """
+    try:
+        if request.method == 'GET':
+            return Response({"lanes": ai_jobs.queue_depth()})
+
+        data_type = request.data.get('type')
+        if not data_type:
+            return Response(
+                {"error": "Missing 'type' field in request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        content = request.data.get('content', {})
+        if data_type == 'audio':
+            # Send compact audio features to the model, never raw samples
+            content = summarise_content(content)
+
+        job = ai_jobs.enqueue(data_type, content, request.data.get('lane', 'interactive'))
+        return Response(job.to_dict(), status=status.HTTP_202_ACCEPTED)
+    except ValueError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_ai_job(request, job_id):
+    """
+    Poll a queued AI analysis; the result is included once it is done
+    """
+    try:
+        job = AnalysisJob.objects.filter(id=job_id).first()
+        if job is None:
+            return Response(
+                {"error": f"Job {job_id} not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(job.to_dict())
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 @api_view(['GET'])
 def ai_health_check(request):
     """
@@ -227,7 +606,8 @@ def ai_health_check(request):
         return Response({
             "status": "operational",
             "service": "gemini",
-            "message": "Gemini API is configured" if gemini_service and gemini_service.model else "Gemini API not configured"
+            "message": "Gemini API is configured" if gemini_service.configured else "Gemini API not configured",
+            "gateway": ai_gateway.status()
         })
     except Exception as e:
         return Response({
@@ -238,80 +618,44 @@ def ai_health_check(request):
 
 
 @api_view(['GET'])
+@cached_view('incidents')
 def get_resolved_incidents(request):
     """
     Get list of resolved incidents
     """
     try:
-        # In a real application, this would fetch from database
-        return Response([
-            {
-                "id": "INC_001",
-                "title": "Unauthorized Access Attempt",
-                "location": "CAM_05 - Main Entrance",
-                "priority": "High",
-                "resolvedAt": "2024-01-15 14:30",
-                "resolvedBy": "Security Team",
-                "description": "Unauthorized person detected at main entrance. Incident resolved after security verification.",
-                "status": "resolved",
-                "originalAlertTime": "2024-01-15 14:15"
-            },
-            {
-                "id": "INC_002",
-                "title": "Camera Malfunction",
-                "location": "CAM_08 - Parking Lot",
-                "priority": "Medium",
-                "resolvedAt": "2024-01-15 13:45",
-                "resolvedBy": "Technical Team",
-                "description": "Camera obstruction detected. Camera cleaned and repositioned.",
-                "status": "resolved",
-                "originalAlertTime": "2024-01-15 13:20"
-            },
-            {
-                "id": "INC_003",
-                "title": "Suspicious Activity",
-                "location": "CAM_03 - Perimeter",
-                "priority": "High",
-                "resolvedAt": "2024-01-15 12:00",
-                "resolvedBy": "Security Team",
-                "description": "Unusual movement patterns detected. Verified as authorized maintenance personnel.",
-                "status": "resolved",
-                "originalAlertTime": "2024-01-15 11:45"
-            },
-            {
-                "id": "INC_004",
-                "title": "High Stress Index",
-                "location": "CAM_07 - Lobby Area",
-                "priority": "Medium",
-                "resolvedAt": "2024-01-15 10:30",
-                "resolvedBy": "System Auto-Resolve",
-                "description": "Environmental stress index exceeded threshold. Returned to normal levels.",
-                "status": "resolved",
-                "originalAlertTime": "2024-01-15 10:15"
-            },
-            {
-                "id": "INC_005",
-                "title": "Audio Anomaly",
-                "location": "CAM_09 - Conference Hall",
-                "priority": "Low",
-                "resolvedAt": "2024-01-15 09:00",
-                "resolvedBy": "System Auto-Resolve",
-                "description": "Unusual audio frequency patterns detected. Confirmed as normal conference activity.",
-                "status": "resolved",
-                "originalAlertTime": "2024-01-15 08:45"
-            },
-            {
-                "id": "INC_006",
-                "title": "Motion Detection Anomaly",
-                "location": "CAM_12 - Storage Room",
-                "priority": "High",
-                "resolvedAt": "2024-01-14 18:30",
-                "resolvedBy": "Security Team",
-                "description": "Unexpected motion detected during off-hours. Verified as scheduled maintenance.",
-                "status": "resolved",
-                "originalAlertTime": "2024-01-14 18:15"
-            }
-        ])
+        incidents = Incident.objects.filter(status='resolved').order_by('-resolved_at')
+        return Response([incident.to_dict() for incident in incidents])
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def search_records(request):
+    """
+    Full-text search over incidents or alerts with priority/status facets
+    """
+    try:
+        params = request.query_params
+        result = SearchService().search(
+            query=params.get('q', ''),
+            kind=params.get('type', 'incidents'),
+            priority=params.getlist('priority'),
+            status=params.getlist('status'),
+            since=_parse_datetime_param(params.get('since')),
+            until=_parse_datetime_param(params.get('until')),
+            limit=min(int(params.get('limit', 20)), 100),
+            offset=int(params.get('offset', 0)),
+        )
+        return Response(result)
+    except ValueError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     except Exception as e:
         return Response(
             {"error": str(e)},
@@ -319,6 +663,51 @@ def get_resolved_incidents(request):
         )
 
 
+@api_view(['GET'])
+def export_data(request, dataset):
+    """
+    Stream resolved incidents or sensor history as an Arrow IPC stream
+    """
+    try:
+        if dataset not in ExportService.DATASETS:
+            return Response(
+                {"error": f"Unknown dataset '{dataset}'"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        since = _parse_datetime_param(request.query_params.get('since'))
+        until = _parse_datetime_param(request.query_params.get('until'))
+        sensor_id = request.query_params.get('sensor')
+
+        response = StreamingHttpResponse(
+            ExportService().stream(dataset, since=since, until=until, sensor_id=sensor_id),
+            content_type='application/vnd.apache.arrow.stream'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{dataset}.arrows"'
+        return response
+    except ValueError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def _parse_datetime_param(value):
+    """Parse an ISO-8601 query parameter, treating naive values as UTC"""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid datetime '{value}'")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
 @api_view(['POST'])
 def login_user(request):
     """
@@ -334,7 +723,7 @@ def login_user(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        user = authenticate(request, username=username, password=password)
+        user = login_gate.authenticate(request, username, password)
         
         if user is not None:
             login(request, user)
@@ -354,6 +743,12 @@ def login_user(request):
                 {"error": "Invalid username or password"},
                 status=status.HTTP_401_UNAUTHORIZED
             )
+    except LoginOverloaded as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         return Response(
             {"error": str(e)},
@@ -510,19 +905,19 @@ def get_settings(request):
         # In a real application, this would fetch from database
         return Response({
             "systemName": "AI Surveillance System",
-            "dataRetention": "90",
+            "dataRetention": str(settings.DATA_RETENTION_DAYS),
             "alertThreshold": 0.7,
-            "autoExport": True,
-            "emailNotifications": True,
-            "smsNotifications": False,
-            "pushNotifications": True,
-            "alertEmail": "",
-            "alertSms": "",
-            "lowThreshold": 0.3,
-            "mediumThreshold": 0.6,
-            "highThreshold": 0.8,
-            "criticalThreshold": 0.9,
-            "alertCooldown": 300,  # seconds
+            "autoExport": settings.AUTO_EXPORT,
+            "emailNotifications": settings.NOTIFY_EMAIL,
+            "smsNotifications": settings.NOTIFY_SMS,
+            "pushNotifications": settings.NOTIFY_PUSH,
+            "alertEmail": settings.ALERT_EMAIL,
+            "alertSms": settings.ALERT_SMS,
+            "lowThreshold": settings.ALERT_THRESHOLDS['low'],
+            "mediumThreshold": settings.ALERT_THRESHOLDS['medium'],
+            "highThreshold": settings.ALERT_THRESHOLDS['high'],
+            "criticalThreshold": settings.ALERT_THRESHOLDS['critical'],
+            "alertCooldown": settings.ALERT_COOLDOWN_SECONDS,  # seconds
             "enableSoundAlerts": True,
             "enableVisualAlerts": True,
         })
@@ -541,6 +936,7 @@ def save_settings(request):
     try:
         # In a real application, this would save to database
         settings_data = request.data
+        events.publish(events.SETTINGS_CHANGED, settings_data)
         return Response({
             "success": True,
             "message": "Settings saved successfully",
@@ -553,6 +949,38 @@ def save_settings(request):
         )
 
 
+@api_view(['GET'])
+def event_stream(request):
+    """
+    Live events (alert created, sensor updated, settings changed) as server-sent events
+
+    `topics` is a comma-separated subset of topics; reconnecting clients resume
+    after their Last-Event-ID.
+    """
+    try:
+        topics = [topic for topic in request.query_params.get('topics', '').split(',') if topic] or None
+        unknown = set(topics or ()) - set(events.TOPICS)
+        if unknown:
+            return Response(
+                {"error": f"Unknown topics: {', '.join(sorted(unknown))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        since = request.headers.get('Last-Event-ID') or request.query_params.get('since')
+        response = StreamingHttpResponse(
+            events.sse_stream(events.get_event_bus(), topics, since),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 # Sensor management endpoints
 @api_view(['GET'])
 def get_sensors(request):
@@ -560,46 +988,21 @@ def get_sensors(request):
     Get all sensors
     """
     try:
-        # In a real application, this would fetch from database
-        sensors = [
-            {
-                "id": "VID-001",
-                "name": "Main Entrance Camera",
-                "type": "video",
-                "location": "Main Entrance",
-                "status": "active",
-                "lastUpdate": "2025-01-08T09:10:00Z",
-                "sensitivity": 0.7,
-            },
-            {
-                "id": "VID-002",
-                "name": "Parking Lot Camera",
-                "type": "video",
-                "location": "Parking Lot A",
-                "status": "active",
-                "lastUpdate": "2025-01-08T09:09:00Z",
-                "sensitivity": 0.6,
-            },
-            {
-                "id": "AUD-001",
-                "name": "Lobby Audio Sensor",
-                "type": "audio",
-                "location": "Lobby Area",
-                "status": "active",
-                "lastUpdate": "2025-01-08T09:08:00Z",
-                "sensitivity": 0.5,
-            },
-            {
-                "id": "IOT-001",
-                "name": "Temperature Sensor",
-                "type": "iot",
-                "location": "Server Room",
-                "status": "inactive",
-                "lastUpdate": "2025-01-08T08:00:00Z",
-                "sensitivity": 0.8,
-            },
-        ]
-        return Response(sensors)
+        zone = _zone_param(request)
+
+        def list_sensors():
+            sensors = Sensor.objects.order_by('sensor_id')
+            if zone is not None:
+                sensors = zone_index.filter(sensors, zone)
+            return [sensor.to_dict() for sensor in sensors]
+
+        return Response(view_cache.get_or_compute(view_cache.request_key(request), zone_tags('sensors', zone),
+                                                  list_sensors))
+    except Zone.DoesNotExist as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_404_NOT_FOUND
+        )
     except Exception as e:
         return Response(
             {"error": str(e)},
@@ -614,15 +1017,109 @@ def create_sensor(request):
     """
     try:
         sensor_data = request.data
-        # In a real application, this would save to database
+        sensor = Sensor(
+            sensor_id=sensor_data.get("id") or f"{sensor_data.get('type', 'SEN').upper()}-{random.randint(100, 999)}",
+        )
+        _apply_sensor_data(sensor, sensor_data)
+        sensor.save()
         return Response({
             "success": True,
             "message": "Sensor created successfully",
-            "sensor": {
-                "id": sensor_data.get("id", f"{sensor_data.get('type', 'SEN').upper()}-{random.randint(100, 999)}"),
-                **sensor_data
-            }
+            "sensor": sensor.to_dict()
         }, status=status.HTTP_201_CREATED)
+    except ValueError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def _ingest(request, key: str, to_record):
+    """Log the posted records, answering once they are on disk; they reach the tables shortly after"""
+    try:
+        items = request.data.get(key) if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return Response(
+                {"error": f"Expected a list of objects, or an object with a '{key}' list"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            records = [to_record(item) for item in items]
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        position = get_ingest_service().append(records)
+        return Response({
+            "success": True,
+            "accepted": len(records),
+            "position": position,
+        }, status=status.HTTP_202_ACCEPTED)
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+def ingest_readings(request):
+    """
+    Record sensor readings ({sensorId, type, value, recordedAt?}) through the ingestion log
+    """
+    return _ingest(request, 'readings', reading_record)
+
+
+@api_view(['POST'])
+def ingest_alerts(request):
+    """
+    Raise alerts ({title, location, priority?, description?, icon?, createdAt?}) through the ingestion log
+    """
+    return _ingest(request, 'alerts', alert_record)
+
+
+@api_view(['GET'])
+def ingest_status(request):
+    """
+    This worker's ingestion log: committed and applied positions
+    """
+    try:
+        return Response(get_ingest_service().status())
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+def upload_audio(request, sensor_id):
+    """
+    Feed raw audio from an audio sensor: 16-bit little-endian mono PCM (`?rate=`, default AUDIO_SAMPLE_RATE)
+    """
+    try:
+        if not Sensor.objects.filter(sensor_id=sensor_id, sensor_type='audio').exists():
+            return Response(
+                {"error": f"Audio sensor {sensor_id} not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        rate = int(request.query_params.get('rate', settings.AUDIO_SAMPLE_RATE))
+        summaries = []
+        for chunk in iter(lambda: request.stream.read(65536) if request.stream else b'', b''):
+            summaries.extend(audio_streams.feed(sensor_id, chunk, sample_rate=rate))
+        return Response({
+            "success": True,
+            "sensorId": sensor_id,
+            "summaries": summaries,
+        })
+    except ValueError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     except Exception as e:
         return Response(
             {"error": str(e)},
@@ -636,16 +1133,25 @@ def update_sensor(request, sensor_id):
     Update a sensor
     """
     try:
-        sensor_data = request.data
-        # In a real application, this would update in database
+        sensor = Sensor.objects.filter(sensor_id=sensor_id).first()
+        if sensor is None:
+            return Response(
+                {"error": f"Sensor {sensor_id} not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        _apply_sensor_data(sensor, request.data)
+        sensor.last_update = timezone.now()
+        sensor.save()
         return Response({
             "success": True,
             "message": "Sensor updated successfully",
-            "sensor": {
-                "id": sensor_id,
-                **sensor_data
-            }
+            "sensor": sensor.to_dict()
         })
+    except ValueError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     except Exception as e:
         return Response(
             {"error": str(e)},
@@ -659,7 +1165,12 @@ def delete_sensor(request, sensor_id):
     Delete a sensor
     """
     try:
-        # In a real application, this would delete from database
+        deleted, _ = Sensor.objects.filter(sensor_id=sensor_id).delete()
+        if not deleted:
+            return Response(
+                {"error": f"Sensor {sensor_id} not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
         return Response({
             "success": True,
             "message": f"Sensor {sensor_id} deleted successfully"
@@ -670,3 +1181,181 @@ def delete_sensor(request, sensor_id):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+
+def _apply_sensor_data(sensor, data):
+    """Copy API fields from a request payload onto a Sensor; ValueError for an unknown zone"""
+    for field, attribute in (
+        ("name", "name"),
+        ("type", "sensor_type"),
+        ("status", "status"),
+        ("sensitivity", "sensitivity"),
+    ):
+        if field in data:
+            setattr(sensor, attribute, data[field])
+    if "location" in data and data["location"] != sensor.location:
+        sensor.location = data["location"]
+        sensor.zone_id = None
+    if data.get("zoneId"):
+        zone_id = str(data["zoneId"])
+        if not zone_id.isdigit() or not Zone.objects.filter(id=int(zone_id)).exists():
+            raise ValueError(f"Unknown zoneId '{data['zoneId']}'")
+        sensor.zone_id = int(zone_id)
+
+
+# Alert rule endpoints
+@api_view(['GET', 'POST'])
+def alert_rules(request):
+    """
+    List alert rules, with the reason for any that no longer compile (GET), or create one (POST)
+    """
+    try:
+        if request.method == 'GET':
+            rules = []
+            for rule in AlertRule.objects.order_by('id'):
+                try:
+                    # A zone a rule names may have been deleted since the rule was saved
+                    validate_expression(rule.expression)
+                    error = None
+                except ValueError as e:
+                    error = str(e)
+                rules.append({**rule.to_dict(), "error": error})
+            return Response(rules)
+
+        rule = AlertRule()
+        _apply_rule_data(rule, request.data)
+        rule.save()
+        return Response({
+            "success": True,
+            "message": "Rule created successfully",
+            "rule": rule.to_dict()
+        }, status=status.HTTP_201_CREATED)
+    except ValueError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['PUT'])
+def update_alert_rule(request, rule_id):
+    """
+    Update an alert rule
+    """
+    try:
+        rule = AlertRule.objects.filter(id=rule_id).first()
+        if rule is None:
+            return Response(
+                {"error": f"Rule {rule_id} not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        _apply_rule_data(rule, request.data)
+        rule.save()
+        return Response({
+            "success": True,
+            "message": "Rule updated successfully",
+            "rule": rule.to_dict()
+        })
+    except ValueError as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['DELETE'])
+def delete_alert_rule(request, rule_id):
+    """
+    Delete an alert rule
+    """
+    try:
+        rule = AlertRule.objects.filter(id=rule_id).first()
+        if rule is None:
+            return Response(
+                {"error": f"Rule {rule_id} not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        # Deleted through the instance so the rule engines hear about it
+        rule.delete()
+        return Response({
+            "success": True,
+            "message": f"Rule {rule_id} deleted successfully"
+        })
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def _apply_rule_data(rule, data):
+    """Copy API fields from a request payload onto an AlertRule, raising ValueError for unusable ones"""
+    for field in ("name", "expression", "priority", "title", "enabled", "cooldown"):
+        if field in data:
+            setattr(rule, field, data[field])
+    if not rule.name or not rule.expression:
+        raise ValueError("A rule needs a 'name' and an 'expression'")
+    if rule.priority not in Alert.PRIORITY_COLORS:
+        raise ValueError(f"Rule 'priority' must be one of {', '.join(Alert.PRIORITY_COLORS)}")
+    if rule.cooldown is not None and (not isinstance(rule.cooldown, int) or rule.cooldown < 0):
+        raise ValueError("Rule 'cooldown' must be a whole number of seconds")
+    # Rejected here rather than skipped by every engine later
+    validate_expression(rule.expression)
+
+
+# Zone endpoints
+@api_view(['GET'])
+def get_zones(request):
+    """
+    Get the site/building/zone hierarchy
+    """
+    try:
+        return Response([zone.to_dict() for zone in Zone.objects.order_by('path')])
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+def get_zone_contents(request, zone_ref):
+    """
+    Get the cameras, sensors and open alerts anywhere inside a zone
+    """
+    try:
+        zone = zone_index.get(zone_ref)
+        return Response({
+            "zone": zone.to_dict(),
+            "cameras": [camera.to_dict() for camera in zone_index.filter(Camera.objects.order_by('id'), zone)],
+            "sensors": [sensor.to_dict() for sensor in zone_index.filter(Sensor.objects.order_by('sensor_id'), zone)],
+            "openAlerts": [
+                alert.to_dict()
+                for alert in zone_index.filter(Alert.objects.filter(status='open').order_by('-created_at'), zone)
+            ],
+        })
+    except Zone.DoesNotExist as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except Exception as e:
+        return Response(
+            {"error": str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+def _zone_param(request):
+    """Resolve the optional ?zone= query parameter (id or name) to a Zone"""
+    ref = request.query_params.get('zone')
+    return zone_index.get(ref) if ref else None
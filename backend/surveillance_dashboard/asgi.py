@@ -15,4 +15,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'surveillance_dashboard.settings
 
 application = get_asgi_application()
 
+# Rate limits hold under ASGI too; admission control is WSGI-only (see AdmissionControl)
+from app.middleware import AsgiRateLimiter
+
+application = AsgiRateLimiter(application)
+
 
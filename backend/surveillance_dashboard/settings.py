@@ -41,6 +41,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app.middleware.TrafficRecorder',
 ]
 
 ROOT_URLCONF = 'surveillance_dashboard.urls'
@@ -72,6 +73,67 @@ DATABASES = {
     }
 }
 
+# Caches: 'default' is an in-process LRU, 'shared' a file cache every worker process on
+# the host can see
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'dashboard',
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('LOCAL_CACHE_MAX_ENTRIES', '1000'))},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SHARED_CACHE_DIR', str(BASE_DIR / 'cache')),
+    },
+}
+
+# Sessions: 'db' keeps them in the django_session table, a query on every authenticated
+# request; 'cached_db' reads them from SESSION_CACHE_ALIAS and writes through to the table;
+# 'cache' keeps them in the cache only; 'signed_cookies' keeps them in the client's cookie,
+# signed with SECRET_KEY, so they cost no storage at all but cannot be revoked server-side
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'db')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_BACKEND}'
+SESSION_CACHE_ALIAS = os.getenv('SESSION_CACHE_ALIAS', 'shared')
+
+# Login password checks run at once (PBKDF2 takes a core each), logins allowed to wait
+# for one, and seconds they wait before being turned away with 503 and Retry-After
+LOGIN_MAX_CONCURRENT = int(os.getenv('LOGIN_MAX_CONCURRENT', str(max(1, (os.cpu_count() or 2) // 2))))
+LOGIN_QUEUE_SIZE = int(os.getenv('LOGIN_QUEUE_SIZE', '8'))
+LOGIN_QUEUE_TIMEOUT = float(os.getenv('LOGIN_QUEUE_TIMEOUT', '2'))
+
+# Per-client rate limits: requests per minute each client may send to routes starting with
+# each prefix, and the burst above that (0 per minute: not limited). The first matching prefix
+# applies, and each prefix has its own bucket per client. app.urls is also served from the
+# root, so /auth/login counts as /api/auth/login. Buckets live in RATE_LIMIT_FILE,
+# memory-mapped and shared by every worker process on the host. Applied around the WSGI and
+# ASGI applications (see wsgi.py and asgi.py), before Django does any work on a request.
+RATE_LIMITS = [
+    ('/api/ai/', float(os.getenv('RATE_LIMIT_AI_PER_MINUTE', '30')), int(os.getenv('RATE_LIMIT_AI_BURST', '10'))),
+    ('/api/auth/', float(os.getenv('RATE_LIMIT_AUTH_PER_MINUTE', '60')), int(os.getenv('RATE_LIMIT_AUTH_BURST', '20'))),
+    ('/api/ingest/', float(os.getenv('RATE_LIMIT_INGEST_PER_MINUTE', '0')),
+     int(os.getenv('RATE_LIMIT_INGEST_BURST', '1000'))),
+    ('/api/', float(os.getenv('RATE_LIMIT_PER_MINUTE', '3000')), int(os.getenv('RATE_LIMIT_BURST', '500'))),
+]
+RATE_LIMIT_FILE = os.getenv('RATE_LIMIT_FILE', '/dev/shm/surveillance-dashboard-rate-limits'
+                            if os.path.isdir('/dev/shm') else str(BASE_DIR / 'rate-limits'))
+# Buckets the file holds; the longest-idle bucket of a full group makes room for a new client
+RATE_LIMIT_BUCKETS = int(os.getenv('RATE_LIMIT_BUCKETS', '131072'))
+# Request header naming the client (e.g. X-Forwarded-For, only behind a proxy that sets it);
+# unset, clients are told apart by their address
+RATE_LIMIT_CLIENT_HEADER = os.getenv('RATE_LIMIT_CLIENT_HEADER', '')
+
+# Admission control per worker process, around the WSGI application only: requests worked
+# on at once (0 turns it off), further requests allowed to wait, and seconds they wait before
+# being shed with 503 and Retry-After. Run the server with more threads than
+# ADMISSION_MAX_CONCURRENT + ADMISSION_QUEUE_SIZE, so requests beyond them reach the
+# middleware and are shed instead of queueing inside the server.
+ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', str(2 * (os.cpu_count() or 1))))
+ADMISSION_QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', '16'))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '1'))
+# Paths never shed: health checks, and frame uploads that stream for as long as a camera is up.
+# As with RATE_LIMITS, paths from the root mount are matched as their /api/ equivalents.
+ADMISSION_EXEMPT_PATHS = ('/api/health', '/api/live-feeds/')
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -125,8 +187,209 @@ CORS_ALLOWED_ORIGINS = os.getenv(
 
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_ALL_ORIGINS = DEBUG  # Allow all origins in debug mode
+# So the dashboard can see how long to back off from a 429 or 503
+CORS_EXPOSE_HEADERS = ['Retry-After']
 
 # Gemini API Key
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
 
+# Estimated tokens an analysis payload may take up in a prompt; larger payloads are
+# digested (series reduced to statistics, long strings cut) until they fit
+AI_PROMPT_TOKEN_BUDGET = int(os.getenv('AI_PROMPT_TOKEN_BUDGET', '1500'))
+
+# AI gateway: requests per minute allowed by the API quota, and the burst above it
+AI_RATE_LIMIT_PER_MINUTE = float(os.getenv('AI_RATE_LIMIT_PER_MINUTE', '60'))
+AI_RATE_LIMIT_BURST = int(os.getenv('AI_RATE_LIMIT_BURST', '10'))
+# Model calls in flight, further requests allowed to wait, how long they wait (seconds)
+# and how long a call may take before the heuristic answers instead
+AI_MAX_CONCURRENT = int(os.getenv('AI_MAX_CONCURRENT', '4'))
+AI_QUEUE_SIZE = int(os.getenv('AI_QUEUE_SIZE', '16'))
+AI_QUEUE_TIMEOUT = float(os.getenv('AI_QUEUE_TIMEOUT', '5'))
+AI_TIMEOUT = float(os.getenv('AI_TIMEOUT', '30'))
+# Circuit breaker: failures in a row that open it, calls slower than this count as
+# failures, and seconds before a probe call is let through
+AI_BREAKER_FAILURES = int(os.getenv('AI_BREAKER_FAILURES', '5'))
+AI_BREAKER_SLOW_SECONDS = float(os.getenv('AI_BREAKER_SLOW_SECONDS', '15'))
+AI_BREAKER_RESET_SECONDS = float(os.getenv('AI_BREAKER_RESET_SECONDS', '30'))
+
+# Queued AI analysis: worker processes and threads per process, threads kept for
+# interactive jobs only, and rate tokens batch jobs leave for interactive ones
+AI_JOB_WORKERS = int(os.getenv('AI_JOB_WORKERS', '1'))
+AI_JOB_THREADS = int(os.getenv('AI_JOB_THREADS', '4'))
+AI_JOB_INTERACTIVE_SLOTS = int(os.getenv('AI_JOB_INTERACTIVE_SLOTS', '1'))
+AI_JOB_BATCH_RESERVE = float(os.getenv('AI_JOB_BATCH_RESERVE', '3'))
+# Seconds between polls of an idle worker thread, seconds a running job may go
+# without finishing before it is handed to another worker, and attempts per job
+AI_JOB_POLL_SECONDS = float(os.getenv('AI_JOB_POLL_SECONDS', '0.05'))
+AI_JOB_LEASE_SECONDS = float(os.getenv('AI_JOB_LEASE_SECONDS', '300'))
+AI_JOB_MAX_ATTEMPTS = int(os.getenv('AI_JOB_MAX_ATTEMPTS', '3'))
+
+
+
+# Data retention and compaction
+# Raw sensor readings are rolled into hourly aggregates after COMPACTION_RAW_MAX_AGE_DAYS;
+# hourly aggregates and alerts are rolled into daily aggregates once they pass DATA_RETENTION_DAYS.
+DATA_RETENTION_DAYS = int(os.getenv('DATA_RETENTION_DAYS', '90'))
+COMPACTION_RAW_MAX_AGE_DAYS = int(os.getenv('COMPACTION_RAW_MAX_AGE_DAYS', '7'))
+COMPACTION_BATCH_SIZE = int(os.getenv('COMPACTION_BATCH_SIZE', '5000'))
+
+# Export expired data to compressed Parquet files before it is dropped
+AUTO_EXPORT = os.getenv('AUTO_EXPORT', 'True') == 'True'
+EXPORT_DIR = Path(os.getenv('EXPORT_DIR', BASE_DIR / 'exports'))
+
+# Search: matches counted (and ranked/faceted) per query before falling back to newest-first
+SEARCH_COUNT_LIMIT = int(os.getenv('SEARCH_COUNT_LIMIT', '10000'))
+
+# Dashboard view cache: which cache holds it, seconds an entry lives without being
+# invalidated, and seconds other processes wait for a cold entry being computed.
+# Invalidations are cache writes, so 'default' (per process) is only right when a single
+# process both serves requests and writes alerts, sensors and incidents
+VIEW_CACHE_BACKEND = os.getenv('VIEW_CACHE_BACKEND', 'shared')
+VIEW_CACHE_TIMEOUT = int(os.getenv('VIEW_CACHE_TIMEOUT', '300'))
+VIEW_CACHE_LEASE_SECONDS = float(os.getenv('VIEW_CACHE_LEASE_SECONDS', '5'))
+
+# Event bus for live-state events (alert created, sensor updated, settings changed):
+# 'local' keeps them in the process, 'unix' and 'tcp' share them through
+# `manage.py run_event_broker` on one host or across nodes
+EVENT_BUS_BACKEND = os.getenv('EVENT_BUS_BACKEND', 'local')
+EVENT_BUS_SOCKET = os.getenv('EVENT_BUS_SOCKET', str(BASE_DIR / 'events.sock'))
+EVENT_BUS_ADDRESS = os.getenv('EVENT_BUS_ADDRESS', '127.0.0.1:8765')
+# Events a process may have pending or unconfirmed, and seconds publishing waits for room
+EVENT_BUS_QUEUE_SIZE = int(os.getenv('EVENT_BUS_QUEUE_SIZE', '10000'))
+EVENT_BUS_PUBLISH_TIMEOUT = float(os.getenv('EVENT_BUS_PUBLISH_TIMEOUT', '0.5'))
+# Events per batch, and seconds a part-filled batch waits for more
+EVENT_BUS_BATCH_SIZE = int(os.getenv('EVENT_BUS_BATCH_SIZE', '256'))
+EVENT_BUS_LINGER = float(os.getenv('EVENT_BUS_LINGER', '0.002'))
+# Recent events kept for clients that reconnect, events queued per broker client, and
+# seconds publishing waits for a client with a full queue before disconnecting it
+EVENT_BUS_HISTORY = int(os.getenv('EVENT_BUS_HISTORY', '10000'))
+EVENT_BUS_CLIENT_QUEUE = int(os.getenv('EVENT_BUS_CLIENT_QUEUE', '10000'))
+EVENT_BUS_SLOW_CLIENT_SECONDS = float(os.getenv('EVENT_BUS_SLOW_CLIENT_SECONDS', '5'))
+
+# Ingestion log: sensor readings and alerts posted to /api/ingest/* are appended to an
+# fsync'd log in INGEST_LOG_DIR (one slot per worker process) and applied to the database
+# in the background. One fsync covers everything appended within INGEST_LOG_COMMIT_MS,
+# or INGEST_LOG_COMMIT_BATCH records, whichever comes first.
+INGEST_LOG_DIR = os.getenv('INGEST_LOG_DIR', str(BASE_DIR / 'ingest_log'))
+INGEST_LOG_SEGMENT_BYTES = int(os.getenv('INGEST_LOG_SEGMENT_BYTES', str(64 * 1024 * 1024)))
+INGEST_LOG_COMMIT_MS = float(os.getenv('INGEST_LOG_COMMIT_MS', '5'))
+INGEST_LOG_COMMIT_BATCH = int(os.getenv('INGEST_LOG_COMMIT_BATCH', '1000'))
+# Records per applier transaction, and seconds an idle applier waits before looking again
+INGEST_APPLY_BATCH = int(os.getenv('INGEST_APPLY_BATCH', '5000'))
+INGEST_APPLY_INTERVAL = float(os.getenv('INGEST_APPLY_INTERVAL', '0.2'))
+# Seconds a batch is retried with backoff while the database is busy (e.g. locked) before
+# the applier leaves it in the log and tries again on its next pass
+INGEST_APPLY_RETRY_SECONDS = float(os.getenv('INGEST_APPLY_RETRY_SECONDS', '30'))
+
+# Append every request to the ingestion and alert APIs to this file, for
+# `manage.py load_generator replay`; unset (the default) records nothing
+TRAFFIC_RECORD_FILE = os.getenv('TRAFFIC_RECORD_FILE', '')
+
+# Alert rules: the stress-level thresholds rules refer to by name (low, medium, high,
+# critical), and seconds a rule stays quiet for a sensor after firing unless the rule
+# sets its own cooldown
+ALERT_THRESHOLDS = {
+    'low': float(os.getenv('ALERT_LOW_THRESHOLD', '0.3')),
+    'medium': float(os.getenv('ALERT_MEDIUM_THRESHOLD', '0.6')),
+    'high': float(os.getenv('ALERT_HIGH_THRESHOLD', '0.8')),
+    'critical': float(os.getenv('ALERT_CRITICAL_THRESHOLD', '0.9')),
+}
+ALERT_COOLDOWN_SECONDS = int(os.getenv('ALERT_COOLDOWN_SECONDS', '300'))
+# Held by the one `manage.py run_rules` process allowed to evaluate rules against this host's database
+ALERT_RULES_LOCK_FILE = os.getenv('ALERT_RULES_LOCK_FILE', str(BASE_DIR / 'alert-rules.lock'))
+
+# Cross-sensor correlation (`manage.py run_correlation`): alerts from at least
+# CORRELATION_MIN_SOURCES kinds of sensor (video, audio, iot) in the same zone, building or
+# site, each within CORRELATION_WINDOW_SECONDS of the last, are fused into one incident.
+# An incident spans at most CORRELATION_MAX_SPAN_SECONDS, and alerts may arrive up to
+# CORRELATION_LATENESS_SECONDS out of order.
+CORRELATION_SCOPE = os.getenv('CORRELATION_SCOPE', 'zone')
+CORRELATION_WINDOW_SECONDS = float(os.getenv('CORRELATION_WINDOW_SECONDS', '120'))
+CORRELATION_MAX_SPAN_SECONDS = float(os.getenv('CORRELATION_MAX_SPAN_SECONDS', '600'))
+CORRELATION_LATENESS_SECONDS = float(os.getenv('CORRELATION_LATENESS_SECONDS', '30'))
+CORRELATION_MIN_SOURCES = int(os.getenv('CORRELATION_MIN_SOURCES', '2'))
+# Clusters of alerts tracked at once, and alerts kept as evidence per incident
+CORRELATION_MAX_OPEN = int(os.getenv('CORRELATION_MAX_OPEN', '10000'))
+CORRELATION_MAX_EVIDENCE = int(os.getenv('CORRELATION_MAX_EVIDENCE', '50'))
+
+# Stress-index forecasting (`manage.py run_forecasts`): hours ahead that are forecast and
+# may be requested with ?forecast=Nh, hours of readings folded in on the first run, Holt-Winters
+# smoothing of level, trend and hour-of-day season, and the prediction interval's coverage
+FORECAST_MAX_HOURS = int(os.getenv('FORECAST_MAX_HOURS', '24'))
+FORECAST_HISTORY_HOURS = int(os.getenv('FORECAST_HISTORY_HOURS', '168'))
+FORECAST_ALPHA = float(os.getenv('FORECAST_ALPHA', '0.1'))
+FORECAST_BETA = float(os.getenv('FORECAST_BETA', '0.01'))
+FORECAST_GAMMA = float(os.getenv('FORECAST_GAMMA', '0.1'))
+FORECAST_INTERVAL = float(os.getenv('FORECAST_INTERVAL', '0.95'))
+
+# Alert escalation: seconds an open alert may stay unacknowledged before it escalates,
+# per priority. Each further escalation waits twice as long, up to ESCALATION_MAX_LEVEL.
+ESCALATION_DEADLINES = {
+    'High': int(os.getenv('ESCALATION_HIGH_SECONDS', '300')),
+    'Medium': int(os.getenv('ESCALATION_MEDIUM_SECONDS', '900')),
+    'Low': int(os.getenv('ESCALATION_LOW_SECONDS', '3600')),
+}
+ESCALATION_MAX_LEVEL = int(os.getenv('ESCALATION_MAX_LEVEL', '3'))
+
+# Notification channels and the bounded worker pool that delivers them
+NOTIFY_EMAIL = os.getenv('NOTIFY_EMAIL', 'True') == 'True'
+NOTIFY_SMS = os.getenv('NOTIFY_SMS', 'False') == 'True'
+NOTIFY_PUSH = os.getenv('NOTIFY_PUSH', 'True') == 'True'
+ALERT_EMAIL = os.getenv('ALERT_EMAIL', '')
+ALERT_SMS = os.getenv('ALERT_SMS', '')
+SMS_GATEWAY_URL = os.getenv('SMS_GATEWAY_URL', '')
+PUSH_GATEWAY_URL = os.getenv('PUSH_GATEWAY_URL', '')
+NOTIFICATION_WORKERS = int(os.getenv('NOTIFICATION_WORKERS', '4'))
+NOTIFICATION_QUEUE_SIZE = int(os.getenv('NOTIFICATION_QUEUE_SIZE', '1000'))
+NOTIFICATION_TIMEOUT = float(os.getenv('NOTIFICATION_TIMEOUT', '10'))
+# Notifications to the same recipient within this many seconds are sent as one digest
+NOTIFICATION_DIGEST_WINDOW = float(os.getenv('NOTIFICATION_DIGEST_WINDOW', '10'))
+NOTIFICATION_DIGEST_MAX = int(os.getenv('NOTIFICATION_DIGEST_MAX', '50'))
+NOTIFICATION_RETRIES = int(os.getenv('NOTIFICATION_RETRIES', '3'))
+NOTIFICATION_RETRY_BACKOFF = float(os.getenv('NOTIFICATION_RETRY_BACKOFF', '1.0'))
+
+# Outgoing email (SMTP); point at localhost:1025 to use `manage.py notification_sinks`
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False') == 'True'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'alerts@surveillance.local')
+EMAIL_TIMEOUT = NOTIFICATION_TIMEOUT
+
+# Camera frame ingestion: frames are scaled to this size and kept in a shared-memory
+# ring of FRAME_RING_SLOTS frames per camera (slots x width x height x 3 bytes)
+FRAME_WIDTH = int(os.getenv('FRAME_WIDTH', '640'))
+FRAME_HEIGHT = int(os.getenv('FRAME_HEIGHT', '360'))
+FRAME_RING_SLOTS = int(os.getenv('FRAME_RING_SLOTS', '8'))
+FRAME_SHM_PREFIX = os.getenv('FRAME_SHM_PREFIX', 'surveillance_frames_')
+# Writers to a camera's ring take turns through a lock file here
+FRAME_LOCK_DIR = os.getenv('FRAME_LOCK_DIR', str(BASE_DIR / 'frame-locks'))
+
+# Alert evidence: a snapshot and a clip of up to EVIDENCE_CLIP_FRAMES frames (bounded by the
+# frame ring) per alert, EVIDENCE_WIDTH pixels wide, appended to EVIDENCE_SEGMENT_BYTES
+# segment files; segments go once their blobs pass EVIDENCE_RETENTION_DAYS or the store
+# outgrows EVIDENCE_MAX_BYTES
+EVIDENCE_DIR = Path(os.getenv('EVIDENCE_DIR', BASE_DIR / 'evidence'))
+EVIDENCE_SEGMENT_BYTES = int(os.getenv('EVIDENCE_SEGMENT_BYTES', str(256 * 1024 * 1024)))
+EVIDENCE_WIDTH = int(os.getenv('EVIDENCE_WIDTH', '320'))
+EVIDENCE_CLIP_FRAMES = int(os.getenv('EVIDENCE_CLIP_FRAMES', '8'))
+EVIDENCE_QUALITY = int(os.getenv('EVIDENCE_QUALITY', '75'))
+EVIDENCE_MAX_BLOB_BYTES = int(os.getenv('EVIDENCE_MAX_BLOB_BYTES', str(2 * 1024 * 1024)))
+EVIDENCE_RETENTION_DAYS = int(os.getenv('EVIDENCE_RETENTION_DAYS', '30'))
+EVIDENCE_MAX_BYTES = int(os.getenv('EVIDENCE_MAX_BYTES', str(10 * 1024 ** 3)))
+
+# Motion detection: frames are compared at 1/MOTION_DOWNSCALE resolution against a running
+# background; scores are averaged per camera over MOTION_SAMPLE_SECONDS and stored as readings
+MOTION_WORKERS = int(os.getenv('MOTION_WORKERS', '0'))  # 0 = one per CPU core
+MOTION_DOWNSCALE = int(os.getenv('MOTION_DOWNSCALE', '4'))
+MOTION_THRESHOLD = float(os.getenv('MOTION_THRESHOLD', '25'))
+MOTION_BACKGROUND_ALPHA = float(os.getenv('MOTION_BACKGROUND_ALPHA', '0.05'))
+MOTION_SAMPLE_SECONDS = float(os.getenv('MOTION_SAMPLE_SECONDS', '10'))
 
+# Audio features: PCM is analysed in AUDIO_WINDOW-sample Hann windows with 50% overlap and
+# summarised every AUDIO_SUMMARY_SECONDS; a window AUDIO_SPIKE_DB above ambient is a spike
+AUDIO_SAMPLE_RATE = int(os.getenv('AUDIO_SAMPLE_RATE', '16000'))
+AUDIO_WINDOW = int(os.getenv('AUDIO_WINDOW', '1024'))
+AUDIO_SUMMARY_SECONDS = float(os.getenv('AUDIO_SUMMARY_SECONDS', '10'))
+AUDIO_SPIKE_DB = float(os.getenv('AUDIO_SPIKE_DB', '12'))
@@ -15,4 +15,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'surveillance_dashboard.settings
 
 application = get_wsgi_application()
 
+# Rate limiting and admission control refuse requests before Django does any work on them
+from app.middleware import AdmissionControl, RateLimiter
+
+application = RateLimiter(AdmissionControl(application))
+
 